@@ -4,6 +4,7 @@ AI-Powered Quiz Validator
 Uses Claude to intelligently validate quiz accuracy with clear instructions
 """
 
+import argparse
 import asyncio
 import asyncpg
 import json
@@ -11,10 +12,12 @@ import os
 from pathlib import Path
 from datetime import datetime
 import logging
-from typing import Dict, List
-import anthropic
+from typing import Dict, List, Optional
 from collections import defaultdict
 
+from catalog_scan import ScanCheckpoint, ScanProgress, count_quiz_sets, has_more_quiz_sets, iter_quiz_set_pages
+from provider_client import call_anthropic, close_clients
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -33,11 +36,14 @@ if env_path.exists():
 class AIQuizValidator:
     """Validates quiz questions using AI with clear context"""
     
-    def __init__(self, db_pool: asyncpg.Pool, api_key: str):
+    def __init__(self, db_pool: asyncpg.Pool, api_key: str, concurrency: int = 8):
         self.db_pool = db_pool
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.api_key = api_key
+        # Calls in flight at once; the shared limiter still enforces RPM/TPM
+        self.semaphore = asyncio.Semaphore(concurrency)
         self.validation_stats = defaultdict(int)
         self.issues_found = []
+        self.progress: Optional[ScanProgress] = None
         
     def get_validation_prompt(self, question: Dict, category: str, mode: str, 
                             difficulty: str, age_rating: str) -> str:
@@ -111,44 +117,52 @@ RESPOND WITH ONLY THIS JSON:
     "explanation": "Brief explanation of validation decision"
 }}"""
 
-    async def validate_batch(self, limit: int = 100, category_filter: str = None):
-        """Validate a batch of quiz questions"""
-        logger.info(f"Starting AI validation (limit: {limit})")
-        
-        async with self.db_pool.acquire() as conn:
-            # Build query
-            query = """
-            SELECT 
-                c.id,
-                c.data,
-                c.metadata
-            FROM content c
-            WHERE c.type = 'quiz_set'
-            """
-            
-            if category_filter:
-                query += f" AND c.data->>'category' = '{category_filter}'"
-            
-            query += f" ORDER BY RANDOM() LIMIT {limit}"
-            
-            quiz_sets = await conn.fetch(query)
-            
-            logger.info(f"Validating {len(quiz_sets)} quiz sets...")
-            
-            for quiz_set in quiz_sets:
-                await self._validate_quiz_set(quiz_set)
-                
-                # Progress update
-                if self.validation_stats['total_validated'] > 0 and self.validation_stats['total_validated'] % 10 == 0:
-                    logger.info(
-                        f"Progress: {self.validation_stats['total_validated']} validated, "
-                        f"{self.validation_stats['issues_found']} issues"
-                    )
-            
-            return self._generate_report()
-    
+    async def validate_batch(self, limit: Optional[int] = None, category_filter: str = None,
+                             checkpoint_path: Optional[str] = None, restart: bool = False,
+                             page_size: int = 20):
+        """
+        Validate quiz sets in id order, the whole catalog unless `limit` is set
+        With a checkpoint file, progress is saved after every page of sets and
+        a rerun picks up after the last finished page, so `limit` also works
+        as a chunk size for scanning the catalog over several runs
+        """
+        checkpoint = ScanCheckpoint(checkpoint_path) if checkpoint_path else None
+        after_id = None
+        if checkpoint and not restart and checkpoint.load():
+            after_id = checkpoint.last_id
+            self.validation_stats.update(checkpoint.state.get('validation_stats', {}))
+            self.issues_found = checkpoint.items
+            logger.info(
+                f"Resuming after set {after_id} "
+                f"({self.validation_stats['total_validated']} questions already validated)"
+            )
+
+        total_sets = await count_quiz_sets(self.db_pool, category_filter, after_id)
+        if limit is not None:
+            total_sets = min(total_sets, limit)
+        logger.info(f"Starting AI validation of {total_sets} quiz sets")
+
+        # Progress counts sets; questions per set vary
+        self.progress = ScanProgress(total_sets, label='sets')
+        async for page in iter_quiz_set_pages(self.db_pool, page_size, category_filter, after_id, limit):
+            await asyncio.gather(*(self._validate_quiz_set(row) for row in page))
+            if checkpoint:
+                checkpoint.save(str(page[-1]['id']), {
+                    'validation_stats': dict(self.validation_stats)
+                }, items=self.issues_found)
+        self.progress.finish()
+
+        # A scan that reached the end starts over next time; a limited one carries on
+        if checkpoint and not await has_more_quiz_sets(
+            self.db_pool, category_filter, checkpoint.last_id or after_id
+        ):
+            checkpoint.remove()
+
+        return self._generate_report()
+
     async def _validate_quiz_set(self, quiz_set_row):
-        """Validate all questions in a quiz set"""
+        """Validate all questions in a quiz set concurrently"""
+        issues_before = self.validation_stats['issues_found']
         try:
             data = quiz_set_row['data']
             if isinstance(data, str):
@@ -168,63 +182,74 @@ RESPOND WITH ONLY THIS JSON:
             age_rating = metadata.get('maturity_rating', 'all_ages')
             
             questions = data.get('questions', [])
-            
-            for q_idx, question in enumerate(questions):
-                self.validation_stats['total_validated'] += 1
-                
-                # Get validation prompt
-                prompt = self.get_validation_prompt(
-                    question, category, mode, difficulty, age_rating
-                )
-                
-                try:
-                    # Call Claude Haiku - fast and budget-friendly!
-                    response = self.client.messages.create(
-                        model="claude-3-haiku-20240307",  # Fast, accurate, and economical
-                        max_tokens=500,
-                        temperature=0,
-                        messages=[{"role": "user", "content": prompt}]
-                    )
-                    
-                    # Parse response
-                    result_text = response.content[0].text.strip()
-                    
-                    # Extract JSON
-                    if '{' in result_text and '}' in result_text:
-                        json_start = result_text.index('{')
-                        json_end = result_text.rindex('}') + 1
-                        result = json.loads(result_text[json_start:json_end])
-                    else:
-                        raise ValueError("No JSON in response")
-                    
-                    # Process validation result
-                    if not result.get('validation_passed', True):
-                        self.validation_stats['issues_found'] += 1
-                        
-                        for issue in result.get('issues', []):
-                            self.issues_found.append({
-                                'set_id': set_id,
-                                'question_idx': q_idx,
-                                'category': category,
-                                'mode': mode,
-                                'question': question['question'][:100] + '...',
-                                'issue_type': issue['type'],
-                                'severity': issue['severity'],
-                                'description': issue['description'],
-                                'suggestion': issue['suggestion'],
-                                'confidence': result.get('confidence', 0.5)
-                            })
-                            
-                            # Track issue types
-                            self.validation_stats[f"issue_{issue['type']}"] += 1
-                    
-                except Exception as e:
-                    logger.error(f"Validation error for question {q_idx} in set {set_id}: {e}")
-                    self.validation_stats['validation_errors'] += 1
+            await asyncio.gather(*(
+                self._validate_question(question, q_idx, set_id, category, mode, difficulty, age_rating)
+                for q_idx, question in enumerate(questions)
+            ))
                     
         except Exception as e:
             logger.error(f"Error processing quiz set {quiz_set_row['id']}: {e}")
             self.validation_stats['processing_errors'] += 1
+
+        if self.progress:
+            self.progress.update(flagged=self.validation_stats['issues_found'] - issues_before)
+
+    async def _validate_question(self, question: Dict, q_idx: int, set_id: str, category: str,
+                                 mode: str, difficulty: str, age_rating: str):
+        """Validate one question and record any issues"""
+        self.validation_stats['total_validated'] += 1
+        
+        # Get validation prompt
+        prompt = self.get_validation_prompt(
+            question, category, mode, difficulty, age_rating
+        )
+        
+        try:
+            # Call Claude Haiku - fast and budget-friendly!
+            response = await call_anthropic({
+                "model": "claude-3-haiku-20240307",  # Fast, accurate, and economical
+                "max_tokens": 500,
+                "temperature": 0,
+                "messages": [{"role": "user", "content": prompt}]
+            }, self.api_key, self.semaphore)
+            if response is None:
+                raise RuntimeError("API call failed")
+            
+            # Parse response
+            result_text = response['content'][0]['text'].strip()
+            
+            # Extract JSON
+            if '{' in result_text and '}' in result_text:
+                json_start = result_text.index('{')
+                json_end = result_text.rindex('}') + 1
+                result = json.loads(result_text[json_start:json_end])
+            else:
+                raise ValueError("No JSON in response")
+            
+            # Process validation result
+            if not result.get('validation_passed', True):
+                self.validation_stats['issues_found'] += 1
+                
+                for issue in result.get('issues', []):
+                    self.issues_found.append({
+                        'set_id': set_id,
+                        'question_idx': q_idx,
+                        'category': category,
+                        'mode': mode,
+                        'question': question['question'][:100] + '...',
+                        'issue_type': issue['type'],
+                        'severity': issue['severity'],
+                        'description': issue['description'],
+                        'suggestion': issue['suggestion'],
+                        'confidence': result.get('confidence', 0.5)
+                    })
+                    
+                    # Track issue types
+                    self.validation_stats[f"issue_{issue['type']}"] += 1
+            
+        except Exception as e:
+            logger.error(f"Validation error for question {q_idx} in set {set_id}: {e}")
+            self.validation_stats['validation_errors'] += 1
     
     def _generate_report(self) -> Dict:
         """Generate validation report"""
@@ -306,7 +331,7 @@ RESPOND WITH ONLY THIS JSON:
         return json_file, summary_file
 
 
-async def main():
+async def main(args):
     """Run the AI validator"""
     DATABASE_URL = os.getenv('DATABASE_URL')
     API_KEY = os.getenv('ANTHROPIC_API_KEY')
@@ -319,7 +344,7 @@ async def main():
     db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=5)
     
     try:
-        validator = AIQuizValidator(db_pool, API_KEY)
+        validator = AIQuizValidator(db_pool, API_KEY, concurrency=args.concurrency)
         
         print("=== AI QUIZ VALIDATOR ===")
         print("Using Claude to validate quiz accuracy")
@@ -331,16 +356,18 @@ async def main():
         print("✓ Age-appropriate content")
         print()
         
-        # Get parameters
-        category = input("Category to validate (blank for random): ").strip() or None
-        limit = input("Number of quiz sets to validate (default 50): ").strip()
-        limit = int(limit) if limit else 50
-        
-        print(f"\nValidating {limit} quiz sets{f' in {category}' if category else ''}...")
-        print("This will take a few minutes...\n")
+        scope = f"{args.limit} quiz sets" if args.limit else "all quiz sets"
+        print(f"\nValidating {scope}{f' in {args.category}' if args.category else ''} "
+              f"({args.concurrency} concurrent calls, checkpoint: {args.checkpoint})...\n")
         
         # Run validation
-        report = await validator.validate_batch(limit=limit, category_filter=category)
+        report = await validator.validate_batch(
+            limit=args.limit,
+            category_filter=args.category,
+            checkpoint_path=args.checkpoint,
+            restart=args.restart,
+            page_size=args.page_size
+        )
         
         # Save report
         json_file, summary_file = validator.save_report(report)
@@ -370,8 +397,18 @@ async def main():
         print(f"Summary: {summary_file}")
         
     finally:
+        await close_clients()
         await db_pool.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Validate quiz sets with AI')
+    parser.add_argument('--category', type=str, help='Filter by category')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after this many sets (default: whole catalog)')
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('AI_VALIDATOR_CONCURRENCY', '8')),
+                        help='API calls in flight at once')
+    parser.add_argument('--page-size', type=int, default=20, help='Sets per checkpointed page')
+    parser.add_argument('--checkpoint', type=str, default='ai_validation_checkpoint.json',
+                        help='Progress file for resuming an interrupted scan')
+    parser.add_argument('--restart', action='store_true', help='Ignore saved progress')
+    asyncio.run(main(parser.parse_args()))
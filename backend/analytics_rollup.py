@@ -0,0 +1,407 @@
+"""
+Analytics rollups for JazzyPop
+Folds quiz_answered events into small counter tables in batches, so the
+/api/analytics/* endpoints never scan events
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = "quiz_answered"
+
+# Distinct sets and the counter each one feeds:
+# scope -> (key expression over the batch, member expression, counter UPDATE)
+DISTINCT_SCOPES = {
+    "quiz_player": (
+        "content_id::text", "player",
+        "UPDATE analytics_quiz_rollup r SET players = r.players + n.added "
+        "FROM n WHERE r.content_id = n.key::uuid"
+    ),
+    "category_player": (
+        "category", "player",
+        "UPDATE analytics_category_rollup r SET players = r.players + n.added "
+        "FROM n WHERE r.category = n.key"
+    ),
+    "category_quiz": (
+        "category", "content_id::text",
+        "UPDATE analytics_category_rollup r SET quizzes = r.quizzes + n.added "
+        "FROM n WHERE r.category = n.key"
+    ),
+    "user_category_quiz": (
+        "user_id::text || ':' || category", "content_id::text",
+        "UPDATE analytics_user_category_rollup r SET quizzes = r.quizzes + n.added "
+        "FROM n WHERE r.user_id = left(n.key, 36)::uuid AND r.category = substr(n.key, 38)"
+    ),
+    "day_player": (
+        "day::text", "player",
+        "UPDATE analytics_daily_rollup r SET players = r.players + n.added "
+        "FROM n WHERE r.day = n.key::date"
+    ),
+    "player": (
+        "''", "player",
+        "UPDATE analytics_totals r SET value = r.value + n.added "
+        "FROM n WHERE r.name = 'players'"
+    ),
+    "quiz": (
+        "''", "content_id::text",
+        "UPDATE analytics_totals r SET value = r.value + n.added "
+        "FROM n WHERE r.name = 'quizzes'"
+    ),
+}
+
+
+class AnalyticsRollup:
+    """
+    Batched, exactly-once rollup of quiz_answered events
+
+    Events are read in (created_at, id) order past a watermark kept in
+    analytics_rollup_state. Each batch updates every rollup and the watermark
+    in one transaction under an advisory lock, so any number of API workers
+    can run the loop without double counting.
+
+    created_at is the inserting transaction's start time, so events younger
+    than `lag` are left for the next batch - a slow transaction can't commit
+    an event behind the watermark.
+
+    Distinct counts (players, quizzes) are exact: members go into
+    analytics_distinct and only newly inserted members bump the counters.
+    Per-day player sets are pruned after day_player_retention_days.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 5000,
+        interval: float = 15.0,
+        lag_seconds: int = 30,
+        day_player_retention_days: int = 14
+    ):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lag_seconds = lag_seconds
+        self.day_player_retention_days = day_player_retention_days
+        self._pool = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def initialize(self, conn):
+        """Create the rollup tables; safe to run on every startup"""
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS analytics_rollup_state (
+                name VARCHAR(50) PRIMARY KEY,
+                last_created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                last_event_id UUID NOT NULL,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS analytics_distinct (
+                scope VARCHAR(30) NOT NULL,
+                key TEXT NOT NULL,
+                member TEXT NOT NULL,
+                PRIMARY KEY (scope, key, member)
+            );
+
+            CREATE TABLE IF NOT EXISTS analytics_totals (
+                name VARCHAR(30) PRIMARY KEY,
+                value BIGINT NOT NULL DEFAULT 0
+            );
+            INSERT INTO analytics_totals (name) VALUES ('players'), ('quizzes')
+            ON CONFLICT (name) DO NOTHING;
+
+            CREATE TABLE IF NOT EXISTS analytics_quiz_rollup (
+                content_id UUID PRIMARY KEY,
+                attempts BIGINT NOT NULL DEFAULT 0,
+                correct BIGINT NOT NULL DEFAULT 0,
+                time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                time_count BIGINT NOT NULL DEFAULT 0,
+                score_sum BIGINT NOT NULL DEFAULT 0,
+                score_count BIGINT NOT NULL DEFAULT 0,
+                players BIGINT NOT NULL DEFAULT 0
+            );
+
+            CREATE TABLE IF NOT EXISTS analytics_quiz_answer_rollup (
+                content_id UUID NOT NULL,
+                answer_id TEXT NOT NULL,
+                selected BIGINT NOT NULL DEFAULT 0,
+                correct BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (content_id, answer_id)
+            );
+
+            CREATE TABLE IF NOT EXISTS analytics_category_rollup (
+                category TEXT PRIMARY KEY,
+                attempts BIGINT NOT NULL DEFAULT 0,
+                correct BIGINT NOT NULL DEFAULT 0,
+                time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                time_count BIGINT NOT NULL DEFAULT 0,
+                correct_time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                correct_time_count BIGINT NOT NULL DEFAULT 0,
+                players BIGINT NOT NULL DEFAULT 0,
+                quizzes BIGINT NOT NULL DEFAULT 0
+            );
+
+            CREATE TABLE IF NOT EXISTS analytics_difficulty_rollup (
+                category TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                attempts BIGINT NOT NULL DEFAULT 0,
+                correct BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (category, difficulty)
+            );
+
+            CREATE TABLE IF NOT EXISTS analytics_user_category_rollup (
+                user_id UUID NOT NULL,
+                category TEXT NOT NULL,
+                attempts BIGINT NOT NULL DEFAULT 0,
+                correct BIGINT NOT NULL DEFAULT 0,
+                time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                time_count BIGINT NOT NULL DEFAULT 0,
+                correct_time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                correct_time_count BIGINT NOT NULL DEFAULT 0,
+                quizzes BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, category)
+            );
+
+            CREATE TABLE IF NOT EXISTS analytics_user_difficulty_rollup (
+                user_id UUID NOT NULL,
+                category TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                attempts BIGINT NOT NULL DEFAULT 0,
+                correct BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, category, difficulty)
+            );
+
+            CREATE TABLE IF NOT EXISTS analytics_daily_rollup (
+                day DATE PRIMARY KEY,
+                answers BIGINT NOT NULL DEFAULT 0,
+                correct BIGINT NOT NULL DEFAULT 0,
+                players BIGINT NOT NULL DEFAULT 0
+            );
+        """)
+        logger.info("Analytics rollup tables initialized")
+
+    # ========== LIFECYCLE ==========
+
+    async def start(self, pool):
+        """Run batches in the background until stop()"""
+        self._pool = pool
+        self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # Catch up in small transactions, then wait for new events
+                while await self.process_batch() >= self.batch_size:
+                    await asyncio.sleep(0)
+            except Exception as e:
+                logger.error(f"Analytics rollup batch failed, will retry: {e}")
+            await asyncio.sleep(self.interval)
+
+    # ========== BATCHES ==========
+
+    async def process_batch(self) -> int:
+        """Fold the next batch of events into the rollups; returns events processed"""
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                # Another worker is already on it
+                if not await conn.fetchval(
+                    "SELECT pg_try_advisory_xact_lock(hashtext('analytics_rollup'))"
+                ):
+                    return 0
+
+                state = await conn.fetchrow("""
+                    SELECT last_created_at, last_event_id
+                    FROM analytics_rollup_state
+                    WHERE name = $1
+                """, STATE_NAME)
+                last_created_at = state["last_created_at"] if state else datetime(1970, 1, 1, tzinfo=timezone.utc)
+                last_event_id = state["last_event_id"] if state else None
+
+                await conn.execute("""
+                    CREATE TEMP TABLE analytics_batch ON COMMIT DROP AS
+                    SELECT
+                        id,
+                        created_at,
+                        DATE(created_at) AS day,
+                        content_id,
+                        user_id,
+                        COALESCE(user_id::text, session_id) AS player,
+                        -- Typed columns; payload only for rows backfill_event_columns.py
+                        -- hasn't reached yet
+                        COALESCE(correct, (payload->>'correct')::boolean, false) AS correct,
+                        COALESCE(time_taken, (payload->>'time_taken')::float) AS time_taken,
+                        COALESCE(score, (payload->>'score')::int) AS score,
+                        payload->>'answer_id' AS answer_id,
+                        COALESCE(category, payload->>'category') AS category,
+                        COALESCE(difficulty, payload->>'difficulty', 'unknown') AS difficulty
+                    FROM events
+                    WHERE type = 'quiz_answered'
+                    -- Plain range first so only the current partitions are scanned
+                    AND created_at >= $1
+                    AND (created_at, id) > ($1, COALESCE($2, '00000000-0000-0000-0000-000000000000'::uuid))
+                    AND created_at < NOW() - make_interval(secs => $3)
+                    ORDER BY created_at, id
+                    LIMIT $4
+                """, last_created_at, last_event_id, self.lag_seconds, self.batch_size)
+
+                last = await conn.fetchrow("""
+                    SELECT created_at, id, (SELECT COUNT(*) FROM analytics_batch) AS processed
+                    FROM analytics_batch
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT 1
+                """)
+                if not last:
+                    return 0
+
+                await self._apply_counters(conn)
+                await self._apply_distinct(conn)
+
+                await conn.execute("""
+                    INSERT INTO analytics_rollup_state (name, last_created_at, last_event_id, updated_at)
+                    VALUES ($1, $2, $3, NOW())
+                    ON CONFLICT (name) DO UPDATE
+                    SET last_created_at = EXCLUDED.last_created_at,
+                        last_event_id = EXCLUDED.last_event_id,
+                        updated_at = NOW()
+                """, STATE_NAME, last["created_at"], last["id"])
+
+                processed = last["processed"]
+                logger.debug(f"Analytics rollup processed {processed} events")
+                return processed
+
+    async def _apply_counters(self, conn):
+        await conn.execute("""
+            INSERT INTO analytics_quiz_rollup
+                (content_id, attempts, correct, time_sum, time_count, score_sum, score_count)
+            SELECT content_id, COUNT(*), COUNT(*) FILTER (WHERE correct),
+                   COALESCE(SUM(time_taken), 0), COUNT(time_taken),
+                   COALESCE(SUM(score), 0), COUNT(score)
+            FROM analytics_batch
+            WHERE content_id IS NOT NULL
+            GROUP BY content_id
+            ON CONFLICT (content_id) DO UPDATE SET
+                attempts = analytics_quiz_rollup.attempts + EXCLUDED.attempts,
+                correct = analytics_quiz_rollup.correct + EXCLUDED.correct,
+                time_sum = analytics_quiz_rollup.time_sum + EXCLUDED.time_sum,
+                time_count = analytics_quiz_rollup.time_count + EXCLUDED.time_count,
+                score_sum = analytics_quiz_rollup.score_sum + EXCLUDED.score_sum,
+                score_count = analytics_quiz_rollup.score_count + EXCLUDED.score_count
+        """)
+
+        await conn.execute("""
+            INSERT INTO analytics_quiz_answer_rollup (content_id, answer_id, selected, correct)
+            SELECT content_id, answer_id, COUNT(*), COUNT(*) FILTER (WHERE correct)
+            FROM analytics_batch
+            WHERE content_id IS NOT NULL AND answer_id IS NOT NULL
+            GROUP BY content_id, answer_id
+            ON CONFLICT (content_id, answer_id) DO UPDATE SET
+                selected = analytics_quiz_answer_rollup.selected + EXCLUDED.selected,
+                correct = analytics_quiz_answer_rollup.correct + EXCLUDED.correct
+        """)
+
+        await conn.execute("""
+            INSERT INTO analytics_category_rollup
+                (category, attempts, correct, time_sum, time_count, correct_time_sum, correct_time_count)
+            SELECT category, COUNT(*), COUNT(*) FILTER (WHERE correct),
+                   COALESCE(SUM(time_taken), 0), COUNT(time_taken),
+                   COALESCE(SUM(time_taken) FILTER (WHERE correct), 0),
+                   COUNT(time_taken) FILTER (WHERE correct)
+            FROM analytics_batch
+            WHERE category IS NOT NULL
+            GROUP BY category
+            ON CONFLICT (category) DO UPDATE SET
+                attempts = analytics_category_rollup.attempts + EXCLUDED.attempts,
+                correct = analytics_category_rollup.correct + EXCLUDED.correct,
+                time_sum = analytics_category_rollup.time_sum + EXCLUDED.time_sum,
+                time_count = analytics_category_rollup.time_count + EXCLUDED.time_count,
+                correct_time_sum = analytics_category_rollup.correct_time_sum + EXCLUDED.correct_time_sum,
+                correct_time_count = analytics_category_rollup.correct_time_count + EXCLUDED.correct_time_count
+        """)
+
+        await conn.execute("""
+            INSERT INTO analytics_difficulty_rollup (category, difficulty, attempts, correct)
+            SELECT category, difficulty, COUNT(*), COUNT(*) FILTER (WHERE correct)
+            FROM analytics_batch
+            WHERE category IS NOT NULL
+            GROUP BY category, difficulty
+            ON CONFLICT (category, difficulty) DO UPDATE SET
+                attempts = analytics_difficulty_rollup.attempts + EXCLUDED.attempts,
+                correct = analytics_difficulty_rollup.correct + EXCLUDED.correct
+        """)
+
+        await conn.execute("""
+            INSERT INTO analytics_user_category_rollup
+                (user_id, category, attempts, correct, time_sum, time_count, correct_time_sum, correct_time_count)
+            SELECT user_id, category, COUNT(*), COUNT(*) FILTER (WHERE correct),
+                   COALESCE(SUM(time_taken), 0), COUNT(time_taken),
+                   COALESCE(SUM(time_taken) FILTER (WHERE correct), 0),
+                   COUNT(time_taken) FILTER (WHERE correct)
+            FROM analytics_batch
+            WHERE user_id IS NOT NULL AND category IS NOT NULL
+            GROUP BY user_id, category
+            ON CONFLICT (user_id, category) DO UPDATE SET
+                attempts = analytics_user_category_rollup.attempts + EXCLUDED.attempts,
+                correct = analytics_user_category_rollup.correct + EXCLUDED.correct,
+                time_sum = analytics_user_category_rollup.time_sum + EXCLUDED.time_sum,
+                time_count = analytics_user_category_rollup.time_count + EXCLUDED.time_count,
+                correct_time_sum = analytics_user_category_rollup.correct_time_sum + EXCLUDED.correct_time_sum,
+                correct_time_count = analytics_user_category_rollup.correct_time_count + EXCLUDED.correct_time_count
+        """)
+
+        await conn.execute("""
+            INSERT INTO analytics_user_difficulty_rollup (user_id, category, difficulty, attempts, correct)
+            SELECT user_id, category, difficulty, COUNT(*), COUNT(*) FILTER (WHERE correct)
+            FROM analytics_batch
+            WHERE user_id IS NOT NULL AND category IS NOT NULL
+            GROUP BY user_id, category, difficulty
+            ON CONFLICT (user_id, category, difficulty) DO UPDATE SET
+                attempts = analytics_user_difficulty_rollup.attempts + EXCLUDED.attempts,
+                correct = analytics_user_difficulty_rollup.correct + EXCLUDED.correct
+        """)
+
+        await conn.execute("""
+            INSERT INTO analytics_daily_rollup (day, answers, correct)
+            SELECT day, COUNT(*), COUNT(*) FILTER (WHERE correct)
+            FROM analytics_batch
+            GROUP BY day
+            ON CONFLICT (day) DO UPDATE SET
+                answers = analytics_daily_rollup.answers + EXCLUDED.answers,
+                correct = analytics_daily_rollup.correct + EXCLUDED.correct
+        """)
+
+    async def _apply_distinct(self, conn):
+        """Record distinct members and bump counters by the number that were new"""
+        for scope, (key_expr, member_expr, update) in DISTINCT_SCOPES.items():
+            await conn.execute(f"""
+                WITH inserted AS (
+                    INSERT INTO analytics_distinct (scope, key, member)
+                    SELECT DISTINCT '{scope}', key, member
+                    FROM (
+                        SELECT {key_expr} AS key, {member_expr} AS member
+                        FROM analytics_batch
+                    ) b
+                    WHERE key IS NOT NULL AND member IS NOT NULL
+                    ON CONFLICT (scope, key, member) DO NOTHING
+                    RETURNING key
+                ),
+                n AS (
+                    SELECT key, COUNT(*) AS added FROM inserted GROUP BY key
+                )
+                {update}
+            """)
+
+        # Batches go in event order, so days before this batch's first day are
+        # done; a catch-up over old events must keep the sets of days it's
+        # still folding in or their players count as new again
+        await conn.execute("""
+            DELETE FROM analytics_distinct
+            WHERE scope = 'day_player'
+            AND key < LEAST(
+                CURRENT_DATE - $1::int,
+                (SELECT MIN(day) FROM analytics_batch)
+            )::text
+        """, self.day_player_retention_days)
@@ -0,0 +1,138 @@
+"""
+Answer-key index for JazzyPop
+Maps (content_id, question_index) to what grading an answer needs - the
+correct answer id(s), category, difficulty and question text - so
+submit_answer doesn't load and decode a whole quiz set per answer.
+Entries are built lazily per content row, bounded by an LRU and dropped
+on the same content_changed notifications as the content cache, so a
+rebalancer or validator rewriting a set is picked up on the next answer.
+"""
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from content_cache import ContentCache
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerKey(NamedTuple):
+    content_type: str
+    category: Optional[str]
+    difficulty: Optional[str]
+    question_text: str
+    # Every answer id marked correct, in answer order
+    correct_ids: Tuple[str, ...]
+
+    def grade(self, answer_id: str) -> Tuple[bool, Optional[str]]:
+        """(correct, correct_answer_id) - same result the old scan over answers gave"""
+        if answer_id in self.correct_ids:
+            return True, answer_id
+        return False, self.correct_ids[-1] if self.correct_ids else None
+
+
+class _Entry(NamedTuple):
+    # Key for the content row itself (question_index None)
+    root: AnswerKey
+    # Keys per question for quiz sets, empty otherwise
+    questions: Tuple[AnswerKey, ...]
+
+
+def _key(content_type: str, category, difficulty, question: Dict[str, Any]) -> AnswerKey:
+    correct_ids = tuple(
+        answer.get("id") for answer in question.get("answers", []) or []
+        if answer.get("correct", False)
+    )
+    return AnswerKey(content_type, category, difficulty, question.get("question", ""), correct_ids)
+
+
+def _build_entry(content_type: str, data: Dict[str, Any], metadata: Optional[Dict[str, Any]]) -> _Entry:
+    data = data or {}
+    metadata = metadata or {}
+    category = metadata.get('category', data.get('category', 'unknown'))
+    difficulty = metadata.get('difficulty', data.get('difficulty', 'medium'))
+
+    questions = ()
+    if content_type == 'quiz_set':
+        questions = tuple(
+            _key(content_type, category, difficulty, question)
+            for question in data.get('questions', []) or []
+        )
+    return _Entry(_key(content_type, category, difficulty, data), questions)
+
+
+class AnswerKeyIndex:
+    """
+    LRU of answer keys, one entry per content row holding all its questions
+
+    Hooks into the content cache's listener: a content_changed notification
+    drops the row, and while the listener is down nothing is served from
+    memory, exactly like the content cache itself.
+    """
+
+    def __init__(self, cache: ContentCache, max_sets: int = 10000):
+        self.cache = cache
+        self.max_sets = max_sets
+        self._entries: "OrderedDict[UUID, _Entry]" = OrderedDict()
+        self._notify_seq = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        cache.subscribe(self._on_invalidate)
+
+    def _on_invalidate(self, content_id: Optional[UUID]):
+        self._notify_seq += 1
+        if content_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(content_id, None)
+
+    async def _entry(self, conn, content_id: UUID) -> Optional[_Entry]:
+        if self.cache.enabled and content_id in self._entries:
+            self._entries.move_to_end(content_id)
+            self.hits += 1
+            return self._entries[content_id]
+
+        self.misses += 1
+        seq = self._notify_seq
+        row = await conn.fetchrow(
+            "SELECT type, data, metadata FROM content WHERE id = $1", content_id
+        )
+        if row is None:
+            return None
+
+        entry = _build_entry(row['type'] or 'quiz', row['data'], row['metadata'])
+        # Don't keep a row that changed while it was loading
+        if self.cache.enabled and seq == self._notify_seq:
+            self._entries[content_id] = entry
+            while len(self._entries) > self.max_sets:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    async def get(self, conn, content_id: UUID, question_index: Optional[int] = None) -> AnswerKey:
+        """
+        Answer key for one question of a set, or for the content row itself
+        Raises ValueError for unknown content or an out-of-range index.
+        """
+        entry = await self._entry(conn, content_id)
+        if entry is None:
+            raise ValueError("Quiz not found")
+
+        if entry.root.content_type == 'quiz_set' and question_index is not None:
+            if 0 <= question_index < len(entry.questions):
+                return entry.questions[question_index]
+            raise ValueError(f"Invalid question index: {question_index}")
+        return entry.root
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "sets": len(self._entries),
+            "max_sets": self.max_sets,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0
+        }
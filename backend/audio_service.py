@@ -4,7 +4,7 @@ Integrates with ElevenLabs API for TTS with cost optimization
 """
 import os
 import asyncio
-import aiohttp
+from provider_client import get_client
 import logging
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
@@ -64,25 +64,24 @@ class AudioService:
                 "voice_settings": voice_settings
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_url}/text-to-speech/{self.voice_id}",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    if response.status == 200:
-                        audio_data = await response.read()
-                        
-                        # Cache the audio
-                        await self._cache_audio(cache_key, audio_data)
-                        
-                        # Track usage
-                        await self._track_usage(len(text))
-                        
-                        return audio_data
-                    else:
-                        logger.error(f"ElevenLabs API error: {response.status}")
-                        return None
+            async with get_client('elevenlabs').post(
+                f"{self.api_url}/text-to-speech/{self.voice_id}",
+                headers=headers,
+                json=payload
+            ) as response:
+                if response.status == 200:
+                    audio_data = await response.read()
+                    
+                    # Cache the audio
+                    await self._cache_audio(cache_key, audio_data)
+                    
+                    # Track usage
+                    await self._track_usage(len(text))
+                    
+                    return audio_data
+                else:
+                    logger.error(f"ElevenLabs API error: {response.status}")
+                    return None
                         
         except Exception as e:
             logger.error(f"Error generating audio: {e}")
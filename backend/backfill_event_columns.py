@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Copy payload/context fields of existing quiz_answered events into the typed
+columns added by migrations/add_event_typed_columns.sql
+
+Works through events in (created_at, id) order, one short transaction per
+chunk, and records how far it got - stop it any time and run it again to
+carry on.
+
+    python backfill_event_columns.py
+    python backfill_event_columns.py --chunk-size 2000 --pause 0.2
+    python backfill_event_columns.py --restart   # start over from the beginning
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+import logging
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+load_dotenv()
+
+from database import db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROGRESS_NAME = "event_typed_columns"
+
+async def backfill_event_columns(chunk_size: int, pause: float, restart: bool):
+    """Fill correct/score/time_taken/category/difficulty/mode for old events"""
+
+    try:
+        await db.connect()
+        logger.info("Connected to database")
+
+        async with db.pool.acquire() as conn:
+            await db.initialize_event_columns(conn)
+
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS backfill_progress (
+                    name VARCHAR(50) PRIMARY KEY,
+                    last_created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                    last_id UUID NOT NULL,
+                    rows_done BIGINT NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            if restart:
+                await conn.execute("DELETE FROM backfill_progress WHERE name = $1", PROGRESS_NAME)
+
+            progress = await conn.fetchrow(
+                "SELECT last_created_at, last_id, rows_done FROM backfill_progress WHERE name = $1",
+                PROGRESS_NAME
+            )
+            if progress:
+                logger.info(f"Resuming after {progress['last_created_at']} ({progress['rows_done']} rows done)")
+
+            while True:
+                async with conn.transaction():
+                    # Only fill columns that are still empty - rows written by the
+                    # new submit_answer already have them
+                    last = await conn.fetchrow("""
+                        WITH chunk AS (
+                            SELECT id, created_at
+                            FROM events
+                            WHERE type = 'quiz_answered'
+                            AND (created_at, id) > (
+                                COALESCE((SELECT last_created_at FROM backfill_progress WHERE name = $1),
+                                         '-infinity'::timestamptz),
+                                COALESCE((SELECT last_id FROM backfill_progress WHERE name = $1),
+                                         '00000000-0000-0000-0000-000000000000'::uuid)
+                            )
+                            ORDER BY created_at, id
+                            LIMIT $2
+                        ),
+                        updated AS (
+                            UPDATE events e SET
+                                correct = COALESCE(e.correct, CASE WHEN jsonb_typeof(e.payload->'correct') = 'boolean'
+                                                                   THEN (e.payload->>'correct')::boolean END),
+                                score = COALESCE(e.score, CASE WHEN jsonb_typeof(e.payload->'score') = 'number'
+                                                               THEN (e.payload->>'score')::numeric::int END),
+                                time_taken = COALESCE(e.time_taken, CASE WHEN jsonb_typeof(e.payload->'time_taken') = 'number'
+                                                                         THEN (e.payload->>'time_taken')::float END),
+                                category = COALESCE(e.category, left(COALESCE(e.payload->>'category', e.context->>'category'), 100)),
+                                difficulty = COALESCE(e.difficulty, left(COALESCE(e.payload->>'difficulty', e.context->>'difficulty'), 20)),
+                                mode = COALESCE(e.mode, left(COALESCE(e.context->>'mode', e.payload->>'mode'), 20))
+                            FROM chunk
+                            WHERE e.id = chunk.id
+                            RETURNING e.id
+                        )
+                        SELECT created_at, id, (SELECT COUNT(*) FROM updated) AS updated
+                        FROM chunk
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT 1
+                    """, PROGRESS_NAME, chunk_size)
+
+                    if not last:
+                        break
+
+                    rows_done = await conn.fetchval("""
+                        INSERT INTO backfill_progress (name, last_created_at, last_id, rows_done, updated_at)
+                        VALUES ($1, $2, $3, $4, NOW())
+                        ON CONFLICT (name) DO UPDATE
+                        SET last_created_at = EXCLUDED.last_created_at,
+                            last_id = EXCLUDED.last_id,
+                            rows_done = backfill_progress.rows_done + EXCLUDED.rows_done,
+                            updated_at = NOW()
+                        RETURNING rows_done
+                    """, PROGRESS_NAME, last["created_at"], last["id"], last["updated"])
+
+                logger.info(f"Backfilled up to {last['created_at']} ({rows_done} rows)")
+                if pause:
+                    await asyncio.sleep(pause)
+
+            logger.info("Event column backfill complete")
+
+    except Exception as e:
+        logger.error(f"Event column backfill failed: {e}")
+        raise
+    finally:
+        await db.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill typed quiz_answered columns on events")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per transaction")
+    parser.add_argument("--pause", type=float, default=0.1, help="Seconds to sleep between chunks")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress")
+    args = parser.parse_args()
+    asyncio.run(backfill_event_columns(args.chunk_size, args.pause, args.restart))
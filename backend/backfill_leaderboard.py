@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Rebuild leaderboard_scores from quiz_answered events
+Run after restoring a backup or if the score table ever drifts from events
+
+    python backfill_leaderboard.py            # rebuild everything
+    python backfill_leaderboard.py --days 3   # only the last 3 UTC days
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+import logging
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+load_dotenv()
+
+from database import db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def backfill_leaderboard(days=None):
+    """Rebuild leaderboard totals from events"""
+
+    try:
+        await db.connect()
+        logger.info("Connected to database")
+
+        async with db.pool.acquire() as conn:
+            await db.leaderboard.initialize(conn)
+            await db.leaderboard.backfill(conn, days=days)
+
+            rows = await conn.fetchval("SELECT COUNT(*) FROM leaderboard_scores")
+            logger.info(f"leaderboard_scores now holds {rows} rows")
+
+    except Exception as e:
+        logger.error(f"Leaderboard backfill failed: {e}")
+        raise
+    finally:
+        await db.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild leaderboard_scores from events")
+    parser.add_argument("--days", type=int, default=None,
+                        help="Only rebuild the last N days (default: everything)")
+    args = parser.parse_args()
+    asyncio.run(backfill_leaderboard(args.days))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the economy store
+Hammers one throwaway user (and one anonymous session) with concurrent energy
+spends and rewards, then checks the balances add up: no spend may succeed
+without energy and no reward may be lost
+
+    python benchmark_economy.py                     # 500 spends + 500 rewards, 20 at a time
+    python benchmark_economy.py --ops 2000 --concurrency 50
+    python benchmark_economy.py --legacy            # also run the old read-modify-write for comparison
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from uuid import uuid4
+
+from dotenv import load_dotenv
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+load_dotenv()
+
+from database import db
+from economy import DEFAULT_STATE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COINS_PER_REWARD = 1
+XP_PER_REWARD = 10
+
+
+def level_for_xp(xp: int) -> int:
+    """Reference implementation of economy_level(): the old level-up loop"""
+    level = 1
+    while xp >= 100 + level * level * 50:
+        level += 1
+    return level
+
+
+async def run_concurrently(name, op, count, concurrency):
+    """Run `op` `count` times, `concurrency` at a time; returns the results"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed():
+        async with semaphore:
+            started = time.perf_counter()
+            result = await op()
+            latencies.append(time.perf_counter() - started)
+            return result
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(timed() for _ in range(count)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000
+    logger.info(f"{name}: {count} ops in {elapsed:.2f}s ({count / elapsed:.0f} ops/s), p50 {p50:.1f}ms, p99 {p99:.1f}ms")
+    return results, elapsed
+
+
+async def check_account(label, user_id, session_id, ops, concurrency, legacy):
+    failures = []
+    start = dict(DEFAULT_STATE)
+    await db.save_economy_state(user_id, session_id, start)
+
+    # More spenders than energy: exactly start['energy'] of them may succeed
+    spends, elapsed = await run_concurrently(
+        f"{label} spend_energy", lambda: db.spend_energy(user_id, session_id, 1), ops, concurrency
+    )
+    succeeded = sum(1 for spent, _ in spends if spent)
+    state = await db.get_economy_state(user_id, session_id)
+    if elapsed >= 60:
+        logger.warning(f"{label}: spend run took over a minute, regeneration makes the energy check inexact")
+    else:
+        expected = min(ops, start['energy'])
+        if succeeded != expected or state['energy'] != start['energy'] - expected:
+            failures.append(
+                f"{label}: {succeeded} spends succeeded (expected {expected}), "
+                f"energy left {state['energy']} (expected {start['energy'] - expected})"
+            )
+
+    await run_concurrently(
+        f"{label} grant", lambda: db.grant_rewards(
+            user_id, session_id, {"coins": COINS_PER_REWARD, "xp": XP_PER_REWARD}
+        ), ops, concurrency
+    )
+    state = await db.get_economy_state(user_id, session_id)
+    expected_coins = start['coins'] + ops * COINS_PER_REWARD
+    expected_xp = start['xp'] + ops * XP_PER_REWARD
+    if state['coins'] != expected_coins or state['xp'] != expected_xp:
+        failures.append(
+            f"{label}: coins {state['coins']} / xp {state['xp']} "
+            f"(expected {expected_coins} / {expected_xp}) - lost updates"
+        )
+    if state['level'] != level_for_xp(expected_xp):
+        failures.append(f"{label}: level {state['level']} (expected {level_for_xp(expected_xp)})")
+
+    if legacy:
+        await db.save_economy_state(user_id, session_id, start)
+
+        async def read_modify_write():
+            current = await db.get_economy_state(user_id, session_id)
+            current['coins'] += COINS_PER_REWARD
+            await db.save_economy_state(user_id, session_id, current)
+
+        await run_concurrently(f"{label} legacy read-modify-write", read_modify_write, ops, concurrency)
+        coins = (await db.get_economy_state(user_id, session_id))['coins']
+        logger.info(f"{label} legacy: {coins - start['coins']} of {ops} rewards kept ({ops - coins + start['coins']} lost)")
+
+    return failures
+
+
+async def benchmark(ops, concurrency, legacy):
+    await db.connect()
+    user_id = None
+    session_id = f"economy-bench-{uuid4().hex[:12]}"
+    try:
+        async with db.pool.acquire() as conn:
+            await db.economy.initialize(conn)
+            user_id = await conn.fetchval("""
+                INSERT INTO users (username, display_name, is_anonymous, created_at)
+                VALUES ($1, 'Economy benchmark', TRUE, NOW())
+                RETURNING id
+            """, session_id)
+
+        failures = await check_account("user", user_id, None, ops, concurrency, legacy)
+        failures += await check_account("session", None, session_id, ops, concurrency, legacy)
+
+        for failure in failures:
+            logger.error(failure)
+        if not failures:
+            logger.info("No double spends or lost updates")
+        return not failures
+
+    finally:
+        async with db.pool.acquire() as conn:
+            if user_id:
+                await conn.execute("DELETE FROM users WHERE id = $1", user_id)
+            await conn.execute("DELETE FROM sessions WHERE id = $1", session_id)
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the economy store under concurrent load")
+    parser.add_argument("--ops", type=int, default=500,
+                        help="Spends and rewards to run per account (default: 500)")
+    parser.add_argument("--concurrency", type=int, default=20,
+                        help="Requests in flight at once (default: 20, the pool size)")
+    parser.add_argument("--legacy", action="store_true",
+                        help="Also run a read-modify-write loop to show the updates it loses")
+    args = parser.parse_args()
+    ok = asyncio.run(benchmark(args.ops, args.concurrency, args.legacy))
+    sys.exit(0 if ok else 1)
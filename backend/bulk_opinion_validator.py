@@ -14,6 +14,8 @@ from datetime import datetime
 from typing import Dict, List, Optional, Set
 from collections import defaultdict
 import aiohttp
+from provider_client import get_client
+from content_safety import opinion_filter, safety_filter
 from dotenv import load_dotenv
 import time
 
@@ -63,13 +65,9 @@ class MultiProviderValidator:
         self.stats = defaultdict(int)
         
         # Opinion patterns
-        self.opinion_patterns = [
-            'loves to', 'likes to', 'prefers', 'favorite',
-            'coolest', 'silliest', 'best', 'worst', 'most fun',
-            'most awesome', 'lamest', 'most boring', 'funnest',
-            'what do you think', 'in your opinion', 'feels like',
-            'which is more', 'what would be'
-        ]
+        # Opinion phrases and safety rules come from content_safety, compiled once
+        self.opinion_filter = opinion_filter
+        self.safety_filter = safety_filter
     
     def get_validation_prompt(self, question: Dict, category: str) -> str:
         """Create validation prompt focusing on factual criteria"""
@@ -138,21 +136,20 @@ Respond with JSON only:
             }
             
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        "https://api.anthropic.com/v1/messages",
-                        headers=headers,
-                        json=payload,
-                        timeout=aiohttp.ClientTimeout(total=30)
-                    ) as response:
-                        if response.status == 200:
-                            self.stats['anthropic_success'] += 1
-                            result = await response.json()
-                            return self._parse_response(result['content'][0]['text'])
-                        else:
-                            self.stats['anthropic_errors'] += 1
-                            logger.error(f"Anthropic error: {response.status}")
-                            return None
+                async with get_client('anthropic').post(
+                    "https://api.anthropic.com/v1/messages",
+                    headers=headers,
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=30)
+                ) as response:
+                    if response.status == 200:
+                        self.stats['anthropic_success'] += 1
+                        result = await response.json()
+                        return self._parse_response(result['content'][0]['text'])
+                    else:
+                        self.stats['anthropic_errors'] += 1
+                        logger.error(f"Anthropic error: {response.status}")
+                        return None
             except Exception as e:
                 self.stats['anthropic_errors'] += 1
                 logger.error(f"Anthropic exception: {e}")
@@ -180,23 +177,22 @@ Respond with JSON only:
             }
             
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        "https://api.openai.com/v1/chat/completions",
-                        headers=headers,
-                        json=payload,
-                        timeout=aiohttp.ClientTimeout(total=30)
-                    ) as response:
-                        if response.status == 200:
-                            self.stats['openai_success'] += 1
-                            result = await response.json()
-                            return self._parse_response(
-                                result['choices'][0]['message']['content']
-                            )
-                        else:
-                            self.stats['openai_errors'] += 1
-                            logger.error(f"OpenAI error: {response.status}")
-                            return None
+                async with get_client('openai').post(
+                    "https://api.openai.com/v1/chat/completions",
+                    headers=headers,
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=30)
+                ) as response:
+                    if response.status == 200:
+                        self.stats['openai_success'] += 1
+                        result = await response.json()
+                        return self._parse_response(
+                            result['choices'][0]['message']['content']
+                        )
+                    else:
+                        self.stats['openai_errors'] += 1
+                        logger.error(f"OpenAI error: {response.status}")
+                        return None
             except Exception as e:
                 self.stats['openai_errors'] += 1
                 logger.error(f"OpenAI exception: {e}")
@@ -238,8 +234,7 @@ Respond with JSON only:
     
     def quick_opinion_check(self, question_text: str) -> bool:
         """Quick local check for obvious opinion questions"""
-        q_lower = question_text.lower()
-        return any(pattern in q_lower for pattern in self.opinion_patterns)
+        return self.opinion_filter.matches(question_text)
     
     async def validate_quiz_set(self, quiz_set: Dict, provider: str = 'auto') -> Dict:
         """Validate all questions in a quiz set"""
@@ -259,13 +254,30 @@ Respond with JSON only:
             'failed_questions': [],
             'opinion_questions': [],
             'long_questions': [],
+            'unsafe_questions': [],
             'validation_errors': []
         }
         
+        # Screen the whole set against the shared safety rules up front
+        safety_hits = self.safety_filter.check_batch(questions, self.safety_filter.QUESTION_FIELDS)
+        
         # Process each question
         for idx, question in enumerate(questions):
             q_text = question.get('question', '')
             
+            # Unsafe content fails outright - no need to spend an API call on it
+            if safety_hits[idx]:
+                match = safety_hits[idx]
+                results['unsafe_questions'].append({
+                    'question_idx': idx,
+                    'rule': match.rule,
+                    'pattern': match.pattern,
+                    'field': match.field
+                })
+                results['failed_questions'].append(idx)
+                self.stats['unsafe_found'] += 1
+                continue
+            
             # Quick local checks first
             if self.quick_opinion_check(q_text):
                 results['opinion_questions'].append(idx)
@@ -453,6 +465,7 @@ Respond with JSON only:
             f.write(f"Opinion Questions (quick check): {stats.get('opinion_found', 0)}\n")
             f.write(f"Opinion Questions (AI verified): {stats.get('ai_opinion_found', 0)}\n")
             f.write(f"Overly Long Questions: {stats.get('too_long', 0)}\n")
+            f.write(f"Unsafe Content (safety filter): {stats.get('unsafe_found', 0)}\n")
             f.write(f"Validation Failures: {stats.get('validation_failed', 0)}\n\n")
             
             f.write("API USAGE:\n")
@@ -0,0 +1,177 @@
+"""
+Shared plumbing for AI scans over the whole quiz catalog
+Keyset paging over quiz sets in id order, a checkpoint file so an interrupted
+scan picks up where it stopped, and a streaming progress line
+"""
+
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+
+class ScanCheckpoint:
+    """
+    JSON file holding the last fully scanned set id plus the scanner's state
+    Written atomically after every page, so a crash loses at most one page.
+
+    Findings go to a JSONL sidecar (<checkpoint>.items.jsonl) that only gets
+    the new ones appended per page; the checkpoint records how many lines are
+    committed, so lines from a page that crashed before its save are ignored.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.items_path = f"{os.path.splitext(path)[0]}.items.jsonl"
+        self.last_id: Optional[str] = None
+        self.state: Dict[str, Any] = {}
+        self.items: List[Any] = []
+        self.item_count = 0
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            saved = json.load(f)
+        self.last_id = saved.get('last_id')
+        self.state = saved.get('state', {})
+        self.item_count = saved.get('items', 0)
+        self.items = []
+        if self.item_count and os.path.exists(self.items_path):
+            with open(self.items_path) as f:
+                for line in itertools.islice(f, self.item_count):
+                    self.items.append(json.loads(line))
+        self.item_count = len(self.items)
+        # Drop lines past the last save so appends carry on from there
+        with open(self.items_path, 'w') as f:
+            f.writelines(json.dumps(item) + '\n' for item in self.items)
+        return True
+
+    def save(self, last_id: str, state: Dict[str, Any], items: Optional[List[Any]] = None):
+        """Checkpoint after a page; `items` is the full findings list, only its new tail is written"""
+        if items is not None and len(items) > self.item_count:
+            # A fresh scan overwrites whatever an older one left behind
+            with open(self.items_path, 'a' if self.item_count else 'w') as f:
+                f.writelines(json.dumps(item, default=str) + '\n' for item in items[self.item_count:])
+            self.item_count = len(items)
+
+        self.last_id = last_id
+        self.state = state
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({
+                'last_id': last_id,
+                'saved_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'state': state,
+                'items': self.item_count
+            }, f)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        for path in (self.path, self.items_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _filters(category: Optional[str], extra_where: str) -> str:
+    where = "type = 'quiz_set'"
+    if extra_where:
+        where += f" AND {extra_where}"
+    if category:
+        where += " AND data->>'category' = $1"
+    return where
+
+
+async def count_quiz_sets(pool: asyncpg.Pool, category: Optional[str] = None,
+                          after_id: Optional[str] = None, extra_where: str = "") -> int:
+    where = _filters(category, extra_where)
+    args: List[Any] = [category] if category else []
+    if after_id:
+        args.append(after_id)
+        where += f" AND id > ${len(args)}::uuid"
+    async with pool.acquire() as conn:
+        return await conn.fetchval(f"SELECT COUNT(*) FROM content WHERE {where}", *args)
+
+
+async def has_more_quiz_sets(pool: asyncpg.Pool, category: Optional[str] = None,
+                             after_id: Optional[str] = None, extra_where: str = "") -> bool:
+    """Whether any quiz set is left after `after_id` - False once a scan reached the end"""
+    where = _filters(category, extra_where)
+    args: List[Any] = [category] if category else []
+    if after_id:
+        args.append(after_id)
+        where += f" AND id > ${len(args)}::uuid"
+    async with pool.acquire() as conn:
+        return await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM content WHERE {where})", *args)
+
+
+async def iter_quiz_set_pages(pool: asyncpg.Pool, page_size: int, category: Optional[str] = None,
+                              after_id: Optional[str] = None, limit: Optional[int] = None,
+                              extra_where: str = "") -> AsyncIterator[List[asyncpg.Record]]:
+    """Quiz sets in id order, one page at a time, starting after `after_id`"""
+    where = _filters(category, extra_where)
+    base_args: List[Any] = [category] if category else []
+    seen = 0
+
+    while limit is None or seen < limit:
+        size = page_size if limit is None else min(page_size, limit - seen)
+        args = base_args + [after_id, size]
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(f"""
+                SELECT id, data, metadata
+                FROM content
+                WHERE {where}
+                AND (${len(args) - 1}::uuid IS NULL OR id > ${len(args) - 1}::uuid)
+                ORDER BY id
+                LIMIT ${len(args)}
+            """, *args)
+        if not rows:
+            break
+        yield rows
+        seen += len(rows)
+        after_id = str(rows[-1]['id'])
+
+
+class ScanProgress:
+    """One self-updating progress line on a terminal, periodic log lines otherwise"""
+
+    def __init__(self, total: int, label: str = 'questions', done: int = 0):
+        self.total = total
+        self.label = label
+        self.done = done
+        self.flagged = 0
+        self.started = time.monotonic()
+        self._start_done = done
+        self._last_log = 0.0
+        self._tty = sys.stderr.isatty()
+
+    def update(self, done: int = 1, flagged: int = 0):
+        self.done += done
+        self.flagged += flagged
+        now = time.monotonic()
+        if not self._tty and now - self._last_log < 10:
+            return
+        self._last_log = now
+
+        elapsed = now - self.started
+        rate = (self.done - self._start_done) / elapsed if elapsed > 0 else 0
+        line = f"{self.done}/{self.total or '?'} {self.label}, {self.flagged} flagged, {rate:.1f}/s"
+        if rate and self.total:
+            line += f", ETA {max(self.total - self.done, 0) / rate / 60:.1f} min"
+
+        if self._tty:
+            sys.stderr.write(f"\r{line}   ")
+            sys.stderr.flush()
+        else:
+            logger.info(f"Progress: {line}")
+
+    def finish(self):
+        if self._tty:
+            sys.stderr.write("\n")
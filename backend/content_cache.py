@@ -0,0 +1,278 @@
+"""
+In-process content cache for JazzyPop
+LRU cache of decoded content/content_variations rows, invalidated through
+Postgres LISTEN/NOTIFY so generators, rebalancers and validators running in
+other processes never leave stale entries behind
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "content_changed"
+
+
+class ContentCache:
+    """
+    Size-bounded LRU of decoded content rows and their mode variations
+
+    Keys are ('content', id) for content rows and ('variations', id) for the
+    {mode: variation_data} dict of a content row. A trigger on both tables
+    sends the content id on the content_changed channel and the listener
+    drops both keys.
+
+    The cache only serves reads while the listener connection is up - if it
+    drops we can't know what we missed, so everything is cleared and reads go
+    straight to Postgres until it reconnects.
+
+    Cached values are shared between requests: copy before mutating.
+
+    Other in-process indexes derived from content can subscribe() to get the
+    same invalidations: the changed content id, or None when everything is
+    cleared.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, UUID], Any]" = OrderedDict()
+        self._listen_conn: Optional[asyncpg.Connection] = None
+        self._database_url: Optional[str] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped on every notification; a load that overlapped one isn't cached
+        self._notify_seq = 0
+        self._subscribers: List[Callable[[Optional[UUID]], None]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self._listen_conn is not None and not self._listen_conn.is_closed()
+
+    # ========== LISTENER ==========
+
+    async def initialize_triggers(self, conn):
+        """
+        Install the NOTIFY triggers on content and content_variations
+        Safe to run on every startup
+        """
+        await conn.execute(f"""
+            CREATE OR REPLACE FUNCTION notify_content_changed()
+            RETURNS TRIGGER AS $$
+            DECLARE
+                changed_id UUID;
+            BEGIN
+                IF TG_TABLE_NAME = 'content_variations' THEN
+                    changed_id := COALESCE(NEW.content_id, OLD.content_id);
+                ELSE
+                    changed_id := COALESCE(NEW.id, OLD.id);
+                END IF;
+                PERFORM pg_notify('{CHANNEL}', changed_id::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            -- Only create missing triggers: DROP/CREATE TRIGGER locks the table
+            DO $do$
+            BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'content_changed_notify') THEN
+                    CREATE TRIGGER content_changed_notify
+                        AFTER INSERT OR UPDATE OR DELETE ON content
+                        FOR EACH ROW EXECUTE FUNCTION notify_content_changed();
+                END IF;
+                IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'content_variations_changed_notify') THEN
+                    CREATE TRIGGER content_variations_changed_notify
+                        AFTER INSERT OR UPDATE OR DELETE ON content_variations
+                        FOR EACH ROW EXECUTE FUNCTION notify_content_changed();
+                END IF;
+            END
+            $do$;
+        """)
+        logger.info("Content change notification triggers installed")
+
+    async def start(self, database_url: str):
+        """Open the dedicated LISTEN connection"""
+        self._database_url = database_url
+        self._stopping = False
+        try:
+            await self._listen()
+        except Exception as e:
+            logger.error(f"Content cache listener failed to start, cache disabled: {e}")
+            self._schedule_reconnect()
+
+    async def stop(self):
+        """Close the LISTEN connection and drop everything"""
+        self._stopping = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._listen_conn and not self._listen_conn.is_closed():
+            await self._listen_conn.close()
+        self._listen_conn = None
+        self.clear()
+
+    async def _listen(self):
+        conn = await asyncpg.connect(self._database_url)
+        await conn.add_listener(CHANNEL, self._on_notify)
+        conn.add_termination_listener(self._on_terminated)
+        # Anything cached before this point may have missed a notification
+        self.clear()
+        self._listen_conn = conn
+        logger.info(f"Content cache listening on '{CHANNEL}'")
+
+    def _on_notify(self, conn, pid, channel, payload):
+        try:
+            self.invalidate(UUID(payload))
+        except ValueError:
+            logger.warning(f"Ignoring malformed {CHANNEL} payload: {payload}")
+
+    def _on_terminated(self, conn):
+        self._listen_conn = None
+        self.clear()
+        if not self._stopping:
+            logger.warning("Content cache listener connection lost, cache disabled until reconnect")
+            self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        if self._reconnect_task and not self._reconnect_task.done():
+            return
+        self._reconnect_task = asyncio.get_event_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = 1
+        while not self._stopping and not self.enabled:
+            await asyncio.sleep(delay)
+            try:
+                await self._listen()
+            except Exception as e:
+                logger.error(f"Content cache listener reconnect failed: {e}")
+                delay = min(delay * 2, 60)
+
+    # ========== CACHE ==========
+
+    def _get(self, key: Tuple[str, UUID]) -> Any:
+        if not self.enabled or key not in self._entries:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key]
+
+    def _put(self, key: Tuple[str, UUID], value: Any, seq: int):
+        if not self.enabled or seq != self._notify_seq:
+            # A change notification arrived while this row was loading
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, content_id: UUID):
+        """Drop a content row and its variations"""
+        self._notify_seq += 1
+        removed = self._entries.pop(('content', content_id), None) is not None
+        removed = self._entries.pop(('variations', content_id), None) is not None or removed
+        if removed:
+            self.invalidations += 1
+        for callback in self._subscribers:
+            callback(content_id)
+
+    def clear(self):
+        self._notify_seq += 1
+        self._entries.clear()
+        for callback in self._subscribers:
+            callback(None)
+
+    def subscribe(self, callback: Callable[[Optional[UUID]], None]):
+        """Call `callback` with each invalidated content id, or None on clear()"""
+        self._subscribers.append(callback)
+
+    async def get_content(self, conn, ids: Iterable[UUID]) -> Dict[UUID, Dict[str, Any]]:
+        """
+        Get active content rows by id, loading misses in one query
+        Rows that are missing or inactive are left out of the result
+        """
+        found = {}
+        missing = []
+        for content_id in ids:
+            cached = self._get(('content', content_id))
+            if cached is not None:
+                found[content_id] = cached
+            else:
+                missing.append(content_id)
+
+        if missing:
+            seq = self._notify_seq
+            rows = await conn.fetch("""
+                SELECT id, type, data, metadata, created_at
+                FROM content
+                WHERE id = ANY($1::uuid[])
+                AND is_active = true
+            """, missing)
+
+            for row in rows:
+                entry = {
+                    "id": row["id"],
+                    "type": row["type"],
+                    "data": row["data"],
+                    "metadata": row["metadata"],
+                    "created_at": row["created_at"]
+                }
+                self._put(('content', row["id"]), entry, seq)
+                found[row["id"]] = entry
+
+        return found
+
+    async def get_variations(self, conn, ids: Iterable[UUID]) -> Dict[UUID, Dict[str, Any]]:
+        """Get {mode: variation_data} for each content id, loading misses in one query"""
+        found = {}
+        missing = []
+        for content_id in ids:
+            cached = self._get(('variations', content_id))
+            if cached is not None:
+                found[content_id] = cached
+            else:
+                missing.append(content_id)
+
+        if missing:
+            seq = self._notify_seq
+            rows = await conn.fetch("""
+                SELECT content_id, mode, variation_data
+                FROM content_variations
+                WHERE content_id = ANY($1::uuid[])
+                ORDER BY content_id, created_at
+            """, missing)
+
+            loaded: Dict[UUID, Dict[str, Any]] = {content_id: {} for content_id in missing}
+            for row in rows:
+                # Keep the first variation per mode, same as a plain fetchrow would
+                loaded[row["content_id"]].setdefault(row["mode"], row["variation_data"])
+
+            for content_id, modes in loaded.items():
+                # Empty dicts are cached too - a new variation fires a notification
+                self._put(('variations', content_id), modes, seq)
+                found[content_id] = modes
+
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0
+        }
@@ -0,0 +1,193 @@
+"""
+Compiled content safety filter shared by every generator and validator
+All rules are compiled into one regex at construction time, so screening a
+text is a single pass no matter how many terms there are. A hit reports
+which rule fired; whole items and sets are screened in one search each.
+"""
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Only filter the really inappropriate stuff - trust Haiku's judgment!
+INAPPROPRIATE_TERMS = [
+    # Extreme violence
+    'murder', 'torture', 'massacre', 'slaughter', 'gore',
+
+    # Explicit content
+    'sex', 'sexual', 'erotic', 'porn', 'nude', 'naked',
+
+    # Hard drugs
+    'cocaine', 'heroin', 'meth', 'crack',
+
+    # Hate speech
+    'racism', 'sexism', 'bigotry', 'discrimination',
+
+    # Self-harm
+    'suicide', 'self-harm', 'cutting'
+]
+
+# Topics to be careful with (context matters)
+SENSITIVE_TOPICS = [
+    'terminal illness', 'graphic accidents', 'natural disasters',
+    'extreme poverty', 'homelessness', 'war zones',
+    'serious mental health issues', 'eating disorders'
+]
+
+PROFANITY_PATTERNS = [
+    r'\bf[*@#$%!]+c?k\b',  # F-word with censoring
+    r'\bs[*@#$%!]+i?t\b',  # S-word with censoring
+    r'\bb[*@#$%!]+t?ch\b', # B-word with censoring
+    r'\b[a@][*@#$%!]+s{1,2}\b', # A-word with censoring
+    r'\bd[*@#$%!]+c?k\b',  # D-word with censoring
+    # Actual profanity (word boundaries to avoid false positives)
+    r'\bfuck\b', r'\bshit\b', r'\bbitch\b', r'\bdick\b',
+    r'\bcunt\b', r'\bcock\b', r'\bbastard\b',
+    # Only catch "ass" when standalone or in compound profanity
+    r'\bass\s', r'\bass$', r'asshole', r'jackass', r'dumbass'
+]
+
+# Phrases that mark a quiz question as asking for an opinion, not a fact
+OPINION_PATTERNS = [
+    'loves to', 'likes to', 'prefers', 'favorite',
+    'coolest', 'silliest', 'best', 'worst', 'most fun',
+    'most awesome', 'lamest', 'most boring', 'funnest',
+    'what do you think', 'in your opinion', 'feels like',
+    'which is more', 'what would be'
+]
+
+# Texts of one item are searched together, joined by a character no rule matches
+_SEPARATOR = '\n'
+
+
+class FilterMatch:
+    """Which rule matched, the pattern behind it and the text it hit"""
+
+    __slots__ = ('rule', 'pattern', 'matched', 'field')
+
+    def __init__(self, rule: str, pattern: str, matched: str, field: Optional[str] = None):
+        self.rule = rule
+        self.pattern = pattern
+        self.matched = matched
+        self.field = field
+
+    def __repr__(self):
+        where = f" in {self.field}" if self.field else ""
+        return f"<FilterMatch {self.rule}: {self.pattern!r} matched {self.matched!r}{where}>"
+
+
+class PatternFilter:
+    """
+    A set of named rules compiled into a single case-insensitive regex
+
+    rules maps a rule name to (patterns, is_regex). Plain terms match as
+    substrings, the same as the old `term in text.lower()` checks; regex
+    patterns keep their own anchors and word boundaries.
+    """
+
+    def __init__(self, rules: Dict[str, Tuple[List[str], bool]]):
+        self._groups: Dict[str, Tuple[str, str]] = {}
+        alternatives = []
+        for rule, (patterns, is_regex) in rules.items():
+            for pattern in patterns:
+                group = f"g{len(self._groups)}"
+                self._groups[group] = (rule, pattern)
+                alternatives.append(f"(?P<{group}>{pattern if is_regex else re.escape(pattern)})")
+        self._regex = re.compile('|'.join(alternatives), re.IGNORECASE)
+
+    def _match(self, m: 're.Match') -> FilterMatch:
+        rule, pattern = self._groups[m.lastgroup]
+        return FilterMatch(rule, pattern, m.group())
+
+    def check(self, text: str) -> Optional[FilterMatch]:
+        """First rule hit in `text`, or None if it's clean"""
+        if not text:
+            return None
+        m = self._regex.search(text)
+        return self._match(m) if m else None
+
+    def matches(self, text: str) -> bool:
+        return self.check(text) is not None
+
+    def check_item(self, item: Any, fields: Optional[Iterable[str]] = None) -> Optional[FilterMatch]:
+        """
+        Screen every string of an item in one search
+        With `fields`, only those keys are screened (lists of answer dicts
+        included); without, every string value anywhere in the item is.
+        """
+        texts = list(_item_texts(item, fields))
+        if not texts:
+            return None
+
+        joined = _SEPARATOR.join(text for _, text in texts)
+        m = self._regex.search(joined)
+        if not m:
+            return None
+
+        match = self._match(m)
+        # Map the hit back to the field it came from
+        offset = 0
+        for field, text in texts:
+            offset += len(text) + 1
+            if m.start() < offset:
+                match.field = field
+                break
+        return match
+
+    def check_batch(self, items: List[Any], fields: Optional[Iterable[str]] = None) -> List[Optional[FilterMatch]]:
+        """check_item for a whole set; one result per item, in order"""
+        fields = list(fields) if fields is not None else None
+        return [self.check_item(item, fields) for item in items]
+
+
+def _item_texts(item: Any, fields: Optional[Iterable[str]], path: str = '') -> Iterable[Tuple[str, str]]:
+    if isinstance(item, str):
+        yield path, item
+    elif isinstance(item, dict):
+        for key, value in item.items():
+            if fields is not None and key not in fields:
+                continue
+            # Below the selected fields everything counts (e.g. answers[].text)
+            yield from _item_texts(value, None, f"{path}.{key}" if path else key)
+    elif isinstance(item, (list, tuple)):
+        for i, value in enumerate(item):
+            yield from _item_texts(value, fields, f"{path}[{i}]")
+
+
+class SafetyFilter(PatternFilter):
+    """Kid-safety rules: inappropriate terms, sensitive topics and profanity"""
+
+    QUESTION_FIELDS = ('question', 'answers', 'explanation')
+
+    def __init__(self):
+        super().__init__({
+            'inappropriate_term': (INAPPROPRIATE_TERMS, False),
+            'sensitive_topic': (SENSITIVE_TOPICS, False),
+            'profanity': (PROFANITY_PATTERNS, True),
+        })
+
+    def is_safe(self, text: str) -> bool:
+        match = self.check(text)
+        if match:
+            logger.warning(f"Content filter blocked {match.rule}: {match.pattern}")
+        return match is None
+
+    def screen_question(self, question: Dict[str, Any]) -> Optional[FilterMatch]:
+        """Screen a quiz question's text, answers and explanation in one pass"""
+        return self.check_item(question, self.QUESTION_FIELDS)
+
+    def filter_items(self, items: List[Any], label: str = 'item',
+                     fields: Optional[Iterable[str]] = None) -> List[Any]:
+        """Drop the items of a generated set that fail the filter"""
+        kept = []
+        for item, match in zip(items, self.check_batch(items, fields)):
+            if match:
+                logger.warning(f"Content filter dropped {label}: {match!r}")
+            else:
+                kept.append(item)
+        return kept
+
+
+safety_filter = SafetyFilter()
+opinion_filter = PatternFilter({'opinion': (OPINION_PATTERNS, False)})
@@ -0,0 +1,160 @@
+"""
+Random content sampling for JazzyPop
+Keeps active content IDs in memory so random picks don't need ORDER BY RANDOM()
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, Optional[str]]
+
+
+class ContentSampler:
+    """
+    In-memory index of active content IDs per (type, category)
+
+    Every active row lives in two pools: (type, None) for unfiltered picks and
+    (type, category) for category picks. Pools are plain lists with a position
+    map, so adds and removals are O(1) (swap-remove) and random.sample is O(k).
+
+    New rows are picked up incrementally from a created_at watermark; rows that
+    were deactivated are dropped when a primary-key fetch no longer returns them.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = 30.0,
+        full_reload_interval: float = 600.0,
+        watermark_overlap: timedelta = timedelta(minutes=5)
+    ):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        # created_at is the insert transaction's start time, so a slow generator
+        # can commit rows older than the watermark - re-scan a small window
+        self.watermark_overlap = watermark_overlap
+
+        self._pools: Dict[PoolKey, List[UUID]] = {}
+        self._positions: Dict[PoolKey, Dict[UUID, int]] = {}
+        self._members: Dict[UUID, Tuple[str, Optional[str]]] = {}
+        self._watermark: Optional[datetime] = None
+        self._last_refresh = 0.0
+        self._last_full_reload = 0.0
+        self._lock = asyncio.Lock()
+
+    def _pool_add(self, key: PoolKey, content_id: UUID):
+        positions = self._positions.setdefault(key, {})
+        if content_id in positions:
+            return
+        pool = self._pools.setdefault(key, [])
+        positions[content_id] = len(pool)
+        pool.append(content_id)
+
+    def _pool_remove(self, key: PoolKey, content_id: UUID):
+        positions = self._positions.get(key)
+        if not positions or content_id not in positions:
+            return
+        pool = self._pools[key]
+        index = positions.pop(content_id)
+        last = pool.pop()
+        if last != content_id:
+            pool[index] = last
+            positions[last] = index
+
+    def add(self, content_id: UUID, content_type: str, category: Optional[str] = None):
+        """Register an active content row"""
+        if content_id in self._members:
+            return
+        self._members[content_id] = (content_type, category)
+        self._pool_add((content_type, None), content_id)
+        if category:
+            self._pool_add((content_type, category), content_id)
+
+    def discard(self, content_id: UUID):
+        """Drop a row that is no longer active"""
+        entry = self._members.pop(content_id, None)
+        if not entry:
+            return
+        content_type, category = entry
+        self._pool_remove((content_type, None), content_id)
+        if category:
+            self._pool_remove((content_type, category), content_id)
+
+    def count(self, content_type: str, category: Optional[str] = None) -> int:
+        """Number of active rows known for a type/category"""
+        return len(self._pools.get((content_type, category), ()))
+
+    async def refresh(self, conn, full: bool = False):
+        """Load new active rows since the watermark (or everything when full=True)"""
+        async with self._lock:
+            now = time.monotonic()
+            if not full and self._watermark is not None and now - self._last_refresh < self.refresh_interval:
+                # Another request refreshed while we waited for the lock
+                return
+
+            full = full or self._watermark is None or (
+                now - self._last_full_reload >= self.full_reload_interval
+            )
+
+            if full:
+                rows = await conn.fetch("""
+                    SELECT id, type, data->>'category' AS category, created_at
+                    FROM content
+                    WHERE is_active = true
+                """)
+                self._pools.clear()
+                self._positions.clear()
+                self._members.clear()
+                self._watermark = None
+                self._last_full_reload = now
+            else:
+                rows = await conn.fetch("""
+                    SELECT id, type, data->>'category' AS category, created_at
+                    FROM content
+                    WHERE is_active = true
+                    AND created_at > $1
+                """, self._watermark - self.watermark_overlap)
+
+            for row in rows:
+                self.add(row["id"], row["type"], row["category"])
+                if row["created_at"] and (self._watermark is None or row["created_at"] > self._watermark):
+                    self._watermark = row["created_at"]
+
+            if self._watermark is None:
+                self._watermark = datetime.now(timezone.utc)
+
+            self._last_refresh = now
+
+            if full:
+                logger.info(f"Content sampler loaded {len(self._members)} active content rows")
+            elif rows:
+                logger.debug(f"Content sampler refreshed {len(rows)} rows")
+
+    async def sample(
+        self,
+        conn,
+        content_type: str,
+        count: int,
+        category: Optional[str] = None
+    ) -> List[UUID]:
+        """Pick up to `count` distinct random active IDs for a type/category"""
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            await self.refresh(conn)
+
+        pool = self._pools.get((content_type, category))
+        if not pool:
+            return []
+
+        return random.sample(pool, min(count, len(pool)))
+
+    def stats(self) -> Dict[str, int]:
+        """Pool sizes keyed by 'type' or 'type:category'"""
+        return {
+            f"{content_type}:{category}" if category else content_type: len(pool)
+            for (content_type, category), pool in self._pools.items()
+        }
@@ -9,21 +9,98 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime
 import json
 import logging
-from uuid import UUID, uuid4
+from uuid import UUID
 from dotenv import load_dotenv
+from content_sampler import ContentSampler
+from content_cache import ContentCache
+from leaderboard_store import LeaderboardStore
+from analytics_rollup import AnalyticsRollup
+from economy import EconomyStore
+from answer_keys import AnswerKeyIndex
+from progress_aggregator import ProgressAggregator
+from player_store import PlayerStore
+from quest_engine import QuestEngine
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# jsonb binary wire format is a version byte followed by the JSON text
+JSONB_VERSION = b'\x01'
+
+
+def _json_dumps(value: Any) -> bytes:
+    """
+    Serialize a value for a json/jsonb parameter
+
+    A str is taken to be JSON text already and sent as-is, because legacy
+    callers still json.dumps() their parameters. To store a JSON string
+    value, pass json.dumps(value) - a bare 'hello' is not valid JSON and
+    Postgres rejects it.
+    """
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    if orjson is not None:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, default=str).encode('utf-8')
+
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+async def _init_connection(conn):
+    """
+    Decode json/jsonb columns to Python objects and encode parameters from them,
+    so queries never have to json.loads()/json.dumps() by hand
+    """
+    await conn.set_type_codec(
+        'jsonb',
+        schema='pg_catalog',
+        format='binary',
+        encoder=lambda value: JSONB_VERSION + _json_dumps(value),
+        decoder=lambda data: _json_loads(data[1:])
+    )
+    await conn.set_type_codec(
+        'json',
+        schema='pg_catalog',
+        format='binary',
+        encoder=_json_dumps,
+        decoder=_json_loads
+    )
+
 class Database:
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
         self.redis = None  # DISABLED - causes caching issues
         self.database_url = os.getenv('DATABASE_URL')
         self.redis_url = os.getenv('REDIS_URL')
-    
+        self.sampler = ContentSampler()
+        self.cache = ContentCache(max_entries=int(os.getenv('CONTENT_CACHE_SIZE', '5000')))
+        self.answer_keys = AnswerKeyIndex(self.cache, max_sets=int(os.getenv('ANSWER_KEY_CACHE_SIZE', '10000')))
+        self.leaderboard = LeaderboardStore()
+        self.analytics = AnalyticsRollup()
+        self.economy = EconomyStore()
+        self.player = PlayerStore()
+        self.progress = ProgressAggregator(
+            flush_interval=float(os.getenv('PROGRESS_FLUSH_INTERVAL', '0')),
+            max_pending=int(os.getenv('PROGRESS_MAX_PENDING', '1000'))
+        )
+        self.quests = QuestEngine(
+            self.player,
+            self.economy,
+            flush_interval=float(os.getenv('QUEST_FLUSH_INTERVAL', '0.5')),
+            max_pending=int(os.getenv('QUEST_MAX_PENDING', '1000'))
+        )
+
     async def connect(self):
         """Initialize database connections"""
         # PostgreSQL connection pool
@@ -31,7 +108,8 @@ class Database:
             self.database_url,
             min_size=5,
             max_size=20,
-            command_timeout=60
+            command_timeout=60,
+            init=_init_connection
         )
         
         # Redis connection DISABLED
@@ -43,18 +121,77 @@ class Database:
     
     async def disconnect(self):
         """Close database connections"""
+        await self.cache.stop()
+        await self.analytics.stop()
+        # Buffered progress needs the pool, so before it closes
+        await self.progress.stop()
+        await self.quests.stop()
         if self.pool:
             await self.pool.close()
         if self.redis:
             await self.redis.close()
     
+    async def initialize_event_columns(self, conn):
+        """
+        Make sure the typed quiz_answered columns exist so submit_answer can write them
+        Indexes and the backfill live in migrations/add_event_typed_columns.sql
+        """
+        missing = await conn.fetchval("""
+            SELECT COUNT(*) < 6
+            FROM information_schema.columns
+            WHERE table_name = 'events'
+            AND column_name IN ('correct', 'score', 'time_taken', 'category', 'difficulty', 'mode')
+        """)
+        if missing:
+            # Nullable columns without defaults: a catalog-only change
+            await conn.execute("""
+                ALTER TABLE events
+                ADD COLUMN IF NOT EXISTS correct BOOLEAN,
+                ADD COLUMN IF NOT EXISTS score INTEGER,
+                ADD COLUMN IF NOT EXISTS time_taken DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS category VARCHAR(100),
+                ADD COLUMN IF NOT EXISTS difficulty VARCHAR(20),
+                ADD COLUMN IF NOT EXISTS mode VARCHAR(20)
+            """)
+            logger.info("Added typed quiz_answered columns to events")
+    
     @asynccontextmanager
     async def transaction(self):
         """Database transaction context manager"""
         async with self.pool.acquire() as conn:
             async with conn.transaction():
                 yield conn
-    
+
+    async def fetch_random_content(self, conn, content_type: str, count: int,
+                                   category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch random active content rows by primary key (no ORDER BY RANDOM())
+        Rows come from the content cache - copy before mutating
+        """
+        rows = []
+        seen = set()
+
+        # Second pass only happens when sampled rows were deactivated since the last refresh
+        for _ in range(2):
+            wanted = count - len(rows)
+            ids = [i for i in await self.sampler.sample(conn, content_type, wanted + len(seen), category)
+                   if i not in seen][:wanted]
+            if not ids:
+                break
+            seen.update(ids)
+
+            by_id = await self.cache.get_content(conn, ids)
+            for content_id in ids:
+                if content_id in by_id:
+                    rows.append(by_id[content_id])
+                else:
+                    self.sampler.discard(content_id)
+
+            if len(rows) >= count:
+                break
+
+        return rows
+
     async def get_current_quiz(self, mode: str = "poqpoq") -> Optional[Dict[str, Any]]:
         """Get a quiz set with 10 questions"""
         async with self.pool.acquire() as conn:
@@ -64,30 +201,21 @@ class Database:
             if cached:
                 return json.loads(cached)
             
-            # Query database - get quiz sets only
-            query = """
-                SELECT 
-                    c.id, c.type, c.data, c.metadata, c.created_at,
-                    cv.variation_data
-                FROM content c
-                LEFT JOIN content_variations cv ON cv.content_id = c.id AND cv.mode = $1
-                WHERE c.type = 'quiz_set' 
-                AND c.is_active = true 
-                ORDER BY RANDOM()
-                LIMIT 1
-            """
-            
-            row = await conn.fetchrow(query, mode)
-            if not row:
+            # Pick a random quiz set from the in-memory sampler
+            rows = await self.fetch_random_content(conn, 'quiz_set', 1)
+            if not rows:
                 return None
-            
+
+            row = rows[0]
+            variations = await self.cache.get_variations(conn, [row["id"]])
+
             result = {
                 "id": str(row["id"]),
                 "type": row["type"],
-                "data": json.loads(row["data"]) if isinstance(row["data"], str) else row["data"],
-                "metadata": json.loads(row["metadata"]) if isinstance(row["metadata"], str) else row["metadata"],
+                "data": row["data"],
+                "metadata": row["metadata"],
                 "created_at": row["created_at"].isoformat(),
-                "mode_variation": json.loads(row["variation_data"]) if row["variation_data"] and isinstance(row["variation_data"], str) else (row["variation_data"] or {})
+                "mode_variation": variations[row["id"]].get(mode) or {}
             }
             
             # Cache for 5 minutes
@@ -97,254 +225,38 @@ class Database:
             return result
     
     async def get_economy_state(self, user_id: Optional[UUID], session_id: Optional[str]) -> Dict[str, Any]:
-        """Get economy state for user or session with time-based energy regeneration"""
+        """Get economy state for user or session; energy regeneration is computed on read"""
         async with self.pool.acquire() as conn:
-            # Check if user_id is actually a valid UUID (not None or empty string)
-            if user_id and isinstance(user_id, UUID):
-                # Get from user_progress
-                row = await conn.fetchrow("""
-                    SELECT stats, updated_at FROM user_progress WHERE user_id = $1
-                """, user_id)
-                
-                if row and row['stats']:
-                    # Handle both dict and JSON string
-                    stats = row['stats']
-                    if isinstance(stats, str):
-                        stats = json.loads(stats)
-                    economy = stats.get('economy', {})
-                    
-                    # Calculate energy regeneration based on time elapsed
-                    current_energy = economy.get("energy", 100)
-                    last_update = economy.get("last_energy_update")
-                    
-                    if last_update:
-                        # Parse timestamp and calculate elapsed time
-                        from datetime import datetime
-                        if isinstance(last_update, str):
-                            last_update_time = datetime.fromisoformat(last_update.replace('Z', '+00:00'))
-                        else:
-                            last_update_time = last_update
-                        
-                        elapsed_minutes = (datetime.utcnow() - last_update_time).total_seconds() / 60
-                        
-                        # Regenerate 1 energy per minute
-                        regenerated = int(elapsed_minutes)
-                        if regenerated > 0:
-                            # Calculate energy cap based on level
-                            level = economy.get("level", 1)
-                            max_energy = 100 + ((level - 1) * 10)  # 100 at level 1, +10 per level
-                            
-                            new_energy = min(current_energy + regenerated, max_energy)
-                            economy["energy"] = new_energy
-                            
-                            # Update the last_energy_update time if we regenerated
-                            economy["last_energy_update"] = datetime.utcnow().isoformat()
-                            
-                            # Save the regenerated energy back to database
-                            await self._update_energy_regeneration(conn, user_id, economy)
-                    
-                    return {
-                        "energy": economy.get("energy", 100),
-                        "hearts": economy.get("hearts", 5),
-                        "coins": economy.get("coins", 0),
-                        "sapphires": economy.get("sapphires", 0),
-                        "emeralds": economy.get("emeralds", 0),
-                        "rubies": economy.get("rubies", 0),
-                        "amethysts": economy.get("amethysts", 0),
-                        "diamonds": economy.get("diamonds", 0),
-                        "xp": economy.get("xp", 0),
-                        "level": economy.get("level", 1),
-                        "streak": economy.get("streak", 0)
-                    }
-            
-            # Fall back to session if no valid user_id
-            if session_id:
-                # Get from sessions table
-                row = await conn.fetchrow("""
-                    SELECT data, created_at FROM sessions WHERE id = $1
-                """, session_id)
-                
-                if row and row['data']:
-                    # Handle both dict and JSON string
-                    data = row['data']
-                    if isinstance(data, str):
-                        data = json.loads(data)
-                    economy = data.get('economy', {})
-                    
-                    # Calculate energy regeneration for sessions too
-                    current_energy = economy.get("energy", 100)
-                    last_update = economy.get("last_energy_update")
-                    
-                    if last_update:
-                        from datetime import datetime
-                        if isinstance(last_update, str):
-                            last_update_time = datetime.fromisoformat(last_update.replace('Z', '+00:00'))
-                        else:
-                            last_update_time = last_update
-                        
-                        elapsed_minutes = (datetime.utcnow() - last_update_time).total_seconds() / 60
-                        regenerated = int(elapsed_minutes)
-                        
-                        if regenerated > 0:
-                            level = economy.get("level", 1)
-                            max_energy = 100 + ((level - 1) * 10)
-                            new_energy = min(current_energy + regenerated, max_energy)
-                            economy["energy"] = new_energy
-                            economy["last_energy_update"] = datetime.utcnow().isoformat()
-                            
-                            # Update session with regenerated energy
-                            data['economy'] = economy
-                            await conn.execute("""
-                                UPDATE sessions 
-                                SET data = $2
-                                WHERE id = $1
-                            """, session_id, json.dumps(data))
-                    
-                    return {
-                        "energy": economy.get("energy", 100),
-                        "hearts": economy.get("hearts", 5),
-                        "coins": economy.get("coins", 0),
-                        "sapphires": economy.get("sapphires", 0),
-                        "emeralds": economy.get("emeralds", 0),
-                        "rubies": economy.get("rubies", 0),
-                        "amethysts": economy.get("amethysts", 0),
-                        "diamonds": economy.get("diamonds", 0),
-                        "xp": economy.get("xp", 0),
-                        "level": economy.get("level", 1),
-                        "streak": economy.get("streak", 0)
-                    }
-            
-            # Return default state with proper energy cap
-            from datetime import datetime
-            default_level = 1
-            max_energy = 100 + ((default_level - 1) * 10)  # 100 at level 1
-            return {
-                "energy": max_energy,
-                "hearts": 5,
-                "coins": 0,
-                "sapphires": 0,
-                "emeralds": 0,
-                "rubies": 0,
-                "amethysts": 0,
-                "diamonds": 0,
-                "xp": 0,
-                "level": default_level,
-                "streak": 0
-            }
+            return await self.economy.get_state(conn, user_id, session_id)
     
-    async def _update_energy_regeneration(self, conn, user_id: UUID, economy: Dict[str, Any]):
-        """Helper to update energy regeneration in user_progress"""
-        await conn.execute("""
-            UPDATE user_progress 
-            SET stats = jsonb_set(
-                stats,
-                '{economy}',
-                $2::jsonb
-            ),
-            updated_at = NOW()
-            WHERE user_id = $1
-        """, user_id, json.dumps(economy))
+    async def spend_energy(self, user_id: Optional[UUID], session_id: Optional[str], amount: int):
+        """Atomically spend energy; returns (spent, economy state after the attempt)"""
+        async with self.pool.acquire() as conn:
+            return await self.economy.spend_energy(conn, user_id, session_id, amount)
+    
+    async def grant_rewards(self, user_id: Optional[UUID], session_id: Optional[str], rewards: Dict[str, int]):
+        """Atomically add rewards; returns (economy state after, level before)"""
+        async with self.pool.acquire() as conn:
+            return await self.economy.grant(conn, user_id, session_id, rewards)
     
     async def save_economy_state(self, user_id: Optional[UUID], session_id: Optional[str], state: Dict[str, Any]):
-        """Save economy state for user or session"""
-        from datetime import datetime
-        
-        # Ensure we track when energy was last updated
-        if "last_energy_update" not in state:
-            state["last_energy_update"] = datetime.utcnow().isoformat()
-        
+        """Overwrite the economy state for user or session"""
         async with self.pool.acquire() as conn:
-            # Check if user_id is actually a valid UUID (not None or empty string)
-            if user_id and isinstance(user_id, UUID):
-                # First check if user exists in database
-                user_exists = await conn.fetchval(
-                    "SELECT EXISTS(SELECT 1 FROM users WHERE id = $1)", 
-                    user_id
-                )
-                
-                if user_exists:
-                    # Check if user_progress exists
-                    existing = await conn.fetchval(
-                        "SELECT EXISTS(SELECT 1 FROM user_progress WHERE user_id = $1)",
-                        user_id
-                    )
-                    
-                    if existing:
-                        # Update existing user_progress
-                        await conn.execute("""
-                            UPDATE user_progress 
-                            SET stats = COALESCE(stats, '{}'::jsonb) || jsonb_build_object('economy', $2::jsonb),
-                                updated_at = NOW()
-                            WHERE user_id = $1
-                        """, user_id, json.dumps(state))
-                    else:
-                        # Create new user_progress
-                        await conn.execute("""
-                            INSERT INTO user_progress (user_id, stats, updated_at)
-                            VALUES ($1, jsonb_build_object('economy', $2::jsonb), NOW())
-                        """, user_id, json.dumps(state))
-                    return  # Successfully saved to user_progress
-                else:
-                    # User doesn't exist, log warning and fall back to session
-                    logger.warning(f"User ID {user_id} not found in database, falling back to session storage")
-            
-            # Fall back to session storage
-            if session_id:
-                # Update session
-                await conn.execute("""
-                    INSERT INTO sessions (id, data, created_at)
-                    VALUES ($1, jsonb_build_object('economy', $2::jsonb), NOW())
-                    ON CONFLICT (id) DO UPDATE
-                    SET data = sessions.data || jsonb_build_object('economy', $2::jsonb)
-                """, session_id, json.dumps(state))
-            else:
-                # No valid storage method available
-                logger.warning("No valid storage method available - neither valid user_id nor session_id provided")
+            await self.economy.set_state(conn, user_id, session_id, state)
 
     async def submit_answer(self, user_id: Optional[UUID], quiz_id: UUID, answer_id: str, 
                           time_taken: float, mode: str, session_id: Optional[str] = None,
                           question_index: Optional[int] = None) -> Dict[str, Any]:
         """Submit a quiz answer and update scores"""
         async with self.transaction() as conn:
-            # Get quiz data to check answer
-            quiz_query = "SELECT id, type, data, metadata FROM content WHERE id = $1"
-            quiz_row = await conn.fetchrow(quiz_query, quiz_id)
-            
-            if not quiz_row:
-                raise ValueError("Quiz not found")
-            
-            quiz_data = quiz_row['data']
-            quiz_metadata = quiz_row['metadata'] or {}
-            
-            # Parse quiz_data if it's a string
-            if isinstance(quiz_data, str):
-                quiz_data = json.loads(quiz_data)
-            if isinstance(quiz_metadata, str):
-                quiz_metadata = json.loads(quiz_metadata)
-            
-            # Determine if this is a quiz or quiz_set
-            content_type = quiz_row.get('type', 'quiz')
-            question_data = quiz_data
-            category = quiz_metadata.get('category', quiz_data.get('category', 'unknown'))
-            difficulty = quiz_metadata.get('difficulty', quiz_data.get('difficulty', 'medium'))
-            
-            # If it's a quiz_set and question_index provided, get specific question
-            if content_type == 'quiz_set' and question_index is not None:
-                questions = quiz_data.get('questions', [])
-                if 0 <= question_index < len(questions):
-                    question_data = questions[question_index]
-                else:
-                    raise ValueError(f"Invalid question index: {question_index}")
+            # Grade from the answer-key index instead of loading the whole set
+            key = await self.answer_keys.get(conn, quiz_id, question_index)
+            content_type = key.content_type
+            category = key.category
+            difficulty = key.difficulty
             
             # Check if answer is correct
-            correct = False
-            correct_answer_id = None
-            for answer in question_data.get("answers", []):
-                if answer.get("correct", False):
-                    correct_answer_id = answer["id"]
-                if answer["id"] == answer_id and answer.get("correct", False):
-                    correct = True
-                    break
+            correct, correct_answer_id = key.grade(answer_id)
             
             # Calculate score based on mode
             base_score = 100 if correct else 0
@@ -357,8 +269,10 @@ class Database:
             
             # Record the event with enhanced tracking
             event_query = """
-                INSERT INTO events (source, type, user_id, session_id, content_id, payload, context)
-                VALUES ('user', 'quiz_answered', $1, $2, $3, $4, $5)
+                INSERT INTO events (source, type, user_id, session_id, content_id, payload, context,
+                                    correct, score, time_taken, category, difficulty, mode)
+                VALUES ('user', 'quiz_answered', $1, $2, $3, $4, $5, $6, $7, $8,
+                        left($9, 100), left($10, 20), left($11, 20))
                 RETURNING id
             """
             
@@ -370,7 +284,7 @@ class Database:
                 "score": base_score,
                 "mode": mode,
                 "question_index": question_index,
-                "question_text": question_data.get("question", ""),
+                "question_text": key.question_text,
                 "category": category,
                 "difficulty": difficulty
             }
@@ -384,139 +298,63 @@ class Database:
             
             event_id = await conn.fetchval(
                 event_query, user_id, session_id, quiz_id, 
-                json.dumps(payload), json.dumps(context)
+                payload, context,
+                correct, base_score, time_taken,
+                # Typed columns are VARCHAR(100)/(20), truncated like the backfill does
+                category, difficulty, mode
             )
             
             # Update user progress if authenticated
+            leaderboard_updates = []
+            progress_updates = []
             if user_id:
-                await self._update_user_progress(conn, user_id, correct, base_score)
-            
-            return {
-                "correct": correct,
-                "score": base_score,
-                "event_id": str(event_id)
-            }
-    
-    async def _update_user_progress(self, conn: asyncpg.Connection, user_id: UUID, 
-                                  correct: bool, score: int):
-        """Update user progress stats"""
-        # Get current progress
-        progress_query = """
-            SELECT id, stats, streak_data 
-            FROM user_progress 
-            WHERE user_id = $1 AND content_type = 'quiz'
-        """
-        
-        progress = await conn.fetchrow(progress_query, user_id)
+                progress_updates = await self.progress.record(conn, event_id, user_id, correct, base_score)
+                leaderboard_updates = await self.leaderboard.record(conn, user_id, mode, base_score)
         
-        if progress:
-            # Update existing progress
-            # Handle both dict and JSON string
-            stats = progress["stats"]
-            if isinstance(stats, str):
-                stats = json.loads(stats)
-            streak_data = progress["streak_data"]
-            if isinstance(streak_data, str):
-                streak_data = json.loads(streak_data)
-            
-            stats["total_quizzes"] = stats.get("total_quizzes", 0) + 1
+        # Only show committed scores on the in-memory leaderboards
+        self.leaderboard.apply(leaderboard_updates)
+        # ... and only buffer committed answers for the progress aggregator
+        self.progress.enqueue(progress_updates)
+        if user_id:
+            self.quests.publish(user_id, "answer_submitted")
             if correct:
-                stats["correct_answers"] = stats.get("correct_answers", 0) + 1
-                streak_data["current"] = streak_data.get("current", 0) + 1
-                streak_data["best"] = max(streak_data.get("best", 0), streak_data["current"])
-            else:
-                streak_data["current"] = 0
-            
-            stats["total_points"] = stats.get("total_points", 0) + score
-            
-            update_query = """
-                UPDATE user_progress 
-                SET stats = $2, streak_data = $3, updated_at = NOW()
-                WHERE id = $1
-            """
-            
-            await conn.execute(
-                update_query, progress["id"], 
-                json.dumps(stats), json.dumps(streak_data)
-            )
-        else:
-            # Create new progress record
-            stats = {
-                "total_quizzes": 1,
-                "correct_answers": 1 if correct else 0,
-                "total_points": score
-            }
-            
-            streak_data = {
-                "current": 1 if correct else 0,
-                "best": 1 if correct else 0
-            }
-            
-            insert_query = """
-                INSERT INTO user_progress (user_id, content_type, stats, streak_data)
-                VALUES ($1, 'quiz', $2, $3)
-            """
-            
-            await conn.execute(
-                insert_query, user_id,
-                json.dumps(stats), json.dumps(streak_data)
-            )
+                self.quests.publish(user_id, "answer_correct")
+        
+        return {
+            "correct": correct,
+            "score": base_score,
+            "event_id": str(event_id)
+        }
     
     async def get_leaderboard(self, period: str = "daily", mode: Optional[str] = None, 
                             limit: int = 10) -> List[Dict[str, Any]]:
         """Get leaderboard for specified period"""
-        # Check cache first
-        cache_key = f"leaderboard:{period}:{mode or 'all'}"
-        cached = await self.redis.get(cache_key) if self.redis else None
-        if cached:
-            return json.loads(cached)
-        
-        # Calculate period boundaries
-        period_clause = ""
-        if period == "daily":
-            period_clause = "AND e.created_at >= CURRENT_DATE"
-        elif period == "weekly":
-            period_clause = "AND e.created_at >= CURRENT_DATE - INTERVAL '7 days'"
-        
-        mode_clause = ""
-        if mode:
-            mode_clause = "AND e.context->>'mode' = $1"
-        
         async with self.pool.acquire() as conn:
-            query = f"""
-                SELECT 
-                    u.id as user_id,
-                    u.display_name,
-                    u.avatar_id,
-                    SUM((e.payload->>'score')::int) as total_score,
-                    COUNT(*) as games_played
-                FROM events e
-                JOIN users u ON u.id = e.user_id
-                WHERE e.type = 'quiz_answered'
-                {period_clause}
-                {mode_clause}
-                GROUP BY u.id, u.display_name, u.avatar_id
-                ORDER BY total_score DESC
-                LIMIT {limit}
-            """
+            top = await self.leaderboard.get_top(conn, period, mode, limit)
+            if not top:
+                return []
             
-            rows = await conn.fetch(query, mode) if mode else await conn.fetch(query)
+            users = await conn.fetch("""
+                SELECT id, display_name, avatar_id
+                FROM users
+                WHERE id = ANY($1::uuid[])
+            """, [user_id for user_id, _, _ in top])
+            users_by_id = {row["id"]: row for row in users}
             
             leaderboard = []
-            for i, row in enumerate(rows):
+            for user_id, score, games_played in top:
+                user = users_by_id.get(user_id)
+                if not user:
+                    continue
                 leaderboard.append({
-                    "rank": i + 1,
-                    "user_id": str(row["user_id"]),
-                    "display_name": row["display_name"],
-                    "avatar_id": row["avatar_id"],
-                    "score": row["total_score"],
-                    "games_played": row["games_played"]
+                    "rank": len(leaderboard) + 1,
+                    "user_id": str(user_id),
+                    "display_name": user["display_name"],
+                    "avatar_id": user["avatar_id"],
+                    "score": score,
+                    "games_played": games_played
                 })
             
-            # Cache for 1 minute
-            if self.redis:
-                await self.redis.setex(cache_key, 60, json.dumps(leaderboard))
-            
             return leaderboard
     
     async def get_active_cards(self, limit: int = 10) -> List[Dict[str, Any]]:
@@ -550,11 +388,7 @@ class Database:
                     "created_at": row["created_at"].isoformat()
                 }
                 
-                # Parse data if it's a string
-                if isinstance(row["data"], str):
-                    card_data["data"] = json.loads(row["data"])
-                else:
-                    card_data["data"] = row["data"]
+                card_data["data"] = row["data"]
                     
                 cards.append(card_data)
             
@@ -579,10 +413,7 @@ class Database:
             
             flashcards = []
             for row in rows:
-                # Handle both dict and JSON string formats
                 data = row["data"]
-                if isinstance(data, str):
-                    data = json.loads(data)
                     
                 card = {
                     "id": str(row["id"]),
@@ -614,33 +445,12 @@ class Database:
             return json.loads(cached)
         
         async with self.pool.acquire() as conn:
-            if isinstance(content_type, list):
-                # Multiple types for trivia mix
-                rows = await conn.fetch("""
-                    SELECT id, type, data, metadata
-                    FROM content
-                    WHERE type = ANY($1::text[])
-                    AND is_active = true
-                    ORDER BY RANDOM()
-                    LIMIT 1
-                """, content_type)  # Always get 1 set which contains 10 items
-            else:
-                # Single type
-                rows = await conn.fetch("""
-                    SELECT id, type, data, metadata
-                    FROM content
-                    WHERE type = $1
-                    AND is_active = true
-                    ORDER BY RANDOM()
-                    LIMIT 1
-                """, content_type)  # Always get 1 set which contains 10 items
-            
+            # Always get 1 set which contains 10 items
+            rows = await self.fetch_random_content(conn, content_type, 1)
+
             flashcards = []
             for row in rows:
-                # Handle both dict and JSON string formats
                 data = row["data"]
-                if isinstance(data, str):
-                    data = json.loads(data)
                 
                 # Extract items from sets
                 if row["type"].endswith('_set'):
@@ -688,7 +498,7 @@ class Database:
                     view_count = user_content_views.view_count + 1,
                     last_viewed = CURRENT_TIMESTAMP,
                     metadata = COALESCE($4, user_content_views.metadata)
-            """, user_id, content_id, content_type, json.dumps(metadata or {}))
+            """, user_id, content_id, content_type, metadata or {})
     
     def _get_category_name(self, content_type: str) -> str:
         """Map content type to display category"""
@@ -707,134 +517,19 @@ class Database:
     async def get_user_quests(self, user_id: UUID) -> Dict[str, Any]:
         """Get all quests for a user"""
         async with self.pool.acquire() as conn:
-            stats = await conn.fetchval(
-                "SELECT stats FROM user_progress WHERE user_id = $1",
-                user_id
-            )
-            if not stats:
-                return {"active": [], "completed": [], "chains": {}}
-            
-            # Handle both dict and JSON string
-            if isinstance(stats, str):
-                stats = json.loads(stats)
-            
-            return stats.get("quests", {"active": [], "completed": [], "chains": {}})
+            return await self.player.get_quests(conn, user_id)
     
     async def update_quest_progress(self, user_id: UUID, quest_type: str, progress: int = 1) -> List[Dict]:
-        """Update quest progress and check for completions"""
-        completed_quests = []
-        
-        async with self.transaction() as conn:
-            # Get current stats
-            row = await conn.fetchrow(
-                "SELECT stats FROM user_progress WHERE user_id = $1",
-                user_id
-            )
-            
-            if not row:
-                return completed_quests
-            
-            # Handle both dict and JSON string
-            stats = row['stats'] or {}
-            if isinstance(stats, str):
-                stats = json.loads(stats)
-            quests = stats.get('quests', {'active': [], 'completed': [], 'chains': {}})
-            
-            # Update matching quests
-            for quest in quests.get('active', []):
-                if quest.get('type') == quest_type:
-                    quest['progress'] = quest.get('progress', 0) + progress
-                    
-                    # Check completion
-                    if quest['progress'] >= quest.get('target', 1):
-                        quest['completed_at'] = datetime.utcnow().isoformat()
-                        completed_quests.append(quest)
-                        
-                        # Move to completed
-                        quests['completed'].append(quest['quest_id'])
-                        
-                        # Award rewards
-                        if 'rewards' in quest:
-                            await self._award_quest_rewards(conn, user_id, quest['rewards'])
-            
-            # Remove completed quests from active
-            quests['active'] = [q for q in quests['active'] 
-                               if q['quest_id'] not in [c['quest_id'] for c in completed_quests]]
-            
-            # Update stats
-            stats['quests'] = quests
-            await conn.execute(
-                "UPDATE user_progress SET stats = $1 WHERE user_id = $2",
-                json.dumps(stats), user_id
-            )
-        
-        return completed_quests
+        """Update quest progress and check for completions; rewards are granted in the same statement"""
+        async with self.pool.acquire() as conn:
+            return await self.quests.advance(conn, user_id, quest_type, progress)
     
     async def add_quest(self, user_id: UUID, quest_data: Dict[str, Any]):
         """Add a new quest for a user"""
-        async with self.transaction() as conn:
-            row = await conn.fetchrow(
-                "SELECT stats FROM user_progress WHERE user_id = $1",
-                user_id
-            )
-            
-            stats = row['stats'] if row else {}
-            # Handle both dict and JSON string
-            if isinstance(stats, str):
-                stats = json.loads(stats)
-            quests = stats.get('quests', {'active': [], 'completed': [], 'chains': {}})
-            
-            # Add quest ID and timestamp
-            quest_data['quest_id'] = quest_data.get('quest_id', f"quest_{uuid4().hex[:8]}")
-            quest_data['started_at'] = datetime.utcnow().isoformat()
-            quest_data['progress'] = 0
-            
-            quests['active'].append(quest_data)
-            stats['quests'] = quests
-            
-            # Check if user_progress exists for this user
-            existing = await conn.fetchval(
-                "SELECT EXISTS(SELECT 1 FROM user_progress WHERE user_id = $1)",
-                user_id
-            )
-            
-            if existing:
-                # Update existing record
-                await conn.execute("""
-                    UPDATE user_progress 
-                    SET stats = $2, updated_at = NOW()
-                    WHERE user_id = $1
-                """, user_id, json.dumps(stats))
-            else:
-                # Insert new record
-                await conn.execute("""
-                    INSERT INTO user_progress (user_id, stats, updated_at)
-                    VALUES ($1, $2, NOW())
-                """, user_id, json.dumps(stats))
-    
-    async def _award_quest_rewards(self, conn, user_id: UUID, rewards: Dict[str, Any]):
-        """Award quest completion rewards"""
-        # Get current economy
-        row = await conn.fetchrow(
-            "SELECT stats FROM user_progress WHERE user_id = $1",
-            user_id
-        )
-        stats = row['stats'] if row else {}
-        # Handle both dict and JSON string
-        if isinstance(stats, str):
-            stats = json.loads(stats)
-        economy = stats.get('economy', {})
-        
-        # Apply rewards
-        for key, value in rewards.items():
-            if key in economy:
-                economy[key] = economy.get(key, 0) + value
-        
-        stats['economy'] = economy
-        await conn.execute(
-            "UPDATE user_progress SET stats = $1 WHERE user_id = $2",
-            json.dumps(stats), user_id
-        )
+        async with self.pool.acquire() as conn:
+            await self.player.add_quest(conn, user_id, quest_data)
+        # Start matching events against it right away
+        self.quests.forget(user_id)
     
     # ========== ACHIEVEMENTS & BADGES ==========
     
@@ -847,9 +542,6 @@ class Database:
                 user_id
             ) or []
             
-            # Handle both dict/list and JSON string
-            if isinstance(achievements, str):
-                achievements = json.loads(achievements)
             
             # Check if already unlocked
             if any(a.get('id') == achievement_id for a in achievements):
@@ -868,181 +560,36 @@ class Database:
                 UPDATE user_progress 
                 SET achievements = $1::jsonb 
                 WHERE user_id = $2
-            """, json.dumps(achievements), user_id)
+            """, achievements, user_id)
             
             return True
     
     async def get_user_badges(self, user_id: UUID) -> List[Dict]:
         """Get all badges for a user"""
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(
-                "SELECT stats FROM user_progress WHERE user_id = $1",
-                user_id
-            )
-            
-            if not row or not row['stats']:
-                return []
-            
-            # Handle both dict and JSON string
-            stats = row['stats']
-            if isinstance(stats, str):
-                stats = json.loads(stats)
-            
-            return stats.get('badges', [])
+            return await self.player.get_badges(conn, user_id)
     
     async def award_badge(self, user_id: UUID, badge_id: str, tier: str = "bronze"):
         """Award a badge to a user"""
-        async with self.transaction() as conn:
-            row = await conn.fetchrow(
-                "SELECT stats FROM user_progress WHERE user_id = $1",
-                user_id
-            )
-            
-            stats = row['stats'] if row else {}
-            # Handle both dict and JSON string
-            if isinstance(stats, str):
-                stats = json.loads(stats)
-            badges = stats.get('badges', [])
-            
-            # Check if badge already exists
-            existing = next((b for b in badges if b['id'] == badge_id), None)
-            
-            if existing:
-                # Update tier if higher
-                tier_order = {'bronze': 1, 'silver': 2, 'gold': 3, 'platinum': 4}
-                if tier_order.get(tier, 0) > tier_order.get(existing['tier'], 0):
-                    existing['tier'] = tier
-                    existing['upgraded_at'] = datetime.utcnow().isoformat()
-            else:
-                # New badge
-                badge = {
-                    'id': badge_id,
-                    'tier': tier,
-                    'earned_at': datetime.utcnow().isoformat()
-                }
-                badges.append(badge)
-            
-            stats['badges'] = badges
-            
-            # Check if user_progress exists for this user
-            existing = await conn.fetchval(
-                "SELECT EXISTS(SELECT 1 FROM user_progress WHERE user_id = $1)",
-                user_id
-            )
-            
-            if existing:
-                # Update existing record
-                await conn.execute("""
-                    UPDATE user_progress 
-                    SET stats = $2, updated_at = NOW()
-                    WHERE user_id = $1
-                """, user_id, json.dumps(stats))
-            else:
-                # Insert new record
-                await conn.execute("""
-                    INSERT INTO user_progress (user_id, stats, updated_at)
-                    VALUES ($1, $2, NOW())
-                """, user_id, json.dumps(stats))
+        async with self.pool.acquire() as conn:
+            await self.player.award_badge(conn, user_id, badge_id, tier)
     
     # ========== ASSETS & PETS ==========
     
     async def get_user_assets(self, user_id: UUID) -> Dict[str, Any]:
         """Get all assets for a user"""
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(
-                "SELECT stats FROM user_progress WHERE user_id = $1",
-                user_id
-            )
-            
-            if not row or not row['stats']:
-                return {'pets': [], 'cosmetics': {}, 'inventory': []}
-            
-            # Handle both dict and JSON string
-            stats = row['stats']
-            if isinstance(stats, str):
-                stats = json.loads(stats)
-            
-            return stats.get('assets', {'pets': [], 'cosmetics': {}, 'inventory': []})
+            return await self.player.get_assets(conn, user_id)
     
     async def add_pet(self, user_id: UUID, pet_data: Dict[str, Any]):
         """Add a pet to user's collection"""
-        async with self.transaction() as conn:
-            row = await conn.fetchrow(
-                "SELECT stats FROM user_progress WHERE user_id = $1",
-                user_id
-            )
-            
-            stats = row['stats'] if row else {}
-            # Handle both dict and JSON string
-            if isinstance(stats, str):
-                stats = json.loads(stats)
-            assets = stats.get('assets', {'pets': [], 'cosmetics': {}, 'inventory': []})
-            
-            # Add pet
-            pet_data['id'] = pet_data.get('id', f"pet_{uuid4().hex[:8]}")
-            pet_data['acquired_at'] = datetime.utcnow().isoformat()
-            pet_data['level'] = 1
-            pet_data['experience'] = 0
-            
-            assets['pets'].append(pet_data)
-            stats['assets'] = assets
-            
-            # Check if user_progress exists for this user
-            existing = await conn.fetchval(
-                "SELECT EXISTS(SELECT 1 FROM user_progress WHERE user_id = $1)",
-                user_id
-            )
-            
-            if existing:
-                # Update existing record
-                await conn.execute("""
-                    UPDATE user_progress 
-                    SET stats = $2, updated_at = NOW()
-                    WHERE user_id = $1
-                """, user_id, json.dumps(stats))
-            else:
-                # Insert new record
-                await conn.execute("""
-                    INSERT INTO user_progress (user_id, stats, updated_at)
-                    VALUES ($1, $2, NOW())
-                """, user_id, json.dumps(stats))
-            
-            return pet_data['id']
+        async with self.pool.acquire() as conn:
+            return await self.player.add_pet(conn, user_id, pet_data)
     
     async def equip_asset(self, user_id: UUID, asset_type: str, asset_id: str):
         """Equip/unequip an asset"""
-        async with self.transaction() as conn:
-            row = await conn.fetchrow(
-                "SELECT stats FROM user_progress WHERE user_id = $1",
-                user_id
-            )
-            
-            stats = row['stats'] if row else {}
-            # Handle both dict and JSON string
-            if isinstance(stats, str):
-                stats = json.loads(stats)
-            assets = stats.get('assets', {'pets': [], 'cosmetics': {}, 'inventory': []})
-            
-            if asset_type == 'pet':
-                # Unequip all pets first
-                for pet in assets['pets']:
-                    pet['equipped'] = False
-                
-                # Equip selected pet
-                pet = next((p for p in assets['pets'] if p['id'] == asset_id), None)
-                if pet:
-                    pet['equipped'] = True
-            
-            elif asset_type in ['avatar_frame', 'theme']:
-                if 'equipped' not in assets['cosmetics']:
-                    assets['cosmetics']['equipped'] = {}
-                assets['cosmetics']['equipped'][asset_type] = asset_id
-            
-            stats['assets'] = assets
-            await conn.execute(
-                "UPDATE user_progress SET stats = $1 WHERE user_id = $2",
-                json.dumps(stats), user_id
-            )
+        async with self.pool.acquire() as conn:
+            await self.player.equip_asset(conn, user_id, asset_type, asset_id)
     
     # ========== ANALYTICS ==========
     
@@ -1052,38 +599,39 @@ class Database:
             # Get overall stats
             stats = await conn.fetchrow("""
                 SELECT 
-                    COUNT(*) as total_attempts,
-                    COUNT(DISTINCT COALESCE(user_id::text, session_id)) as unique_players,
-                    SUM(CASE WHEN (payload->>'correct')::boolean THEN 1 ELSE 0 END) as correct_answers,
-                    AVG((payload->>'time_taken')::float) as avg_time,
-                    AVG((payload->>'score')::int) as avg_score
-                FROM events
-                WHERE type = 'quiz_answered' AND content_id = $1
+                    attempts as total_attempts,
+                    players as unique_players,
+                    correct as correct_answers,
+                    time_sum / NULLIF(time_count, 0) as avg_time,
+                    score_sum::float / NULLIF(score_count, 0) as avg_score
+                FROM analytics_quiz_rollup
+                WHERE content_id = $1
             """, quiz_id)
             
             # Get per-answer breakdown
             answer_stats = await conn.fetch("""
                 SELECT 
-                    payload->>'answer_id' as answer_id,
-                    COUNT(*) as times_selected,
-                    SUM(CASE WHEN (payload->>'correct')::boolean THEN 1 ELSE 0 END) as times_correct
-                FROM events
-                WHERE type = 'quiz_answered' AND content_id = $1
-                GROUP BY payload->>'answer_id'
+                    answer_id,
+                    selected as times_selected,
+                    correct as times_correct
+                FROM analytics_quiz_answer_rollup
+                WHERE content_id = $1
             """, quiz_id)
             
+            total_attempts = stats['total_attempts'] if stats else 0
+            
             return {
                 "quiz_id": str(quiz_id),
-                "total_attempts": stats['total_attempts'],
-                "unique_players": stats['unique_players'],
-                "success_rate": float(stats['correct_answers']) / stats['total_attempts'] if stats['total_attempts'] > 0 else 0,
-                "avg_time_seconds": float(stats['avg_time']) if stats['avg_time'] else 0,
-                "avg_score": float(stats['avg_score']) if stats['avg_score'] else 0,
+                "total_attempts": total_attempts,
+                "unique_players": stats['unique_players'] if stats else 0,
+                "success_rate": float(stats['correct_answers']) / total_attempts if total_attempts > 0 else 0,
+                "avg_time_seconds": float(stats['avg_time']) if stats and stats['avg_time'] else 0,
+                "avg_score": float(stats['avg_score']) if stats and stats['avg_score'] else 0,
                 "answer_distribution": [
                     {
                         "answer_id": row['answer_id'],
                         "times_selected": row['times_selected'],
-                        "selection_rate": float(row['times_selected']) / stats['total_attempts'] if stats['total_attempts'] > 0 else 0
+                        "selection_rate": float(row['times_selected']) / total_attempts if total_attempts > 0 else 0
                     }
                     for row in answer_stats
                 ]
@@ -1092,46 +640,50 @@ class Database:
     async def get_category_analytics(self, category: str, user_id: Optional[UUID] = None) -> Dict[str, Any]:
         """Get performance analytics for a category, optionally filtered by user"""
         async with self.pool.acquire() as conn:
-            user_filter = "AND user_id = $2" if user_id else ""
-            params = [category, user_id] if user_id else [category]
+            if user_id:
+                category_table = "analytics_user_category_rollup"
+                difficulty_table = "analytics_user_difficulty_rollup"
+                user_filter = "AND user_id = $2"
+                params = [category, user_id]
+            else:
+                category_table = "analytics_category_rollup"
+                difficulty_table = "analytics_difficulty_rollup"
+                user_filter = ""
+                params = [category]
             
             stats = await conn.fetchrow(f"""
                 SELECT 
-                    COUNT(*) as total_attempts,
-                    SUM(CASE WHEN (payload->>'correct')::boolean THEN 1 ELSE 0 END) as correct_answers,
-                    COUNT(DISTINCT content_id) as unique_quizzes,
-                    AVG((payload->>'time_taken')::float) as avg_time,
-                    AVG(CASE WHEN (payload->>'correct')::boolean THEN (payload->>'time_taken')::float END) as avg_correct_time
-                FROM events
-                WHERE type = 'quiz_answered' 
-                AND payload->>'category' = $1
+                    attempts as total_attempts,
+                    correct as correct_answers,
+                    quizzes as unique_quizzes,
+                    time_sum / NULLIF(time_count, 0) as avg_time,
+                    correct_time_sum / NULLIF(correct_time_count, 0) as avg_correct_time
+                FROM {category_table}
+                WHERE category = $1
                 {user_filter}
             """, *params)
             
             # Get difficulty breakdown
             difficulty_stats = await conn.fetch(f"""
-                SELECT 
-                    payload->>'difficulty' as difficulty,
-                    COUNT(*) as attempts,
-                    SUM(CASE WHEN (payload->>'correct')::boolean THEN 1 ELSE 0 END) as correct
-                FROM events
-                WHERE type = 'quiz_answered' 
-                AND payload->>'category' = $1
+                SELECT difficulty, attempts, correct
+                FROM {difficulty_table}
+                WHERE category = $1
                 {user_filter}
-                GROUP BY payload->>'difficulty'
             """, *params)
             
+            total_attempts = stats['total_attempts'] if stats else 0
+            
             return {
                 "category": category,
                 "user_id": str(user_id) if user_id else None,
-                "total_attempts": stats['total_attempts'],
-                "success_rate": float(stats['correct_answers']) / stats['total_attempts'] if stats['total_attempts'] > 0 else 0,
-                "unique_quizzes_attempted": stats['unique_quizzes'],
-                "avg_time_seconds": float(stats['avg_time']) if stats['avg_time'] else 0,
-                "avg_correct_answer_time": float(stats['avg_correct_time']) if stats['avg_correct_time'] else 0,
+                "total_attempts": total_attempts,
+                "success_rate": float(stats['correct_answers']) / total_attempts if total_attempts > 0 else 0,
+                "unique_quizzes_attempted": stats['unique_quizzes'] if stats else 0,
+                "avg_time_seconds": float(stats['avg_time']) if stats and stats['avg_time'] else 0,
+                "avg_correct_answer_time": float(stats['avg_correct_time']) if stats and stats['avg_correct_time'] else 0,
                 "difficulty_breakdown": [
                     {
-                        "difficulty": row['difficulty'] or 'unknown',
+                        "difficulty": row['difficulty'],
                         "attempts": row['attempts'],
                         "success_rate": float(row['correct']) / row['attempts'] if row['attempts'] > 0 else 0
                     }
@@ -1145,17 +697,14 @@ class Database:
             # Get category performance
             category_stats = await conn.fetch("""
                 SELECT 
-                    payload->>'category' as category,
-                    COUNT(*) as attempts,
-                    SUM(CASE WHEN (payload->>'correct')::boolean THEN 1 ELSE 0 END) as correct,
-                    AVG((payload->>'time_taken')::float) as avg_time
-                FROM events
-                WHERE type = 'quiz_answered' 
-                AND user_id = $1
-                AND payload->>'category' IS NOT NULL
-                GROUP BY payload->>'category'
-                HAVING COUNT(*) >= $2
-                ORDER BY (SUM(CASE WHEN (payload->>'correct')::boolean THEN 1 ELSE 0 END)::float / COUNT(*)) DESC
+                    category,
+                    attempts,
+                    correct,
+                    time_sum / NULLIF(time_count, 0) as avg_time
+                FROM analytics_user_category_rollup
+                WHERE user_id = $1
+                AND attempts >= $2
+                ORDER BY correct::float / attempts DESC
             """, user_id, min_attempts)
             
             if not category_stats:
@@ -1201,26 +750,22 @@ class Database:
             # Overall platform stats
             overall = await conn.fetchrow("""
                 SELECT 
-                    COUNT(DISTINCT COALESCE(user_id::text, session_id)) as total_players,
-                    COUNT(*) as total_answers,
-                    COUNT(DISTINCT content_id) as unique_quizzes_played,
-                    SUM(CASE WHEN (payload->>'correct')::boolean THEN 1 ELSE 0 END) as total_correct
-                FROM events
-                WHERE type = 'quiz_answered'
+                    (SELECT value FROM analytics_totals WHERE name = 'players') as total_players,
+                    COALESCE(SUM(answers), 0) as total_answers,
+                    (SELECT value FROM analytics_totals WHERE name = 'quizzes') as unique_quizzes_played,
+                    COALESCE(SUM(correct), 0) as total_correct
+                FROM analytics_daily_rollup
             """)
             
             # Category popularity and performance
             category_stats = await conn.fetch("""
                 SELECT 
-                    payload->>'category' as category,
-                    COUNT(*) as attempts,
-                    COUNT(DISTINCT COALESCE(user_id::text, session_id)) as players,
-                    SUM(CASE WHEN (payload->>'correct')::boolean THEN 1 ELSE 0 END) as correct,
-                    AVG((payload->>'time_taken')::float) as avg_time
-                FROM events
-                WHERE type = 'quiz_answered'
-                AND payload->>'category' IS NOT NULL
-                GROUP BY payload->>'category'
+                    category,
+                    attempts,
+                    players,
+                    correct,
+                    time_sum / NULLIF(time_count, 0) as avg_time
+                FROM analytics_category_rollup
                 ORDER BY attempts DESC
                 LIMIT 10
             """)
@@ -1228,14 +773,12 @@ class Database:
             # Time-based patterns (last 7 days)
             daily_stats = await conn.fetch("""
                 SELECT 
-                    DATE(created_at) as date,
-                    COUNT(DISTINCT COALESCE(user_id::text, session_id)) as active_players,
-                    COUNT(*) as total_answers
-                FROM events
-                WHERE type = 'quiz_answered'
-                AND created_at >= CURRENT_DATE - INTERVAL '7 days'
-                GROUP BY DATE(created_at)
-                ORDER BY date DESC
+                    day as date,
+                    players as active_players,
+                    answers as total_answers
+                FROM analytics_daily_rollup
+                WHERE day >= CURRENT_DATE - 7
+                ORDER BY day DESC
             """)
             
             return {
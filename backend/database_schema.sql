@@ -44,8 +44,10 @@ CREATE TABLE content_variations (
 );
 
 -- Events table (everything that happens)
+-- Range partitioned by month on created_at; event_partitions.py creates the
+-- monthly partitions and archives old ones
 CREATE TABLE events (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     source VARCHAR(50) NOT NULL, -- 'user', 'system', 'ai_generator', 'alm'
     type VARCHAR(100) NOT NULL, -- 'quiz_answered', 'content_created', etc.
     user_id UUID REFERENCES users(id),
@@ -53,8 +55,18 @@ CREATE TABLE events (
     content_id UUID REFERENCES content(id),
     payload JSONB NOT NULL,
     context JSONB DEFAULT '{}', -- tenant, channel, anonymous mode, etc.
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
+    -- Hot quiz_answered fields, copied out of payload/context for analytics
+    correct BOOLEAN,
+    score INTEGER,
+    time_taken DOUBLE PRECISION,
+    category VARCHAR(100),
+    difficulty VARCHAR(20),
+    mode VARCHAR(20),
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE events_default PARTITION OF events DEFAULT;
 
 -- User progress and stats
 CREATE TABLE user_progress (
@@ -132,6 +144,9 @@ CREATE INDEX idx_content_data ON content USING GIN(data);
 CREATE INDEX idx_events_user_type ON events(user_id, type);
 CREATE INDEX idx_events_created_at ON events(created_at);
 CREATE INDEX idx_events_context ON events USING GIN(context);
+CREATE INDEX idx_events_type_created_at ON events(type, created_at);
+CREATE INDEX idx_events_content_id ON events(content_id);
+CREATE INDEX idx_events_user_category ON events(user_id, category);
 CREATE INDEX idx_user_progress_user_id ON user_progress(user_id);
 CREATE INDEX idx_sessions_expires ON sessions(expires_at);
 CREATE INDEX idx_cards_active ON cards(starts_at, expires_at);
@@ -0,0 +1,385 @@
+"""
+Economy store for JazzyPop
+Balances live in user_economy, one typed row per registered user. Energy is
+kept as (value, energy_updated_at) and regeneration is worked out on read,
+so reading a balance never writes. Spending is a single conditional UPDATE
+and rewards are in-place increments, so concurrent requests can't double
+spend or lose a reward.
+
+Anonymous players keep their balances in sessions.data->'economy' in the
+same (energy, last_energy_update) shape, updated with the same statements
+over jsonb.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+# Starting balances, also used for anything missing from a legacy blob
+DEFAULT_STATE: Dict[str, int] = {
+    "energy": 100,
+    "hearts": 5,
+    "coins": 0,
+    "sapphires": 0,
+    "emeralds": 0,
+    "rubies": 0,
+    "amethysts": 0,
+    "diamonds": 0,
+    "xp": 0,
+    "level": 1,
+    "streak": 0,
+}
+
+STATE_FIELDS = tuple(DEFAULT_STATE)
+
+# Balances a reward can add to, in parameter order ($2..)
+REWARD_FIELDS = ("energy", "hearts", "coins", "sapphires", "emeralds",
+                 "rubies", "amethysts", "diamonds", "xp")
+
+_USER_ENERGY = "economy_energy(energy, energy_updated_at, level)"
+_USER_CLOCK = "economy_energy_clock(energy, energy_updated_at, level)"
+_USER_COLUMNS = f"{_USER_ENERGY} AS energy, " + ", ".join(f for f in STATE_FIELDS if f != "energy")
+
+# Legacy / session blobs: (energy, last update, level) out of an economy jsonb
+_BLOB_ARGS = """
+    COALESCE(({e}->>'energy')::numeric::int, 100),
+    COALESCE(({e}->>'last_energy_update')::timestamp AT TIME ZONE 'UTC', NOW()),
+    COALESCE(({e}->>'level')::numeric::int, 1)
+"""
+
+
+def _blob_field(e: str, field: str) -> str:
+    return f"COALESCE(({e}->>'{field}')::numeric::bigint, {DEFAULT_STATE[field]})"
+
+
+def _valid_user(user_id: Optional[UUID]) -> bool:
+    return bool(user_id) and isinstance(user_id, UUID)
+
+
+def _session_state(economy: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    economy = economy or {}
+    return {
+        field: default if economy.get(field) is None else int(economy[field])
+        for field, default in DEFAULT_STATE.items()
+    }
+
+
+class EconomyStore:
+    """
+    Energy, hearts, currencies and level for users and anonymous sessions
+
+    Regeneration is 1 energy per minute up to 100 + 10 per level above 1, the
+    same curve the old read-and-write-back path used. The SQL functions
+    installed by initialize() are the only place it is computed.
+
+    Users get their user_economy row the first time the economy is touched,
+    seeded from the user_progress.stats->'economy' blob they already have.
+    """
+
+    async def initialize(self, conn):
+        """Create the balance table and regeneration functions; safe to run on every startup"""
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_economy (
+                user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+                energy INTEGER NOT NULL DEFAULT 100,
+                energy_updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                hearts INTEGER NOT NULL DEFAULT 5,
+                coins BIGINT NOT NULL DEFAULT 0,
+                sapphires INTEGER NOT NULL DEFAULT 0,
+                emeralds INTEGER NOT NULL DEFAULT 0,
+                rubies INTEGER NOT NULL DEFAULT 0,
+                amethysts INTEGER NOT NULL DEFAULT 0,
+                diamonds INTEGER NOT NULL DEFAULT 0,
+                xp BIGINT NOT NULL DEFAULT 0,
+                level INTEGER NOT NULL DEFAULT 1,
+                streak INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE OR REPLACE FUNCTION economy_energy_cap(lvl INTEGER)
+            RETURNS INTEGER AS $$
+                SELECT 100 + (GREATEST(lvl, 1) - 1) * 10
+            $$ LANGUAGE sql IMMUTABLE;
+
+            -- Energy right now: stored value plus a point per whole minute, up to the cap.
+            -- Never lowers a balance that is already above the cap
+            CREATE OR REPLACE FUNCTION economy_energy(energy INTEGER, updated_at TIMESTAMPTZ, lvl INTEGER)
+            RETURNS INTEGER AS $$
+                SELECT GREATEST(
+                    energy,
+                    LEAST(
+                        energy + floor(extract(epoch FROM NOW() - updated_at) / 60)::int,
+                        economy_energy_cap(lvl)
+                    )
+                )
+            $$ LANGUAGE sql STABLE;
+
+            -- The updated_at that goes with economy_energy(): advanced by the whole
+            -- minutes consumed so a partly regenerated point isn't thrown away,
+            -- or reset to now once the cap is reached
+            CREATE OR REPLACE FUNCTION economy_energy_clock(energy INTEGER, updated_at TIMESTAMPTZ, lvl INTEGER)
+            RETURNS TIMESTAMPTZ AS $$
+                SELECT CASE
+                    WHEN m < 0 OR energy + m >= economy_energy_cap(lvl) THEN NOW()
+                    ELSE updated_at + make_interval(mins => m)
+                END
+                FROM (SELECT floor(extract(epoch FROM NOW() - updated_at) / 60)::int AS m) t
+            $$ LANGUAGE sql STABLE;
+
+            -- Level for an XP total: the first level whose threshold 100 + level^2 * 50 is above it
+            CREATE OR REPLACE FUNCTION economy_level(xp BIGINT)
+            RETURNS INTEGER AS $$
+                SELECT floor(sqrt(GREATEST(xp - 100, 0) / 50.0))::int + 1
+            $$ LANGUAGE sql IMMUTABLE;
+        """)
+        logger.info("Economy store initialized")
+
+    # ========== USERS ==========
+
+    async def seed_users(self, conn, user_ids: List[UUID]) -> Tuple[int, int]:
+        """
+        Create missing rows from the users' legacy stats blobs
+        Returns (rows created, users that exist)
+        """
+        e = "p.economy"
+        row = await conn.fetchrow(f"""
+            WITH seeded AS (
+                INSERT INTO user_economy (
+                    user_id, energy, energy_updated_at, level,
+                    hearts, coins, sapphires, emeralds, rubies, amethysts, diamonds, xp, streak
+                )
+                SELECT u.id, {_BLOB_ARGS.format(e=e)},
+                       {", ".join(_blob_field(e, f) for f in
+                                  ("hearts", "coins", "sapphires", "emeralds", "rubies",
+                                   "amethysts", "diamonds", "xp", "streak"))}
+                FROM users u
+                LEFT JOIN LATERAL (
+                    -- Not the per-answer 'quiz' row, which has no economy
+                    SELECT stats->'economy' AS economy
+                    FROM user_progress
+                    WHERE user_id = u.id
+                    AND stats ? 'economy'
+                    ORDER BY updated_at DESC NULLS LAST
+                    LIMIT 1
+                ) p ON TRUE
+                WHERE u.id = ANY($1::uuid[])
+                -- Skip the blob lookup for users who already have a row
+                AND NOT EXISTS (SELECT 1 FROM user_economy ue WHERE ue.user_id = u.id)
+                ON CONFLICT (user_id) DO NOTHING
+                RETURNING 1
+            )
+            -- A concurrent first request may have inserted a row instead
+            SELECT (SELECT COUNT(*) FROM seeded) AS seeded,
+                   (SELECT COUNT(*) FROM users WHERE id = ANY($1::uuid[])) AS users
+        """, list(user_ids))
+        return row["seeded"], row["users"]
+
+    async def _seed_user(self, conn, user_id: UUID) -> bool:
+        """Make sure the user's row exists; False when there is no such user"""
+        _, users = await self.seed_users(conn, [user_id])
+        return users > 0
+
+    async def _user_state(self, conn, user_id: UUID) -> Optional[Dict[str, int]]:
+        query = f"SELECT {_USER_COLUMNS} FROM user_economy WHERE user_id = $1"
+        row = await conn.fetchrow(query, user_id)
+        if row is None:
+            if not await self._seed_user(conn, user_id):
+                return None
+            row = await conn.fetchrow(query, user_id)
+        return dict(row)
+
+    # ========== SESSIONS ==========
+
+    async def _ensure_session(self, conn, session_id: str):
+        await conn.execute("""
+            INSERT INTO sessions (id, data, created_at)
+            VALUES ($1, '{}'::jsonb, NOW())
+            ON CONFLICT (id) DO NOTHING
+        """, session_id)
+
+    # ========== PUBLIC API ==========
+
+    async def get_state(self, conn, user_id: Optional[UUID], session_id: Optional[str]) -> Dict[str, int]:
+        """Current balances with regeneration applied; a plain read"""
+        if _valid_user(user_id):
+            state = await self._user_state(conn, user_id)
+            if state is not None:
+                return state
+
+        if session_id:
+            economy = await conn.fetchval(f"""
+                SELECT COALESCE(data->'economy', '{{}}'::jsonb)
+                       || jsonb_build_object('energy', economy_energy({_BLOB_ARGS.format(e="data->'economy'")}))
+                FROM sessions
+                WHERE id = $1
+            """, session_id)
+            if economy is not None:
+                return _session_state(economy)
+
+        return dict(DEFAULT_STATE)
+
+    async def spend_energy(self, conn, user_id: Optional[UUID], session_id: Optional[str],
+                           amount: int) -> Tuple[bool, Dict[str, int]]:
+        """
+        Take `amount` energy if the player has it
+        Returns (spent, balances after the attempt)
+        """
+        if _valid_user(user_id):
+            query = f"""
+                UPDATE user_economy
+                SET energy = {_USER_ENERGY} - $2,
+                    energy_updated_at = {_USER_CLOCK},
+                    updated_at = NOW()
+                WHERE user_id = $1
+                AND {_USER_ENERGY} >= $2
+                RETURNING {", ".join(STATE_FIELDS)}
+            """
+            row = await conn.fetchrow(query, user_id, amount)
+            if row is not None:
+                return True, dict(row)
+
+            state = await self._user_state(conn, user_id)
+            if state is not None:
+                if state["energy"] < amount:
+                    return False, state
+                # Row was only just seeded
+                row = await conn.fetchrow(query, user_id, amount)
+                if row is not None:
+                    return True, dict(row)
+                return False, await self._user_state(conn, user_id)
+
+        if session_id:
+            args = _BLOB_ARGS.format(e="sessions.data->'economy'")
+            query = f"""
+                UPDATE sessions
+                SET data = COALESCE(data, '{{}}'::jsonb) || jsonb_build_object(
+                    'economy', COALESCE(data->'economy', '{{}}'::jsonb) || jsonb_build_object(
+                        'energy', economy_energy({args}) - $2,
+                        'last_energy_update', economy_energy_clock({args}) AT TIME ZONE 'UTC'
+                    )
+                )
+                WHERE id = $1
+                AND economy_energy({args}) >= $2
+                RETURNING data->'economy'
+            """
+            economy = await conn.fetchval(query, session_id, amount)
+            if economy is None:
+                state = await self.get_state(conn, None, session_id)
+                if state["energy"] < amount:
+                    return False, state
+                # First spend of a session we haven't stored yet
+                await self._ensure_session(conn, session_id)
+                economy = await conn.fetchval(query, session_id, amount)
+                if economy is None:
+                    return False, await self.get_state(conn, None, session_id)
+            return True, _session_state(economy)
+
+        # Nowhere to keep it; behave like a fresh player
+        state = dict(DEFAULT_STATE)
+        if state["energy"] < amount:
+            return False, state
+        state["energy"] -= amount
+        return True, state
+
+    async def grant(self, conn, user_id: Optional[UUID], session_id: Optional[str],
+                    rewards: Dict[str, int]) -> Tuple[Dict[str, int], int]:
+        """
+        Add rewards to the player's balances; keys other than REWARD_FIELDS are ignored
+        The level follows the new XP total and never goes down.
+        Returns (balances after, level before).
+        """
+        amounts = [int(rewards.get(field, 0) or 0) for field in REWARD_FIELDS]
+        xp = f"${REWARD_FIELDS.index('xp') + 2}"
+
+        if _valid_user(user_id):
+            increments = ",\n".join(
+                f"{field} = e.{field} + ${i + 2}"
+                for i, field in enumerate(REWARD_FIELDS) if field not in ("energy", "xp")
+            )
+            query = f"""
+                UPDATE user_economy e
+                SET energy = economy_energy(e.energy, e.energy_updated_at, e.level) + $2,
+                    energy_updated_at = economy_energy_clock(e.energy, e.energy_updated_at, e.level),
+                    {increments},
+                    xp = e.xp + {xp},
+                    level = GREATEST(e.level, economy_level(e.xp + {xp})),
+                    updated_at = NOW()
+                FROM (SELECT level FROM user_economy WHERE user_id = $1 FOR UPDATE) previous
+                WHERE e.user_id = $1
+                RETURNING {", ".join(f"e.{f}" for f in STATE_FIELDS)}, previous.level AS previous_level
+            """
+            row = await conn.fetchrow(query, user_id, *amounts)
+            if row is None and await self._seed_user(conn, user_id):
+                row = await conn.fetchrow(query, user_id, *amounts)
+            if row is not None:
+                state = dict(row)
+                return state, state.pop("previous_level")
+
+        if session_id:
+            e = "sessions.data->'economy'"
+            args = _BLOB_ARGS.format(e=e)
+            pairs = [
+                f"'energy', economy_energy({args}) + $2",
+                f"'last_energy_update', economy_energy_clock({args}) AT TIME ZONE 'UTC'",
+            ]
+            pairs += [
+                f"'{field}', {_blob_field(e, field)} + ${i + 2}"
+                for i, field in enumerate(REWARD_FIELDS) if field != "energy"
+            ]
+            pairs.append(f"'level', GREATEST({_blob_field(e, 'level')}, economy_level({_blob_field(e, 'xp')} + {xp}))")
+            query = f"""
+                UPDATE sessions
+                SET data = COALESCE(sessions.data, '{{}}'::jsonb) || jsonb_build_object(
+                    'economy', COALESCE({e}, '{{}}'::jsonb) || jsonb_build_object({", ".join(pairs)})
+                )
+                FROM (SELECT data->'economy' AS economy FROM sessions WHERE id = $1 FOR UPDATE) previous
+                WHERE sessions.id = $1
+                RETURNING sessions.data->'economy' AS economy, {_blob_field("previous.economy", "level")} AS previous_level
+            """
+            row = await conn.fetchrow(query, session_id, *amounts)
+            if row is None:
+                await self._ensure_session(conn, session_id)
+                row = await conn.fetchrow(query, session_id, *amounts)
+            return _session_state(row["economy"]), row["previous_level"]
+
+        state = dict(DEFAULT_STATE)
+        for field, amount in zip(REWARD_FIELDS, amounts):
+            state[field] += amount
+        return state, DEFAULT_STATE["level"]
+
+    async def set_state(self, conn, user_id: Optional[UUID], session_id: Optional[str],
+                        state: Dict[str, Any]):
+        """
+        Overwrite balances wholesale, for admin tools and account merges
+        Gameplay should use spend_energy() / grant(), which can't lose concurrent updates.
+        """
+        values = [int(state.get(field, default)) for field, default in DEFAULT_STATE.items()]
+
+        if _valid_user(user_id):
+            stored = await conn.fetchval(f"""
+                INSERT INTO user_economy (user_id, {", ".join(STATE_FIELDS)}, energy_updated_at, updated_at)
+                SELECT id, {", ".join(f"${i + 2}" for i in range(len(STATE_FIELDS)))}, NOW(), NOW()
+                FROM users
+                WHERE id = $1
+                ON CONFLICT (user_id) DO UPDATE
+                SET {", ".join(f"{f} = EXCLUDED.{f}" for f in STATE_FIELDS)},
+                    energy_updated_at = NOW(),
+                    updated_at = NOW()
+                RETURNING TRUE
+            """, user_id, *values)
+            if stored:
+                return
+            logger.warning(f"User ID {user_id} not found in database, falling back to session storage")
+
+        if session_id:
+            economy = dict(zip(STATE_FIELDS, values))
+            await conn.execute("""
+                INSERT INTO sessions (id, data, created_at)
+                VALUES ($1, jsonb_build_object('economy', $2::jsonb || jsonb_build_object(
+                    'last_energy_update', NOW() AT TIME ZONE 'UTC')), NOW())
+                ON CONFLICT (id) DO UPDATE
+                SET data = COALESCE(sessions.data, '{}'::jsonb) || EXCLUDED.data
+            """, session_id, economy)
+        else:
+            logger.warning("No valid storage method available - neither valid user_id nor session_id provided")
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Monthly range partitions for the events table
+Pre-creates upcoming months, archives old months to gzip files, and moves an
+existing plain events table onto partitions without taking the API down
+
+    python event_partitions.py migrate            # copy into a partitioned table and swap
+    python event_partitions.py maintain           # create the next months' partitions
+    python event_partitions.py archive --keep-months 12 --archive-dir /var/backups/events
+
+The API creates the next months on startup, but a long-running deployment
+needs `maintain` on a schedule: jazzypop-event-partitions.timer runs it
+daily. Archiving is a retention decision, so schedule it yourself, e.g.
+
+    0 4 1 * * cd /home/ubuntu/jazzypop-backend && venv/bin/python event_partitions.py archive --keep-months 12 --archive-dir /var/backups/events
+"""
+
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import sys
+from datetime import date
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PARENT = "events"
+# Built next to the live table during migrate, renamed to events on swap
+STAGING = "events_partitioned"
+LEGACY = "events_legacy"
+PROGRESS_NAME = "events_partition_copy"
+
+
+def _month_start(day: date, offset: int = 0) -> date:
+    month = day.month - 1 + offset
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def _partition_name(parent: str, month: date) -> str:
+    return f"{parent}_{month:%Y_%m}"
+
+
+async def is_partitioned(conn, table: str = PARENT) -> bool:
+    return await conn.fetchval("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = $1 AND pg_table_is_visible(c.oid)
+        )
+    """, table)
+
+
+async def list_partitions(conn, parent: str = PARENT) -> List[Tuple[str, Optional[date], Optional[date]]]:
+    """(name, from, to) for each monthly partition; the default partition has no bounds"""
+    rows = await conn.fetch("""
+        SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = $1 AND pg_table_is_visible(p.oid)
+        ORDER BY c.relname
+    """, parent)
+
+    partitions = []
+    for row in rows:
+        bounds = None
+        if row["name"].startswith(f"{parent}_") and row["name"] != f"{parent}_default":
+            try:
+                year, month = row["name"][len(parent) + 1:].split("_")
+                start = date(int(year), int(month), 1)
+                bounds = (start, _month_start(start, 1))
+            except ValueError:
+                pass
+        partitions.append((row["name"], *(bounds or (None, None))))
+    return partitions
+
+
+async def _create_partition(conn, parent: str, month: date):
+    """
+    Create one month's partition. Rows already sitting in the default
+    partition for that month block a plain CREATE ... PARTITION OF, so those
+    are moved into a standalone table which is then attached
+    """
+    name = _partition_name(parent, month)
+    start, end = month.isoformat(), _month_start(month, 1).isoformat()
+    default = f"{parent}_default"
+
+    async with conn.transaction():
+        stranded = (
+            await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", default)
+            and await conn.fetchval(f"""
+                SELECT EXISTS (
+                    SELECT 1 FROM {default}
+                    WHERE created_at >= '{start}' AND created_at < '{end}'
+                )
+            """)
+        )
+
+        if not stranded:
+            await conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent}
+                FOR VALUES FROM ('{start}') TO ('{end}')
+            """)
+            return
+
+        await conn.execute(f"""
+            CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+            WITH moved AS (
+                DELETE FROM {default}
+                WHERE created_at >= '{start}' AND created_at < '{end}'
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved;
+            ALTER TABLE {parent} ATTACH PARTITION {name}
+            FOR VALUES FROM ('{start}') TO ('{end}');
+        """)
+        logger.info(f"Moved {month:%Y-%m} rows out of {default} into {name}")
+
+
+async def ensure_partitions(conn, months_ahead: int = 3, parent: str = PARENT,
+                            since: Optional[date] = None):
+    """
+    Create monthly partitions from `since` (default: this month) through
+    months_ahead months from now. Safe to run repeatedly
+    """
+    today = date.today()
+    month = _month_start(since or today)
+    last = _month_start(today, months_ahead)
+
+    created = 0
+    while month <= last:
+        name = _partition_name(parent, month)
+        exists = await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", name)
+        if not exists:
+            await _create_partition(conn, parent, month)
+            created += 1
+        month = _month_start(month, 1)
+
+    if created:
+        logger.info(f"Created {created} {parent} partitions through {last:%Y-%m}")
+
+
+async def archive_partitions(conn, keep_months: int, archive_dir: Optional[str] = None,
+                             parent: str = PARENT) -> List[str]:
+    """
+    Detach monthly partitions that ended more than keep_months ago
+
+    With archive_dir each detached month is written to <name>.csv.gz and then
+    dropped; without it the detached table is left in place to deal with by hand.
+    """
+    cutoff = _month_start(date.today(), -keep_months)
+    archived = []
+
+    for name, start, end in await list_partitions(conn, parent):
+        if end is None or end > cutoff:
+            continue
+
+        await conn.execute(f"ALTER TABLE {parent} DETACH PARTITION {name}")
+        logger.info(f"Detached {name}")
+
+        if archive_dir:
+            os.makedirs(archive_dir, exist_ok=True)
+            path = os.path.join(archive_dir, f"{name}.csv.gz")
+            with gzip.open(path, "wb") as archive:
+                async def write(chunk):
+                    archive.write(chunk)
+                await conn.copy_from_table(name, output=write, format="csv", header=True)
+            await conn.execute(f"DROP TABLE {name}")
+            logger.info(f"Archived {name} to {path}")
+
+        archived.append(name)
+
+    return archived
+
+
+# ========== ONLINE MIGRATION ==========
+
+async def _create_staging(conn):
+    """Partitioned copy of events plus a trigger that mirrors new writes into it"""
+    await conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STAGING} (
+            LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS
+        ) PARTITION BY RANGE (created_at);
+
+        DO $do$
+        BEGIN
+            -- The partition key has to be part of the primary key
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint WHERE conname = '{STAGING}_pkey'
+            ) THEN
+                ALTER TABLE {STAGING} ADD CONSTRAINT {STAGING}_pkey PRIMARY KEY (id, created_at);
+            END IF;
+            -- LIKE doesn't copy foreign keys; keep the ones database_schema.sql declares
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint WHERE conname = '{STAGING}_user_id_fkey'
+            ) THEN
+                ALTER TABLE {STAGING} ADD CONSTRAINT {STAGING}_user_id_fkey
+                    FOREIGN KEY (user_id) REFERENCES users(id);
+            END IF;
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint WHERE conname = '{STAGING}_content_id_fkey'
+            ) THEN
+                ALTER TABLE {STAGING} ADD CONSTRAINT {STAGING}_content_id_fkey
+                    FOREIGN KEY (content_id) REFERENCES content(id);
+            END IF;
+        END
+        $do$;
+
+        CREATE TABLE IF NOT EXISTS {STAGING}_default PARTITION OF {STAGING} DEFAULT;
+
+        CREATE INDEX IF NOT EXISTS idx_{STAGING}_user_type ON {STAGING}(user_id, type);
+        CREATE INDEX IF NOT EXISTS idx_{STAGING}_created_at ON {STAGING}(created_at);
+        CREATE INDEX IF NOT EXISTS idx_{STAGING}_context ON {STAGING} USING GIN(context);
+        CREATE INDEX IF NOT EXISTS idx_{STAGING}_type_created_at ON {STAGING}(type, created_at);
+        CREATE INDEX IF NOT EXISTS idx_{STAGING}_content_id ON {STAGING}(content_id);
+        CREATE INDEX IF NOT EXISTS idx_{STAGING}_user_category ON {STAGING}(user_id, category);
+
+        CREATE OR REPLACE FUNCTION mirror_events_to_partitioned()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM {STAGING} WHERE id = OLD.id AND created_at = OLD.created_at;
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'UPDATE' THEN
+                DELETE FROM {STAGING} WHERE id = OLD.id AND created_at = OLD.created_at;
+            END IF;
+            INSERT INTO {STAGING} SELECT NEW.* ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DO $do$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'events_mirror_partitioned') THEN
+                CREATE TRIGGER events_mirror_partitioned
+                    AFTER INSERT OR UPDATE OR DELETE ON {PARENT}
+                    FOR EACH ROW EXECUTE FUNCTION mirror_events_to_partitioned();
+            END IF;
+        END
+        $do$;
+    """)
+
+
+async def _copy_chunk(conn, chunk_size: int) -> int:
+    """Copy the next (created_at, id) chunk of events into the staging table"""
+    async with conn.transaction():
+        last = await conn.fetchrow(f"""
+            WITH chunk AS (
+                SELECT *
+                FROM {PARENT}
+                WHERE (created_at, id) > (
+                    COALESCE((SELECT last_created_at FROM backfill_progress WHERE name = $1),
+                             '-infinity'::timestamptz),
+                    COALESCE((SELECT last_id FROM backfill_progress WHERE name = $1),
+                             '00000000-0000-0000-0000-000000000000'::uuid)
+                )
+                ORDER BY created_at, id
+                LIMIT $2
+            ),
+            copied AS (
+                INSERT INTO {STAGING} SELECT * FROM chunk
+                ON CONFLICT DO NOTHING
+                RETURNING 1
+            )
+            SELECT created_at, id, (SELECT COUNT(*) FROM chunk) AS rows
+            FROM chunk
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1
+        """, PROGRESS_NAME, chunk_size)
+
+        if not last:
+            return 0
+
+        await conn.execute("""
+            INSERT INTO backfill_progress (name, last_created_at, last_id, rows_done, updated_at)
+            VALUES ($1, $2, $3, $4, NOW())
+            ON CONFLICT (name) DO UPDATE
+            SET last_created_at = EXCLUDED.last_created_at,
+                last_id = EXCLUDED.last_id,
+                rows_done = backfill_progress.rows_done + EXCLUDED.rows_done,
+                updated_at = NOW()
+        """, PROGRESS_NAME, last["created_at"], last["id"], last["rows"])
+        return last["rows"]
+
+
+async def migrate_to_partitions(conn, chunk_size: int = 10000, pause: float = 0.1,
+                                months_ahead: int = 3):
+    """
+    Move a plain events table onto monthly partitions
+
+    1. Create events_partitioned with a partition per month of existing data,
+       the same user/content foreign keys as a fresh install, and a trigger
+       on events that mirrors every new write into it
+    2. Copy existing rows across in short (created_at, id) chunks, resumable
+       through backfill_progress
+    3. Swap names in one short ACCESS EXCLUSIVE transaction; the old table is
+       kept as events_legacy until you drop it
+    """
+    if await is_partitioned(conn):
+        logger.info("events is already partitioned")
+        return
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_progress (
+            name VARCHAR(50) PRIMARY KEY,
+            last_created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            last_id UUID NOT NULL,
+            rows_done BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    await _create_staging(conn)
+    oldest = await conn.fetchval(f"SELECT MIN(created_at) FROM {PARENT}")
+    await ensure_partitions(conn, months_ahead, parent=STAGING,
+                            since=oldest.date() if oldest else None)
+
+    total = 0
+    while True:
+        copied = await _copy_chunk(conn, chunk_size)
+        if not copied:
+            break
+        total += copied
+        logger.info(f"Copied {total} events")
+        if pause:
+            await asyncio.sleep(pause)
+
+    async with conn.transaction():
+        await conn.execute(f"LOCK TABLE {PARENT} IN ACCESS EXCLUSIVE MODE")
+        # Rows from transactions that were still open while the copy ran
+        await conn.execute(f"""
+            INSERT INTO {STAGING}
+            SELECT * FROM {PARENT}
+            WHERE created_at >= COALESCE(
+                (SELECT last_created_at FROM backfill_progress WHERE name = $1),
+                '-infinity'::timestamptz
+            ) - INTERVAL '1 hour'
+            ON CONFLICT DO NOTHING
+        """, PROGRESS_NAME)
+        for name, start, _ in await list_partitions(conn, STAGING):
+            if start is not None:
+                await conn.execute(f"ALTER TABLE {name} RENAME TO {_partition_name(PARENT, start)}")
+        await conn.execute(f"""
+            DROP TRIGGER events_mirror_partitioned ON {PARENT};
+            DROP FUNCTION mirror_events_to_partitioned();
+            ALTER TABLE {PARENT} RENAME TO {LEGACY};
+            ALTER TABLE {STAGING} RENAME TO {PARENT};
+            ALTER TABLE {STAGING}_default RENAME TO {PARENT}_default;
+        """)
+        await conn.execute("DELETE FROM backfill_progress WHERE name = $1", PROGRESS_NAME)
+
+    logger.info(f"events is now partitioned by month; old table kept as {LEGACY}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Manage monthly events partitions")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    migrate = sub.add_parser("migrate", help="Move events onto monthly partitions online")
+    migrate.add_argument("--chunk-size", type=int, default=10000)
+    migrate.add_argument("--pause", type=float, default=0.1)
+
+    maintain = sub.add_parser("maintain", help="Create upcoming partitions")
+    maintain.add_argument("--months-ahead", type=int, default=3)
+
+    archive = sub.add_parser("archive", help="Detach (and optionally archive) old partitions")
+    archive.add_argument("--keep-months", type=int, required=True)
+    archive.add_argument("--archive-dir", default=None,
+                         help="Write detached months here as .csv.gz and drop them")
+
+    args = parser.parse_args()
+
+    from database import db
+    await db.connect()
+    try:
+        async with db.pool.acquire() as conn:
+            if args.command == "migrate":
+                await migrate_to_partitions(conn, args.chunk_size, args.pause)
+            elif args.command == "maintain":
+                await ensure_partitions(conn, args.months_ahead)
+            else:
+                archived = await archive_partitions(conn, args.keep_months, args.archive_dir)
+                logger.info(f"Archived {len(archived)} partitions")
+    finally:
+        await db.disconnect()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
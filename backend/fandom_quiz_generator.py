@@ -9,8 +9,11 @@ import json
 import logging
 from datetime import datetime
 from uuid import uuid4
-from typing import Dict, Any, List
-import aiohttp
+from typing import Dict, Any, List, Optional
+from provider_client import close_clients, get_client
+from llm_batch import batch_max_tokens, parse_json_items
+from content_safety import safety_filter
+from question_index import question_index
 from dotenv import load_dotenv
 from database import db
 import random
@@ -21,6 +24,9 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class FandomQuizGenerator:
+    # What the shared safety filter screens on each generated question
+    SCREENED_FIELDS = ('question', 'correct_answer', 'options', 'fun_fact')
+    
     def __init__(self):
         self.api_key = os.getenv('ANTHROPIC_API_KEY')
         self.api_url = "https://api.anthropic.com/v1/messages"
@@ -101,6 +107,11 @@ class FandomQuizGenerator:
         
         self.chaos_reactions = ['🚀', '🤖', '⚔️', '🐉', '👾', '🛸', '🎮', '📚', '🌌', '✨']
         
+        # Ask for the whole set in one call and only regenerate the questions
+        # that come back malformed
+        self.batch_generation = os.getenv('QUIZ_GEN_BATCH', 'true').lower() == 'true'
+        self.max_batch_rounds = 3
+        
         # Category tiers for economics (all high-tier specialist content)
         self.category_tiers = {cat: 4 for cat in self.categories}
         
@@ -121,19 +132,14 @@ class FandomQuizGenerator:
             ]
         }
 
-    async def generate_quiz_question(self, category: str, question_num: int) -> Dict[str, Any]:
-        """Generate a single quiz question with fandom focus"""
-        
+    def _question_guidelines(self) -> str:
+        """Fandom style, variety, chaos and answer rules shared by single and batched prompts"""
         # Select random chaos elements for variety
         chaos_character = random.choice(self.chaos_characters)
         chaos_scenario = random.choice(self.chaos_scenarios)
-        chaos_theme = random.choice(self.chaos_themes)
         chaos_twist = random.choice(self.chaos_twists)
         
-        # Build the prompt with fandom-specific guidance
-        prompt = f"""You are the JazzyPop Fandom Quiz Master! Create an incredibly nerdy trivia question about {category}.
-        This is question {question_num} of 10 in a quiz set.
-
+        return f"""
         FANDOM STYLE GUIDE:
         - Deep dive into geek culture, sci-fi, fantasy, anime, and gaming
         - Reference specific series including classics AND trending 2024-2025:
@@ -170,6 +176,15 @@ class FandomQuizGenerator:
         - One option can be a funny crossover reference
         - Use terminology fans would recognize
         - Make wrong answers educational about the universe
+        """
+    
+    async def generate_quiz_question(self, category: str, question_num: int) -> Dict[str, Any]:
+        """Generate a single quiz question with fandom focus"""
+        
+        # Build the prompt with fandom-specific guidance
+        prompt = f"""You are the JazzyPop Fandom Quiz Master! Create an incredibly nerdy trivia question about {category}.
+        This is question {question_num} of 10 in a quiz set.
+        {self._question_guidelines()}
         
         CRITICAL JSON FORMATTING REQUIREMENTS:
         You MUST return ONLY valid JSON with EXACTLY these 6 fields:
@@ -225,41 +240,182 @@ class FandomQuizGenerator:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        content = data['content'][0]['text']
+            async with get_client('anthropic').post(self.api_url, headers=headers, json=payload) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    content = data['content'][0]['text']
+                    
+                    # Parse JSON from response
+                    try:
+                        result = json.loads(content)
                         
-                        # Parse JSON from response
-                        try:
-                            result = json.loads(content)
-                            
-                            # Extract feedback_captions if present
-                            feedback_captions = result.pop('feedback_captions', None)
-                            
-                            # Add metadata
-                            result['category'] = category
-                            result['tier'] = self.category_tiers.get(category, 4)
-                            result['chaos_level'] = random.choice(['mild', 'medium', 'extreme'])
-                            
-                            # Store feedback_captions separately to add to quiz set later
-                            if feedback_captions:
-                                result['_feedback_captions'] = feedback_captions
-                            
-                            return result
-                            
-                        except json.JSONDecodeError:
-                            logger.error(f"Failed to parse JSON: {content}")
+                        match = safety_filter.check_item(result, self.SCREENED_FIELDS)
+                        if match:
+                            logger.warning(f"Content filter rejected question: {match!r}")
                             return self.create_fallback_question(category, question_num)
-                    else:
-                        logger.error(f"API error: {response.status}")
+                        
+                        # Extract feedback_captions if present
+                        feedback_captions = result.pop('feedback_captions', None)
+                        
+                        # Add metadata
+                        result['category'] = category
+                        result['tier'] = self.category_tiers.get(category, 4)
+                        result['chaos_level'] = random.choice(['mild', 'medium', 'extreme'])
+                        
+                        # Store feedback_captions separately to add to quiz set later
+                        if feedback_captions:
+                            result['_feedback_captions'] = feedback_captions
+                        
+                        return result
+                        
+                    except json.JSONDecodeError:
+                        logger.error(f"Failed to parse JSON: {content}")
                         return self.create_fallback_question(category, question_num)
+                else:
+                    logger.error(f"API error: {response.status}")
+                    return self.create_fallback_question(category, question_num)
                         
         except Exception as e:
             logger.error(f"Error generating question: {e}")
             return self.create_fallback_question(category, question_num)
 
+    def _is_complete_question(self, item: Dict[str, Any]) -> bool:
+        """A batch item must have the question, 4 options containing the answer and a valid difficulty"""
+        options = item.get('options')
+        return (
+            isinstance(item.get('question'), str) and bool(item['question'].strip())
+            and isinstance(options, list) and len(options) == 4
+            and all(isinstance(option, str) for option in options)
+            and item.get('correct_answer') in options
+            and item.get('difficulty') in ('easy', 'medium', 'hard')
+        )
+    
+    async def generate_question_batch(self, category: str, count: int,
+                                      existing: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Generate `count` questions in one API call
+        Returns only the complete items - the caller asks again for the rest
+        """
+        avoid = ""
+        if existing:
+            avoid = "\n        ALREADY IN THIS SET (do not repeat or closely paraphrase):\n" + "\n".join(
+                f"        - {text}" for text in existing
+            )
+        
+        prompt = f"""You are the JazzyPop Fandom Quiz Master! Create {count} incredibly nerdy trivia questions about {category}.
+        Each question should cover a different piece of lore - no two questions about the same thing.
+        {self._question_guidelines()}
+        {avoid}
+        
+        CRITICAL JSON FORMATTING REQUIREMENTS:
+        Return ONLY a JSON array of exactly {count} objects. Each object has these 5 fields:
+        1. "question" - string, the trivia question
+        2. "correct_answer" - string, MUST match one option exactly
+        3. "options" - array of EXACTLY 4 strings
+        4. "difficulty" - string, MUST be "easy" OR "medium" OR "hard"
+        5. "fun_fact" - string, a fact about the answer
+        The FIRST object also has "feedback_captions" - an object with EXACTLY 5
+        properties: "perfect" (all correct), "great" (7-9), "good" (4-6),
+        "okay" (1-3), "oops" (0 correct)
+        
+        JSON FORMAT (NO OTHER TEXT):
+        [
+            {{
+                "question": "Your question here",
+                "correct_answer": "The right answer",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "difficulty": "medium",
+                "fun_fact": "Interesting fact here",
+                "feedback_captions": {{
+                    "perfect": "Legendary otaku status achieved!",
+                    "great": "Your power level is over 9000!",
+                    "good": "Not bad, young padawan!",
+                    "okay": "Time to rewatch some classics!",
+                    "oops": "Did you even read the manga?"
+                }}
+            }},
+            {{
+                "question": "Your next question here",
+                "correct_answer": "The right answer",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "difficulty": "hard",
+                "fun_fact": "Interesting fact here"
+            }}
+        ]
+        
+        VALIDATION CHECKS:
+        - correct_answer MUST be one of the 4 options
+        - options array MUST have exactly 4 items
+        - difficulty MUST be "easy", "medium", or "hard"
+        - Return ONLY the JSON array, no other text"""
+        
+        headers = {
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json"
+        }
+        
+        payload = {
+            "model": "claude-3-haiku-20240307",
+            "max_tokens": batch_max_tokens(count, per_item=250),
+            "temperature": 0.9,
+            "messages": [{
+                "role": "user",
+                "content": prompt
+            }]
+        }
+        
+        try:
+            async with get_client('anthropic').post(self.api_url, headers=headers, json=payload) as response:
+                if response.status != 200:
+                    logger.error(f"API error: {response.status}")
+                    return []
+                data = await response.json()
+        except Exception as e:
+            logger.error(f"Error generating question batch: {e}")
+            return []
+        
+        questions = []
+        items = parse_json_items(data['content'][0]['text'])
+        for item in items:
+            feedback_captions = item.pop('feedback_captions', None)
+            if not self._is_complete_question(item):
+                continue
+            match = safety_filter.check_item(item, self.SCREENED_FIELDS)
+            if match:
+                logger.warning(f"Content filter rejected question: {match!r}")
+                continue
+            
+            # Add metadata
+            item['category'] = category
+            item['tier'] = self.category_tiers.get(category, 4)
+            item['chaos_level'] = random.choice(['mild', 'medium', 'extreme'])
+            if isinstance(feedback_captions, dict):
+                item['_feedback_captions'] = feedback_captions
+            questions.append(item)
+        
+        if len(questions) < count:
+            logger.warning(f"Batch returned {len(questions)}/{count} usable questions ({len(items)} parsed)")
+        return questions[:count]
+    
+    async def _generate_questions_batched(self, category: str, count: int = 10) -> List[Dict[str, Any]]:
+        """Fill a set with batched calls, re-asking only for the missing questions"""
+        questions: List[Dict[str, Any]] = []
+        for _ in range(self.max_batch_rounds):
+            missing = count - len(questions)
+            if missing <= 0:
+                break
+            batch = await self.generate_question_batch(
+                category, missing, existing=[q['question'] for q in questions]
+            )
+            questions += question_index.filter_new(batch, accepted=questions)
+        
+        # Same fallback the single-question path uses when the API lets us down
+        for i in range(len(questions), count):
+            questions.append(dict(self.create_fallback_question(category, i + 1)))
+        
+        return questions
+    
     def create_fallback_question(self, category: str, question_num: int) -> Dict[str, Any]:
         """Create a fallback question if API fails"""
         fallback_questions = {
@@ -336,18 +492,17 @@ class FandomQuizGenerator:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data['content'][0]['text'].strip()
-                    else:
-                        return f"Epic {category.replace('_', ' ').title()} Challenge"
+            async with get_client('anthropic').post(self.api_url, headers=headers, json=payload) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data['content'][0]['text'].strip()
+                else:
+                    return f"Epic {category.replace('_', ' ').title()} Challenge"
         except Exception as e:
             logger.error(f"Error generating title: {e}")
             return f"Ultimate {category.replace('_', ' ').title()} Quiz"
 
-    async def apply_chaos_mode(self, original_question: str, chaos_character: str, 
+    async def apply_chaos_mode(self, original_question: str, category: str, chaos_character: str,
                              chaos_theme: str, chaos_scenario: str, chaos_twist: str) -> str:
         """Apply chaos mode with fandom-specific twists"""
         prompt = f"""Take this fandom trivia question and transform it into MAXIMUM GEEK CHAOS:
@@ -385,13 +540,12 @@ class FandomQuizGenerator:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data['content'][0]['text'].strip()
-                    else:
-                        return original_question
+            async with get_client('anthropic').post(self.api_url, headers=headers, json=payload) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data['content'][0]['text'].strip()
+                else:
+                    return original_question
         except Exception as e:
             logger.error(f"Error applying chaos: {e}")
             return original_question
@@ -404,18 +558,22 @@ class FandomQuizGenerator:
         title = await self.generate_quiz_title(category)
         
         # Generate 10 questions
-        questions = []
-        feedback_captions = None
+        if self.batch_generation:
+            questions = await self._generate_questions_batched(category)
+        else:
+            questions = []
+            for i in range(10):
+                questions.append(await self.generate_quiz_question(category, i + 1))
+                
+                # Add delay to avoid rate limiting
+                await asyncio.sleep(1)
         
-        for i in range(10):
-            question = await self.generate_quiz_question(category, i + 1)
-            
-            # Extract feedback_captions from first question
-            if i == 0 and '_feedback_captions' in question:
-                feedback_captions = question.pop('_feedback_captions')
-            elif '_feedback_captions' in question:
-                # Remove from other questions to keep consistent
-                question.pop('_feedback_captions', None)
+        feedback_captions = None
+        for question in questions:
+            # Keep the first set of feedback_captions, drop the rest
+            captions = question.pop('_feedback_captions', None)
+            if captions and not feedback_captions:
+                feedback_captions = captions
             
             # Apply chaos mode to some questions (30% chance)
             if random.random() < 0.3:
@@ -433,11 +591,6 @@ class FandomQuizGenerator:
                     chaos_twist
                 )
                 question['chaos_applied'] = True
-            
-            questions.append(question)
-            
-            # Add delay to avoid rate limiting
-            await asyncio.sleep(1)
         
         # Calculate economics based on tier
         tier = self.category_tiers.get(category, 4)
@@ -569,9 +722,10 @@ class FandomQuizGenerator:
         """Save quiz set to database"""
         try:
             async with db.pool.acquire() as conn:
-                await conn.execute("""
+                content_id = await conn.fetchval("""
                     INSERT INTO content (type, data, metadata, tags)
                     VALUES ($1, $2, $3, $4)
+                    RETURNING id
                 """, 
                 'quiz_set',
                 json.dumps(quiz_set),
@@ -579,6 +733,7 @@ class FandomQuizGenerator:
                 quiz_set.get('tags', [])
                 )
                 
+            question_index.add_set(content_id, quiz_set['questions'])
             logger.info(f"Successfully saved fandom quiz set: {quiz_set['title']}")
             return True
             
@@ -596,6 +751,7 @@ class FandomQuizGenerator:
                 for category in self.categories:
                     # Check if we need more content for this category
                     async with db.pool.acquire() as conn:
+                        await question_index.refresh(conn)
                         count = await conn.fetchval("""
                             SELECT COUNT(*) FROM content 
                             WHERE type = 'quiz_set' 
@@ -628,6 +784,8 @@ class FandomQuizGenerator:
 async def main():
     """Main entry point"""
     await db.connect()
+    async with db.pool.acquire() as conn:
+        await question_index.refresh(conn, full=True)
     
     generator = FandomQuizGenerator()
     
@@ -642,6 +800,7 @@ async def main():
         # Run continuous generation
         await generator.run_generator()
     
+    await close_clients()
     await db.disconnect()
 
 if __name__ == "__main__":
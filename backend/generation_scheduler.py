@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+"""
+Inventory-aware content generation scheduler for JazzyPop
+Replaces the per-generator fixed-interval loops: one scheduler measures how
+much unseen content is left per (type, category, mode) and how fast players
+are using it up, spends a global API budget on the buckets closest to
+running dry, and queues the work for generation_worker.py processes.
+
+Inventory is active content per bucket. Consumption comes from quiz_answered
+events for quiz sets and from growth of the seen/completed bitmaps in
+user_content_bitmaps for the flashcard sets. A bucket's runway is how long
+a heavy player (90th percentile of seen content) has before running out:
+
+    runway_hours = (inventory - heavy_seen) / (consumption_per_hour / active_users)
+
+Buckets under min_inventory come first whatever their runway; buckets with
+more than target_runway_hours of runway get nothing.
+
+Run exactly one scheduler (it takes an advisory lock); run as many workers
+as the API budget can keep busy:
+
+    python generation_scheduler.py
+    python generation_scheduler.py --once --dry-run   # print the plan only
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LOCK_KEY = 0x6A50_6765  # "jPge"
+
+# (content_type, category, mode); category/mode are None where a type isn't split by them
+BucketKey = Tuple[str, Optional[str], Optional[str]]
+
+
+@dataclass
+class Bucket:
+    content_type: str
+    category: Optional[str]
+    mode: Optional[str]
+    inventory: int = 0
+    active_users: int = 0
+    seen_total: int = 0
+    heavy_seen: float = 0.0
+    consumption_per_hour: float = 0.0
+    runway_hours: Optional[float] = None
+
+    @property
+    def key(self) -> BucketKey:
+        return (self.content_type, self.category, self.mode)
+
+
+class GenerationQueue:
+    """
+    Lease-based queue of generation jobs, same lifecycle as ValidationQueue
+    At most one outstanding (pending or leased) job per bucket; re-queueing a
+    bucket just updates the priority of the job already waiting
+    """
+
+    def __init__(self, lease_seconds: int = 900, max_attempts: int = 3, retry_delay: int = 120):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    async def initialize(self, conn):
+        """Create the jobs and inventory tables; safe to run on every startup"""
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS generation_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                content_type VARCHAR(50) NOT NULL,
+                category VARCHAR(100),
+                mode VARCHAR(20),
+                priority DOUBLE PRECISION NOT NULL DEFAULT 0,
+                api_calls INTEGER NOT NULL DEFAULT 1,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                leased_by VARCHAR(100),
+                lease_expires_at TIMESTAMP WITH TIME ZONE,
+                last_error TEXT,
+                result_id UUID,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP WITH TIME ZONE,
+                finished_at TIMESTAMP WITH TIME ZONE
+            );
+
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_generation_jobs_outstanding
+            ON generation_jobs(content_type, (COALESCE(category, '')), (COALESCE(mode, '')))
+            WHERE status IN ('pending', 'leased');
+
+            CREATE INDEX IF NOT EXISTS idx_generation_jobs_claimable
+            ON generation_jobs(priority, created_at) WHERE status = 'pending';
+
+            CREATE INDEX IF NOT EXISTS idx_generation_jobs_finished
+            ON generation_jobs(finished_at) WHERE status IN ('done', 'dead');
+
+            CREATE TABLE IF NOT EXISTS generation_inventory (
+                content_type VARCHAR(50) NOT NULL,
+                category VARCHAR(100) NOT NULL DEFAULT '',
+                mode VARCHAR(20) NOT NULL DEFAULT '',
+                inventory INTEGER NOT NULL,
+                active_users INTEGER NOT NULL,
+                seen_total BIGINT NOT NULL,
+                heavy_seen DOUBLE PRECISION NOT NULL,
+                consumption_per_hour DOUBLE PRECISION NOT NULL,
+                runway_hours DOUBLE PRECISION,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (content_type, category, mode)
+            );
+        """)
+
+    async def enqueue(self, conn, bucket: Bucket, priority: float, api_calls: int) -> bool:
+        """Queue one set for a bucket; False if one was already outstanding"""
+        return await conn.fetchval("""
+            INSERT INTO generation_jobs (content_type, category, mode, priority, api_calls)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (content_type, (COALESCE(category, '')), (COALESCE(mode, '')))
+            WHERE status IN ('pending', 'leased')
+            DO UPDATE SET priority = LEAST(generation_jobs.priority, EXCLUDED.priority)
+            RETURNING (xmax = 0)
+        """, bucket.content_type, bucket.category, bucket.mode, priority, api_calls)
+
+    async def outstanding(self, conn) -> set:
+        rows = await conn.fetch("""
+            SELECT content_type, category, mode FROM generation_jobs
+            WHERE status IN ('pending', 'leased')
+        """)
+        return {(row['content_type'], row['category'], row['mode']) for row in rows}
+
+    async def reap_expired(self, conn) -> int:
+        """Dead-letter expired leases that have used up their attempts"""
+        result = await conn.execute("""
+            UPDATE generation_jobs
+            SET status = 'dead',
+                leased_by = NULL,
+                lease_expires_at = NULL,
+                last_error = COALESCE(last_error, 'lease expired'),
+                finished_at = CURRENT_TIMESTAMP
+            WHERE status = 'leased'
+            AND lease_expires_at < CURRENT_TIMESTAMP
+            AND attempts >= $1
+        """, self.max_attempts)
+        return int(result.split()[-1])
+
+    async def claim(self, conn, worker_id: str, limit: int, content_types: List[str]) -> List[Dict[str, Any]]:
+        """Lease up to `limit` of the most urgent jobs this worker can run"""
+        rows = await conn.fetch("""
+            WITH claimable AS (
+                SELECT id
+                FROM generation_jobs
+                WHERE content_type = ANY($5::text[])
+                AND ((status = 'pending' AND available_at <= CURRENT_TIMESTAMP)
+                     OR (status = 'leased' AND lease_expires_at < CURRENT_TIMESTAMP AND attempts < $4))
+                ORDER BY priority, created_at
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE generation_jobs j
+            SET status = 'leased',
+                leased_by = $1,
+                lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $3::int),
+                attempts = j.attempts + 1,
+                started_at = CURRENT_TIMESTAMP
+            FROM claimable
+            WHERE j.id = claimable.id
+            RETURNING j.id, j.content_type, j.category, j.mode, j.attempts
+        """, worker_id, limit, self.lease_seconds, self.max_attempts, content_types)
+        return [dict(row) for row in rows]
+
+    async def heartbeat(self, conn, worker_id: str, job_ids: List[int]) -> int:
+        if not job_ids:
+            return 0
+        result = await conn.execute("""
+            UPDATE generation_jobs
+            SET lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $3::int)
+            WHERE id = ANY($2::bigint[]) AND status = 'leased' AND leased_by = $1
+        """, worker_id, job_ids, self.lease_seconds)
+        return int(result.split()[-1])
+
+    async def complete(self, conn, worker_id: str, job_id: int, result_id=None) -> bool:
+        result = await conn.execute("""
+            UPDATE generation_jobs
+            SET status = 'done',
+                leased_by = NULL,
+                lease_expires_at = NULL,
+                last_error = NULL,
+                result_id = $3,
+                finished_at = CURRENT_TIMESTAMP
+            WHERE id = $1 AND status = 'leased' AND leased_by = $2
+        """, job_id, worker_id, result_id)
+        return result.endswith(' 1')
+
+    async def fail(self, conn, worker_id: str, job_id: int, error: str) -> str:
+        row = await conn.fetchrow("""
+            UPDATE generation_jobs
+            SET status = CASE WHEN attempts >= $3 THEN 'dead' ELSE 'pending' END,
+                available_at = CURRENT_TIMESTAMP + make_interval(secs => $4::int * attempts),
+                leased_by = NULL,
+                lease_expires_at = NULL,
+                last_error = $5,
+                finished_at = CASE WHEN attempts >= $3 THEN CURRENT_TIMESTAMP END
+            WHERE id = $1 AND status = 'leased' AND leased_by = $2
+            RETURNING status
+        """, job_id, worker_id, self.max_attempts, self.retry_delay, error)
+        return row['status'] if row else 'lost'
+
+    async def release(self, conn, worker_id: str, job_ids: List[int]):
+        """Hand unstarted jobs back on shutdown without using up an attempt"""
+        if not job_ids:
+            return
+        await conn.execute("""
+            UPDATE generation_jobs
+            SET status = 'pending',
+                attempts = GREATEST(attempts - 1, 0),
+                leased_by = NULL,
+                lease_expires_at = NULL
+            WHERE id = ANY($2::bigint[]) AND status = 'leased' AND leased_by = $1
+        """, worker_id, job_ids)
+
+
+async def generation_stats(conn, lowest: int = 10) -> Dict[str, Any]:
+    """Queue depth, throughput over the last hour and the buckets nearest to running out"""
+    depth = await conn.fetch("""
+        SELECT status, COUNT(*) AS count FROM generation_jobs
+        WHERE status IN ('pending', 'leased')
+        GROUP BY status
+    """)
+    hour = await conn.fetchrow("""
+        SELECT COUNT(*) FILTER (WHERE status = 'done') AS done,
+               COUNT(*) FILTER (WHERE status = 'dead') AS dead,
+               COALESCE(SUM(api_calls) FILTER (WHERE status = 'done'), 0) AS api_calls,
+               AVG(EXTRACT(EPOCH FROM finished_at - started_at)) FILTER (WHERE status = 'done') AS avg_seconds,
+               MAX(EXTRACT(EPOCH FROM finished_at - created_at)) FILTER (WHERE status = 'done') AS max_wait_seconds
+        FROM generation_jobs
+        WHERE status IN ('done', 'dead')
+        AND finished_at > CURRENT_TIMESTAMP - INTERVAL '1 hour'
+    """)
+    buckets = await conn.fetch("""
+        SELECT content_type, category, mode, inventory, active_users,
+               consumption_per_hour, runway_hours, updated_at
+        FROM generation_inventory
+        ORDER BY runway_hours ASC NULLS LAST, inventory ASC
+        LIMIT $1
+    """, lowest)
+
+    return {
+        "queue_depth": {row['status']: row['count'] for row in depth},
+        "last_hour": {
+            "sets_generated": hour['done'],
+            "dead_lettered": hour['dead'],
+            "api_calls": hour['api_calls'],
+            "avg_job_seconds": round(hour['avg_seconds'] or 0, 1),
+            "max_queue_to_done_seconds": round(hour['max_wait_seconds'] or 0, 1)
+        },
+        "lowest_runway": [
+            {
+                "content_type": row['content_type'],
+                "category": row['category'] or None,
+                "mode": row['mode'] or None,
+                "inventory": row['inventory'],
+                "active_users": row['active_users'],
+                "consumption_per_hour": round(row['consumption_per_hour'], 2),
+                "runway_hours": round(row['runway_hours'], 1) if row['runway_hours'] is not None else None,
+                "updated_at": row['updated_at'].isoformat() if row['updated_at'] else None
+            }
+            for row in buckets
+        ]
+    }
+
+
+class GenerationScheduler:
+    """
+    Measures inventory, decides what to generate and queues it
+
+    The API budget is a token bucket in API calls per hour; each job costs its
+    target's api_calls up front. Unspent budget carries over up to `burst`
+    cycles' worth, so quiet periods don't save up an hour of spending.
+    """
+
+    def __init__(
+        self,
+        targets: Dict[str, Any],
+        budget_per_hour: float = 120.0,
+        interval: float = 300.0,
+        burst: float = 3.0,
+        min_inventory: int = 10,
+        target_runway_hours: float = 72.0,
+        active_days: int = 7,
+        events_window_hours: int = 24,
+        smoothing: float = 0.3
+    ):
+        self.targets = targets
+        self.budget_per_hour = budget_per_hour
+        self.interval = interval
+        self.max_budget = budget_per_hour * interval / 3600 * burst
+        self.min_inventory = min_inventory
+        self.target_runway_hours = target_runway_hours
+        self.active_days = active_days
+        self.events_window_hours = events_window_hours
+        # Weight of the newest bitmap-growth sample in the consumption EWMA
+        self.smoothing = smoothing
+        self.queue = GenerationQueue()
+
+        self.budget = budget_per_hour * interval / 3600
+        self._last_tick = time.monotonic()
+        self._previous: Dict[BucketKey, Tuple[float, int, float]] = {}
+        self.running = True
+
+    # ========== INVENTORY ==========
+
+    def _expected_buckets(self) -> Dict[BucketKey, Bucket]:
+        buckets = {}
+        for content_type, target in self.targets.items():
+            for category in target.categories or [None]:
+                for mode in target.modes or [None]:
+                    bucket = Bucket(content_type, category, mode)
+                    buckets[bucket.key] = bucket
+        return buckets
+
+    async def measure(self, conn) -> List[Bucket]:
+        """Current inventory, consumption and runway of every bucket a target can fill"""
+        types = list(self.targets)
+        rows = await conn.fetch("""
+            WITH targets AS (
+                SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::bool[])
+                    AS t(content_type, bitmap_type, category_field, by_mode)
+            ),
+            buckets AS (
+                SELECT t.content_type, t.bitmap_type,
+                       CASE t.category_field
+                           WHEN 'category' THEN c.data->>'category'
+                           WHEN 'theme' THEN c.data->>'theme'
+                       END AS category,
+                       CASE WHEN t.by_mode THEN c.data->>'mode' END AS mode,
+                       COUNT(*) AS inventory,
+                       rb_build_agg(m.id) FILTER (WHERE m.id IS NOT NULL) AS ids
+                FROM content c
+                JOIN targets t ON t.content_type = c.type
+                LEFT JOIN content_id_mapping m ON m.content_uuid = c.id
+                WHERE c.is_active = true
+                GROUP BY 1, 2, 3, 4
+            ),
+            usage AS (
+                SELECT b.content_type, b.category, b.mode,
+                       u.last_updated > NOW() - make_interval(days => $5::int) AS active,
+                       rb_and_cardinality(
+                           rb_or(COALESCE(u.seen_bitmap, rb_build(ARRAY[]::integer[])),
+                                 COALESCE(u.completed_bitmap, rb_build(ARRAY[]::integer[]))),
+                           b.ids
+                       ) AS seen
+                FROM buckets b
+                JOIN user_content_bitmaps u ON u.content_type = b.bitmap_type
+                WHERE b.ids IS NOT NULL
+            )
+            SELECT b.content_type, b.category, b.mode, b.inventory,
+                   COUNT(*) FILTER (WHERE u.active) AS active_users,
+                   COALESCE(SUM(u.seen), 0) AS seen_total,
+                   COALESCE(percentile_cont(0.9) WITHIN GROUP (ORDER BY u.seen) FILTER (WHERE u.active), 0) AS heavy_seen
+            FROM buckets b
+            LEFT JOIN usage u
+                ON u.content_type = b.content_type
+                AND u.category IS NOT DISTINCT FROM b.category
+                AND u.mode IS NOT DISTINCT FROM b.mode
+            GROUP BY b.content_type, b.category, b.mode, b.inventory
+        """,
+            types,
+            [self.targets[t].bitmap_type for t in types],
+            [self.targets[t].category_field or '' for t in types],
+            [bool(self.targets[t].modes) for t in types],
+            self.active_days
+        )
+
+        # Quiz sets have no bitmap rows, so their rate, players and seen counts
+        # all come from the same window of quiz_answered events. Every set is
+        # served in every mode, so supply and demand are per category only
+        quiz_usage = {}
+        if 'quiz_set' in self.targets:
+            for row in await conn.fetch("""
+                WITH plays AS (
+                    SELECT category, user_id, COUNT(DISTINCT content_id) AS seen
+                    FROM events
+                    WHERE type = 'quiz_answered'
+                    AND created_at > NOW() - make_interval(hours => $1::int)
+                    AND user_id IS NOT NULL
+                    GROUP BY category, user_id
+                )
+                SELECT category,
+                       COUNT(*) AS active_users,
+                       SUM(seen)::bigint AS seen_total,
+                       percentile_cont(0.9) WITHIN GROUP (ORDER BY seen) AS heavy_seen
+                FROM plays
+                GROUP BY category
+            """, self.events_window_hours):
+                quiz_usage[row['category']] = row
+
+        now = time.monotonic()
+        buckets = self._expected_buckets()
+        for row in rows:
+            bucket = buckets.get((row['content_type'], row['category'], row['mode']))
+            if bucket is None:
+                continue  # Content no target generates any more (old modes, retired categories)
+            bucket.inventory = row['inventory']
+            bucket.active_users = row['active_users']
+            bucket.seen_total = row['seen_total']
+            bucket.heavy_seen = float(row['heavy_seen'])
+
+        for bucket in buckets.values():
+            if bucket.content_type == 'quiz_set':
+                usage = quiz_usage.get(bucket.category)
+                bucket.active_users = usage['active_users'] if usage else 0
+                bucket.seen_total = usage['seen_total'] if usage else 0
+                bucket.heavy_seen = float(usage['heavy_seen']) if usage else 0.0
+                bucket.consumption_per_hour = bucket.seen_total / self.events_window_hours
+            else:
+                bucket.consumption_per_hour = self._bitmap_rate(bucket, now)
+            bucket.runway_hours = self._runway(bucket)
+
+        return list(buckets.values())
+
+    def _bitmap_rate(self, bucket: Bucket, now: float) -> float:
+        """Seen-bitmap growth per hour since the last measurement, smoothed"""
+        previous = self._previous.get(bucket.key)
+        self._previous[bucket.key] = (now, bucket.seen_total, previous[2] if previous else 0.0)
+        if not previous:
+            return 0.0
+        at, seen_total, rate = previous
+        hours = (now - at) / 3600
+        if hours <= 0:
+            return rate
+        sample = max(bucket.seen_total - seen_total, 0) / hours
+        rate = sample if rate == 0 else self.smoothing * sample + (1 - self.smoothing) * rate
+        self._previous[bucket.key] = (now, bucket.seen_total, rate)
+        return rate
+
+    def _runway(self, bucket: Bucket) -> Optional[float]:
+        if bucket.consumption_per_hour <= 0:
+            return None
+        per_user = bucket.consumption_per_hour / max(bucket.active_users, 1)
+        return max(bucket.inventory - bucket.heavy_seen, 0) / per_user
+
+    async def save_inventory(self, conn, buckets: List[Bucket]):
+        await conn.execute("""
+            INSERT INTO generation_inventory
+                (content_type, category, mode, inventory, active_users, seen_total,
+                 heavy_seen, consumption_per_hour, runway_hours, updated_at)
+            SELECT *, CURRENT_TIMESTAMP
+            FROM unnest($1::text[], $2::text[], $3::text[], $4::int[], $5::int[], $6::bigint[],
+                        $7::float8[], $8::float8[], $9::float8[])
+            ON CONFLICT (content_type, category, mode) DO UPDATE
+            SET inventory = EXCLUDED.inventory,
+                active_users = EXCLUDED.active_users,
+                seen_total = EXCLUDED.seen_total,
+                heavy_seen = EXCLUDED.heavy_seen,
+                consumption_per_hour = EXCLUDED.consumption_per_hour,
+                runway_hours = EXCLUDED.runway_hours,
+                updated_at = EXCLUDED.updated_at
+        """,
+            [b.content_type for b in buckets],
+            [b.category or '' for b in buckets],
+            [b.mode or '' for b in buckets],
+            [b.inventory for b in buckets],
+            [b.active_users for b in buckets],
+            [b.seen_total for b in buckets],
+            [b.heavy_seen for b in buckets],
+            [b.consumption_per_hour for b in buckets],
+            [b.runway_hours for b in buckets]
+        )
+
+    # ========== PLANNING ==========
+
+    def plan(self, buckets: List[Bucket], outstanding: set) -> List[Tuple[Bucket, float]]:
+        """
+        Buckets to generate for this cycle with their queue priority (lower
+        runs first), most urgent first, within the current budget
+        """
+        needy = []
+        for bucket in buckets:
+            if bucket.key in outstanding:
+                continue
+            if bucket.inventory < self.min_inventory:
+                # Below the floor: ahead of everything, emptiest first
+                needy.append((bucket, -1.0 / (bucket.inventory + 1)))
+            elif bucket.runway_hours is not None and bucket.runway_hours < self.target_runway_hours:
+                needy.append((bucket, bucket.runway_hours))
+        needy.sort(key=lambda item: item[1])
+
+        planned = []
+        budget = self.budget
+        for bucket, priority in needy:
+            cost = self.targets[bucket.content_type].api_calls
+            if cost > budget:
+                break
+            budget -= cost
+            planned.append((bucket, priority))
+        return planned
+
+    def _refill(self):
+        now = time.monotonic()
+        self.budget = min(
+            self.budget + self.budget_per_hour * (now - self._last_tick) / 3600,
+            self.max_budget
+        )
+        self._last_tick = now
+
+    async def run_cycle(self, conn, dry_run: bool = False) -> Dict[str, Any]:
+        self._refill()
+        reaped = await self.queue.reap_expired(conn)
+        buckets = await self.measure(conn)
+        outstanding = await self.queue.outstanding(conn)
+        planned = self.plan(buckets, outstanding)
+
+        queued = 0
+        if dry_run:
+            for bucket, priority in planned:
+                logger.info(
+                    f"Would queue {bucket.content_type} {bucket.category or '-'}/{bucket.mode or '-'}: "
+                    f"inventory {bucket.inventory}, runway "
+                    f"{'n/a' if bucket.runway_hours is None else f'{bucket.runway_hours:.1f}h'}"
+                )
+        else:
+            await self.save_inventory(conn, buckets)
+            for bucket, priority in planned:
+                cost = self.targets[bucket.content_type].api_calls
+                if await self.queue.enqueue(conn, bucket, priority, cost):
+                    self.budget -= cost
+                    queued += 1
+
+        summary = {
+            "buckets": len(buckets),
+            "below_floor": sum(1 for b in buckets if b.inventory < self.min_inventory),
+            "outstanding": len(outstanding),
+            "queued": queued if not dry_run else len(planned),
+            "dead_lettered": reaped,
+            "budget_left": round(self.budget, 1)
+        }
+        logger.info(
+            f"Generation cycle: {summary['queued']} jobs queued, {summary['outstanding']} already "
+            f"outstanding, {summary['below_floor']}/{summary['buckets']} buckets below "
+            f"{self.min_inventory} sets, budget left {summary['budget_left']} calls"
+        )
+        return summary
+
+    # ========== LIFECYCLE ==========
+
+    async def run(self, pool, once: bool = False, dry_run: bool = False):
+        async with pool.acquire() as lock_conn:
+            if not await lock_conn.fetchval("SELECT pg_try_advisory_lock($1)", SCHEDULER_LOCK_KEY):
+                logger.error("Another generation scheduler is running; exiting")
+                return
+            try:
+                async with pool.acquire() as conn:
+                    await self.queue.initialize(conn)
+                while self.running:
+                    try:
+                        async with pool.acquire() as conn:
+                            await self.run_cycle(conn, dry_run)
+                    except Exception as e:
+                        logger.error(f"Generation cycle failed, will retry: {e}")
+                    if once:
+                        break
+                    await asyncio.sleep(self.interval)
+            finally:
+                await lock_conn.execute("SELECT pg_advisory_unlock($1)", SCHEDULER_LOCK_KEY)
+
+
+async def main(args):
+    from database import db
+    from generation_worker import build_targets
+
+    await db.connect()
+    scheduler = GenerationScheduler(
+        build_targets(),
+        budget_per_hour=float(os.getenv('GENERATION_API_BUDGET_PER_HOUR', '120')),
+        interval=float(os.getenv('GENERATION_SCHEDULE_INTERVAL', '300')),
+        min_inventory=int(os.getenv('GENERATION_MIN_INVENTORY', '10')),
+        target_runway_hours=float(os.getenv('GENERATION_TARGET_RUNWAY_HOURS', '72'))
+    )
+
+    def stop(*_):
+        scheduler.running = False
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        await scheduler.run(db.pool, once=args.once, dry_run=args.dry_run)
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Schedule content generation by inventory")
+    parser.add_argument("--once", action="store_true", help="Run one cycle and exit")
+    parser.add_argument("--dry-run", action="store_true", help="Log the plan without queueing anything")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Generation Worker - runs the jobs generation_scheduler.py queues
+Each job is one set for one (type, category, mode) bucket; jobs are leased
+from generation_jobs, so any number of workers can run side by side
+"""
+
+import asyncio
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+from database import db
+from generation_scheduler import GenerationQueue
+from provider_client import close_clients
+from question_index import question_index
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+QUIZ_MODES = ['poqpoq', 'chaos', 'zen', 'speed']
+
+
+@dataclass
+class GenerationTarget:
+    """What the scheduler can ask for: one content type and how to make a set of it"""
+    content_type: str
+    # Content type name used in user_content_bitmaps
+    bitmap_type: str
+    # data field the generator's category lands in; None when it takes no category
+    category_field: Optional[str]
+    categories: Optional[List[str]]
+    modes: Optional[List[str]]
+    # API calls one set costs, charged against the scheduler's budget
+    api_calls: int
+    run: Callable[[Optional[str], Optional[str]], Awaitable[Any]]
+
+
+def build_targets() -> Dict[str, GenerationTarget]:
+    """Every generator the scheduler can dispatch to"""
+    from quiz_set_generator_v3 import QuizSetGeneratorV3
+    from trivia_set_generator import trivia_set_generator, generate_and_store_trivia_set
+    from joke_set_generator import generate_and_store_joke_set
+    from pun_set_generator import generate_and_store_pun_set
+    from quote_set_generator import generate_and_store_quote_set
+
+    quiz = QuizSetGeneratorV3()
+
+    async def run_quiz(category, mode):
+        # Each set is served in every mode (content_variations), so the
+        # scheduler tracks quiz stock per category; the base mode is random
+        return await quiz.run_for(category, mode or random.choice(QUIZ_MODES))
+
+    async def run_trivia(category, mode):
+        set_id, _ = await generate_and_store_trivia_set(category)
+        return set_id
+
+    return {
+        # Title, question batch (+ occasional top-up) and zen hints
+        'quiz_set': GenerationTarget(
+            'quiz_set', 'quiz', 'category', quiz.categories, None, 4, run_quiz
+        ),
+        'trivia_set': GenerationTarget(
+            'trivia_set', 'trivia', 'theme', trivia_set_generator.categories, None, 1, run_trivia
+        ),
+        'joke_set': GenerationTarget(
+            'joke_set', 'joke', None, None, None, 1, lambda category, mode: generate_and_store_joke_set()
+        ),
+        'pun_set': GenerationTarget(
+            'pun_set', 'pun', None, None, None, 1, lambda category, mode: generate_and_store_pun_set()
+        ),
+        'quote_set': GenerationTarget(
+            'quote_set', 'quote', None, None, None, 1, lambda category, mode: generate_and_store_quote_set()
+        ),
+    }
+
+
+class GenerationWorker:
+    """Leases generation jobs and runs them, `concurrency` at a time"""
+
+    def __init__(self, targets: Dict[str, GenerationTarget]):
+        self.targets = targets
+        self.running = True
+        self.concurrency = int(os.getenv('GENERATION_WORKER_CONCURRENCY', '2'))
+        self.sleep_interval = int(os.getenv('GENERATION_WORKER_INTERVAL', '30'))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.queue = GenerationQueue(
+            lease_seconds=int(os.getenv('GENERATION_LEASE_SECONDS', '900')),
+            max_attempts=int(os.getenv('GENERATION_MAX_ATTEMPTS', '3'))
+        )
+        self.leased = set()
+        self.stats = {
+            'generated': 0,
+            'errors': 0,
+            'dead': 0,
+            'started_at': datetime.utcnow()
+        }
+
+    async def start(self):
+        logger.info(f"Starting generation worker {self.worker_id} ({self.concurrency} concurrent jobs)")
+        signal.signal(signal.SIGINT, self._handle_shutdown)
+        signal.signal(signal.SIGTERM, self._handle_shutdown)
+
+        await db.connect()
+        async with db.pool.acquire() as conn:
+            await self.queue.initialize(conn)
+            if 'quiz_set' in self.targets:
+                await question_index.refresh(conn, full=True)
+        heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+        try:
+            while self.running:
+                async with db.pool.acquire() as conn:
+                    jobs = await self.queue.claim(conn, self.worker_id, self.concurrency, list(self.targets))
+                if not jobs:
+                    await asyncio.sleep(self.sleep_interval)
+                    continue
+
+                self.leased.update(job['id'] for job in jobs)
+                await asyncio.gather(*(self._run_job(job) for job in jobs))
+        finally:
+            heartbeat_task.cancel()
+            if self.leased:
+                async with db.pool.acquire() as conn:
+                    await self.queue.release(conn, self.worker_id, list(self.leased))
+            await close_clients()
+            await db.disconnect()
+            self._log_stats()
+
+    async def _run_job(self, job: Dict[str, Any]):
+        label = f"{job['content_type']} {job['category'] or '-'}/{job['mode'] or '-'}"
+        target = self.targets[job['content_type']]
+        logger.info(f"Generating {label} (job {job['id']}, attempt {job['attempts']})")
+        try:
+            result_id = await target.run(job['category'], job['mode'])
+            if result_id is None:
+                raise RuntimeError("generator produced no set")
+
+            async with db.pool.acquire() as conn:
+                if not await self.queue.complete(conn, self.worker_id, job['id'], result_id):
+                    logger.warning(f"Lease on generation job {job['id']} expired before completion")
+            self.stats['generated'] += 1
+            logger.info(f"Generated {label}: {result_id}")
+
+        except Exception as e:
+            logger.error(f"Error generating {label}: {e}")
+            self.stats['errors'] += 1
+            async with db.pool.acquire() as conn:
+                status = await self.queue.fail(conn, self.worker_id, job['id'], str(e))
+            if status == 'dead':
+                self.stats['dead'] += 1
+        finally:
+            self.leased.discard(job['id'])
+
+    async def _heartbeat_loop(self):
+        interval = max(self.queue.lease_seconds // 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            if not self.leased:
+                continue
+            try:
+                async with db.pool.acquire() as conn:
+                    await self.queue.heartbeat(conn, self.worker_id, list(self.leased))
+            except Exception as e:
+                logger.error(f"Heartbeat failed: {e}")
+
+    def _log_stats(self):
+        hours = (datetime.utcnow() - self.stats['started_at']).total_seconds() / 3600
+        logger.info(
+            f"Generation worker: {self.stats['generated']} sets, {self.stats['errors']} errors, "
+            f"{self.stats['dead']} dead-lettered, {self.stats['generated'] / hours if hours else 0:.1f} sets/hour"
+        )
+
+    def _handle_shutdown(self, signum, frame):
+        logger.info("Shutdown signal received, finishing current jobs...")
+        self.running = False
+
+
+async def main():
+    worker = GenerationWorker(build_targets())
+    try:
+        await worker.start()
+    except Exception as e:
+        logger.error(f"Fatal error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
@@ -9,7 +9,8 @@ import logging
 from datetime import datetime
 from uuid import uuid4
 from typing import Dict, Any, List
-import aiohttp
+from provider_client import close_clients, get_client
+from content_safety import safety_filter
 from database import db
 from dotenv import load_dotenv
 
@@ -81,32 +82,37 @@ class JokeGenerator:
                     }]
                 }
                 
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        "https://api.anthropic.com/v1/messages",
-                        headers=headers,
-                        json=payload
-                    ) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            content = data['content'][0]['text']
+                async with get_client('anthropic').post(
+                    "https://api.anthropic.com/v1/messages",
+                    headers=headers,
+                    json=payload
+                ) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        content = data['content'][0]['text']
+                        
+                        # Parse JSON from response
+                        import re
+                        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+                        if json_match:
+                            joke_data = json.loads(json_match.group())
                             
-                            # Parse JSON from response
-                            import re
-                            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                            if json_match:
-                                joke_data = json.loads(json_match.group())
-                                
-                                return {
-                                    "id": str(uuid4()),
-                                    "type": "joke",
-                                    "data": joke_data,
-                                    "metadata": {
-                                        "theme": theme,
-                                        "generated_at": datetime.utcnow().isoformat()
-                                    },
-                                    "tags": ["joke", "knock-knock", theme, "flashcard"]
-                                }
+                            # Screen with the shared safety filter
+                            match = safety_filter.check_item(joke_data)
+                            if match:
+                                logger.warning(f"Content filter rejected joke: {match!r}")
+                                return self.get_fallback_joke(theme)
+                            
+                            return {
+                                "id": str(uuid4()),
+                                "type": "joke",
+                                "data": joke_data,
+                                "metadata": {
+                                    "theme": theme,
+                                    "generated_at": datetime.utcnow().isoformat()
+                                },
+                                "tags": ["joke", "knock-knock", theme, "flashcard"]
+                            }
         except Exception as e:
             logger.error(f"Error generating joke: {e}")
         
@@ -224,6 +230,7 @@ async def main():
     try:
         await run_joke_generator()
     finally:
+        await close_clients()
         await db.disconnect()
 
 if __name__ == "__main__":
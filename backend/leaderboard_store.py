@@ -0,0 +1,377 @@
+"""
+Leaderboard store for JazzyPop
+Score totals per user are kept per UTC day and all-time, per mode, and are
+bumped in the same transaction that records a quiz_answered event - reading
+a leaderboard never scans events
+"""
+import asyncio
+import bisect
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+# period_start used for all-time rows
+ALL_TIME_START = date(1970, 1, 1)
+# Rolling window kept compatible with the old CURRENT_DATE - 7 days filter
+WEEKLY_DAYS = 7
+# '' is the row for all modes combined
+ALL_MODES = ''
+# Modes that get a board of their own; answers in any other mode a client
+# sends only count towards ALL_MODES, so board keys stay bounded
+BOARD_MODES = ('poqpoq', 'chaos', 'zen', 'speed')
+
+BoardKey = Tuple[str, str]
+
+
+class _TopK:
+    """Highest `size` (score, games_played) totals, kept sorted by score"""
+
+    def __init__(self, size: int, period_start: date):
+        self.size = size
+        self.period_start = period_start
+        self.loaded_at = 0.0
+        self._totals: Dict[UUID, Tuple[int, int]] = {}
+        self._order: List[Tuple[int, str, UUID]] = []
+
+    def load(self, rows: List[Tuple[UUID, int, int]]):
+        self._totals.clear()
+        self._order.clear()
+        for user_id, score, games_played in rows:
+            self.offer(user_id, score, games_played)
+        self.loaded_at = time.monotonic()
+
+    def offer(self, user_id: UUID, score: int, games_played: int):
+        """Record a user's new total; totals only grow, so this is all we need"""
+        current = self._totals.get(user_id)
+        if current is not None:
+            self._order.remove((-current[0], str(user_id), user_id))
+        elif len(self._order) >= self.size and -self._order[-1][0] >= score:
+            return
+
+        self._totals[user_id] = (score, games_played)
+        bisect.insort(self._order, (-score, str(user_id), user_id))
+
+        if len(self._order) > self.size:
+            _, _, dropped = self._order.pop()
+            del self._totals[dropped]
+
+    def top(self, limit: int) -> List[Tuple[UUID, int, int]]:
+        return [
+            (user_id, -neg_score, self._totals[user_id][1])
+            for neg_score, _, user_id in self._order[:limit]
+        ]
+
+
+class LeaderboardStore:
+    """
+    Incrementally maintained daily / weekly / all-time leaderboards
+
+    leaderboard_scores holds one row per (period, period_start, mode, user):
+    'daily' rows per UTC day and a single 'all_time' row. submit_answer adds
+    to the daily and all-time rows for the answer's mode and for all modes
+    (mode = ''). Weekly is the sum of the last WEEKLY_DAYS + 1 daily rows, like
+    the old rolling filter.
+
+    Each worker keeps the top `top_k` of every board it has served in memory.
+    Daily and all-time boards take this worker's updates immediately (the
+    upsert returns the new totals); all boards are reloaded after
+    refresh_interval to pick up other workers' updates.
+
+    When the UTC day changes, the finished day's top scores are archived in
+    the leaderboards table and daily rows past retention_days are pruned.
+    """
+
+    def __init__(
+        self,
+        top_k: int = 100,
+        refresh_interval: float = 10.0,
+        retention_days: int = 35
+    ):
+        self.top_k = top_k
+        self.refresh_interval = refresh_interval
+        self.retention_days = retention_days
+        self._boards: Dict[BoardKey, _TopK] = {}
+        self._current_day: Optional[date] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _today() -> date:
+        return datetime.now(timezone.utc).date()
+
+    def _period_start(self, period: str, today: date) -> date:
+        if period == "daily":
+            return today
+        if period == "weekly":
+            return today - timedelta(days=WEEKLY_DAYS)
+        return ALL_TIME_START
+
+    async def initialize(self, conn):
+        """Create the score table; safe to run on every startup"""
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS leaderboard_scores (
+                period VARCHAR(20) NOT NULL,
+                period_start DATE NOT NULL,
+                mode VARCHAR(20) NOT NULL DEFAULT '',
+                user_id UUID NOT NULL,
+                score BIGINT NOT NULL DEFAULT 0,
+                games_played INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (period, period_start, mode, user_id)
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_leaderboard_scores_rank
+            ON leaderboard_scores(period, period_start, mode, score DESC);
+        """)
+
+        if not await conn.fetchval("SELECT EXISTS (SELECT 1 FROM leaderboard_scores)"):
+            if await conn.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM events WHERE type = 'quiz_answered' AND user_id IS NOT NULL)"
+            ):
+                logger.warning(
+                    "leaderboard_scores is empty but quiz_answered events exist - "
+                    "run backfill_leaderboard.py to rebuild it"
+                )
+
+        self._current_day = self._today()
+        logger.info("Leaderboard store initialized")
+
+    # ========== WRITES ==========
+
+    async def record(self, conn, user_id: UUID, mode: Optional[str], score: int) -> List[Tuple]:
+        """
+        Add one answer to the user's totals, inside the caller's transaction
+
+        Returns the updated rows; pass them to apply() once the transaction
+        has committed so the in-memory boards never show uncommitted scores.
+        """
+        modes = [ALL_MODES] + ([mode] if mode in BOARD_MODES else [])
+        rows = await conn.fetch("""
+            INSERT INTO leaderboard_scores (period, period_start, mode, user_id, score, games_played)
+            SELECT p.period, p.period_start, m.mode, $1, $2, 1
+            FROM (VALUES ('daily', $3::date), ('all_time', $4::date)) AS p(period, period_start)
+            CROSS JOIN unnest($5::varchar[]) AS m(mode)
+            ON CONFLICT (period, period_start, mode, user_id) DO UPDATE
+            SET score = leaderboard_scores.score + EXCLUDED.score,
+                games_played = leaderboard_scores.games_played + 1,
+                updated_at = NOW()
+            RETURNING period, period_start, mode, score, games_played
+        """, user_id, score, self._today(), ALL_TIME_START, modes)
+
+        return [
+            (row["period"], row["period_start"], row["mode"], user_id, row["score"], row["games_played"])
+            for row in rows
+        ]
+
+    def apply(self, updates: List[Tuple]):
+        """Feed committed totals from record() into the in-memory boards"""
+        for period, period_start, mode, user_id, score, games_played in updates:
+            board = self._boards.get((period, mode))
+            if board is not None and board.period_start == period_start:
+                board.offer(user_id, score, games_played)
+
+    # ========== READS ==========
+
+    async def get_top(
+        self,
+        conn,
+        period: str,
+        mode: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Tuple[UUID, int, int]]:
+        """(user_id, score, games_played) for the top `limit` users of a board"""
+        mode = mode or ALL_MODES
+        today = self._today()
+        period_start = self._period_start(period, today)
+
+        if self._current_day is not None and today != self._current_day:
+            await self._rollover(conn, today)
+
+        if limit > self.top_k:
+            return await self._fetch_top(conn, period, period_start, mode, limit)
+
+        key = (period, mode)
+        board = self._boards.get(key)
+        if (
+            board is None
+            or board.period_start != period_start
+            or time.monotonic() - board.loaded_at >= self.refresh_interval
+        ):
+            rows = await self._fetch_top(conn, period, period_start, mode, self.top_k)
+            board = _TopK(self.top_k, period_start)
+            board.load(rows)
+            self._boards[key] = board
+
+        return board.top(limit)
+
+    async def _fetch_top(
+        self,
+        conn,
+        period: str,
+        period_start: date,
+        mode: str,
+        limit: int
+    ) -> List[Tuple[UUID, int, int]]:
+        if period == "weekly":
+            rows = await conn.fetch("""
+                SELECT user_id, SUM(score) AS score, SUM(games_played) AS games_played
+                FROM leaderboard_scores
+                WHERE period = 'daily' AND period_start >= $1 AND mode = $2
+                GROUP BY user_id
+                ORDER BY score DESC
+                LIMIT $3
+            """, period_start, mode, limit)
+        else:
+            rows = await conn.fetch("""
+                SELECT user_id, score, games_played
+                FROM leaderboard_scores
+                WHERE period = $1 AND period_start = $2 AND mode = $3
+                ORDER BY score DESC
+                LIMIT $4
+            """, period, period_start, mode, limit)
+
+        return [(row["user_id"], int(row["score"]), int(row["games_played"])) for row in rows]
+
+    # ========== ROLLOVER ==========
+
+    async def _rollover(self, conn, today: date):
+        """Archive the finished day(s) and prune old daily rows, once per worker per day"""
+        async with self._lock:
+            previous_day = self._current_day
+            if previous_day is None or previous_day == today:
+                return
+            self._current_day = today
+            # Day-keyed boards reload on their own; drop them to free memory
+            self._boards = {k: v for k, v in self._boards.items() if k[0] == "all_time"}
+
+            try:
+                async with conn.transaction():
+                    # Every worker rolls over; only the first one archives
+                    await conn.execute("SELECT pg_advisory_xact_lock(hashtext('leaderboard_rollover'))")
+                    await conn.execute("""
+                        WITH ranked AS (
+                            SELECT period_start, mode, user_id, score, games_played,
+                                   ROW_NUMBER() OVER (
+                                       PARTITION BY period_start, mode ORDER BY score DESC
+                                   ) AS rank
+                            FROM leaderboard_scores
+                            WHERE period = 'daily'
+                            AND period_start >= $1 AND period_start < $2
+                        )
+                        INSERT INTO leaderboards (type, mode, scores, period_start, period_end)
+                        SELECT 'daily', NULLIF(r.mode, ''),
+                               jsonb_agg(jsonb_build_object(
+                                   'user_id', r.user_id,
+                                   'score', r.score,
+                                   'games_played', r.games_played,
+                                   'rank', r.rank
+                               ) ORDER BY r.rank),
+                               r.period_start::timestamp AT TIME ZONE 'UTC',
+                               (r.period_start + 1)::timestamp AT TIME ZONE 'UTC'
+                        FROM ranked r
+                        WHERE r.rank <= $3
+                        AND NOT EXISTS (
+                            SELECT 1 FROM leaderboards l
+                            WHERE l.type = 'daily'
+                            AND l.period_start = r.period_start::timestamp AT TIME ZONE 'UTC'
+                            AND l.mode IS NOT DISTINCT FROM NULLIF(r.mode, '')
+                        )
+                        GROUP BY r.period_start, r.mode
+                    """, previous_day, today, self.top_k)
+
+                    await conn.execute("""
+                        DELETE FROM leaderboard_scores
+                        WHERE period = 'daily' AND period_start < $1
+                    """, today - timedelta(days=self.retention_days))
+                logger.info(f"Leaderboard rolled over from {previous_day} to {today}")
+            except Exception as e:
+                # Archiving is best effort - live boards don't depend on it
+                logger.error(f"Leaderboard rollover archiving failed: {e}")
+
+    # ========== RECOVERY ==========
+
+    async def backfill(self, conn, days: Optional[int] = None):
+        """
+        Rebuild totals from quiz_answered events
+
+        days=None rebuilds everything; otherwise only the last `days` UTC days
+        of daily rows are rebuilt and all-time rows are corrected by the
+        difference. That correction needs the old daily rows, so `days` is
+        capped at retention_days. Live writers wait on the table lock while
+        this runs.
+        """
+        if days is not None and days > self.retention_days:
+            logger.warning(
+                f"Daily rows are only kept for {self.retention_days} days; "
+                f"rebuilding those instead of {days} (omit --days to rebuild everything)"
+            )
+            days = self.retention_days
+
+        async with conn.transaction():
+            await conn.execute("LOCK TABLE leaderboard_scores IN EXCLUSIVE MODE")
+
+            if days is None:
+                since = None
+                await conn.execute("DELETE FROM leaderboard_scores")
+            else:
+                since = self._today() - timedelta(days=days)
+                # Take the old daily totals for the window back out of all-time
+                await conn.execute("""
+                    UPDATE leaderboard_scores a
+                    SET score = a.score - d.score,
+                        games_played = a.games_played - d.games_played
+                    FROM (
+                        SELECT mode, user_id, SUM(score) AS score, SUM(games_played) AS games_played
+                        FROM leaderboard_scores
+                        WHERE period = 'daily' AND period_start >= $1
+                        GROUP BY mode, user_id
+                    ) d
+                    WHERE a.period = 'all_time' AND a.mode = d.mode AND a.user_id = d.user_id
+                """, since)
+                await conn.execute("""
+                    DELETE FROM leaderboard_scores
+                    WHERE period = 'daily' AND period_start >= $1
+                """, since)
+
+            await conn.execute("""
+                INSERT INTO leaderboard_scores (period, period_start, mode, user_id, score, games_played)
+                SELECT 'daily', (e.created_at AT TIME ZONE 'UTC')::date, m.mode, e.user_id,
+                       SUM(COALESCE(e.score, (e.payload->>'score')::int)), COUNT(*)
+                FROM events e
+                CROSS JOIN LATERAL (VALUES
+                    (''),
+                    -- Same rule as record(): other modes only count towards all modes
+                    (CASE WHEN COALESCE(e.mode, e.context->>'mode') = ANY($2::varchar[])
+                          THEN COALESCE(e.mode, e.context->>'mode') END)
+                ) AS m(mode)
+                WHERE e.type = 'quiz_answered'
+                AND e.user_id IS NOT NULL
+                AND m.mode IS NOT NULL
+                AND ($1::date IS NULL OR e.created_at >= $1::timestamp AT TIME ZONE 'UTC')
+                GROUP BY 2, 3, 4
+            """, since, list(BOARD_MODES))
+
+            await conn.execute("""
+                INSERT INTO leaderboard_scores (period, period_start, mode, user_id, score, games_played)
+                SELECT 'all_time', $2, mode, user_id, SUM(score), SUM(games_played)
+                FROM leaderboard_scores
+                WHERE period = 'daily'
+                AND ($1::date IS NULL OR period_start >= $1)
+                GROUP BY mode, user_id
+                ON CONFLICT (period, period_start, mode, user_id) DO UPDATE
+                SET score = leaderboard_scores.score + EXCLUDED.score,
+                    games_played = leaderboard_scores.games_played + EXCLUDED.games_played,
+                    updated_at = NOW()
+            """, since, ALL_TIME_START)
+
+            if days is None:
+                await conn.execute("""
+                    DELETE FROM leaderboard_scores
+                    WHERE period = 'daily' AND period_start < $1
+                """, self._today() - timedelta(days=self.retention_days))
+
+        self._boards.clear()
+        logger.info(f"Leaderboard backfilled from events ({'all' if days is None else f'last {days} days'})")
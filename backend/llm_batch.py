@@ -0,0 +1,45 @@
+"""
+Helpers for batched LLM generation
+One request returns a JSON array of items; each item is parsed on its own so
+a single malformed or truncated entry doesn't throw away the whole batch
+"""
+import json
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+_decoder = json.JSONDecoder()
+
+
+def parse_json_items(text: str) -> List[Dict[str, Any]]:
+    """
+    Pull every complete JSON object out of a (possibly broken) JSON array
+
+    Works through the text object by object: anything that fails to decode is
+    skipped up to the next '{' that does, and a response cut off by max_tokens
+    still yields every item before the cut.
+    """
+    start = text.find('[')
+    pos = start + 1 if start >= 0 else 0
+    items = []
+
+    while True:
+        pos = text.find('{', pos)
+        if pos < 0:
+            break
+        try:
+            item, end = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            pos += 1
+            continue
+        if isinstance(item, dict):
+            items.append(item)
+        pos = end
+
+    return items
+
+
+def batch_max_tokens(count: int, per_item: int, overhead: int = 200, cap: int = 4096) -> int:
+    """Output budget for a batch of `count` items, within the model's output limit"""
+    return min(cap, overhead + count * per_item)
@@ -0,0 +1,125 @@
+"""
+Process-wide rate limiting for LLM API calls
+A requests-per-minute / tokens-per-minute token bucket shared by every
+generator in the process, plus jittered backoff for 429/5xx retries
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Worth retrying: rate limited, overloaded (529) or a transient server error
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504, 529}
+
+
+class TokenBucketLimiter:
+    """
+    Two token buckets refilled continuously: one for requests, one for tokens
+
+    Callers acquire() an estimate before each request and settle() with the
+    real usage afterwards, so the token bucket tracks what the API counts.
+    Waiters are served in arrival order. A 429 can pause() the whole bucket
+    so every generator backs off together instead of each hammering the API.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens: int):
+        """Wait until one request and `tokens` tokens are available, then take them"""
+        # A single call bigger than the whole bucket would never fit
+        tokens = min(tokens, self.tokens_per_minute)
+        started = time.monotonic()
+
+        async with self._lock:
+            while True:
+                self._refill()
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0 and self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    break
+
+                wait = max(
+                    pause,
+                    (1 - self._requests) * 60 / self.requests_per_minute,
+                    (tokens - self._tokens) * 60 / self.tokens_per_minute
+                )
+                await asyncio.sleep(max(wait, 0.01))
+
+        waited = time.monotonic() - started
+        if waited > 0.01:
+            self.waits += 1
+            self.wait_seconds += waited
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the token bucket once the real usage is known"""
+        self._tokens = min(self.tokens_per_minute, self._tokens + estimated - actual)
+
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds` (e.g. from a 429 retry-after)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests_available": round(self._requests, 2),
+            "tokens_available": round(self._tokens),
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 2)
+        }
+
+
+_limiters: Dict[str, TokenBucketLimiter] = {}
+
+
+def get_limiter(provider: str = "anthropic") -> TokenBucketLimiter:
+    """
+    The shared limiter for a provider, sized from <PROVIDER>_RPM / <PROVIDER>_TPM
+    """
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        prefix = provider.upper()
+        limiter = TokenBucketLimiter(
+            requests_per_minute=int(os.getenv(f"{prefix}_RPM", "50")),
+            tokens_per_minute=int(os.getenv(f"{prefix}_TPM", "50000"))
+        )
+        _limiters[provider] = limiter
+    return limiter
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Rough pre-call estimate: ~4 characters per input token plus the output budget"""
+    return len(prompt) // 4 + max_tokens
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0,
+                  retry_after: Optional[str] = None) -> float:
+    """
+    Full-jitter exponential backoff; a server-supplied retry-after wins
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), cap)
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
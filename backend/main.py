@@ -11,7 +11,6 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import os
-import json
 import logging
 import asyncio
 from uuid import UUID, uuid4
@@ -19,8 +18,10 @@ from contextlib import asynccontextmanager
 
 # Import our modules
 from database import db
-from roaring_bitmap_dedup import RoaringBitmapDeduplication
+from roaring_bitmap_memory import create_roaring_dedup
+from event_partitions import ensure_partitions, is_partitioned
 from audio_service import audio_service
+from provider_client import client_stats, close_clients
 from auth_utils import hash_password, verify_password, validate_password_strength, validate_email_format, generate_username_from_email
 from auth_password_reset import router as password_reset_router
 from email_service import email_service
@@ -32,13 +33,40 @@ async def lifespan(app: FastAPI):
     # Startup
     await db.connect()
     # Initialize roaring bitmap deduplication
-    rb_dedup = RoaringBitmapDeduplication()
+    # (in-memory pyroaring engine when available, SQL otherwise)
+    rb_dedup = create_roaring_dedup(cache=db.cache)
     async with db.pool.acquire() as conn:
         await rb_dedup.initialize_user_bitmaps(conn)
+        await db.initialize_event_columns(conn)
+        if await is_partitioned(conn):
+            try:
+                await ensure_partitions(conn)
+            except Exception as e:
+                # Writes still land in events_default; the maintain timer retries
+                logger.error(f"Could not create upcoming events partitions: {e}")
+        # Warm the random content sampler so the first request doesn't pay for it
+        await db.sampler.refresh(conn, full=True)
+        await db.cache.initialize_triggers(conn)
+        await db.leaderboard.initialize(conn)
+        await db.analytics.initialize(conn)
+        await db.economy.initialize(conn)
+        await db.progress.initialize(conn)
+        await db.player.initialize(conn)
+    await rb_dedup.start(db.pool)
     app.state.rb_dedup = rb_dedup
-    logger.info("Roaring bitmap deduplication initialized")
+    logger.info(f"Roaring bitmap deduplication initialized ({type(rb_dedup).__name__})")
+    # Content cache only serves reads while it's listening for content_changed
+    await db.cache.start(db.database_url)
+    # Analytics endpoints read rollups that this keeps folding events into
+    await db.analytics.start(db.pool)
+    # Flushes coalesced quiz progress and recovers answers a crashed worker held
+    await db.progress.start(db.pool)
+    # Applies quest progress from answers, finished sets and feedback
+    await db.quests.start(db.pool)
     yield
-    # Shutdown
+    # Shutdown - flush buffered bitmap updates while the pool is still open
+    await rb_dedup.stop()
+    await close_clients()
     await db.disconnect()
 
 # Initialize FastAPI app with enhanced OpenAPI documentation
@@ -283,7 +311,11 @@ async def health_check():
     """Returns the health status of the API"""
     return {
         "status": "healthy",
-        "timestamp": datetime.utcnow()
+        "timestamp": datetime.utcnow(),
+        "content_cache": db.cache.stats(),
+        "answer_keys": db.answer_keys.stats(),
+        "quests": db.quests.stats(),
+        "providers": client_stats()
     }
 
 # Content endpoints
@@ -404,8 +436,8 @@ async def get_current_quote(category: str = "wisdom"):
                 return {
                     "id": str(quote["id"]),
                     "type": quote["type"],
-                    "data": json.loads(quote["data"]),
-                    "metadata": json.loads(quote["metadata"]) if quote["metadata"] else {},
+                    "data": quote["data"],
+                    "metadata": quote["metadata"] or {},
                     "tags": quote["tags"]
                 }
     except Exception as e:
@@ -489,89 +521,95 @@ async def get_quiz_sets(
         )
     
     async with db.pool.acquire() as conn:
-        # Build the query
-        query_parts = [
-            "SELECT c.id, c.type, c.data, c.metadata, c.created_at",
-            "FROM content c",
-            "WHERE c.type = 'quiz_set'",
-            "AND c.is_active = true"
-        ]
-        
-        params = []
-        param_count = 0
-        
-        # Add category filter if specified
-        if category:
+        if order in ("newest", "oldest"):
+            # Build the query
+            query_parts = [
+                "SELECT c.id, c.type, c.data, c.metadata, c.created_at",
+                "FROM content c",
+                "WHERE c.type = 'quiz_set'",
+                "AND c.is_active = true"
+            ]
+
+            params = []
+            param_count = 0
+
+            # Add category filter if specified
+            if category:
+                param_count += 1
+                query_parts.append(f"AND c.data->>'category' = ${param_count}")
+                params.append(category)
+
+            # Add ordering
+            if order == "newest":
+                query_parts.append("ORDER BY c.created_at DESC")
+            else:
+                query_parts.append("ORDER BY c.created_at ASC")
+
+            # Add limit
             param_count += 1
-            query_parts.append(f"AND c.data->>'category' = ${param_count}")
-            params.append(category)
-        
-        # Add ordering
-        if order == "newest":
-            query_parts.append("ORDER BY c.created_at DESC")
-        elif order == "oldest":
-            query_parts.append("ORDER BY c.created_at ASC")
-        else:  # random
-            query_parts.append("ORDER BY RANDOM()")
-        
-        # Add limit
-        param_count += 1
-        query_parts.append(f"LIMIT ${param_count}")
-        params.append(count)
-        
-        # Execute query
-        query = " ".join(query_parts)
-        rows = await conn.fetch(query, *params)
-        
+            query_parts.append(f"LIMIT ${param_count}")
+            params.append(count)
+
+            # Execute query
+            query = " ".join(query_parts)
+            rows = await conn.fetch(query, *params)
+        else:  # random - sampled in memory, fetched by primary key
+            rows = await db.fetch_random_content(conn, 'quiz_set', count, category)
+
+        # Pick each quiz's mode up front so all variations load in one query
+        selected_modes = {}
+        variations = {}
+        if include_variations and rows:
+            import random
+            for row in rows:
+                if mode == "random":
+                    # Pick a random mode for this quiz
+                    selected_modes[row["id"]] = random.choice(['chaos', 'zen', 'speed', 'poqpoq'])
+                else:
+                    selected_modes[row["id"]] = mode if mode in ['chaos', 'zen', 'speed'] else 'poqpoq'
+
+            # Fetch the variations (cached per content id, misses load in one query)
+            all_variations = await db.cache.get_variations(conn, list(selected_modes.keys()))
+            for content_id, selected_mode in selected_modes.items():
+                if selected_mode in all_variations.get(content_id, {}):
+                    variations[content_id] = all_variations[content_id][selected_mode]
+
         results = []
         for row in rows:
             quiz_data = {
                 "id": str(row["id"]),
                 "type": row["type"],
-                "data": json.loads(row["data"]) if isinstance(row["data"], str) else row["data"],
-                "metadata": json.loads(row["metadata"]) if isinstance(row["metadata"], str) else row["metadata"],
+                "data": row["data"],
+                "metadata": row["metadata"],
                 "created_at": row["created_at"].isoformat()
             }
             
-            # Add mode variations if requested
-            if include_variations:
-                # Determine which mode(s) to fetch
-                if mode == "random":
-                    # Pick a random mode for this quiz
-                    import random
-                    selected_mode = random.choice(['chaos', 'zen', 'speed', 'poqpoq'])
-                else:
-                    selected_mode = mode if mode in ['chaos', 'zen', 'speed'] else 'poqpoq'
+            # Apply the mode variation if one was found
+            if row["id"] in variations:
+                selected_mode = selected_modes[row["id"]]
+                var_data = variations[row["id"]]
+                # Cached rows are shared between requests - copy what gets modified
+                quiz_data["data"] = dict(quiz_data["data"])
                 
-                # Fetch the variation
-                var_query = """
-                    SELECT mode, variation_data 
-                    FROM content_variations 
-                    WHERE content_id = $1 AND mode = $2
-                """
-                
-                variation = await conn.fetchrow(var_query, row["id"], selected_mode)
-                
-                if variation:
-                    var_data = json.loads(variation["variation_data"]) if isinstance(variation["variation_data"], str) else variation["variation_data"]
-                    
-                    # Apply variation to quiz data
-                    if selected_mode == 'chaos' and 'questions' in var_data:
-                        quiz_data["data"]["questions"] = var_data["questions"]
-                        quiz_data["mode"] = "chaos"
-                        quiz_data["mode_effects"] = var_data.get("chaos_effects", [])
-                    elif selected_mode == 'zen' and 'questions' in var_data:
-                        # Merge zen hints into questions
-                        for i, q in enumerate(quiz_data["data"]["questions"]):
-                            if i < len(var_data["questions"]):
-                                q["hint"] = var_data["questions"][i].get("hint", "")
-                        quiz_data["mode"] = "zen"
-                        quiz_data["no_timer"] = True
-                    elif selected_mode == 'speed':
-                        quiz_data["mode"] = "speed"
-                        quiz_data["time_per_question"] = var_data.get("time_per_question", 10)
-                    else:
-                        quiz_data["mode"] = "poqpoq"
+                # Apply variation to quiz data
+                if selected_mode == 'chaos' and 'questions' in var_data:
+                    quiz_data["data"]["questions"] = var_data["questions"]
+                    quiz_data["mode"] = "chaos"
+                    quiz_data["mode_effects"] = var_data.get("chaos_effects", [])
+                elif selected_mode == 'zen' and 'questions' in var_data:
+                    # Merge zen hints into questions
+                    questions = [dict(q) for q in quiz_data["data"].get("questions", [])]
+                    for i, q in enumerate(questions):
+                        if i < len(var_data["questions"]):
+                            q["hint"] = var_data["questions"][i].get("hint", "")
+                    quiz_data["data"]["questions"] = questions
+                    quiz_data["mode"] = "zen"
+                    quiz_data["no_timer"] = True
+                elif selected_mode == 'speed':
+                    quiz_data["mode"] = "speed"
+                    quiz_data["time_per_question"] = var_data.get("time_per_question", 10)
+                else:
+                    quiz_data["mode"] = "poqpoq"
             
             results.append(quiz_data)
         
@@ -600,10 +638,9 @@ async def get_pun_sets(
             )
             
             # Mark as seen
-            for item in results:
-                await app.state.rb_dedup.mark_content_seen(
-                    conn, str(user_id), "pun", item['id']
-                )
+            await app.state.rb_dedup.mark_many_seen(
+                conn, str(user_id), "pun", [item['id'] for item in results]
+            )
             
             return results
             
@@ -615,35 +652,36 @@ async def get_pun_sets(
                 return results
         
         # Original logic for anonymous users (continues below)
-        # Build query
-        query_parts = [
-            "SELECT id, type, data, metadata, created_at",
-            "FROM content",
-            "WHERE type = 'pun_set'",
-            "AND is_active = true"
-        ]
-        
-        # Add ordering
-        if order == "newest":
-            query_parts.append("ORDER BY created_at DESC")
-        elif order == "oldest":
-            query_parts.append("ORDER BY created_at ASC")
-        else:  # random
-            query_parts.append("ORDER BY RANDOM()")
-        
-        query_parts.append("LIMIT $1")
-        
-        # Execute query
-        query = " ".join(query_parts)
-        rows = await conn.fetch(query, count)
+        if order in ("newest", "oldest"):
+            # Build query
+            query_parts = [
+                "SELECT id, type, data, metadata, created_at",
+                "FROM content",
+                "WHERE type = 'pun_set'",
+                "AND is_active = true"
+            ]
+
+            # Add ordering
+            if order == "newest":
+                query_parts.append("ORDER BY created_at DESC")
+            else:
+                query_parts.append("ORDER BY created_at ASC")
+
+            query_parts.append("LIMIT $1")
+
+            # Execute query
+            query = " ".join(query_parts)
+            rows = await conn.fetch(query, count)
+        else:  # random - sampled in memory, fetched by primary key
+            rows = await db.fetch_random_content(conn, 'pun_set', count)
         
         results = []
         for row in rows:
             pun_data = {
                 "id": str(row["id"]),
                 "type": row["type"],
-                "data": json.loads(row["data"]) if isinstance(row["data"], str) else row["data"],
-                "metadata": json.loads(row["metadata"]) if isinstance(row["metadata"], str) else row["metadata"],
+                "data": row["data"],
+                "metadata": row["metadata"],
                 "created_at": row["created_at"].isoformat()
             }
             results.append(pun_data)
@@ -673,10 +711,9 @@ async def get_quote_sets(
             )
             
             # Mark as seen
-            for item in results:
-                await app.state.rb_dedup.mark_content_seen(
-                    conn, str(user_id), "quote", item['id']
-                )
+            await app.state.rb_dedup.mark_many_seen(
+                conn, str(user_id), "quote", [item['id'] for item in results]
+            )
             
             return results
             
@@ -688,35 +725,36 @@ async def get_quote_sets(
                 return results
         
         # Original logic for anonymous users (continues below)
-        # Build query
-        query_parts = [
-            "SELECT id, type, data, metadata, created_at",
-            "FROM content",
-            "WHERE type = 'quote_set'",
-            "AND is_active = true"
-        ]
-        
-        # Add ordering
-        if order == "newest":
-            query_parts.append("ORDER BY created_at DESC")
-        elif order == "oldest":
-            query_parts.append("ORDER BY created_at ASC")
-        else:  # random
-            query_parts.append("ORDER BY RANDOM()")
-        
-        query_parts.append("LIMIT $1")
-        
-        # Execute query
-        query = " ".join(query_parts)
-        rows = await conn.fetch(query, count)
+        if order in ("newest", "oldest"):
+            # Build query
+            query_parts = [
+                "SELECT id, type, data, metadata, created_at",
+                "FROM content",
+                "WHERE type = 'quote_set'",
+                "AND is_active = true"
+            ]
+
+            # Add ordering
+            if order == "newest":
+                query_parts.append("ORDER BY created_at DESC")
+            else:
+                query_parts.append("ORDER BY created_at ASC")
+
+            query_parts.append("LIMIT $1")
+
+            # Execute query
+            query = " ".join(query_parts)
+            rows = await conn.fetch(query, count)
+        else:  # random - sampled in memory, fetched by primary key
+            rows = await db.fetch_random_content(conn, 'quote_set', count)
         
         results = []
         for row in rows:
             quote_data = {
                 "id": str(row["id"]),
                 "type": row["type"],
-                "data": json.loads(row["data"]) if isinstance(row["data"], str) else row["data"],
-                "metadata": json.loads(row["metadata"]) if isinstance(row["metadata"], str) else row["metadata"],
+                "data": row["data"],
+                "metadata": row["metadata"],
                 "created_at": row["created_at"].isoformat()
             }
             results.append(quote_data)
@@ -746,10 +784,9 @@ async def get_joke_sets(
             )
             
             # Mark as seen
-            for item in results:
-                await app.state.rb_dedup.mark_content_seen(
-                    conn, str(user_id), "joke", item['id']
-                )
+            await app.state.rb_dedup.mark_many_seen(
+                conn, str(user_id), "joke", [item['id'] for item in results]
+            )
             
             return results
             
@@ -761,35 +798,36 @@ async def get_joke_sets(
                 return results
         
         # Original logic for anonymous users (continues below)
-        # Build query
-        query_parts = [
-            "SELECT id, type, data, metadata, created_at",
-            "FROM content",
-            "WHERE type = 'joke_set'",
-            "AND is_active = true"
-        ]
-        
-        # Add ordering
-        if order == "newest":
-            query_parts.append("ORDER BY created_at DESC")
-        elif order == "oldest":
-            query_parts.append("ORDER BY created_at ASC")
-        else:  # random
-            query_parts.append("ORDER BY RANDOM()")
-        
-        query_parts.append("LIMIT $1")
-        
-        # Execute query
-        query = " ".join(query_parts)
-        rows = await conn.fetch(query, count)
+        if order in ("newest", "oldest"):
+            # Build query
+            query_parts = [
+                "SELECT id, type, data, metadata, created_at",
+                "FROM content",
+                "WHERE type = 'joke_set'",
+                "AND is_active = true"
+            ]
+
+            # Add ordering
+            if order == "newest":
+                query_parts.append("ORDER BY created_at DESC")
+            else:
+                query_parts.append("ORDER BY created_at ASC")
+
+            query_parts.append("LIMIT $1")
+
+            # Execute query
+            query = " ".join(query_parts)
+            rows = await conn.fetch(query, count)
+        else:  # random - sampled in memory, fetched by primary key
+            rows = await db.fetch_random_content(conn, 'joke_set', count)
         
         results = []
         for row in rows:
             joke_data = {
                 "id": str(row["id"]),
                 "type": row["type"],
-                "data": json.loads(row["data"]) if isinstance(row["data"], str) else row["data"],
-                "metadata": json.loads(row["metadata"]) if isinstance(row["metadata"], str) else row["metadata"],
+                "data": row["data"],
+                "metadata": row["metadata"],
                 "created_at": row["created_at"].isoformat()
             }
             results.append(joke_data)
@@ -819,10 +857,9 @@ async def get_trivia_sets(
             )
             
             # Mark as seen
-            for item in results:
-                await app.state.rb_dedup.mark_content_seen(
-                    conn, str(user_id), "trivia", item['id']
-                )
+            await app.state.rb_dedup.mark_many_seen(
+                conn, str(user_id), "trivia", [item['id'] for item in results]
+            )
             
             return results
             
@@ -834,35 +871,36 @@ async def get_trivia_sets(
                 return results
         
         # Original logic for anonymous users (continues below)
-        # Build query
-        query_parts = [
-            "SELECT id, type, data, metadata, created_at",
-            "FROM content",
-            "WHERE type = 'trivia_set'",
-            "AND is_active = true"
-        ]
-        
-        # Add ordering
-        if order == "newest":
-            query_parts.append("ORDER BY created_at DESC")
-        elif order == "oldest":
-            query_parts.append("ORDER BY created_at ASC")
-        else:  # random
-            query_parts.append("ORDER BY RANDOM()")
-        
-        query_parts.append("LIMIT $1")
-        
-        # Execute query
-        query = " ".join(query_parts)
-        rows = await conn.fetch(query, count)
+        if order in ("newest", "oldest"):
+            # Build query
+            query_parts = [
+                "SELECT id, type, data, metadata, created_at",
+                "FROM content",
+                "WHERE type = 'trivia_set'",
+                "AND is_active = true"
+            ]
+
+            # Add ordering
+            if order == "newest":
+                query_parts.append("ORDER BY created_at DESC")
+            else:
+                query_parts.append("ORDER BY created_at ASC")
+
+            query_parts.append("LIMIT $1")
+
+            # Execute query
+            query = " ".join(query_parts)
+            rows = await conn.fetch(query, count)
+        else:  # random - sampled in memory, fetched by primary key
+            rows = await db.fetch_random_content(conn, 'trivia_set', count)
         
         results = []
         for row in rows:
             trivia_data = {
                 "id": str(row["id"]),
                 "type": row["type"],
-                "data": json.loads(row["data"]) if isinstance(row["data"], str) else row["data"],
-                "metadata": json.loads(row["metadata"]) if isinstance(row["metadata"], str) else row["metadata"],
+                "data": row["data"],
+                "metadata": row["metadata"],
                 "created_at": row["created_at"].isoformat()
             }
             results.append(trivia_data)
@@ -1012,7 +1050,7 @@ async def google_auth(auth_request: GoogleAuthRequest):
                                 stats->'economy' || $1::jsonb
                             )
                             WHERE user_id = $2
-                        """, json.dumps(economy), user_id)
+                        """, economy, user_id)
                         
                         migrated_data = True
                         
@@ -1169,7 +1207,7 @@ async def register(register_request: RegisterRequest):
                             $1::jsonb
                         )
                         WHERE user_id = $2
-                    """, json.dumps(session_data), user_id)
+                    """, session_data, user_id)
                     
                     migrated_data = True
                     
@@ -1775,11 +1813,11 @@ class EnergySpendRequest(BaseModel):
 async def spend_energy(request: EnergySpendRequest):
     """Spend energy to start a game or activity"""
     try:
-        # Get current economy state
-        economy_state = await db.get_economy_state(request.user_id, request.session_id)
+        # Single conditional UPDATE - concurrent spends can't both take the last energy
+        spent, economy_state = await db.spend_energy(request.user_id, request.session_id, request.amount)
         
         # Check if user has enough energy
-        if economy_state['energy'] < request.amount:
+        if not spent:
             raise HTTPException(
                 status_code=400,
                 detail={
@@ -1790,9 +1828,6 @@ async def spend_energy(request: EnergySpendRequest):
                 }
             )
         
-        # Deduct energy
-        economy_state['energy'] -= request.amount
-        
         # Log the energy spend transaction
         # TODO: Implement transaction logging
         # await db.log_transaction(
@@ -1807,9 +1842,6 @@ async def spend_energy(request: EnergySpendRequest):
         #     }
         # )
         
-        # Save updated state
-        await db.save_economy_state(request.user_id, request.session_id, economy_state)
-        
         return {
             "success": True,
             "remaining_energy": economy_state['energy'],
@@ -1846,17 +1878,25 @@ async def process_game_result(
     # Calculate rewards based on result
     rewards = calculate_rewards(result)
     
-    # Get current economy state
-    economy_state = await db.get_economy_state(user_id, session_id)
-    
-    # Apply rewards
-    new_state = apply_rewards(economy_state, rewards)
+    # Add rewards in place; the level follows XP in the same statement
+    new_state, previous_level = await db.grant_rewards(user_id, session_id, rewards)
     
     # Check for level up
-    level_up = check_level_up(economy_state, new_state)
+    level_up = check_level_up(previous_level, new_state["level"])
+    
+    # Set finished - write out the player's buffered quiz progress now
+    if user_id:
+        try:
+            await db.progress.flush(user_id)
+        except Exception as e:
+            # Still buffered; the next periodic flush retries it
+            logger.error(f"Progress flush failed for {user_id}: {e}")
     
-    # Save new state
-    await db.save_economy_state(user_id, session_id, new_state)
+    # Finished-set quests are advanced by the quest engine
+    db.quests.publish(user_id, "set_completed")
+    db.quests.publish(user_id, result.type)
+    if result.perfect_score:
+        db.quests.publish(user_id, "perfect_set")
     
     return {
         "success": True,
@@ -1933,33 +1973,9 @@ def calculate_rewards(result: GameResult) -> dict:
     
     return rewards
 
-def apply_rewards(state: dict, rewards: dict) -> dict:
-    """Apply rewards to current state"""
-    new_state = state.copy()
-    
-    for resource, amount in rewards.items():
-        if resource in new_state:
-            new_state[resource] = new_state.get(resource, 0) + amount
-            
-    return new_state
-
-def check_level_up(old_state: dict, new_state: dict) -> Optional[dict]:
-    """Check if player leveled up"""
-    old_level = old_state.get("level", 1)
-    
-    # Calculate level from XP (polynomial progression)
-    xp = new_state.get("xp", 0)
-    new_level = 1
-    
-    while True:
-        xp_for_next = 100 + (new_level * new_level * 50)
-        if xp >= xp_for_next:
-            new_level += 1
-        else:
-            break
-    
+def check_level_up(old_level: int, new_level: int) -> Optional[dict]:
+    """Check if player leveled up (levels come from XP via economy_level() in SQL)"""
     if new_level > old_level:
-        new_state["level"] = new_level
         return {
             "old_level": old_level,
             "new_level": new_level,
@@ -2161,6 +2177,7 @@ async def submit_feedback(feedback: FeedbackRequest):
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     
+    db.quests.publish(feedback.user_id, "feedback_given")
     return result
 
 @app.get("/api/feedback/content/{content_id}",
@@ -2199,7 +2216,7 @@ async def patch_quiz_set(request: Dict[str, Any]):
                 raise HTTPException(status_code=404, detail="Quiz set not found")
             
             # Parse the data
-            data = json.loads(quiz_set["data"]) if isinstance(quiz_set["data"], str) else quiz_set["data"]
+            data = quiz_set["data"]
             existing_questions = data.get("questions", [])
             
             # Extract context from the existing set
@@ -2234,7 +2251,7 @@ async def patch_quiz_set(request: Dict[str, Any]):
                 SET data = $1,
                     updated_at = $2
                 WHERE id = $3
-            """, json.dumps(data), datetime.utcnow(), UUID(set_id))
+            """, data, datetime.utcnow(), UUID(set_id))
             
             logger.info(f"Patched quiz set {set_id} with {len(new_questions)} new questions")
             
@@ -2282,8 +2299,8 @@ async def get_all_content_by_type(
                 content.append({
                     "id": str(row["id"]),
                     "type": row["type"],
-                    "data": json.loads(row["data"]) if isinstance(row["data"], str) else row["data"],
-                    "metadata": json.loads(row["metadata"]) if row["metadata"] and isinstance(row["metadata"], str) else row["metadata"],
+                    "data": row["data"],
+                    "metadata": row["metadata"],
                     "tags": row["tags"],
                     "created_at": row["created_at"].isoformat() if row["created_at"] else None,
                     "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None
@@ -2325,6 +2342,26 @@ async def get_validation_stats():
         "timestamp": datetime.utcnow()
     }
 
+@app.get("/api/generation/stats",
+    tags=["Generation"],
+    summary="Get content generation statistics",
+    description="Generation queue depth, last-hour throughput and the content buckets closest to running out")
+async def get_generation_stats():
+    """Get generation scheduler statistics"""
+    from generation_scheduler import generation_stats
+
+    try:
+        async with db.pool.acquire() as conn:
+            stats = await generation_stats(conn)
+    except Exception as e:
+        # Tables only exist once the scheduler has run
+        logger.error(f"Error getting generation stats: {e}")
+        raise HTTPException(status_code=503, detail="Generation scheduler not initialized")
+    return {
+        "generation_stats": stats,
+        "timestamp": datetime.utcnow()
+    }
+
 @app.post("/api/validation/validate/{content_id}",
     tags=["Validation"],
     summary="Manually trigger validation",
@@ -2695,10 +2732,9 @@ async def mark_content_set_completed(
     """Mark an entire content set as completed"""
     async with db.pool.acquire() as conn:
         # Mark all items in the set as completed
-        for content_id in content_ids:
-            await app.state.rb_dedup.mark_content_completed(
-                conn, str(user_id), content_type, content_id
-            )
+        await app.state.rb_dedup.mark_many_completed(
+            conn, str(user_id), content_type, content_ids
+        )
         
         # Get updated stats
         stats = await app.state.rb_dedup.get_user_stats(
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Move every user's user_progress.stats blob into the normalized tables:
+economy into user_economy, quests / badges / assets into user_quests,
+user_badges and user_assets
+
+The API migrates users lazily the first time it touches them, so this can
+run online at any time; it just gets everyone else done. Already-migrated
+users are skipped, so stop it any time and run it again to carry on.
+
+    python migrate_user_stats.py
+    python migrate_user_stats.py --batch-size 200 --pause 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+import logging
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+load_dotenv()
+
+from database import db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def migrate_user_stats(batch_size: int, pause: float):
+    """Copy stats blobs into the normalized tables, one short transaction per batch"""
+
+    try:
+        await db.connect()
+        logger.info("Connected to database")
+
+        async with db.pool.acquire() as conn:
+            await db.economy.initialize(conn)
+            await db.player.initialize(conn)
+
+            last_id = None
+            users_done = economy_rows = migrated = 0
+            while True:
+                user_ids = await conn.fetch("""
+                    SELECT id
+                    FROM users
+                    WHERE ($1::uuid IS NULL OR id > $1::uuid)
+                    ORDER BY id
+                    LIMIT $2
+                """, last_id, batch_size)
+                if not user_ids:
+                    break
+                user_ids = [row["id"] for row in user_ids]
+
+                async with conn.transaction():
+                    seeded, _ = await db.economy.seed_users(conn, user_ids)
+                    economy_rows += seeded
+                    migrated += await db.player.migrate_users(conn, user_ids)
+
+                users_done += len(user_ids)
+                last_id = user_ids[-1]
+                logger.info(
+                    f"{users_done} users checked: {economy_rows} economy rows created, "
+                    f"{migrated} quest/badge/asset blobs migrated"
+                )
+                if pause:
+                    await asyncio.sleep(pause)
+
+            logger.info("User stats migration complete")
+
+    except Exception as e:
+        logger.error(f"User stats migration failed: {e}")
+        raise
+    finally:
+        await db.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate user_progress.stats blobs into normalized tables")
+    parser.add_argument("--batch-size", type=int, default=500, help="Users per transaction")
+    parser.add_argument("--pause", type=float, default=0.1, help="Seconds to sleep between batches")
+    args = parser.parse_args()
+    asyncio.run(migrate_user_stats(args.batch_size, args.pause))
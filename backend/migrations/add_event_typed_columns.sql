@@ -0,0 +1,27 @@
+-- Migration: Typed columns for hot quiz_answered event fields
+-- Date: 2026-10-16
+-- Purpose: Stop casting payload/context JSONB per row in analytics and leaderboard queries
+--
+-- The ADD COLUMNs are metadata-only (nullable, no default). The indexes are built
+-- CONCURRENTLY, so run this file outside a transaction (plain psql, no -1), then
+-- fill existing rows with: python backfill_event_columns.py
+
+ALTER TABLE events
+ADD COLUMN IF NOT EXISTS correct BOOLEAN,
+ADD COLUMN IF NOT EXISTS score INTEGER,
+ADD COLUMN IF NOT EXISTS time_taken DOUBLE PRECISION,
+ADD COLUMN IF NOT EXISTS category VARCHAR(100),
+ADD COLUMN IF NOT EXISTS difficulty VARCHAR(20),
+ADD COLUMN IF NOT EXISTS mode VARCHAR(20);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_type_created_at ON events(type, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_content_id ON events(content_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_user_category ON events(user_id, category);
+
+-- Add comment for documentation
+COMMENT ON COLUMN events.correct IS 'quiz_answered: payload.correct';
+COMMENT ON COLUMN events.score IS 'quiz_answered: payload.score';
+COMMENT ON COLUMN events.time_taken IS 'quiz_answered: payload.time_taken in seconds';
+COMMENT ON COLUMN events.category IS 'quiz_answered: payload.category';
+COMMENT ON COLUMN events.difficulty IS 'quiz_answered: payload.difficulty';
+COMMENT ON COLUMN events.mode IS 'quiz_answered: context.mode';
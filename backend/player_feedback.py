@@ -7,7 +7,6 @@ import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 from uuid import UUID, uuid4
-import json
 from database import db
 
 logger = logging.getLogger(__name__)
@@ -168,7 +167,7 @@ class PlayerFeedbackSystem:
                 }
             
             # Calculate difficulty average
-            difficulty_votes = json.loads(aggregate['difficulty_votes'])
+            difficulty_votes = aggregate['difficulty_votes'] or {}
             total_votes = sum(difficulty_votes.values())
             difficulty_avg = 3.0
             if total_votes > 0:
@@ -182,7 +181,7 @@ class PlayerFeedbackSystem:
                 'flags': aggregate['flag_count'],
                 'difficulty_average': round(difficulty_avg, 2),
                 'difficulty_votes': difficulty_votes,
-                'emotes': json.loads(aggregate['emote_counts']),
+                'emotes': aggregate['emote_counts'] or {},
                 'last_updated': aggregate['last_updated'].isoformat()
             }
     
@@ -207,7 +206,7 @@ class PlayerFeedbackSystem:
                 WHERE user_id = $1 AND content_type = 'feedback'
             """, user_id)
             
-            feedback_stats = json.loads(progress['stats']) if progress else {}
+            feedback_stats = (progress['stats'] or {}) if progress else {}
             
             return {
                 'user_id': str(user_id),
@@ -254,7 +253,7 @@ class PlayerFeedbackSystem:
                 VALUES ($1, $2, $3, $4, $5, $6, $7)
             """, feedback_record['id'], feedback_record['content_id'],
                 feedback_record.get('user_id'), feedback_record.get('session_id'),
-                feedback_record['feedback_type'], json.dumps(feedback_record['feedback_data']),
+                feedback_record['feedback_type'], feedback_record['feedback_data'],
                 datetime.utcnow())
     
     async def _update_feedback_aggregates(self, content_id: UUID, feedback_type: str, 
@@ -373,7 +372,7 @@ class PlayerFeedbackSystem:
                 WHERE user_id = $1 AND content_type = 'feedback'
             """, user_id)
             
-            current_stats = json.loads(current['stats']) if current else {}
+            current_stats = (current['stats'] or {}) if current else {}
             current_achievements = current_stats.get('achievements', [])
             
             # Add new achievements
@@ -392,7 +391,7 @@ class PlayerFeedbackSystem:
                 UPDATE user_progress
                 SET stats = $2, updated_at = CURRENT_TIMESTAMP
                 WHERE user_id = $1 AND content_type = 'feedback'
-            """, user_id, json.dumps(current_stats))
+            """, user_id, current_stats)
     
     async def _check_content_review_needed(self, content_id: UUID):
         """Check if content has too many flags and needs review"""
@@ -0,0 +1,368 @@
+"""
+Quests, badges and assets for JazzyPop players
+One row per quest / badge / asset in user_quests, user_badges and
+user_assets, changed with targeted INSERT / UPDATE statements instead of
+rewriting the whole user_progress.stats blob. Reads rebuild the documents
+the /api/quests, /api/badges and /api/assets endpoints always returned.
+
+Users are moved over from the blob lazily, the first time a worker touches
+them, and in bulk by migrate_user_stats.py; user_stats_migrated records who
+has been done so the copy happens exactly once.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Set
+from uuid import UUID, uuid4
+
+logger = logging.getLogger(__name__)
+
+TIER_ORDER = ['bronze', 'silver', 'gold', 'platinum']
+COSMETIC_TYPES = ('avatar_frame', 'theme')
+
+
+def _array(expr: str) -> str:
+    return f"CASE WHEN jsonb_typeof({expr}) = 'array' THEN {expr} ELSE '[]'::jsonb END"
+
+
+def _object(expr: str) -> str:
+    return f"CASE WHEN jsonb_typeof({expr}) = 'object' THEN {expr} ELSE '{{}}'::jsonb END"
+
+
+def _utc(expr: str) -> str:
+    """A naive-UTC isoformat string from the blob as a timestamptz, NULL if it doesn't parse"""
+    return f"player_blob_timestamp({expr})"
+
+
+# Copies the blob of every user in $1 that hasn't been migrated yet.
+# Rows that already exist win, so running it against a user who has
+# been written to since is harmless
+MIGRATE_SQL = f"""
+    WITH claimed AS (
+        INSERT INTO user_stats_migrated (user_id)
+        SELECT id FROM users WHERE id = ANY($1::uuid[])
+        ON CONFLICT (user_id) DO NOTHING
+        RETURNING user_id
+    ),
+    src AS (
+        SELECT p.user_id, p.stats
+        FROM user_progress p
+        JOIN claimed c ON c.user_id = p.user_id
+        WHERE jsonb_typeof(p.stats) = 'object'
+    ),
+    active_quests AS (
+        INSERT INTO user_quests (user_id, quest_id, quest_type, status, progress, target, data, started_at)
+        SELECT s.user_id, q->>'quest_id', q->>'type', 'active',
+               COALESCE((q->>'progress')::numeric::int, 0),
+               COALESCE((q->>'target')::numeric::int, 1),
+               q,
+               COALESCE({_utc("q->>'started_at'")}, NOW())
+        FROM src s, jsonb_array_elements({_array("s.stats->'quests'->'active'")}) q
+        WHERE q->>'quest_id' IS NOT NULL
+        ON CONFLICT (user_id, quest_id) DO NOTHING
+        RETURNING 1
+    ),
+    completed_quests AS (
+        -- The blob only kept the ids of completed quests
+        INSERT INTO user_quests (user_id, quest_id, status, data)
+        SELECT s.user_id, q #>> '{{}}', 'completed', jsonb_build_object('quest_id', q #>> '{{}}')
+        FROM src s, jsonb_array_elements({_array("s.stats->'quests'->'completed'")}) q
+        WHERE jsonb_typeof(q) = 'string'
+        ON CONFLICT (user_id, quest_id) DO NOTHING
+        RETURNING 1
+    ),
+    chains AS (
+        INSERT INTO user_quest_chains (user_id, chains)
+        SELECT s.user_id, s.stats->'quests'->'chains'
+        FROM src s
+        WHERE jsonb_typeof(s.stats->'quests'->'chains') = 'object'
+        AND s.stats->'quests'->'chains' <> '{{}}'::jsonb
+        ON CONFLICT (user_id) DO NOTHING
+        RETURNING 1
+    ),
+    badges AS (
+        INSERT INTO user_badges (user_id, badge_id, tier, data, earned_at, upgraded_at)
+        SELECT s.user_id, b->>'id', COALESCE(b->>'tier', 'bronze'),
+               b - 'id' - 'tier' - 'earned_at' - 'upgraded_at',
+               COALESCE({_utc("b->>'earned_at'")}, NOW()),
+               {_utc("b->>'upgraded_at'")}
+        FROM src s, jsonb_array_elements({_array("s.stats->'badges'")}) b
+        WHERE b->>'id' IS NOT NULL
+        ON CONFLICT (user_id, badge_id) DO NOTHING
+        RETURNING 1
+    ),
+    pets AS (
+        INSERT INTO user_assets (user_id, asset_type, asset_id, data, equipped, acquired_at)
+        SELECT s.user_id, 'pet', a->>'id', a - 'equipped',
+               COALESCE((a->>'equipped')::boolean, FALSE),
+               COALESCE({_utc("a->>'acquired_at'")}, NOW())
+        FROM src s, jsonb_array_elements({_array("s.stats->'assets'->'pets'")}) a
+        WHERE a->>'id' IS NOT NULL
+        ON CONFLICT (user_id, asset_type, asset_id) DO NOTHING
+        RETURNING 1
+    ),
+    inventory AS (
+        INSERT INTO user_assets (user_id, asset_type, asset_id, data, acquired_at)
+        SELECT s.user_id, 'inventory', COALESCE(i.item->>'id', 'item_' || i.n), i.item, NOW() + i.n * interval '1 microsecond'
+        FROM src s, jsonb_array_elements({_array("s.stats->'assets'->'inventory'")}) WITH ORDINALITY i(item, n)
+        ON CONFLICT (user_id, asset_type, asset_id) DO NOTHING
+        RETURNING 1
+    ),
+    equipped_cosmetics AS (
+        INSERT INTO user_assets (user_id, asset_type, asset_id, equipped)
+        SELECT s.user_id, e.key, e.value, TRUE
+        FROM src s, jsonb_each_text({_object("s.stats->'assets'->'cosmetics'->'equipped'")}) e
+        ON CONFLICT (user_id, asset_type, asset_id) DO NOTHING
+        RETURNING 1
+    ),
+    cosmetics AS (
+        INSERT INTO user_assets (user_id, asset_type, asset_id, data)
+        SELECT s.user_id, 'cosmetic', c.key, c.value
+        FROM src s, jsonb_each({_object("s.stats->'assets'->'cosmetics'")}) c
+        WHERE c.key <> 'equipped'
+        ON CONFLICT (user_id, asset_type, asset_id) DO NOTHING
+        RETURNING 1
+    )
+    SELECT COUNT(*) FROM claimed
+"""
+
+
+class PlayerStore:
+    """
+    Quest, badge and asset rows per user
+
+    Every public method makes sure the user has been copied out of the
+    stats blob first. Users known to be migrated are remembered in memory
+    (up to max_known), so that check is usually free.
+    """
+
+    def __init__(self, max_known: int = 100000):
+        self.max_known = max_known
+        self._migrated: Set[UUID] = set()
+
+    async def initialize(self, conn):
+        """Create the tables; safe to run on every startup"""
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_stats_migrated (
+                user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+                migrated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS user_quests (
+                user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                quest_id VARCHAR(100) NOT NULL,
+                quest_type VARCHAR(100),
+                status VARCHAR(20) NOT NULL DEFAULT 'active',
+                progress INTEGER NOT NULL DEFAULT 0,
+                target INTEGER NOT NULL DEFAULT 1,
+                -- The quest as it was added (title, rewards, ...)
+                data JSONB NOT NULL DEFAULT '{}',
+                started_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                completed_at TIMESTAMP WITH TIME ZONE,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, quest_id)
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_user_quests_active_type
+            ON user_quests(user_id, quest_type) WHERE status = 'active';
+
+            CREATE TABLE IF NOT EXISTS user_quest_chains (
+                user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+                chains JSONB NOT NULL DEFAULT '{}'
+            );
+
+            CREATE TABLE IF NOT EXISTS user_badges (
+                user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                badge_id VARCHAR(100) NOT NULL,
+                tier VARCHAR(20) NOT NULL DEFAULT 'bronze',
+                data JSONB NOT NULL DEFAULT '{}',
+                earned_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                upgraded_at TIMESTAMP WITH TIME ZONE,
+                PRIMARY KEY (user_id, badge_id)
+            );
+
+            -- asset_type: 'pet', 'inventory', 'cosmetic' or an equippable
+            -- cosmetic slot ('avatar_frame', 'theme')
+            CREATE TABLE IF NOT EXISTS user_assets (
+                user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                asset_type VARCHAR(30) NOT NULL,
+                asset_id VARCHAR(100) NOT NULL,
+                data JSONB NOT NULL DEFAULT '{}',
+                equipped BOOLEAN NOT NULL DEFAULT FALSE,
+                acquired_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, asset_type, asset_id)
+            );
+        """)
+        # One malformed timestamp in a blob must not fail the user's whole migration
+        await conn.execute("""
+            CREATE OR REPLACE FUNCTION player_blob_timestamp(value TEXT)
+            RETURNS TIMESTAMPTZ AS $$
+            BEGIN
+                RETURN value::timestamp AT TIME ZONE 'UTC';
+            EXCEPTION WHEN others THEN
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql STABLE;
+        """)
+        logger.info("Player store initialized")
+
+    # ========== MIGRATION ==========
+
+    async def migrate_users(self, conn, user_ids: Iterable[UUID]) -> int:
+        """Copy these users' stats blobs into the tables; returns users migrated now"""
+        user_ids = list(user_ids)
+        migrated = await conn.fetchval(MIGRATE_SQL, user_ids)
+        self._remember(user_ids)
+        return migrated
+
+    async def ensure_migrated(self, conn, user_ids: Iterable[UUID]):
+        """Migrate whichever of these users this worker hasn't seen yet"""
+        pending = [user_id for user_id in set(user_ids) if user_id not in self._migrated]
+        if pending:
+            await self.migrate_users(conn, pending)
+
+    async def _ensure(self, conn, user_id: UUID):
+        await self.ensure_migrated(conn, [user_id])
+
+    def _remember(self, user_ids: List[UUID]):
+        if len(self._migrated) + len(user_ids) > self.max_known:
+            self._migrated.clear()
+        self._migrated.update(user_ids)
+
+    # ========== QUESTS ==========
+
+    async def get_quests(self, conn, user_id: UUID) -> Dict[str, Any]:
+        await self._ensure(conn, user_id)
+        row = await conn.fetchrow("""
+            SELECT
+                (SELECT COALESCE(jsonb_agg(
+                            data || jsonb_build_object('quest_id', quest_id, 'progress', progress)
+                            ORDER BY started_at, quest_id
+                        ), '[]'::jsonb)
+                 FROM user_quests WHERE user_id = $1 AND status = 'active') AS active,
+                (SELECT COALESCE(jsonb_agg(quest_id ORDER BY completed_at NULLS FIRST, quest_id), '[]'::jsonb)
+                 FROM user_quests WHERE user_id = $1 AND status = 'completed') AS completed,
+                (SELECT chains FROM user_quest_chains WHERE user_id = $1) AS chains
+        """, user_id)
+        return {"active": row["active"], "completed": row["completed"], "chains": row["chains"] or {}}
+
+    async def add_quest(self, conn, user_id: UUID, quest_data: Dict[str, Any]) -> str:
+        """Start a quest; adding a quest id again restarts it"""
+        await self._ensure(conn, user_id)
+        quest_data['quest_id'] = quest_data.get('quest_id', f"quest_{uuid4().hex[:8]}")
+        quest_data['started_at'] = datetime.utcnow().isoformat()
+        quest_data['progress'] = 0
+
+        await conn.execute("""
+            INSERT INTO user_quests (user_id, quest_id, quest_type, status, progress, target, data, started_at)
+            VALUES ($1, $2, $3, 'active', 0, $4, $5, NOW())
+            ON CONFLICT (user_id, quest_id) DO UPDATE
+            SET quest_type = EXCLUDED.quest_type,
+                status = 'active',
+                progress = 0,
+                target = EXCLUDED.target,
+                data = EXCLUDED.data,
+                started_at = NOW(),
+                completed_at = NULL,
+                updated_at = NOW()
+        """, user_id, quest_data['quest_id'], quest_data.get('type'),
+            int(quest_data.get('target') or 1), quest_data)
+        return quest_data['quest_id']
+
+    # ========== BADGES ==========
+
+    async def get_badges(self, conn, user_id: UUID) -> List[Dict]:
+        await self._ensure(conn, user_id)
+        return await conn.fetchval("""
+            SELECT COALESCE(jsonb_agg(
+                       data || jsonb_strip_nulls(jsonb_build_object(
+                           'id', badge_id,
+                           'tier', tier,
+                           'earned_at', earned_at AT TIME ZONE 'UTC',
+                           'upgraded_at', upgraded_at AT TIME ZONE 'UTC'
+                       ))
+                       ORDER BY earned_at, badge_id
+                   ), '[]'::jsonb)
+            FROM user_badges
+            WHERE user_id = $1
+        """, user_id)
+
+    async def award_badge(self, conn, user_id: UUID, badge_id: str, tier: str = "bronze"):
+        """Award a badge, or raise its tier if this one is higher"""
+        await self._ensure(conn, user_id)
+        await conn.execute("""
+            INSERT INTO user_badges (user_id, badge_id, tier, earned_at)
+            VALUES ($1, $2, $3, NOW())
+            ON CONFLICT (user_id, badge_id) DO UPDATE
+            SET tier = EXCLUDED.tier,
+                upgraded_at = NOW()
+            WHERE COALESCE(array_position($4::varchar[], EXCLUDED.tier), 0)
+                > COALESCE(array_position($4::varchar[], user_badges.tier), 0)
+        """, user_id, badge_id, tier, TIER_ORDER)
+
+    # ========== ASSETS ==========
+
+    async def get_assets(self, conn, user_id: UUID) -> Dict[str, Any]:
+        await self._ensure(conn, user_id)
+        row = await conn.fetchrow("""
+            SELECT
+                COALESCE(jsonb_agg(data || jsonb_build_object('equipped', equipped)
+                                   ORDER BY acquired_at, asset_id)
+                         FILTER (WHERE asset_type = 'pet'), '[]'::jsonb) AS pets,
+                COALESCE(jsonb_agg(data ORDER BY acquired_at, asset_id)
+                         FILTER (WHERE asset_type = 'inventory'), '[]'::jsonb) AS inventory,
+                COALESCE(jsonb_object_agg(asset_id, data)
+                         FILTER (WHERE asset_type = 'cosmetic'), '{}'::jsonb) AS cosmetics,
+                jsonb_object_agg(asset_type, asset_id)
+                    FILTER (WHERE asset_type = ANY($2::varchar[]) AND equipped) AS equipped
+            FROM user_assets
+            WHERE user_id = $1
+        """, user_id, list(COSMETIC_TYPES))
+
+        cosmetics = row["cosmetics"]
+        if row["equipped"]:
+            cosmetics["equipped"] = row["equipped"]
+        return {"pets": row["pets"], "cosmetics": cosmetics, "inventory": row["inventory"]}
+
+    async def add_pet(self, conn, user_id: UUID, pet_data: Dict[str, Any]) -> str:
+        await self._ensure(conn, user_id)
+        pet_data['id'] = pet_data.get('id', f"pet_{uuid4().hex[:8]}")
+        pet_data['acquired_at'] = datetime.utcnow().isoformat()
+        pet_data['level'] = 1
+        pet_data['experience'] = 0
+
+        await conn.execute("""
+            INSERT INTO user_assets (user_id, asset_type, asset_id, data, acquired_at)
+            VALUES ($1, 'pet', $2, $3, NOW())
+            ON CONFLICT (user_id, asset_type, asset_id) DO UPDATE
+            SET data = EXCLUDED.data, acquired_at = NOW()
+        """, user_id, pet_data['id'], pet_data)
+        return pet_data['id']
+
+    async def equip_asset(self, conn, user_id: UUID, asset_type: str, asset_id: str):
+        """Equip a pet or cosmetic; everything else in the same slot is unequipped"""
+        await self._ensure(conn, user_id)
+        if asset_type == 'pet':
+            # Every pet row is locked and rewritten, so concurrent equips can't
+            # leave two pets equipped. An unknown id just unequips them all
+            await conn.execute("""
+                UPDATE user_assets
+                SET equipped = (asset_id = $2)
+                WHERE user_id = $1
+                AND asset_type = 'pet'
+            """, user_id, asset_id)
+
+        elif asset_type in COSMETIC_TYPES:
+            await conn.execute("""
+                WITH unequipped AS (
+                    UPDATE user_assets
+                    SET equipped = FALSE
+                    WHERE user_id = $1
+                    AND asset_type = $2
+                    AND asset_id <> $3
+                    AND equipped
+                )
+                INSERT INTO user_assets (user_id, asset_type, asset_id, equipped)
+                VALUES ($1, $2, $3, TRUE)
+                ON CONFLICT (user_id, asset_type, asset_id) DO UPDATE
+                SET equipped = TRUE
+            """, user_id, asset_type, asset_id)
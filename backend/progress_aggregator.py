@@ -0,0 +1,331 @@
+"""
+Quiz progress aggregator for JazzyPop
+Keeps the 'quiz' user_progress row (total_quizzes, correct_answers,
+total_points and the current/best streak) up to date with server-side jsonb
+arithmetic - one statement per batch of answers instead of reading and
+rewriting both documents on every answer
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = "quiz_progress"
+LOCK_NAME = "progress_aggregator"
+
+# (event_id, user_id, correct, score)
+Answer = Tuple[UUID, UUID, bool, int]
+
+# Applies a batch of answers with columns (event_id, user_id, correct, score, seq).
+# Only answers whose event_id is new to progress_applied_events count, so a
+# batch can be retried or overlap recovery without double counting. Streaks
+# are worked out per user from runs of correct answers in seq order:
+# leading = run before the first miss, trailing = run after the last miss,
+# max_run = longest run after the first miss.
+APPLY_SQL = """
+    WITH batch AS (
+        {batch}
+    ),
+    fresh AS (
+        INSERT INTO progress_applied_events (event_id)
+        SELECT event_id FROM batch
+        ON CONFLICT (event_id) DO NOTHING
+        RETURNING event_id
+    ),
+    answers AS (
+        SELECT b.user_id, b.correct, b.score,
+               SUM(CASE WHEN b.correct THEN 0 ELSE 1 END)
+                   OVER (PARTITION BY b.user_id ORDER BY b.seq) AS run
+        FROM batch b
+        JOIN fresh f ON f.event_id = b.event_id
+        JOIN users u ON u.id = b.user_id
+    ),
+    runs AS (
+        SELECT user_id, run, COUNT(*) FILTER (WHERE correct) AS streak
+        FROM answers
+        GROUP BY user_id, run
+    ),
+    deltas AS (
+        SELECT t.user_id, t.answers, t.correct, t.points,
+               r.leading, r.trailing, r.max_run, r.missed
+        FROM (
+            SELECT user_id,
+                   COUNT(*) AS answers,
+                   COUNT(*) FILTER (WHERE correct) AS correct,
+                   COALESCE(SUM(score), 0) AS points
+            FROM answers
+            GROUP BY user_id
+        ) t
+        JOIN (
+            SELECT user_id,
+                   COALESCE(MAX(streak) FILTER (WHERE run = 0), 0) AS leading,
+                   (ARRAY_AGG(streak ORDER BY run DESC))[1] AS trailing,
+                   COALESCE(MAX(streak) FILTER (WHERE run > 0), 0) AS max_run,
+                   MAX(run) > 0 AS missed
+            FROM runs
+            GROUP BY user_id
+        ) r ON r.user_id = t.user_id
+    ),
+    updated AS (
+        UPDATE user_progress p
+        SET stats = COALESCE(p.stats, '{{}}'::jsonb) || jsonb_build_object(
+                'total_quizzes', COALESCE((p.stats->>'total_quizzes')::bigint, 0) + d.answers,
+                'correct_answers', COALESCE((p.stats->>'correct_answers')::bigint, 0) + d.correct,
+                'total_points', COALESCE((p.stats->>'total_points')::bigint, 0) + d.points
+            ),
+            streak_data = COALESCE(p.streak_data, '{{}}'::jsonb) || jsonb_build_object(
+                'current', CASE WHEN d.missed THEN d.trailing
+                                ELSE COALESCE((p.streak_data->>'current')::int, 0) + d.leading END,
+                'best', GREATEST(
+                    COALESCE((p.streak_data->>'best')::int, 0),
+                    COALESCE((p.streak_data->>'current')::int, 0) + d.leading,
+                    d.max_run
+                )
+            ),
+            updated_at = NOW()
+        FROM deltas d
+        WHERE p.user_id = d.user_id
+        AND p.content_type = 'quiz'
+        RETURNING p.user_id
+    ),
+    inserted AS (
+        INSERT INTO user_progress (user_id, content_type, stats, streak_data)
+        SELECT d.user_id, 'quiz',
+               jsonb_build_object(
+                   'total_quizzes', d.answers,
+                   'correct_answers', d.correct,
+                   'total_points', d.points
+               ),
+               jsonb_build_object(
+                   'current', CASE WHEN d.missed THEN d.trailing ELSE d.leading END,
+                   'best', GREATEST(d.leading, d.max_run)
+               )
+        FROM deltas d
+        WHERE NOT EXISTS (SELECT 1 FROM updated u WHERE u.user_id = d.user_id)
+        RETURNING user_id
+    )
+    SELECT COUNT(*) FROM fresh
+"""
+
+ARRAY_BATCH = """
+    SELECT *
+    FROM unnest($1::uuid[], $2::uuid[], $3::boolean[], $4::int[])
+        WITH ORDINALITY AS b(event_id, user_id, correct, score, seq)
+"""
+
+
+class ProgressAggregator:
+    """
+    Per-user quiz counters and streaks, written through or coalesced
+
+    With flush_interval 0 each answer is applied inside submit_answer's
+    transaction. With a positive flush_interval answers are buffered in
+    memory after their transaction commits and applied together every
+    flush_interval seconds, when max_pending is reached, or when the player
+    finishes a set (flush(user_id)).
+
+    The events log is the journal: every applied answer's event id goes into
+    progress_applied_events in the same statement. A recovery pass walks
+    quiz_answered events past a watermark (older than recovery_grace_seconds,
+    so live buffers have had their chance) and applies any that were never
+    recorded - answers a crashed worker was still holding. Events from
+    before the aggregator was first installed are never replayed.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 0.0,
+        max_pending: int = 1000,
+        recovery_interval: float = 300.0,
+        recovery_grace_seconds: int = 120,
+        recovery_batch_size: int = 5000,
+        applied_retention_hours: int = 24
+    ):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.recovery_interval = recovery_interval
+        self.recovery_grace_seconds = recovery_grace_seconds
+        self.recovery_batch_size = recovery_batch_size
+        self.applied_retention_hours = applied_retention_hours
+        self._pending: List[Answer] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._pool = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def coalescing(self) -> bool:
+        return self.flush_interval > 0
+
+    async def initialize(self, conn):
+        """Create the journal tables; safe to run on every startup"""
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS progress_applied_events (
+                event_id UUID PRIMARY KEY,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_progress_applied_events_applied_at
+            ON progress_applied_events(applied_at);
+
+            CREATE TABLE IF NOT EXISTS progress_aggregator_state (
+                name VARCHAR(50) PRIMARY KEY,
+                last_created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                last_event_id UUID,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        # Events before the first install were counted by the old per-answer update
+        await conn.execute("""
+            INSERT INTO progress_aggregator_state (name, last_created_at)
+            VALUES ($1, NOW())
+            ON CONFLICT (name) DO NOTHING
+        """, STATE_NAME)
+        logger.info(f"Progress aggregator initialized ({'coalescing' if self.coalescing else 'write-through'})")
+
+    async def start(self, pool):
+        """Run flushes and recovery in the background until stop()"""
+        self._pool = pool
+        self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the loop and apply whatever is still buffered"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._pool and self._pending:
+            await self.flush()
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        next_recovery = loop.time()
+        while True:
+            try:
+                if self._pending:
+                    await self.flush()
+                if loop.time() >= next_recovery:
+                    next_recovery = loop.time() + self.recovery_interval
+                    while await self.recover() >= self.recovery_batch_size:
+                        await asyncio.sleep(0)
+            except Exception as e:
+                logger.error(f"Progress aggregator pass failed, will retry: {e}")
+            await asyncio.sleep(self.flush_interval if self.coalescing else self.recovery_interval)
+
+    # ========== WRITES ==========
+
+    async def record(self, conn, event_id: UUID, user_id: UUID, correct: bool, score: int) -> List[Answer]:
+        """
+        Count one answer, inside the transaction that inserted its event
+
+        Write-through applies it right away and returns []. When coalescing it
+        returns the answer; pass it to enqueue() once the transaction has
+        committed so a rolled-back answer is never counted.
+        """
+        answer = (event_id, user_id, correct, score)
+        if self.coalescing:
+            return [answer]
+        await self._apply(conn, [answer])
+        return []
+
+    def enqueue(self, answers: List[Answer]):
+        if not answers:
+            return
+        self._pending.extend(answers)
+        if len(self._pending) >= self.max_pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_event_loop().create_task(self.flush())
+
+    async def flush(self, user_id: Optional[UUID] = None) -> int:
+        """Apply buffered answers - everyone's, or just one user's when they finish a set"""
+        async with self._flush_lock:
+            if user_id is None:
+                batch, self._pending = self._pending, []
+            else:
+                batch = [a for a in self._pending if a[1] == user_id]
+                self._pending = [a for a in self._pending if a[1] != user_id]
+            if not batch:
+                return 0
+
+            try:
+                async with self._pool.acquire() as conn:
+                    return await self._apply(conn, batch)
+            except Exception:
+                # Keep them for the next flush; recovery picks them up if we die first
+                self._pending[:0] = batch
+                raise
+
+    async def _apply(self, conn, answers: List[Answer]) -> int:
+        event_ids, user_ids, correct, scores = zip(*answers)
+        return await conn.fetchval(
+            APPLY_SQL.format(batch=ARRAY_BATCH),
+            list(event_ids), list(user_ids), list(correct), list(scores)
+        )
+
+    # ========== RECOVERY ==========
+
+    async def recover(self) -> int:
+        """Apply the next batch of events no worker recorded; returns events scanned"""
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                # Another worker is already on it
+                if not await conn.fetchval(
+                    "SELECT pg_try_advisory_xact_lock(hashtext($1))", LOCK_NAME
+                ):
+                    return 0
+
+                state = await conn.fetchrow("""
+                    SELECT last_created_at, last_event_id
+                    FROM progress_aggregator_state
+                    WHERE name = $1
+                """, STATE_NAME)
+                last_created_at = state["last_created_at"] if state else datetime.now(timezone.utc)
+                last_event_id = state["last_event_id"] if state else None
+
+                await conn.execute("""
+                    CREATE TEMP TABLE progress_recovery ON COMMIT DROP AS
+                    SELECT id, created_at, user_id,
+                           COALESCE(correct, (payload->>'correct')::boolean, false) AS correct,
+                           COALESCE(score, (payload->>'score')::int, 0) AS score
+                    FROM events
+                    WHERE type = 'quiz_answered'
+                    AND created_at >= $1
+                    AND (created_at > $1 OR $2::uuid IS NULL OR id > $2::uuid)
+                    AND created_at < NOW() - make_interval(secs => $3::int)
+                    ORDER BY created_at, id
+                    LIMIT $4
+                """, last_created_at, last_event_id, self.recovery_grace_seconds, self.recovery_batch_size)
+
+                last = await conn.fetchrow("""
+                    SELECT created_at, id, COUNT(*) OVER () AS scanned
+                    FROM progress_recovery
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT 1
+                """)
+                if last is None:
+                    await self._prune(conn)
+                    return 0
+
+                recovered = await conn.fetchval(APPLY_SQL.format(batch="""
+                    SELECT id AS event_id, user_id, correct, score,
+                           row_number() OVER (ORDER BY created_at, id) AS seq
+                    FROM progress_recovery
+                    WHERE user_id IS NOT NULL
+                """))
+                if recovered:
+                    logger.warning(f"Progress aggregator recovered {recovered} unapplied quiz answers")
+
+                await conn.execute("""
+                    UPDATE progress_aggregator_state
+                    SET last_created_at = $2, last_event_id = $3, updated_at = NOW()
+                    WHERE name = $1
+                """, STATE_NAME, last["created_at"], last["id"])
+                return last["scanned"]
+
+    async def _prune(self, conn):
+        """Journal rows only matter until recovery has passed their events"""
+        await conn.execute("""
+            DELETE FROM progress_applied_events
+            WHERE applied_at < NOW() - make_interval(hours => $1::int)
+        """, self.applied_retention_hours)
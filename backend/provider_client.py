@@ -0,0 +1,224 @@
+"""
+Shared HTTP clients for LLM and TTS providers
+One long-lived, pooled aiohttp session per provider (keep-alive, connection
+limits, timeouts) with per-call latency / status / retry metrics
+
+Point a provider at a local stub server by setting <PROVIDER>_BASE_URL, e.g.
+ANTHROPIC_BASE_URL=http://localhost:8080 sends
+https://api.anthropic.com/v1/messages to http://localhost:8080/v1/messages
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from llm_rate_limiter import RETRYABLE_STATUSES, backoff_delay, estimate_tokens, get_limiter
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_MESSAGES_URL = "https://api.anthropic.com/v1/messages"
+
+# Defaults per provider; each can be overridden with <PROVIDER>_MAX_CONNECTIONS
+# and <PROVIDER>_TIMEOUT
+PROVIDER_DEFAULTS = {
+    "anthropic": {"max_connections": 20, "timeout": 60},
+    "openai": {"max_connections": 20, "timeout": 60},
+    "elevenlabs": {"max_connections": 10, "timeout": 120},
+    "discord": {"max_connections": 2, "timeout": 10},
+}
+
+
+class ProviderClient:
+    """
+    A pooled aiohttp session for one provider
+
+    The session is created lazily on first use (it must belong to the running
+    event loop) and recreated if the loop changes, so short CLI scripts that
+    call asyncio.run() more than once keep working.
+    """
+
+    def __init__(self, name: str, max_connections: int, timeout: float,
+                 base_url: Optional[str] = None):
+        self.name = name
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=10)
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop = None
+
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.statuses: Dict[int, int] = {}
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections,
+                keepalive_timeout=30,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._loop = loop
+        return self._session
+
+    def _resolve(self, url: str) -> str:
+        """Swap scheme and host for the stub server when one is configured"""
+        if not self.base_url:
+            return url
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        return f"{self.base_url}{path}"
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs: Any):
+        """
+        Like session.request(), on the shared session, with metrics recorded
+        Use as: async with client.post(url, json=...) as response: ...
+        """
+        session = self._get_session()
+        started = time.monotonic()
+        self.requests += 1
+        try:
+            async with session.request(method, self._resolve(url), **kwargs) as response:
+                self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+                yield response
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.errors += 1
+            raise
+        finally:
+            latency = time.monotonic() - started
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def post(self, url: str, **kwargs: Any):
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any):
+        return self.request("GET", url, **kwargs)
+
+    def record_retry(self):
+        """Count a retry made by the caller's own retry loop"""
+        self.retries += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "statuses": dict(self.statuses),
+            "avg_latency_ms": round(self.total_latency / self.requests * 1000, 1) if self.requests else 0,
+            "max_latency_ms": round(self.max_latency * 1000, 1),
+            "base_url": self.base_url
+        }
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_clients: Dict[str, ProviderClient] = {}
+
+
+def get_client(provider: str) -> ProviderClient:
+    """The process-wide client for a provider"""
+    client = _clients.get(provider)
+    if client is None:
+        prefix = provider.upper()
+        defaults = PROVIDER_DEFAULTS.get(provider, {"max_connections": 10, "timeout": 60})
+        client = ProviderClient(
+            provider,
+            max_connections=int(os.getenv(f"{prefix}_MAX_CONNECTIONS", defaults["max_connections"])),
+            timeout=float(os.getenv(f"{prefix}_TIMEOUT", defaults["timeout"])),
+            base_url=os.getenv(f"{prefix}_BASE_URL")
+        )
+        _clients[provider] = client
+    return client
+
+
+def client_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: client.stats() for name, client in _clients.items()}
+
+
+async def close_clients():
+    """Close every provider session; call on shutdown"""
+    for client in _clients.values():
+        await client.close()
+
+
+class _Unbounded:
+    """Stand-in for a semaphore when the caller doesn't cap concurrency"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+async def call_anthropic(payload: Dict[str, Any], api_key: str,
+                         semaphore: Optional[asyncio.Semaphore] = None,
+                         max_attempts: int = 5,
+                         url: str = ANTHROPIC_MESSAGES_URL) -> Optional[Dict[str, Any]]:
+    """
+    POST to the messages API under the caller's concurrency cap and the shared
+    RPM/TPM limiter, retrying 429/5xx with jittered backoff
+    Returns the decoded response, or None once the call has failed for good
+    """
+    headers = {
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01",
+        "content-type": "application/json"
+    }
+    prompt = payload['messages'][0]['content']
+    estimated = estimate_tokens(prompt if isinstance(prompt, str) else json.dumps(prompt), payload['max_tokens'])
+    limiter = get_limiter('anthropic')
+    client = get_client('anthropic')
+    guard = semaphore if semaphore is not None else _Unbounded()
+
+    for attempt in range(max_attempts):
+        if attempt:
+            client.record_retry()
+        async with guard:
+            await limiter.acquire(estimated)
+            try:
+                async with client.post(url, headers=headers, json=payload) as response:
+                    if response.status == 200:
+                        result = await response.json()
+                        usage = result.get('usage')
+                        if usage:
+                            limiter.settle(
+                                estimated,
+                                usage.get('input_tokens', 0) + usage.get('output_tokens', 0)
+                            )
+                        return result
+
+                    if response.status not in RETRYABLE_STATUSES:
+                        logger.error(f"API error: {response.status}")
+                        return None
+
+                    delay = backoff_delay(attempt, retry_after=response.headers.get('retry-after'))
+                    if response.status == 429:
+                        # Everyone sharing the limiter backs off, not just us
+                        limiter.pause(delay)
+                    logger.warning(f"API returned {response.status}, retrying in {delay:.1f}s")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = backoff_delay(attempt)
+                logger.warning(f"API request failed ({e}), retrying in {delay:.1f}s")
+
+        # Sleep outside the semaphore so other calls can use the slot
+        await asyncio.sleep(delay)
+
+    logger.error(f"API call failed after {max_attempts} attempts")
+    return None
@@ -9,7 +9,8 @@ import logging
 from datetime import datetime
 from uuid import uuid4
 from typing import Dict, Any, List
-import aiohttp
+from provider_client import close_clients, get_client
+from content_safety import safety_filter
 from database import db
 from dotenv import load_dotenv
 
@@ -79,33 +80,38 @@ class PunGenerator:
                     }]
                 }
                 
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        "https://api.anthropic.com/v1/messages",
-                        headers=headers,
-                        json=payload
-                    ) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            content = data['content'][0]['text']
+                async with get_client('anthropic').post(
+                    "https://api.anthropic.com/v1/messages",
+                    headers=headers,
+                    json=payload
+                ) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        content = data['content'][0]['text']
+                        
+                        # Parse JSON from response
+                        # Claude might wrap it in markdown, so extract JSON
+                        import re
+                        json_match = re.search(r'\{[\s\S]*\}', content)
+                        if json_match:
+                            pun_data = json.loads(json_match.group())
                             
-                            # Parse JSON from response
-                            # Claude might wrap it in markdown, so extract JSON
-                            import re
-                            json_match = re.search(r'\{[\s\S]*\}', content)
-                            if json_match:
-                                pun_data = json.loads(json_match.group())
-                                
-                                return {
-                                    "id": str(uuid4()),
-                                    "type": "pun",
-                                    "data": pun_data,
-                                    "metadata": {
-                                        "theme": theme,
-                                        "generated_at": datetime.utcnow().isoformat()
-                                    },
-                                    "tags": ["pun", theme, "flashcard"]
-                                }
+                            # Screen with the shared safety filter
+                            match = safety_filter.check_item(pun_data)
+                            if match:
+                                logger.warning(f"Content filter rejected pun: {match!r}")
+                                return self.get_fallback_pun(theme)
+                            
+                            return {
+                                "id": str(uuid4()),
+                                "type": "pun",
+                                "data": pun_data,
+                                "metadata": {
+                                    "theme": theme,
+                                    "generated_at": datetime.utcnow().isoformat()
+                                },
+                                "tags": ["pun", theme, "flashcard"]
+                            }
         except Exception as e:
             logger.error(f"Failed to generate pun: {e}")
         
@@ -230,6 +236,7 @@ async def main():
     try:
         await run_pun_generator()
     finally:
+        await close_clients()
         await db.disconnect()
 
 if __name__ == "__main__":
@@ -9,7 +9,8 @@ import logging
 from datetime import datetime
 from uuid import uuid4
 from typing import Dict, Any, List
-import aiohttp
+from provider_client import close_clients, get_client
+from content_safety import safety_filter
 from database import db
 from dotenv import load_dotenv
 
@@ -90,42 +91,46 @@ class PunSetGenerator:
                     }]
                 }
                 
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        "https://api.anthropic.com/v1/messages",
-                        headers=headers,
-                        json=payload
-                    ) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            content = data['content'][0]['text']
+                async with get_client('anthropic').post(
+                    "https://api.anthropic.com/v1/messages",
+                    headers=headers,
+                    json=payload
+                ) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        content = data['content'][0]['text']
+                        
+                        # Parse JSON array from response
+                        import re
+                        json_match = re.search(r'\[[\s\S]*\]', content)
+                        if json_match:
+                            puns_array = json.loads(json_match.group())
                             
-                            # Parse JSON array from response
-                            import re
-                            json_match = re.search(r'\[[\s\S]*\]', content)
-                            if json_match:
-                                puns_array = json.loads(json_match.group())
-                                
-                                # Create the pun set structure
-                                return {
-                                    "id": str(uuid4()),
-                                    "type": "pun_set",
-                                    "data": {
-                                        "title": "The Punderful Collection: Groan-Worthy Wordplay",
-                                        "puns": puns_array[:10],  # Ensure exactly 10
-                                        "category": "bad_puns",
-                                        "difficulty": "varied",
-                                        "total_puns": 10
-                                    },
-                                    "metadata": {
-                                        "generated_at": datetime.utcnow().isoformat(),
-                                        "generator_version": "2.0",
-                                        "has_challenges": True
-                                    },
-                                    "tags": ["pun_set", "flashcard", "wordplay"]
-                                }
-                        else:
-                            logger.error(f"API error: {response.status}")
+                            # Drop anything the shared safety filter rejects
+                            puns_array = safety_filter.filter_items(puns_array, 'pun')
+                            if not puns_array:
+                                return self.get_fallback_pun_set()
+                            
+                            # Create the pun set structure
+                            return {
+                                "id": str(uuid4()),
+                                "type": "pun_set",
+                                "data": {
+                                    "title": "The Punderful Collection: Groan-Worthy Wordplay",
+                                    "puns": puns_array[:10],  # Ensure exactly 10
+                                    "category": "bad_puns",
+                                    "difficulty": "varied",
+                                    "total_puns": len(puns_array[:10])
+                                },
+                                "metadata": {
+                                    "generated_at": datetime.utcnow().isoformat(),
+                                    "generator_version": "2.0",
+                                    "has_challenges": True
+                                },
+                                "tags": ["pun_set", "flashcard", "wordplay"]
+                            }
+                    else:
+                        logger.error(f"API error: {response.status}")
         except Exception as e:
             logger.error(f"Failed to generate pun set: {e}")
         
@@ -331,6 +336,7 @@ async def main():
     try:
         await run_pun_set_generator()
     finally:
+        await close_clients()
         await db.disconnect()
 
 if __name__ == "__main__":
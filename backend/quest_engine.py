@@ -0,0 +1,304 @@
+"""
+Event-driven quest engine for JazzyPop
+Domain events (answer submitted, set completed, feedback given) are
+published after their request commits, matched against an index of each
+player's active quest types, and applied in batches: one statement per
+batch advances every matching quest and pays out the rewards of the ones
+it completes - no per-request read-modify-write of quests or balances.
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from economy import EconomyStore, REWARD_FIELDS
+from player_store import PlayerStore
+
+logger = logging.getLogger(__name__)
+
+# Domain event -> the quest types it advances. Any other name advances
+# quests of that exact type, which is how POST /api/quests/{quest_id}/progress
+# (quest_id used as the type) has always worked.
+EVENT_QUEST_TYPES: Dict[str, Tuple[str, ...]] = {
+    "answer_submitted": ("answer_submitted",),
+    "answer_correct": ("answer_correct",),
+    # The welcome quest ('tutorial') is "Complete your first quiz"
+    "set_completed": ("set_completed", "tutorial"),
+    "perfect_set": ("perfect_set",),
+    "feedback_given": ("feedback_given",),
+}
+
+# (user_id, quest_type) -> progress to add
+Batch = Dict[Tuple[UUID, str], int]
+
+
+def _reward_sum(field: str) -> str:
+    """Total of one numeric reward over a user's completed quests; other values count as 0"""
+    return (
+        f"trunc(SUM(CASE WHEN jsonb_typeof(c.rewards->'{field}') = 'number' "
+        f"THEN (c.rewards->>'{field}')::numeric ELSE 0 END))::bigint AS {field}"
+    )
+
+
+_REWARD_INCREMENTS = ",\n".join(
+    f"{field} = e.{field} + r.{field}" for field in REWARD_FIELDS if field not in ("energy", "xp")
+)
+
+# Advances quests and grants rewards for a batch with columns
+# (user_id, quest_type, amount), one row per (user_id, quest_type).
+# Quest rows, then economy rows, are locked in key order so two workers
+# flushing overlapping batches can't deadlock. Balances are incremented
+# exactly like EconomyStore.grant(), so the rows must exist already.
+APPLY_SQL = f"""
+    WITH batch AS (
+        SELECT *
+        FROM unnest($1::uuid[], $2::text[], $3::int[]) AS b(user_id, quest_type, amount)
+    ),
+    locked AS (
+        SELECT q.user_id, q.quest_id, b.amount
+        FROM user_quests q
+        JOIN batch b ON b.user_id = q.user_id AND b.quest_type = q.quest_type
+        WHERE q.status = 'active'
+        ORDER BY q.user_id, q.quest_id
+        FOR UPDATE OF q
+    ),
+    advanced AS (
+        UPDATE user_quests q
+        SET progress = q.progress + l.amount,
+            status = CASE WHEN q.progress + l.amount >= q.target THEN 'completed' ELSE q.status END,
+            completed_at = CASE WHEN q.progress + l.amount >= q.target THEN NOW() END,
+            updated_at = NOW()
+        FROM locked l
+        WHERE q.user_id = l.user_id
+        AND q.quest_id = l.quest_id
+        RETURNING q.user_id, q.status, q.data->'rewards' AS rewards,
+                  q.data || jsonb_build_object(
+                      'quest_id', q.quest_id,
+                      'progress', q.progress,
+                      'completed_at', q.completed_at AT TIME ZONE 'UTC'
+                  ) AS quest
+    ),
+    completed AS (
+        SELECT * FROM advanced WHERE status = 'completed'
+    ),
+    rewards AS (
+        SELECT c.user_id, {", ".join(_reward_sum(field) for field in REWARD_FIELDS)}
+        FROM completed c
+        GROUP BY c.user_id
+    ),
+    locked_economy AS (
+        SELECT e.user_id
+        FROM user_economy e
+        WHERE e.user_id IN (SELECT user_id FROM rewards)
+        ORDER BY e.user_id
+        FOR UPDATE
+    ),
+    granted AS (
+        UPDATE user_economy e
+        SET energy = economy_energy(e.energy, e.energy_updated_at, e.level) + r.energy,
+            energy_updated_at = economy_energy_clock(e.energy, e.energy_updated_at, e.level),
+            {_REWARD_INCREMENTS},
+            xp = e.xp + r.xp,
+            level = GREATEST(e.level, economy_level(e.xp + r.xp)),
+            updated_at = NOW()
+        FROM rewards r
+        JOIN locked_economy l ON l.user_id = r.user_id
+        WHERE e.user_id = r.user_id
+        RETURNING e.user_id
+    )
+    SELECT user_id, quest FROM completed
+"""
+
+
+class QuestEngine:
+    """
+    Applies quest progress from domain events in batches
+
+    publish() only buffers: progress is coalesced per (user, quest type) and
+    flushed every flush_interval seconds, when max_pending keys are waiting,
+    or on stop(). Before a batch touches the database it is matched against
+    an in-memory index of each player's active quest types, loaded from the
+    idx_user_quests_active_type partial index and kept for index_ttl
+    seconds; events nobody has a quest for are dropped right there. A quest
+    started on this worker is picked up immediately (forget()), one started
+    on another worker within index_ttl.
+
+    Buffered events are not journaled: a crash loses at most one
+    flush_interval of quest progress, never a reward that was paid.
+    """
+
+    def __init__(
+        self,
+        player: PlayerStore,
+        economy: EconomyStore,
+        flush_interval: float = 0.5,
+        max_pending: int = 1000,
+        index_ttl: float = 60.0,
+        max_indexed_users: int = 50000
+    ):
+        self.player = player
+        self.economy = economy
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.index_ttl = index_ttl
+        self.max_indexed_users = max_indexed_users
+        # user_id -> (loaded at, active quest types)
+        self._index: "OrderedDict[UUID, Tuple[float, FrozenSet[str]]]" = OrderedDict()
+        self._pending: Batch = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._pool = None
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.dropped = 0
+        self.applied = 0
+        self.completed = 0
+
+    async def start(self, pool):
+        """Flush published events in the background until stop()"""
+        self._pool = pool
+        self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the loop and apply whatever is still buffered"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._pool and self._pending:
+            await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                if self._pending:
+                    await self.flush()
+            except Exception as e:
+                logger.error(f"Quest engine flush failed, will retry: {e}")
+
+    # ========== EVENTS ==========
+
+    def publish(self, user_id: Optional[UUID], event: str, amount: int = 1):
+        """Buffer a domain event for a player; call once its transaction has committed"""
+        if not user_id or not isinstance(user_id, UUID):
+            return
+        self.published += 1
+        for quest_type in EVENT_QUEST_TYPES.get(event, (event,)):
+            key = (user_id, quest_type)
+            self._pending[key] = self._pending.get(key, 0) + amount
+        if len(self._pending) >= self.max_pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_event_loop().create_task(self.flush())
+
+    async def flush(self) -> int:
+        """Apply everything buffered; returns quests completed"""
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            try:
+                async with self._pool.acquire() as conn:
+                    completed = await self._apply(conn, batch)
+            except Exception:
+                # Put them back for the next flush, merged with anything published since
+                for key, amount in batch.items():
+                    self._pending[key] = self._pending.get(key, 0) + amount
+                raise
+            return len(completed)
+
+    async def advance(self, conn, user_id: UUID, quest_type: str, amount: int = 1) -> List[Dict]:
+        """
+        Apply progress right away rather than buffering it
+        Skips the active quest index, so a quest started moments ago on another
+        worker still advances. Returns the quests this completed, with their
+        rewards already granted.
+        """
+        completed = await self._apply(conn, {(user_id, quest_type): amount}, use_index=False)
+        return [quest for _, quest in completed]
+
+    async def _apply(self, conn, batch: Batch, use_index: bool = True) -> List[Tuple[UUID, Dict[str, Any]]]:
+        async with conn.transaction():
+            if use_index:
+                matched = await self._match(conn, batch)
+                self.dropped += len(batch) - len(matched)
+                if not matched:
+                    return []
+            else:
+                # APPLY_SQL only touches active quests, so no match is needed
+                await self.player.ensure_migrated(conn, list({user_id for user_id, _ in batch}))
+                matched = batch
+
+            keys = list(matched)
+            # Rewards are plain increments, so balances must have their row
+            await self.economy.seed_users(conn, list({user_id for user_id, _ in keys}))
+            rows = await conn.fetch(
+                APPLY_SQL,
+                [user_id for user_id, _ in keys],
+                [quest_type for _, quest_type in keys],
+                [matched[key] for key in keys]
+            )
+
+        self.applied += len(matched)
+        self.completed += len(rows)
+        # Completed quests leave the index; the next event reloads the user
+        for row in rows:
+            self._index.pop(row["user_id"], None)
+        return [(row["user_id"], row["quest"]) for row in rows]
+
+    # ========== ACTIVE QUEST INDEX ==========
+
+    async def _match(self, conn, batch: Batch) -> Batch:
+        """The part of a batch some active quest is waiting for"""
+        active = await self._active_types(conn, {user_id for user_id, _ in batch})
+        return {
+            (user_id, quest_type): amount
+            for (user_id, quest_type), amount in batch.items()
+            if quest_type in active[user_id]
+        }
+
+    async def _active_types(self, conn, user_ids: Iterable[UUID]) -> Dict[UUID, FrozenSet[str]]:
+        now = asyncio.get_event_loop().time()
+        active: Dict[UUID, FrozenSet[str]] = {}
+        stale = []
+        for user_id in user_ids:
+            entry = self._index.get(user_id)
+            if entry is not None and now - entry[0] < self.index_ttl:
+                self._index.move_to_end(user_id)
+                active[user_id] = entry[1]
+            else:
+                stale.append(user_id)
+
+        if stale:
+            # Quests still in a stats blob aren't in user_quests yet
+            await self.player.ensure_migrated(conn, stale)
+            rows = await conn.fetch("""
+                SELECT user_id, array_agg(DISTINCT quest_type) AS quest_types
+                FROM user_quests
+                WHERE user_id = ANY($1::uuid[])
+                AND status = 'active'
+                AND quest_type IS NOT NULL
+                GROUP BY user_id
+            """, stale)
+            loaded = {row["user_id"]: frozenset(row["quest_types"]) for row in rows}
+            for user_id in stale:
+                active[user_id] = loaded.get(user_id, frozenset())
+                self._index[user_id] = (now, active[user_id])
+                self._index.move_to_end(user_id)
+            while len(self._index) > self.max_indexed_users:
+                self._index.popitem(last=False)
+        return active
+
+    def forget(self, user_id: UUID):
+        """Drop a player's index entry after their quests change"""
+        self._index.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "indexed_users": len(self._index),
+            "pending": len(self._pending),
+            "published": self.published,
+            "dropped": self.dropped,
+            "applied": self.applied,
+            "completed": self.completed
+        }
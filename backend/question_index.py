@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate index over quiz questions
+MinHash signatures of each question (text plus correct answer, normalized and
+cut into character shingles) bucketed with LSH, so "is this question already
+in the catalog?" is a handful of dict lookups instead of a scan.
+
+Generators load it once at startup, refresh it incrementally from a
+created_at watermark (same scheme as the content sampler) and drop generated
+questions that match something already there. Run as a script it prints the
+duplicate clusters already in the catalog:
+
+    python question_index.py
+    python question_index.py --threshold 0.8 --output duplicate_clusters.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+# (content_id, index of the question in the set)
+QuestionKey = Tuple[UUID, int]
+
+# Question-framing words carry no meaning for "is this the same fact?"
+STOPWORDS = frozenset("""
+    a an the of to in on at by for from with and or is are was were be been
+    what which who whom whose when where why how does do did can could would
+    should will this that these those it its as known called name named
+""".split())
+
+SHINGLE_SIZE = 4
+# Smallest prime above 2**32, so (a*h + b) % _PRIME permutes 32-bit shingle hashes
+_PRIME = 4294967311
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def question_text(question: Dict[str, Any]) -> str:
+    """Question plus its correct answer, for either stored question format"""
+    answer = question.get('correct_answer')
+    if not isinstance(answer, str):
+        answer = next(
+            (a.get('text', '') for a in question.get('answers') or []
+             if isinstance(a, dict) and a.get('correct')),
+            ''
+        )
+    return f"{question.get('question', '')} {answer}"
+
+
+def normalize(text: str) -> str:
+    return ' '.join(t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS)
+
+
+def shingles(text: str) -> List[int]:
+    """crc32 of every character shingle of the normalized text"""
+    norm = normalize(text)
+    if len(norm) <= SHINGLE_SIZE:
+        return [zlib.crc32(norm.encode())] if norm else []
+    return list({
+        zlib.crc32(norm[i:i + SHINGLE_SIZE].encode())
+        for i in range(len(norm) - SHINGLE_SIZE + 1)
+    })
+
+
+class QuestionIndex:
+    """
+    MinHash/LSH index of every active quiz_set question
+
+    num_perm = bands * rows hash functions; two questions become candidates
+    when all `rows` values of any band agree, and a candidate only counts as
+    a duplicate when its estimated Jaccard similarity reaches `threshold`.
+    With 16 bands of 4 rows, pairs at 0.7 similarity are found ~99% of the
+    time and pairs below 0.3 rarely even get compared.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        bands: int = 16,
+        rows: int = 4,
+        refresh_interval: float = 60.0,
+        full_reload_interval: float = 1800.0,
+        watermark_overlap: timedelta = timedelta(minutes=5),
+        seed: int = 1,
+        max_cached_shingles: int = 100000
+    ):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.num_perm = bands * rows
+        self.refresh_interval = refresh_interval
+        # Rewritten questions (validation revisions) are only seen on a full reload
+        self.full_reload_interval = full_reload_interval
+        self.watermark_overlap = watermark_overlap
+
+        # Fixed seed: signatures must be comparable across processes and runs
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+            for _ in range(self.num_perm)
+        ]
+        # Shingles repeat across questions constantly; caching each one's
+        # permuted hashes turns a signature into one element-wise min
+        self._shingle_cache: Dict[int, array] = {}
+        self.max_cached_shingles = max_cached_shingles
+
+        self._signatures: Dict[QuestionKey, array] = {}
+        self._buckets: List[Dict[Tuple[int, ...], List[QuestionKey]]] = [{} for _ in range(bands)]
+        self._sets: Dict[UUID, int] = {}
+        self._watermark: Optional[datetime] = None
+        self._last_refresh = 0.0
+        self._last_full_reload = 0.0
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    # ========== SIGNATURES ==========
+
+    def _permuted(self, h: int) -> array:
+        values = self._shingle_cache.get(h)
+        if values is None:
+            if len(self._shingle_cache) >= self.max_cached_shingles:
+                self._shingle_cache.clear()
+            values = array('I', [((a * h + b) % _PRIME) & 0xFFFFFFFF for a, b in self._perms])
+            self._shingle_cache[h] = values
+        return values
+
+    def signature(self, question: Dict[str, Any]) -> Optional[array]:
+        hashes = shingles(question_text(question))
+        if not hashes:
+            return None
+        return array('I', map(min, zip(*[self._permuted(h) for h in hashes])))
+
+    def _bands(self, sig: array) -> Iterable[Tuple[int, Tuple[int, ...]]]:
+        rows = self.rows
+        for band in range(self.bands):
+            yield band, tuple(sig[band * rows:(band + 1) * rows])
+
+    @staticmethod
+    def similarity(sig_a: array, sig_b: array) -> float:
+        """Estimated Jaccard similarity: share of agreeing MinHash values"""
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+    # ========== INDEX ==========
+
+    def add(self, content_id: UUID, question_index: int, question: Dict[str, Any]):
+        key = (content_id, question_index)
+        if key in self._signatures:
+            return
+        sig = self.signature(question)
+        if sig is None:
+            return
+        self._signatures[key] = sig
+        for band, value in self._bands(sig):
+            self._buckets[band].setdefault(value, []).append(key)
+
+    def add_set(self, content_id: UUID, questions: List[Dict[str, Any]]):
+        """Index a saved quiz set's questions"""
+        for i, question in enumerate(questions):
+            if isinstance(question, dict):
+                self.add(content_id, i, question)
+        self._sets[content_id] = len(questions)
+
+    def discard_set(self, content_id: UUID):
+        for i in range(self._sets.pop(content_id, 0)):
+            key = (content_id, i)
+            sig = self._signatures.pop(key, None)
+            if sig is None:
+                continue
+            for band, value in self._bands(sig):
+                bucket = self._buckets[band].get(value)
+                if bucket:
+                    bucket.remove(key)
+                    if not bucket:
+                        del self._buckets[band][value]
+
+    def _candidates(self, sig: array) -> Iterable[QuestionKey]:
+        seen = set()
+        for band, value in self._bands(sig):
+            for key in self._buckets[band].get(value, ()):
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def find_duplicate(self, question: Dict[str, Any],
+                       threshold: Optional[float] = None) -> Optional[Tuple[QuestionKey, float]]:
+        """The most similar indexed question at or above the threshold, if any"""
+        sig = self.signature(question)
+        return self._best_match(sig, threshold) if sig is not None else None
+
+    def _best_match(self, sig: array, threshold: Optional[float] = None) -> Optional[Tuple[QuestionKey, float]]:
+        threshold = self.threshold if threshold is None else threshold
+        best = None
+        for key in self._candidates(sig):
+            score = self.similarity(sig, self._signatures[key])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def filter_new(self, questions: List[Dict[str, Any]],
+                   accepted: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """
+        Drop generated questions that repeat the catalog, questions already
+        `accepted` into the set being built, or an earlier question in the list
+        """
+        kept_sigs = [s for s in (self.signature(q) for q in accepted or []) if s is not None]
+        kept = []
+        for question in questions:
+            sig = self.signature(question)
+            if sig is None:
+                kept.append(question)
+                continue
+            match = self._best_match(sig)
+            if match:
+                (content_id, index), score = match
+                logger.info(
+                    f"Dropped near-duplicate question ({score:.0%} like {content_id}#{index}): "
+                    f"{question.get('question', '')[:80]}"
+                )
+                continue
+            if any(self.similarity(sig, other) >= self.threshold for other in kept_sigs):
+                logger.info(f"Dropped question repeating its own set: {question.get('question', '')[:80]}")
+                continue
+            kept_sigs.append(sig)
+            kept.append(question)
+        return kept
+
+    # ========== LOADING ==========
+
+    async def refresh(self, conn, full: bool = False, page_size: int = 2000):
+        """Index quiz sets created since the watermark (everything when full=True)"""
+        async with self._lock:
+            now = time.monotonic()
+            if not full and self._watermark is not None and now - self._last_refresh < self.refresh_interval:
+                return
+
+            full = full or self._watermark is None or (
+                now - self._last_full_reload >= self.full_reload_interval
+            )
+
+            started = time.monotonic()
+            if full:
+                self._signatures.clear()
+                self._buckets = [{} for _ in range(self.bands)]
+                self._sets.clear()
+                self._watermark = None
+                self._last_full_reload = now
+                since = None
+            else:
+                since = self._watermark - self.watermark_overlap
+
+            # Keyset pages so a full load never holds the whole catalog's JSON
+            loaded = 0
+            last_id = None
+            while True:
+                rows = await conn.fetch("""
+                    SELECT id, created_at, data->'questions' AS questions
+                    FROM content
+                    WHERE type = 'quiz_set'
+                    AND is_active = true
+                    AND ($1::timestamptz IS NULL OR created_at > $1)
+                    AND ($2::uuid IS NULL OR id > $2)
+                    ORDER BY id
+                    LIMIT $3
+                """, since, last_id, page_size)
+                if not rows:
+                    break
+
+                for row in rows:
+                    questions = row['questions']
+                    if isinstance(questions, str):
+                        questions = json.loads(questions)
+                    if row['id'] not in self._sets and isinstance(questions, list):
+                        self.add_set(row['id'], questions)
+                        loaded += 1
+                    if row['created_at'] and (self._watermark is None or row['created_at'] > self._watermark):
+                        self._watermark = row['created_at']
+                last_id = rows[-1]['id']
+                # Let other tasks run between pages of a big load
+                await asyncio.sleep(0)
+
+            if self._watermark is None:
+                self._watermark = datetime.now(timezone.utc)
+            self._last_refresh = now
+
+            if full:
+                logger.info(
+                    f"Question index loaded {len(self._signatures)} questions from "
+                    f"{len(self._sets)} quiz sets in {time.monotonic() - started:.1f}s"
+                )
+            elif loaded:
+                logger.debug(f"Question index added {loaded} quiz sets")
+
+    # ========== REPORTING ==========
+
+    def clusters(self, threshold: Optional[float] = None) -> List[List[Tuple[QuestionKey, float]]]:
+        """
+        Groups of near-duplicate questions already in the index
+        Pairs come from shared LSH buckets only, then union-find joins them;
+        each member carries its similarity to the cluster's first question
+        """
+        threshold = self.threshold if threshold is None else threshold
+        parent: Dict[QuestionKey, QuestionKey] = {}
+
+        def find(key: QuestionKey) -> QuestionKey:
+            root = key
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while key != root:
+                parent[key], key = root, parent.get(key, key)
+            return root
+
+        checked = set()
+        for band_buckets in self._buckets:
+            for bucket in band_buckets.values():
+                if len(bucket) < 2:
+                    continue
+                for i, a in enumerate(bucket):
+                    for b in bucket[i + 1:]:
+                        pair = (a, b) if a < b else (b, a)
+                        if pair in checked:
+                            continue
+                        checked.add(pair)
+                        if self.similarity(self._signatures[a], self._signatures[b]) >= threshold:
+                            parent.setdefault(a, a)
+                            parent.setdefault(b, b)
+                            root_a, root_b = find(a), find(b)
+                            if root_a != root_b:
+                                parent[root_b] = root_a
+
+        groups: Dict[QuestionKey, List[QuestionKey]] = {}
+        for key in parent:
+            groups.setdefault(find(key), []).append(key)
+
+        result = []
+        for members in groups.values():
+            members.sort()
+            first = self._signatures[members[0]]
+            result.append([(key, self.similarity(first, self._signatures[key])) for key in members])
+        result.sort(key=len, reverse=True)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "questions": len(self._signatures),
+            "quiz_sets": len(self._sets),
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "watermark": self._watermark.isoformat() if self._watermark else None
+        }
+
+
+question_index = QuestionIndex(threshold=float(os.getenv('QUESTION_DUP_THRESHOLD', '0.7')))
+
+
+async def duplicate_report(threshold: float, output: Optional[str]):
+    """Print (and optionally save) the near-duplicate clusters in the catalog"""
+    from database import db
+
+    await db.connect()
+    try:
+        async with db.pool.acquire() as conn:
+            await question_index.refresh(conn, full=True)
+            clusters = question_index.clusters(threshold)
+
+            # Fetch the text of every clustered question for the report
+            set_ids = list({key[0] for cluster in clusters for key, _ in cluster})
+            rows = await conn.fetch("""
+                SELECT id, data->>'category' AS category, data->'questions' AS questions
+                FROM content WHERE id = ANY($1::uuid[])
+            """, set_ids)
+        sets = {
+            row['id']: (row['category'], json.loads(row['questions']) if isinstance(row['questions'], str) else row['questions'])
+            for row in rows
+        }
+
+        report = []
+        for cluster in clusters:
+            members = []
+            for (content_id, index), score in cluster:
+                category, questions = sets.get(content_id, (None, []))
+                question = questions[index] if index < len(questions or []) else {}
+                members.append({
+                    'content_id': str(content_id),
+                    'question_index': index,
+                    'category': category,
+                    'similarity': round(score, 2),
+                    'question': question.get('question')
+                })
+            report.append(members)
+
+        duplicates = sum(len(cluster) - 1 for cluster in clusters)
+        print(f"{len(question_index)} questions indexed, {len(clusters)} duplicate clusters, "
+              f"{duplicates} redundant questions (threshold {threshold})")
+        for members in report[:20]:
+            print(f"\n{len(members)} questions:")
+            for member in members[:5]:
+                print(f"  [{member['category']}] {member['question']} ({member['content_id']}#{member['question_index']})")
+
+        if output:
+            with open(output, 'w') as f:
+                json.dump({
+                    'generated_at': datetime.now(timezone.utc).isoformat(),
+                    'stats': question_index.stats(),
+                    'clusters': report
+                }, f, indent=2)
+            print(f"\nReport saved to {output}")
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="List near-duplicate quiz questions in the catalog")
+    parser.add_argument("--threshold", type=float, default=question_index.threshold,
+                        help="Estimated Jaccard similarity that counts as a duplicate")
+    parser.add_argument("--output", type=str, default=None, help="Write the clusters as JSON to this file")
+    args = parser.parse_args()
+    asyncio.run(duplicate_report(args.threshold, args.output))
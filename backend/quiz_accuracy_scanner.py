@@ -4,6 +4,7 @@ Quiz Accuracy Scanner - Finds quizzes with incorrect answers
 Uses AI validation to detect factual errors
 """
 
+import argparse
 import asyncio
 import asyncpg
 import json
@@ -11,8 +12,10 @@ import os
 from datetime import datetime
 from pathlib import Path
 import logging
-from typing import Dict, List
-import anthropic
+from typing import Dict, List, Optional
+
+from catalog_scan import ScanCheckpoint, ScanProgress, count_quiz_sets, has_more_quiz_sets, iter_quiz_set_pages
+from provider_client import call_anthropic, close_clients
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -32,9 +35,15 @@ if env_path.exists():
 class QuizAccuracyScanner:
     """Scans quiz questions for factual accuracy issues"""
     
-    def __init__(self, db_pool: asyncpg.Pool):
+    # Only full sets are scanned
+    SET_FILTER = "jsonb_array_length(data->'questions') = 10"
+
+    def __init__(self, db_pool: asyncpg.Pool, concurrency: int = 8):
         self.db_pool = db_pool
-        self.client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+        self.api_key = os.getenv('ANTHROPIC_API_KEY')
+        # Calls in flight at once; the shared limiter still enforces RPM/TPM
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.progress: Optional[ScanProgress] = None
         self.suspicious_quizzes = []
         self.scan_stats = {
             'total_scanned': 0,
@@ -43,43 +52,55 @@ class QuizAccuracyScanner:
             'common_problems': []
         }
     
-    async def scan_all_quizzes(self, limit: int = 100, category_filter: str = None):
-        """Scan quizzes for accuracy issues"""
-        logger.info(f"Starting accuracy scan (limit: {limit})")
-        
-        async with self.db_pool.acquire() as conn:
-            # Build query
-            query = """
-            SELECT 
-                id,
-                data,
-                metadata
-            FROM content
-            WHERE type = 'quiz_set'
-                AND jsonb_array_length(data->'questions') = 10
-            """
-            
-            if category_filter:
-                query += f" AND data->>'category' = '{category_filter}'"
-            
-            query += f" ORDER BY RANDOM() LIMIT {limit}"
-            
-            quiz_sets = await conn.fetch(query)
-            
-            for quiz_set in quiz_sets:
-                await self._scan_quiz_set(quiz_set)
-                
-                # Progress update
-                if self.scan_stats['total_scanned'] % 10 == 0:
-                    logger.info(
-                        f"Progress: {self.scan_stats['total_scanned']} scanned, "
-                        f"{self.scan_stats['errors_found']} issues found"
-                    )
+    async def scan_all_quizzes(self, limit: Optional[int] = None, category_filter: str = None,
+                               checkpoint_path: Optional[str] = None, restart: bool = False,
+                               page_size: int = 20):
+        """
+        Scan quiz sets in id order, the whole catalog unless `limit` is set
+        Resumes from the checkpoint file when one is given and exists
+        """
+        checkpoint = ScanCheckpoint(checkpoint_path) if checkpoint_path else None
+        after_id = None
+        if checkpoint and not restart and checkpoint.load():
+            after_id = checkpoint.last_id
+            saved = checkpoint.state
+            self.scan_stats['total_scanned'] = saved.get('total_scanned', 0)
+            self.scan_stats['errors_found'] = saved.get('errors_found', 0)
+            self.scan_stats['categories_with_issues'] = set(saved.get('categories_with_issues', []))
+            self.suspicious_quizzes = checkpoint.items
+            logger.info(
+                f"Resuming after set {after_id} "
+                f"({self.scan_stats['total_scanned']} questions already scanned)"
+            )
+
+        total_sets = await count_quiz_sets(self.db_pool, category_filter, after_id, self.SET_FILTER)
+        if limit is not None:
+            total_sets = min(total_sets, limit)
+        logger.info(f"Starting accuracy scan of {total_sets} quiz sets")
+
+        already = self.scan_stats['total_scanned']
+        self.progress = ScanProgress(already + total_sets * 10, done=already)
+        async for page in iter_quiz_set_pages(self.db_pool, page_size, category_filter, after_id,
+                                              limit, self.SET_FILTER):
+            await asyncio.gather(*(self._scan_quiz_set(row) for row in page))
+            if checkpoint:
+                checkpoint.save(str(page[-1]['id']), {
+                    'total_scanned': self.scan_stats['total_scanned'],
+                    'errors_found': self.scan_stats['errors_found'],
+                    'categories_with_issues': sorted(self.scan_stats['categories_with_issues'])
+                }, items=self.suspicious_quizzes)
+        self.progress.finish()
+
+        # A scan that reached the end starts over next time; a limited one carries on
+        if checkpoint and not await has_more_quiz_sets(
+            self.db_pool, category_filter, checkpoint.last_id or after_id, self.SET_FILTER
+        ):
+            checkpoint.remove()
         
         return self.generate_report()
     
     async def _scan_quiz_set(self, quiz_set_row):
-        """Scan a single quiz set"""
+        """Scan a single quiz set, all questions at once"""
         data = quiz_set_row['data']
         if isinstance(data, str):
             data = json.loads(data)
@@ -89,31 +110,40 @@ class QuizAccuracyScanner:
         mode = data.get('mode', 'standard')
         questions = data.get('questions', [])
         
-        # Scan each question
-        for i, question in enumerate(questions):
-            self.scan_stats['total_scanned'] += 1
+        await asyncio.gather(*(
+            self._scan_question(question, i, set_id, category, mode)
+            for i, question in enumerate(questions)
+        ))
+
+    async def _scan_question(self, question: Dict, i: int, set_id: str, category: str, mode: str):
+        self.scan_stats['total_scanned'] += 1
+        flagged = 0
+        
+        try:
+            result = await self._validate_question(question, category, mode)
             
-            try:
-                result = await self._validate_question(question, category, mode)
+            if not result['is_accurate']:
+                flagged = 1
+                self.scan_stats['errors_found'] += 1
+                self.scan_stats['categories_with_issues'].add(category)
+                
+                self.suspicious_quizzes.append({
+                    'set_id': set_id,
+                    'question_index': i,
+                    'category': category,
+                    'mode': mode,
+                    'question': question['question'],
+                    'marked_correct': self._get_correct_answer(question),
+                    'issue': result['issue'],
+                    'confidence': result['confidence'],
+                    'severity': result['severity']
+                })
                 
-                if not result['is_accurate']:
-                    self.scan_stats['errors_found'] += 1
-                    self.scan_stats['categories_with_issues'].add(category)
-                    
-                    self.suspicious_quizzes.append({
-                        'set_id': set_id,
-                        'question_index': i,
-                        'category': category,
-                        'mode': mode,
-                        'question': question['question'],
-                        'marked_correct': self._get_correct_answer(question),
-                        'issue': result['issue'],
-                        'confidence': result['confidence'],
-                        'severity': result['severity']
-                    })
-                    
-            except Exception as e:
-                logger.error(f"Error validating question in set {set_id}: {e}")
+        except Exception as e:
+            logger.error(f"Error validating question in set {set_id}: {e}")
+
+        if self.progress:
+            self.progress.update(flagged=flagged)
     
     async def _validate_question(self, question: Dict, category: str, mode: str) -> Dict:
         """Validate a single question using AI"""
@@ -151,15 +181,17 @@ Return ONLY this JSON (no other text):
 
         try:
             # Call AI for validation
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",  # Fast model for scanning
-                max_tokens=200,
-                temperature=0,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            response = await call_anthropic({
+                "model": "claude-3-haiku-20240307",  # Fast model for scanning
+                "max_tokens": 200,
+                "temperature": 0,
+                "messages": [{"role": "user", "content": prompt}]
+            }, self.api_key, self.semaphore)
+            if response is None:
+                raise RuntimeError("API call failed")
             
             # Parse response
-            result_text = response.content[0].text.strip()
+            result_text = response['content'][0]['text'].strip()
             # Extract JSON from response
             if '{' in result_text and '}' in result_text:
                 json_start = result_text.index('{')
@@ -262,7 +294,7 @@ Return ONLY this JSON (no other text):
         logger.info(f"Summary saved to {summary_file}")
 
 
-async def main():
+async def main(args):
     """Run the accuracy scanner"""
     DATABASE_URL = os.getenv('DATABASE_URL')
     
@@ -274,22 +306,24 @@ async def main():
     db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=5)
     
     try:
-        scanner = QuizAccuracyScanner(db_pool)
+        scanner = QuizAccuracyScanner(db_pool, concurrency=args.concurrency)
         
         print("=== QUIZ ACCURACY SCANNER ===")
         print("This will use AI to check quiz questions for factual errors")
         print()
         
-        # Get scan parameters
-        category = input("Category to scan (leave blank for all): ").strip() or None
-        limit = input("Number of quiz sets to scan (default 100): ").strip()
-        limit = int(limit) if limit else 100
-        
-        print(f"\nScanning {limit} quiz sets{f' in category {category}' if category else ''}...")
-        print("This may take a few minutes...\n")
+        scope = f"{args.limit} quiz sets" if args.limit else "all quiz sets"
+        print(f"\nScanning {scope}{f' in category {args.category}' if args.category else ''} "
+              f"({args.concurrency} concurrent calls, checkpoint: {args.checkpoint})...\n")
         
         # Run scan
-        report = await scanner.scan_all_quizzes(limit=limit, category_filter=category)
+        report = await scanner.scan_all_quizzes(
+            limit=args.limit,
+            category_filter=args.category,
+            checkpoint_path=args.checkpoint,
+            restart=args.restart,
+            page_size=args.page_size
+        )
         
         # Save report
         scanner.save_report(report)
@@ -307,8 +341,18 @@ async def main():
                 print(f"   Issue: {quiz['issue']}")
         
     finally:
+        await close_clients()
         await db_pool.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Scan quiz sets for factual errors')
+    parser.add_argument('--category', type=str, help='Filter by category')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after this many sets (default: whole catalog)')
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('ACCURACY_SCAN_CONCURRENCY', '8')),
+                        help='API calls in flight at once')
+    parser.add_argument('--page-size', type=int, default=20, help='Sets per checkpointed page')
+    parser.add_argument('--checkpoint', type=str, default='accuracy_scan_checkpoint.json',
+                        help='Progress file for resuming an interrupted scan')
+    parser.add_argument('--restart', action='store_true', help='Ignore saved progress')
+    asyncio.run(main(parser.parse_args()))
@@ -10,7 +10,7 @@ import re
 from datetime import datetime, timedelta
 from uuid import uuid4, UUID
 from typing import Dict, Any, List
-import aiohttp
+from provider_client import close_clients, get_client
 from database import db
 from dotenv import load_dotenv
 
@@ -103,29 +103,28 @@ class QuizGenerator:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.anthropic.com/v1/messages",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        content = data['content'][0]['text']
-                        
-                        # Parse JSON from response
-                        # Claude might wrap it in markdown, so extract JSON
-                        import re
-                        json_match = re.search(r'\{[\s\S]*\}', content)
-                        if json_match:
-                            quiz_data = json.loads(json_match.group(0))
-                            return {
-                                "category": category,
-                                "difficulty": "medium",
-                                **quiz_data
-                            }
-                    else:
-                        logger.error(f"Anthropic API error: {response.status}")
+            async with get_client('anthropic').post(
+                "https://api.anthropic.com/v1/messages",
+                headers=headers,
+                json=payload
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    content = data['content'][0]['text']
+                    
+                    # Parse JSON from response
+                    # Claude might wrap it in markdown, so extract JSON
+                    import re
+                    json_match = re.search(r'\{[\s\S]*\}', content)
+                    if json_match:
+                        quiz_data = json.loads(json_match.group(0))
+                        return {
+                            "category": category,
+                            "difficulty": "medium",
+                            **quiz_data
+                        }
+                else:
+                    logger.error(f"Anthropic API error: {response.status}")
         except Exception as e:
             logger.error(f"Error calling Anthropic API: {e}")
         
@@ -301,15 +300,14 @@ class QuizGenerator:
                 }]
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.anthropic.com/v1/messages",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data['content'][0]['text'].strip()
+            async with get_client('anthropic').post(
+                "https://api.anthropic.com/v1/messages",
+                headers=headers,
+                json=payload
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data['content'][0]['text'].strip()
         except Exception as e:
             logger.error(f"Error generating chaos question: {e}")
         
@@ -441,6 +439,7 @@ async def main():
         generator = QuizGenerator()
         await generator.run_generator()
     finally:
+        await close_clients()
         await db.disconnect()
 
 if __name__ == "__main__":
@@ -9,9 +9,10 @@ import logging
 from datetime import datetime
 from uuid import uuid4
 from typing import Dict, Any, List
-import aiohttp
+from provider_client import get_client
 from dotenv import load_dotenv
 from database import db
+from question_index import question_index
 
 load_dotenv()
 
@@ -265,15 +266,14 @@ class QuizSetGenerator:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        content = result['content'][0]['text']
-                        return json.loads(content)
-                    else:
-                        logger.error(f"API error: {response.status}")
-                        return None
+            async with get_client('anthropic').post(self.api_url, headers=headers, json=payload) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    content = result['content'][0]['text']
+                    return json.loads(content)
+                else:
+                    logger.error(f"API error: {response.status}")
+                    return None
         except Exception as e:
             logger.error(f"Error generating question: {e}")
             return None
@@ -313,13 +313,12 @@ class QuizSetGenerator:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result['content'][0]['text'].strip()
-                    else:
-                        return f"Amazing {category.title()} Trivia Challenge"
+            async with get_client('anthropic').post(self.api_url, headers=headers, json=payload) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    return result['content'][0]['text'].strip()
+                else:
+                    return f"Amazing {category.title()} Trivia Challenge"
         except Exception as e:
             logger.error(f"Error generating title: {e}")
             return f"Amazing {category.title()} Trivia Challenge"
@@ -369,13 +368,12 @@ class QuizSetGenerator:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result['content'][0]['text'].strip()
-                    else:
-                        return original_question
+            async with get_client('anthropic').post(self.api_url, headers=headers, json=payload) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    return result['content'][0]['text'].strip()
+                else:
+                    return original_question
         except Exception as e:
             logger.error(f"Error generating chaos question: {e}")
             return original_question
@@ -391,12 +389,15 @@ class QuizSetGenerator:
         # Generate title
         title = await self.generate_quiz_title(category)
         
-        # Generate 10 questions
+        # Generate 10 questions, asking again (a few times) for any that
+        # repeat a question already in the catalog or in this set
         questions = []
-        for i in range(10):
-            question = await self.generate_quiz_question(category, i + 1)
+        attempts = 0
+        while len(questions) < 10 and attempts < 15:
+            attempts += 1
+            question = await self.generate_quiz_question(category, len(questions) + 1)
             if question:
-                questions.append(question)
+                questions += question_index.filter_new([question], accepted=questions)
             await asyncio.sleep(0.5)  # Rate limiting
         
         # Determine difficulty based on category
@@ -533,6 +534,7 @@ class QuizSetGenerator:
                     VALUES ($1, $2, $3)
                 """, quiz_id, mode, json.dumps(variation))
             
+            question_index.add_set(quiz_id, quiz_set['questions'])
             logger.info(f"Saved quiz set: {quiz_id} - {quiz_set['title']}")
             return quiz_id
     
@@ -541,6 +543,10 @@ class QuizSetGenerator:
         # Pick a random category
         category = self.categories[int(datetime.now().timestamp()) % len(self.categories)]
         
+        # Pick up sets other generators saved since the last round
+        async with db.pool.acquire() as conn:
+            await question_index.refresh(conn)
+        
         # Generate quiz set
         quiz_set = await self.generate_quiz_set(category)
         
@@ -569,6 +575,8 @@ class QuizSetGenerator:
 async def main():
     """Main entry point"""
     await db.connect()
+    async with db.pool.acquire() as conn:
+        await question_index.refresh(conn, full=True)
     
     generator = QuizSetGenerator()
     
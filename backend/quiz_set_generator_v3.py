@@ -35,10 +35,14 @@ import json
 import logging
 from datetime import datetime
 from uuid import uuid4
-from typing import Dict, Any, List
-import aiohttp
+from typing import Dict, Any, List, Optional
+from provider_client import call_anthropic
 from dotenv import load_dotenv
 from database import db
+from llm_batch import batch_max_tokens, parse_json_items
+from content_safety import safety_filter
+from question_index import question_index
+import copy
 import random
 
 load_dotenv()
@@ -50,31 +54,9 @@ class ContentFilter:
     """Content filter to ensure kid-safe quiz questions"""
     
     def __init__(self):
-        # Inappropriate words/phrases to filter
-        # Only filter the really inappropriate stuff - trust Haiku's judgment!
-        self.inappropriate_terms = [
-            # Extreme violence
-            'murder', 'torture', 'massacre', 'slaughter', 'gore',
-            
-            # Explicit content
-            'sex', 'sexual', 'erotic', 'porn', 'nude', 'naked',
-            
-            # Hard drugs
-            'cocaine', 'heroin', 'meth', 'crack',
-            
-            # Hate speech
-            'racism', 'sexism', 'bigotry', 'discrimination',
-            
-            # Self-harm
-            'suicide', 'self-harm', 'cutting'
-        ]
-        
-        # Topics to be careful with (context matters)
-        self.sensitive_topics = [
-            'terminal illness', 'graphic accidents', 'natural disasters',
-            'extreme poverty', 'homelessness', 'war zones',
-            'serious mental health issues', 'eating disorders'
-        ]
+        # Term lists and patterns live in content_safety, compiled once and
+        # shared with the other generators
+        self.safety = safety_filter
         
         # Safe replacement suggestions
         self.safe_replacements = {
@@ -92,61 +74,16 @@ class ContentFilter:
     
     def is_content_safe(self, text: str) -> bool:
         """Check if content is safe for kids"""
-        text_lower = text.lower()
-        
-        # Check for inappropriate terms
-        for term in self.inappropriate_terms:
-            if term in text_lower:
-                logger.warning(f"Content filter blocked term: {term}")
-                return False
-        
-        # Check for sensitive topics
-        for topic in self.sensitive_topics:
-            if topic in text_lower:
-                logger.warning(f"Content filter blocked topic: {topic}")
-                return False
-        
-        # Additional profanity pattern checking
-        import re
-        profanity_patterns = [
-            r'\bf[*@#$%!]+c?k\b',  # F-word with censoring
-            r'\bs[*@#$%!]+i?t\b',  # S-word with censoring
-            r'\bb[*@#$%!]+t?ch\b', # B-word with censoring
-            r'\b[a@][*@#$%!]+s{1,2}\b', # A-word with censoring
-            r'\bd[*@#$%!]+c?k\b',  # D-word with censoring
-            # Actual profanity (word boundaries to avoid false positives)
-            r'\bfuck\b', r'\bshit\b', r'\bbitch\b', r'\bdick\b',
-            r'\bcunt\b', r'\bcock\b', r'\bbastard\b',
-            # Only catch "ass" when standalone or in compound profanity
-            r'\bass\s', r'\bass$', r'asshole', r'jackass', r'dumbass'
-        ]
-        
-        for pattern in profanity_patterns:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                logger.warning(f"Content filter blocked profanity pattern: {pattern}")
-                return False
-        
-        return True
+        return self.safety.is_safe(text)
     
     def filter_question(self, question_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Filter and clean a question"""
+        """Filter a question - text, answers and explanation are screened in one pass"""
         if not question_data:
             return question_data
         
-        # Check question text
-        if not self.is_content_safe(question_data.get('question', '')):
-            logger.warning("Question failed content filter")
-            return None
-        
-        # Check all answers
-        for answer in question_data.get('answers', []):
-            if not self.is_content_safe(answer.get('text', '')):
-                logger.warning(f"Answer failed content filter: {answer.get('text', '')}")
-                return None
-        
-        # Check explanation
-        if not self.is_content_safe(question_data.get('explanation', '')):
-            logger.warning("Explanation failed content filter")
+        match = self.safety.screen_question(question_data)
+        if match:
+            logger.warning(f"Question failed content filter: {match!r}")
             return None
         
         return question_data
@@ -183,6 +120,16 @@ class QuizSetGeneratorV3:
         self.api_url = "https://api.anthropic.com/v1/messages"
         self.content_filter = ContentFilter()
         
+        # Questions are generated concurrently; the limiter is shared with every
+        # other generator in the process
+        self.api_semaphore = asyncio.Semaphore(int(os.getenv('QUIZ_GEN_CONCURRENCY', '5')))
+        self.max_api_retries = 5
+        
+        # Ask for the whole set in one call and only regenerate the questions
+        # that fail parsing or the content filter
+        self.batch_generation = os.getenv('QUIZ_GEN_BATCH', 'true').lower() == 'true'
+        self.max_batch_rounds = 3
+        
         # Original categories
         self.original_categories = [
             'technology', 'science', 'history', 'geography', 'literature',
@@ -526,19 +473,16 @@ class QuizSetGeneratorV3:
             'mode': mode  # Include mode in economics
         }
         
-    async def generate_quiz_question(self, category: str, question_num: int, difficulty: str, mode: str = 'poqpoq') -> Dict[str, Any]:
-        """Generate a single quiz question with difficulty and mode awareness"""
-        # Add some chaos context for variety
-        chaos_character = random.choice(self.chaos_characters)
-        chaos_scenario = random.choice(self.chaos_scenarios)
+    async def _call_api(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Messages API call under this generator's concurrency cap and the shared limiter"""
+        return await call_anthropic(payload, self.api_key, self.api_semaphore, self.max_api_retries, self.api_url)
+    
+    def _question_guidelines(self, category: str, difficulty: str, mode: str, chaos_frame: str) -> str:
+        """Audience, style, mode and safety rules shared by single and batched question prompts"""
         pop_ref = random.choice(self.pop_culture_refs)
-        
-        # Difficulty-specific instructions
         diff_config = self.difficulty_levels[difficulty]
         
-        prompt = f"""You are the JazzyPop Quiz Master creating a {mode} mode quiz! Create an entertaining trivia question about {category}.
-        This is question {question_num} of 10 in a quiz set.
-        
+        guidelines = f"""
         TARGET AUDIENCE: Ages 6-13, specifically {diff_config['description']}
         DIFFICULTY LEVEL: {difficulty} (complexity: {diff_config['complexity']})
         MODE: {mode}
@@ -578,9 +522,9 @@ class QuizSetGeneratorV3:
         """
         
         if mode == 'chaos':
-            prompt += f"""
+            guidelines += f"""
         CHAOS MODE ACTIVATED! 🎪
-        - Frame the question with: {chaos_character} in a {chaos_scenario}
+        - {chaos_frame}
         - Use maximum silliness and {pop_ref}
         - Wrong answers should be hilariously wrong
         - Add emojis and excitement!
@@ -588,7 +532,7 @@ class QuizSetGeneratorV3:
         - Tag with: chaos, wild, unhinged
         """
         elif mode == 'zen':
-            prompt += """
+            guidelines += """
         ZEN MODE - Peaceful Learning 🧘
         - Use calm, encouraging language
         - Focus on the joy of learning
@@ -597,7 +541,7 @@ class QuizSetGeneratorV3:
         - Tag with: zen, peaceful, mindful
         """
         elif mode == 'speed':
-            prompt += """
+            guidelines += """
         SPEED MODE - Quick Thinking! ⚡
         - Make questions clear and snappy
         - Answers should be quick to read
@@ -605,14 +549,14 @@ class QuizSetGeneratorV3:
         - Tag with: speed, fast, quick
         """
         else:  # poqpoq (standard)
-            prompt += """
+            guidelines += """
         STANDARD MODE - Classic Fun! 🌟
         - Balance education and entertainment
         - Clear, engaging questions
         - Tag with: poqpoq, standard, classic
         """
         
-        prompt += f"""
+        guidelines += f"""
         
         {self.content_filter.get_safety_prompt()}
         
@@ -621,6 +565,22 @@ class QuizSetGeneratorV3:
         - Wrong answers should be obviously silly or clearly wrong
         - Use familiar examples from kids' lives
         - Keep all answers short and readable
+        """
+        return guidelines
+    
+    async def generate_quiz_question(self, category: str, question_num: int, difficulty: str, mode: str = 'poqpoq') -> Dict[str, Any]:
+        """Generate a single quiz question with difficulty and mode awareness"""
+        # Add some chaos context for variety
+        chaos_character = random.choice(self.chaos_characters)
+        chaos_scenario = random.choice(self.chaos_scenarios)
+        guidelines = self._question_guidelines(
+            category, difficulty, mode,
+            f"Frame the question with: {chaos_character} in a {chaos_scenario}"
+        )
+        
+        prompt = f"""You are the JazzyPop Quiz Master creating a {mode} mode quiz! Create an entertaining trivia question about {category}.
+        This is question {question_num} of 10 in a quiz set.
+        {guidelines}
         
         Return JSON with this exact format:
         {{
@@ -639,12 +599,6 @@ class QuizSetGeneratorV3:
         
         Return ONLY the JSON, no other text."""
         
-        headers = {
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
-        
         payload = {
             "model": "claude-3-haiku-20240307",
             "max_tokens": 600,
@@ -656,31 +610,144 @@ class QuizSetGeneratorV3:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        content = result['content'][0]['text']
-                        question_data = json.loads(content)
-                        # Ensure mode and difficulty are included
-                        question_data['mode'] = mode
-                        question_data['difficulty'] = difficulty
-                        
-                        # Filter the question for safety
-                        filtered_question = self.content_filter.filter_question(question_data)
-                        if not filtered_question:
-                            logger.warning(f"Question failed content filter, regenerating...")
-                            # Return None to trigger regeneration
-                            return None
-                        
-                        return filtered_question
-                    else:
-                        logger.error(f"API error: {response.status}")
-                        return None
+            result = await self._call_api(payload)
+            if not result:
+                return None
+            
+            content = result['content'][0]['text']
+            question_data = json.loads(content)
+            # Ensure mode and difficulty are included
+            question_data['mode'] = mode
+            question_data['difficulty'] = difficulty
+            
+            # Filter the question for safety
+            filtered_question = self.content_filter.filter_question(question_data)
+            if not filtered_question:
+                logger.warning(f"Question failed content filter, regenerating...")
+                # Return None to trigger regeneration
+                return None
+            
+            return filtered_question
         except Exception as e:
             logger.error(f"Error generating question: {e}")
             return None
     
+    def _is_complete_question(self, item: Dict[str, Any]) -> bool:
+        """A batch item must be a whole question: text plus 4 answers with one correct"""
+        answers = item.get('answers')
+        return (
+            isinstance(item.get('question'), str) and bool(item['question'].strip())
+            and isinstance(answers, list) and len(answers) == 4
+            and all(isinstance(a, dict) and isinstance(a.get('text'), str) for a in answers)
+            and sum(1 for a in answers if a.get('correct') is True) == 1
+        )
+    
+    async def generate_question_batch(self, category: str, count: int, difficulty: str, mode: str = 'poqpoq',
+                                      existing: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Generate `count` questions in one API call
+        Returns only the items that parsed and passed the content filter - the
+        caller asks again for however many are missing
+        """
+        # One chaos frame per question so the batch doesn't all share one gag
+        chaos_frames = '; '.join(
+            f"Q{i + 1}: {random.choice(self.chaos_characters)} in a {random.choice(self.chaos_scenarios)}"
+            for i in range(count)
+        )
+        guidelines = self._question_guidelines(
+            category, difficulty, mode,
+            f"Frame each question with its own character and scenario: {chaos_frames}"
+        )
+        
+        avoid = ""
+        if existing:
+            avoid = "\n        ALREADY IN THIS SET (do not repeat or closely paraphrase):\n" + "\n".join(
+                f"        - {text}" for text in existing
+            )
+        
+        prompt = f"""You are the JazzyPop Quiz Master creating a {mode} mode quiz! Create {count} entertaining trivia questions about {category}.
+        Each question should cover a different fact - no two questions about the same thing.
+        {guidelines}
+        {avoid}
+        
+        Return a JSON array of exactly {count} objects, each in this exact format:
+        [
+            {{
+                "question": "Your creative question here",
+                "answers": [
+                    {{"id": "a", "text": "Answer 1", "correct": false}},
+                    {{"id": "b", "text": "Answer 2", "correct": true}},
+                    {{"id": "c", "text": "Answer 3", "correct": false}},
+                    {{"id": "d", "text": "Answer 4", "correct": false}}
+                ],
+                "explanation": "Kid-friendly explanation that makes learning fun!",
+                "mode": "{mode}",
+                "difficulty": "{difficulty}",
+                "tags": ["tag1", "tag2", "{mode}", "{category}"]
+            }}
+        ]
+        
+        Return ONLY the JSON array, no other text."""
+        
+        payload = {
+            "model": "claude-3-haiku-20240307",
+            "max_tokens": batch_max_tokens(count, per_item=380),
+            "temperature": 0.9 if mode == 'chaos' else 0.7,
+            "messages": [{
+                "role": "user",
+                "content": prompt
+            }]
+        }
+        
+        try:
+            result = await self._call_api(payload)
+        except Exception as e:
+            logger.error(f"Error generating question batch: {e}")
+            return []
+        if not result:
+            return []
+        
+        questions = []
+        items = parse_json_items(result['content'][0]['text'])
+        for item in items:
+            if not self._is_complete_question(item):
+                continue
+            item['mode'] = mode
+            item['difficulty'] = difficulty
+            filtered_question = self.content_filter.filter_question(item)
+            if filtered_question:
+                questions.append(filtered_question)
+        
+        if len(questions) < count:
+            logger.warning(f"Batch returned {len(questions)}/{count} usable questions ({len(items)} parsed)")
+        return questions[:count]
+    
+    async def _generate_questions_batched(self, category: str, difficulty: str, mode: str, count: int = 10) -> List[Dict[str, Any]]:
+        """Fill a set with batched calls, re-asking only for the missing questions"""
+        questions: List[Dict[str, Any]] = []
+        for _ in range(self.max_batch_rounds):
+            missing = count - len(questions)
+            if missing <= 0:
+                break
+            batch = await self.generate_question_batch(
+                category, missing, difficulty, mode,
+                existing=[q['question'] for q in questions]
+            )
+            # Repeats of the catalog count as missing and get asked for again
+            questions += question_index.filter_new(batch, accepted=questions)
+        
+        # Last resort: single-question calls for whatever is still missing
+        missing = count - len(questions)
+        if missing > 0:
+            logger.warning(f"Falling back to single-question generation for {missing} questions")
+            singles = await asyncio.gather(*(
+                self._generate_safe_question(category, len(questions) + i + 1, difficulty, mode)
+                for i in range(missing)
+            ))
+            questions += question_index.filter_new([q for q in singles if q], accepted=questions)
+        
+        return questions
+    
     async def generate_quiz_title(self, category: str, mode: str = 'poqpoq') -> str:
         """Generate a creative title for the quiz set based on mode"""
         mode_themes = {
@@ -732,12 +799,6 @@ class QuizSetGeneratorV3:
         
         prompt += f"\n\nReturn ONLY the title for {category} in {mode} mode, no quotes, no other text."
         
-        headers = {
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
-        
         payload = {
             "model": "claude-3-haiku-20240307",
             "max_tokens": 100,
@@ -749,13 +810,10 @@ class QuizSetGeneratorV3:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result['content'][0]['text'].strip()
-                    else:
-                        return f"Amazing {category.title()} {mode.title()} Challenge"
+            result = await self._call_api(payload)
+            if result:
+                return result['content'][0]['text'].strip()
+            return f"Amazing {category.title()} {mode.title()} Challenge"
         except Exception as e:
             logger.error(f"Error generating title: {e}")
             return f"Amazing {category.title()} {mode.title()} Challenge"
@@ -803,6 +861,63 @@ class QuizSetGeneratorV3:
         ]
         return random.choice(hints)
     
+    def _correct_answer_text(self, question: Dict[str, Any]) -> Optional[str]:
+        """The correct answer's text, from the answers list or a flat correct_answer field"""
+        for answer in question.get('answers', []):
+            if answer.get('correct'):
+                return answer.get('text')
+        return question.get('correct_answer')
+    
+    async def generate_zen_hints(self, questions: List[Dict[str, Any]], category: str) -> List[Optional[str]]:
+        """
+        Hints for a whole set in one API call
+        Falls back to the generate_zen_hint templates for any hint that is
+        missing, malformed or fails the content filter
+        """
+        answers = [self._correct_answer_text(q) for q in questions]
+        listing = "\n".join(
+            f"        {i + 1}. Q: {q['question']} | A: {answer}"
+            for i, (q, answer) in enumerate(zip(questions, answers))
+        )
+        prompt = f"""You are the calm, kind JazzyPop Zen guide. For each {category} quiz question below,
+        write one gentle hint for kids aged 6-13 that nudges them toward the answer without giving it away.
+        Keep each hint under 100 characters, peaceful and encouraging.
+        
+{listing}
+        
+        Return ONLY a JSON array of {len(questions)} strings, one hint per question, in order."""
+        
+        payload = {
+            "model": "claude-3-haiku-20240307",
+            "max_tokens": batch_max_tokens(len(questions), per_item=50),
+            "temperature": 0.7,
+            "messages": [{
+                "role": "user",
+                "content": prompt
+            }]
+        }
+        
+        generated: List[Any] = []
+        try:
+            result = await self._call_api(payload)
+            if result:
+                content = result['content'][0]['text']
+                start, end = content.find('['), content.rfind(']') + 1
+                if start >= 0 and end > start:
+                    generated = json.loads(content[start:end])
+        except Exception as e:
+            logger.error(f"Error generating zen hints: {e}")
+        if not isinstance(generated, list):
+            generated = []
+        
+        hints = []
+        for i, (q, answer) in enumerate(zip(questions, answers)):
+            hint = generated[i] if i < len(generated) else None
+            if not isinstance(hint, str) or not hint.strip() or not self.content_filter.is_content_safe(hint):
+                hint = await self.generate_zen_hint(q['question'], answer, category) if answer else None
+            hints.append(hint)
+        return hints
+    
     def find_rhyme(self, word: str) -> str:
         """Simple rhyme finder for hints"""
         # This is a simplified version - in production you'd want a proper rhyme dictionary
@@ -813,31 +928,53 @@ class QuizSetGeneratorV3:
         }
         return rhyme_hints.get(last_sound, 'something special')
     
+    async def _generate_safe_question(self, category: str, question_num: int, difficulty: str, mode: str) -> Optional[Dict[str, Any]]:
+        """Generate one question, regenerating if it fails the content filter"""
+        max_retries = 3
+        for retry in range(max_retries):
+            question = await self.generate_quiz_question(category, question_num, difficulty, mode)
+            if question:
+                return question
+            if retry < max_retries - 1:
+                logger.info(f"Retrying question generation for question {question_num}")
+        logger.error(f"Failed to generate safe question {question_num} after {max_retries} attempts")
+        return None
+    
+    async def _generate_questions_single(self, category: str, difficulty: str, mode: str, count: int = 10) -> List[Dict[str, Any]]:
+        """Fill a set with one call per question, re-asking for any that repeat the catalog or the set"""
+        questions: List[Dict[str, Any]] = []
+        for _ in range(self.max_batch_rounds):
+            missing = count - len(questions)
+            if missing <= 0:
+                break
+            # All missing questions fan out together; the semaphore and the
+            # shared limiter keep us inside the API limits
+            singles = await asyncio.gather(*(
+                self._generate_safe_question(category, len(questions) + i + 1, difficulty, mode)
+                for i in range(missing)
+            ))
+            questions += question_index.filter_new([q for q in singles if q], accepted=questions)
+        return questions
+    
     async def generate_quiz_set(self, category: str, mode: str = 'poqpoq') -> Dict[str, Any]:
         """Generate a complete quiz set with 10 questions for a specific mode"""
         logger.info(f"Generating {mode} mode quiz set for category: {category}")
         
-        # Generate title based on mode
-        title = await self.generate_quiz_title(category, mode)
-        
         # Determine difficulty based on category
         difficulty = self.get_category_difficulty(category)
         
-        # Generate 10 questions with retry logic for filtered content
-        questions = []
-        for i in range(10):
-            max_retries = 3
-            for retry in range(max_retries):
-                question = await self.generate_quiz_question(category, i + 1, difficulty, mode)
-                if question:
-                    questions.append(question)
-                    break
-                elif retry < max_retries - 1:
-                    logger.info(f"Retrying question generation for question {i + 1}")
-                    await asyncio.sleep(0.3)  # Brief pause before retry
-            else:
-                logger.error(f"Failed to generate safe question {i + 1} after {max_retries} attempts")
-            await asyncio.sleep(0.5)  # Rate limiting
+        if self.batch_generation:
+            # One call for the whole set (plus small follow-ups for rejects),
+            # alongside the title
+            title, questions = await asyncio.gather(
+                self.generate_quiz_title(category, mode),
+                self._generate_questions_batched(category, difficulty, mode)
+            )
+        else:
+            title, questions = await asyncio.gather(
+                self.generate_quiz_title(category, mode),
+                self._generate_questions_single(category, difficulty, mode)
+            )
         
         # Create quiz set structure with mode information
         quiz_set = {
@@ -854,28 +991,45 @@ class QuizSetGeneratorV3:
         
         return quiz_set
     
+    def _derive_variation(self, base_quiz_set: Dict[str, Any], mode: str) -> Dict[str, Any]:
+        """Copy of the base set retagged for another mode - no API calls"""
+        base_mode = base_quiz_set['mode']
+        variation = copy.deepcopy(base_quiz_set)
+        variation['mode'] = mode
+        variation['trivia'] = f"This {mode} mode quiz explores fun facts about {variation['category']}!"
+        variation['economics'] = self.calculate_economics(variation['category'], variation['difficulty'], mode)
+        variation['tags'] = [mode if tag == base_mode else tag for tag in variation.get('tags', [])]
+        
+        for q in variation['questions']:
+            q['mode'] = mode
+            if isinstance(q.get('tags'), list):
+                q['tags'] = [mode if tag == base_mode else tag for tag in q['tags']]
+        
+        return variation
+    
     async def generate_mode_variations(self, base_quiz_set: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate all mode variations from a base quiz set"""
+        """Derive all mode variations from a base quiz set by transforming its questions"""
         variations = {}
         
-        # Generate each mode variation
+        # Every variation reuses the base questions; only what a mode needs is rewritten
         for mode in ['chaos', 'zen', 'speed', 'poqpoq']:
             if mode == base_quiz_set['mode']:
                 # Use the base quiz set for its native mode
                 variations[mode] = base_quiz_set
             else:
-                # Generate new variation for this mode
-                mode_quiz = await self.generate_quiz_set(
-                    base_quiz_set['category'], 
-                    mode
-                )
-                variations[mode] = mode_quiz
+                variations[mode] = self._derive_variation(base_quiz_set, mode)
         
         # Add mode-specific enhancements
         
         # CHAOS MODE - Complete insanity
         if 'chaos' in variations:
             chaos_quiz = variations['chaos']
+            if chaos_quiz is not base_quiz_set:
+                # Templated rewording, no API call; a chaos base set was written that way already
+                for q in chaos_quiz['questions']:
+                    q['original_question'] = q['question']
+                    q['question'] = await self.generate_chaos_question(q['question'])
+            
             # Enhance chaos questions with extra effects
             for i, q in enumerate(chaos_quiz['questions']):
                 chaos_level = random.randint(1, 5)
@@ -911,14 +1065,12 @@ class QuizSetGeneratorV3:
                 "Take your time, there's no rush 🐢"
             ]
             
-            for q in zen_quiz['questions']:
+            # All hints for the set come from one call
+            hints = await self.generate_zen_hints(zen_quiz['questions'], zen_quiz['category'])
+            for q, hint in zip(zen_quiz['questions'], hints):
                 q['affirmation'] = random.choice(zen_affirmations)
-                if 'correct_answer' in q:
-                    q['hint'] = await self.generate_zen_hint(
-                        q['question'], 
-                        q['correct_answer'], 
-                        zen_quiz['category']
-                    )
+                if hint:
+                    q['hint'] = hint
             
             zen_quiz['zen_config'] = {
                 "no_timer": True,
@@ -988,6 +1140,7 @@ class QuizSetGeneratorV3:
                     VALUES ($1, $2, $3)
                 """, quiz_id, mode, json.dumps(variation))
             
+            question_index.add_set(quiz_id, quiz_set['questions'])
             logger.info(f"Saved quiz set: {quiz_id} - {quiz_set['title']} (Mode: {quiz_set['mode']})")
             return quiz_id
     
@@ -999,18 +1152,26 @@ class QuizSetGeneratorV3:
         # Pick mode (random or specific)
         mode = specific_mode or random.choice(['poqpoq', 'chaos', 'zen', 'speed'])
         
+        await self.run_for(category, mode)
+    
+    async def run_for(self, category: str, mode: str) -> Optional[Any]:
+        """Generate and save one quiz set for a category and mode; returns its id"""
+        # Pick up sets other generators saved since the last round
+        async with db.pool.acquire() as conn:
+            await question_index.refresh(conn)
+        
         # Generate base quiz set for the chosen mode
         base_quiz_set = await self.generate_quiz_set(category, mode)
         
         if len(base_quiz_set['questions']) < 8:
             logger.error(f"Not enough questions generated: {len(base_quiz_set['questions'])}")
-            return
+            return None
         
         # Generate all mode variations
         variations = await self.generate_mode_variations(base_quiz_set)
         
         # Save to database
-        await self.save_quiz_set(base_quiz_set, variations)
+        return await self.save_quiz_set(base_quiz_set, variations)
     
     async def run_continuous(self, interval_minutes: int = 5):
         """Run continuously, generating quiz sets at intervals"""
@@ -1032,6 +1193,8 @@ class QuizSetGeneratorV3:
 async def main():
     """Main entry point"""
     await db.connect()
+    async with db.pool.acquire() as conn:
+        await question_index.refresh(conn, full=True)
     
     generator = QuizSetGeneratorV3()
     
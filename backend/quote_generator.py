@@ -9,7 +9,8 @@ import logging
 from datetime import datetime
 from uuid import uuid4
 from typing import Dict, Any, List
-import aiohttp
+from provider_client import close_clients, get_client
+from content_safety import safety_filter
 from database import db
 from dotenv import load_dotenv
 
@@ -102,40 +103,45 @@ class QuoteGenerator:
                 }]
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.anthropic.com/v1/messages",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        content = data['content'][0]['text']
+            async with get_client('anthropic').post(
+                "https://api.anthropic.com/v1/messages",
+                headers=headers,
+                json=payload
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    content = data['content'][0]['text']
+                    
+                    # Parse JSON from response
+                    # Claude might wrap it in markdown, so extract JSON
+                    import re
+                    json_match = re.search(r'\{[\s\S]*\}', content)
+                    if json_match:
+                        quote_data = json.loads(json_match.group())
                         
-                        # Parse JSON from response
-                        # Claude might wrap it in markdown, so extract JSON
-                        import re
-                        json_match = re.search(r'\{[\s\S]*\}', content)
-                        if json_match:
-                            quote_data = json.loads(json_match.group())
-                            
-                            # Ensure author is always present
-                            if not quote_data.get('author'):
-                                quote_data['author'] = 'Unknown'
-                            
-                            return {
-                                "id": str(uuid4()),
-                                "type": "quote",
-                                "data": quote_data,
-                                "metadata": {
-                                    "theme": theme,
-                                    "generated_at": datetime.utcnow().isoformat()
-                                },
-                                "tags": ["quote", theme, "flashcard"]
-                            }
-                    else:
-                        logger.error(f"API error: {response.status}")
-                        return None
+                        # Screen with the shared safety filter
+                        match = safety_filter.check_item(quote_data)
+                        if match:
+                            logger.warning(f"Content filter rejected quote: {match!r}")
+                            return self.get_fallback_quote(theme)
+                        
+                        # Ensure author is always present
+                        if not quote_data.get('author'):
+                            quote_data['author'] = 'Unknown'
+                        
+                        return {
+                            "id": str(uuid4()),
+                            "type": "quote",
+                            "data": quote_data,
+                            "metadata": {
+                                "theme": theme,
+                                "generated_at": datetime.utcnow().isoformat()
+                            },
+                            "tags": ["quote", theme, "flashcard"]
+                        }
+                else:
+                    logger.error(f"API error: {response.status}")
+                    return None
                         
         except Exception as e:
             logger.error(f"Failed to generate quote: {e}")
@@ -246,6 +252,7 @@ async def main():
     try:
         await run_quote_generator()
     finally:
+        await close_clients()
         await db.disconnect()
 
 if __name__ == "__main__":
@@ -5,7 +5,6 @@ Ultra-efficient content tracking using roaring bitmaps
 
 from typing import List, Dict, Optional, Set
 from datetime import datetime
-import json
 from uuid import UUID
 import logging
 
@@ -30,7 +29,21 @@ class RoaringBitmapDeduplication:
         Create table to store user content bitmaps
         One-time setup for the system
         """
-        
+
+        # Both engines store and flush through the roaringbitmap type and rb_* functions;
+        # without the extension every bitmap write would fail, so refuse to start
+        if not await conn.fetchval(
+            "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'roaringbitmap')"
+        ):
+            try:
+                await conn.execute("CREATE EXTENSION IF NOT EXISTS roaringbitmap")
+            except Exception as e:
+                raise RuntimeError(
+                    "The pg_roaringbitmap extension is not installed and could not be "
+                    f"created ({e}); install it or run CREATE EXTENSION roaringbitmap as a superuser"
+                ) from e
+            logger.info("Created the roaringbitmap extension")
+
         # Create sequence table to map UUIDs to integers
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS content_id_mapping (
@@ -64,6 +77,12 @@ class RoaringBitmapDeduplication:
         
         logger.info("Roaring bitmap tables initialized")
     
+    async def start(self, pool):
+        """Nothing to warm up - every call goes straight to Postgres"""
+    
+    async def stop(self):
+        """Nothing is buffered, so nothing to flush"""
+    
     async def get_or_create_content_id(
         self, 
         conn, 
@@ -93,6 +112,29 @@ class RoaringBitmapDeduplication:
             RETURNING id
         """, UUID(content_uuid), content_type)
     
+    async def get_or_create_content_ids(
+        self,
+        conn,
+        content_uuids: List[str],
+        content_type: str
+    ) -> Dict[str, int]:
+        """
+        Bulk version of get_or_create_content_id - one statement for any
+        number of UUIDs. Returns {uuid string: integer id}
+        """
+        if not content_uuids:
+            return {}
+        
+        rows = await conn.fetch("""
+            INSERT INTO content_id_mapping (content_uuid, content_type)
+            SELECT DISTINCT u, $2 FROM unnest($1::uuid[]) AS u
+            ON CONFLICT (content_uuid) DO UPDATE
+            SET content_type = EXCLUDED.content_type
+            RETURNING id, content_uuid
+        """, [UUID(u) for u in content_uuids], content_type)
+        
+        return {str(row["content_uuid"]): row["id"] for row in rows}
+    
     async def mark_content_seen(
         self,
         conn,
@@ -154,6 +196,70 @@ class RoaringBitmapDeduplication:
                 last_updated = NOW()
         """, UUID(user_id), content_type, content_id)
     
+    async def mark_many_seen(
+        self,
+        conn,
+        user_id: str,
+        content_type: str,
+        content_uuids: List[str]
+    ):
+        """
+        Mark several items as seen with a single rb_or
+        """
+        
+        if not content_uuids:
+            return
+        
+        content_ids = await self.get_or_create_content_ids(
+            conn, content_uuids, content_type
+        )
+        
+        await conn.execute("""
+            INSERT INTO user_content_bitmaps (user_id, content_type, seen_bitmap)
+            VALUES ($1, $2, rb_build($3::integer[]))
+            ON CONFLICT (user_id, content_type) 
+            DO UPDATE SET 
+                seen_bitmap = rb_or(
+                    COALESCE(user_content_bitmaps.seen_bitmap, rb_build(ARRAY[]::integer[])),
+                    EXCLUDED.seen_bitmap
+                ),
+                last_updated = NOW()
+        """, UUID(user_id), content_type, list(content_ids.values()))
+    
+    async def mark_many_completed(
+        self,
+        conn,
+        user_id: str,
+        content_type: str,
+        content_uuids: List[str]
+    ):
+        """
+        Mark several items as seen and completed with a single rb_or each
+        """
+        
+        if not content_uuids:
+            return
+        
+        content_ids = await self.get_or_create_content_ids(
+            conn, content_uuids, content_type
+        )
+        
+        await conn.execute("""
+            INSERT INTO user_content_bitmaps (user_id, content_type, seen_bitmap, completed_bitmap)
+            VALUES ($1, $2, rb_build($3::integer[]), rb_build($3::integer[]))
+            ON CONFLICT (user_id, content_type) 
+            DO UPDATE SET 
+                seen_bitmap = rb_or(
+                    COALESCE(user_content_bitmaps.seen_bitmap, rb_build(ARRAY[]::integer[])),
+                    EXCLUDED.seen_bitmap
+                ),
+                completed_bitmap = rb_or(
+                    COALESCE(user_content_bitmaps.completed_bitmap, rb_build(ARRAY[]::integer[])),
+                    EXCLUDED.completed_bitmap
+                ),
+                last_updated = NOW()
+        """, UUID(user_id), content_type, list(content_ids.values()))
+    
     async def get_unseen_content(
         self,
         conn,
@@ -215,8 +321,8 @@ class RoaringBitmapDeduplication:
             results.append({
                 "id": str(row["id"]),
                 "type": row["type"],
-                "data": json.loads(row["data"]) if isinstance(row["data"], str) else row["data"],
-                "metadata": json.loads(row["metadata"]) if isinstance(row["metadata"], str) else row["metadata"],
+                "data": row["data"],
+                "metadata": row["metadata"],
                 "created_at": row["created_at"].isoformat()
             })
         
@@ -359,8 +465,8 @@ class RoaringBitmapDeduplication:
         return [{
             "id": str(row["id"]),
             "type": row["type"],
-            "data": json.loads(row["data"]) if isinstance(row["data"], str) else row["data"],
-            "metadata": json.loads(row["metadata"]) if isinstance(row["metadata"], str) else row["metadata"],
+            "data": row["data"],
+            "metadata": row["metadata"],
             "created_at": row["created_at"].isoformat()
         } for row in rows]
 
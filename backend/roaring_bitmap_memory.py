@@ -0,0 +1,467 @@
+"""
+In-memory roaring bitmap deduplication for JazzyPop
+Keeps active users' seen/completed bitmaps in pyroaring and flushes changes
+to user_content_bitmaps in batches, so picking unseen content is a bitmap
+andnot instead of a LEFT JOIN + ORDER BY RANDOM()
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from roaring_bitmap_dedup import RoaringBitmapDeduplication
+
+try:
+    from pyroaring import BitMap
+except ImportError:
+    BitMap = None
+
+logger = logging.getLogger(__name__)
+
+UserKey = Tuple[UUID, str]
+UniverseKey = Tuple[str, Optional[str]]
+
+
+class _UserBitmaps:
+    """One user's bitmaps for a content type, plus the bits not yet flushed"""
+
+    __slots__ = ("seen", "completed", "pending_seen", "pending_completed",
+                 "loaded_at", "last_used", "last_updated")
+
+    def __init__(self, seen: "BitMap", completed: "BitMap", last_updated: Optional[datetime]):
+        self.seen = seen
+        self.completed = completed
+        self.pending_seen = BitMap()
+        self.pending_completed = BitMap()
+        self.loaded_at = time.monotonic()
+        self.last_used = self.loaded_at
+        self.last_updated = last_updated
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.pending_seen) or bool(self.pending_completed)
+
+
+class InMemoryRoaringDedup(RoaringBitmapDeduplication):
+    """
+    Drop-in replacement for RoaringBitmapDeduplication backed by pyroaring
+
+    content_id_mapping is mirrored as a dense list indexed by mapped id, and the
+    active set rows of each type (and type/category) are kept as a universe
+    bitmap. Unseen selection is universe - seen, then a random pick by rank.
+
+    Bits are only ever added, so the write-behind flush ORs each user's pending
+    bits into the stored bitmaps - several workers can flush the same row
+    without losing each other's updates. A user's bitmaps are re-read from
+    Postgres after user_ttl to pick up what other workers have written.
+    """
+
+    def __init__(
+        self,
+        cache=None,
+        flush_interval: float = 5.0,
+        refresh_interval: float = 30.0,
+        full_reload_interval: float = 600.0,
+        user_ttl: float = 300.0,
+        watermark_overlap: timedelta = timedelta(minutes=5)
+    ):
+        self.cache = cache
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.user_ttl = user_ttl
+        self.watermark_overlap = watermark_overlap
+
+        # content_id_mapping mirror: index is the mapped id
+        self._uuids: List[Optional[UUID]] = []
+        self._ids: Dict[UUID, int] = {}
+        self._universe: Dict[UniverseKey, "BitMap"] = {}
+        self._members: Dict[int, UniverseKey] = {}
+        self._watermark: Optional[datetime] = None
+        self._last_refresh = 0.0
+        self._last_full_reload = 0.0
+        self._refresh_lock = asyncio.Lock()
+
+        self._users: Dict[UserKey, _UserBitmaps] = {}
+        self._user_locks: Dict[UserKey, asyncio.Lock] = {}
+        self._pool = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    # ========== LIFECYCLE ==========
+
+    async def start(self, pool):
+        """Load the content universe and start the write-behind flusher"""
+        self._pool = pool
+        async with pool.acquire() as conn:
+            await self.refresh(conn, full=True)
+        self._flush_task = asyncio.get_event_loop().create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flusher and write out whatever is still pending"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._pool:
+            await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Roaring bitmap flush failed, will retry: {e}")
+
+    # ========== CONTENT UNIVERSE ==========
+
+    def _map(self, mapped_id: int, content_uuid: UUID):
+        if mapped_id >= len(self._uuids):
+            self._uuids.extend([None] * (mapped_id + 1 - len(self._uuids)))
+        self._uuids[mapped_id] = content_uuid
+        self._ids[content_uuid] = mapped_id
+
+    def _add_member(self, mapped_id: int, content_type: str, category: Optional[str]):
+        if mapped_id in self._members:
+            return
+        self._members[mapped_id] = (content_type, category)
+        self._universe.setdefault((content_type, None), BitMap()).add(mapped_id)
+        if category:
+            self._universe.setdefault((content_type, category), BitMap()).add(mapped_id)
+
+    def _discard_member(self, mapped_id: int):
+        entry = self._members.pop(mapped_id, None)
+        if not entry:
+            return
+        content_type, category = entry
+        self._universe[(content_type, None)].discard(mapped_id)
+        if category:
+            self._universe[(content_type, category)].discard(mapped_id)
+
+    async def refresh(self, conn, full: bool = False):
+        """
+        Pick up active set rows created since the watermark (or all of them),
+        mapping any that don't have an integer id yet
+        """
+        async with self._refresh_lock:
+            now = time.monotonic()
+            if not full and self._watermark is not None and now - self._last_refresh < self.refresh_interval:
+                return
+
+            full = full or self._watermark is None or (
+                now - self._last_full_reload >= self.full_reload_interval
+            )
+            since = None if full else self._watermark - self.watermark_overlap
+
+            # Bitmap content types drop the _set suffix ('pun_set' -> 'pun')
+            await conn.execute("""
+                INSERT INTO content_id_mapping (content_uuid, content_type)
+                SELECT c.id, regexp_replace(c.type, '_set$', '')
+                FROM content c
+                WHERE c.is_active = true
+                AND c.type LIKE '%\\_set'
+                AND ($1::timestamptz IS NULL OR c.created_at > $1)
+                ON CONFLICT (content_uuid) DO NOTHING
+            """, since)
+
+            rows = await conn.fetch("""
+                SELECT cm.id AS mapped_id, c.id, c.type,
+                       c.data->>'category' AS category, c.created_at
+                FROM content c
+                JOIN content_id_mapping cm ON cm.content_uuid = c.id
+                WHERE c.is_active = true
+                AND c.type LIKE '%\\_set'
+                AND ($1::timestamptz IS NULL OR c.created_at > $1)
+            """, since)
+
+            if full:
+                self._universe.clear()
+                self._members.clear()
+                self._watermark = None
+                self._last_full_reload = now
+
+            for row in rows:
+                self._map(row["mapped_id"], row["id"])
+                self._add_member(row["mapped_id"], row["type"][:-len("_set")], row["category"])
+                if row["created_at"] and (self._watermark is None or row["created_at"] > self._watermark):
+                    self._watermark = row["created_at"]
+
+            if self._watermark is None:
+                self._watermark = datetime.now(timezone.utc)
+
+            self._last_refresh = now
+
+            if full:
+                logger.info(f"Roaring dedup loaded {len(self._members)} active set ids")
+
+    async def _content_ids(self, conn, content_uuids: List[str], content_type: str) -> List[int]:
+        uuids = [UUID(u) for u in content_uuids]
+        unmapped = [str(u) for u in uuids if u not in self._ids]
+        if unmapped:
+            created = await self.get_or_create_content_ids(conn, unmapped, content_type)
+            for content_uuid, mapped_id in created.items():
+                self._map(mapped_id, UUID(content_uuid))
+        return [self._ids[u] for u in uuids]
+
+    # ========== USER BITMAPS ==========
+
+    async def _user(self, conn, user_id: str, content_type: str) -> _UserBitmaps:
+        key = (UUID(user_id), content_type)
+        state = self._users.get(key)
+        if state is not None and time.monotonic() - state.loaded_at < self.user_ttl:
+            state.last_used = time.monotonic()
+            return state
+
+        lock = self._user_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            state = self._users.get(key)
+            if state is not None and time.monotonic() - state.loaded_at < self.user_ttl:
+                state.last_used = time.monotonic()
+                return state
+
+            row = await conn.fetchrow("""
+                SELECT seen_bitmap::bytea AS seen, completed_bitmap::bytea AS completed, last_updated
+                FROM user_content_bitmaps
+                WHERE user_id = $1 AND content_type = $2
+            """, key[0], content_type)
+
+            seen = BitMap.deserialize(row["seen"]) if row and row["seen"] else BitMap()
+            completed = BitMap.deserialize(row["completed"]) if row and row["completed"] else BitMap()
+            fresh = _UserBitmaps(seen, completed, row["last_updated"] if row else None)
+
+            if state is not None:
+                # Bits are never cleared, so the union also covers anything
+                # this worker hasn't flushed yet (or is flushing right now)
+                fresh.pending_seen = state.pending_seen
+                fresh.pending_completed = state.pending_completed
+                fresh.seen |= state.seen
+                fresh.completed |= state.completed
+
+            self._users[key] = fresh
+            return fresh
+
+    async def mark_content_seen(
+        self,
+        conn,
+        user_id: str,
+        content_type: str,
+        content_uuid: str
+    ):
+        await self.mark_many_seen(conn, user_id, content_type, [content_uuid])
+
+    async def mark_content_completed(
+        self,
+        conn,
+        user_id: str,
+        content_type: str,
+        content_uuid: str
+    ):
+        await self.mark_many_completed(conn, user_id, content_type, [content_uuid])
+
+    async def mark_many_seen(
+        self,
+        conn,
+        user_id: str,
+        content_type: str,
+        content_uuids: List[str]
+    ):
+        """Mark content as seen; written to Postgres on the next flush"""
+        if not content_uuids:
+            return
+        content_ids = BitMap(await self._content_ids(conn, content_uuids, content_type))
+        state = await self._user(conn, user_id, content_type)
+        new_seen = content_ids - state.seen
+        if new_seen:
+            state.seen |= new_seen
+            state.pending_seen |= new_seen
+            state.last_updated = datetime.utcnow()
+
+    async def mark_many_completed(
+        self,
+        conn,
+        user_id: str,
+        content_type: str,
+        content_uuids: List[str]
+    ):
+        """Mark content as seen and completed; written to Postgres on the next flush"""
+        if not content_uuids:
+            return
+        content_ids = BitMap(await self._content_ids(conn, content_uuids, content_type))
+        state = await self._user(conn, user_id, content_type)
+        new_seen = content_ids - state.seen
+        new_completed = content_ids - state.completed
+        state.seen |= new_seen
+        state.pending_seen |= new_seen
+        state.completed |= new_completed
+        state.pending_completed |= new_completed
+        state.last_updated = datetime.utcnow()
+
+    async def flush(self):
+        """Write every user's pending bits in one statement"""
+        async with self._flush_lock:
+            batch = [(key, state) for key, state in self._users.items() if state.dirty]
+
+            if batch:
+                user_ids, content_types, seen, completed = [], [], [], []
+                for (user_id, content_type), state in batch:
+                    user_ids.append(user_id)
+                    content_types.append(content_type)
+                    seen.append(state.pending_seen.serialize())
+                    completed.append(state.pending_completed.serialize())
+                    state.pending_seen = BitMap()
+                    state.pending_completed = BitMap()
+
+                try:
+                    async with self._pool.acquire() as conn:
+                        await conn.execute("""
+                            INSERT INTO user_content_bitmaps
+                                (user_id, content_type, seen_bitmap, completed_bitmap, last_updated)
+                            SELECT u.user_id, u.content_type,
+                                   u.seen::roaringbitmap, u.completed::roaringbitmap, NOW()
+                            FROM unnest($1::uuid[], $2::varchar[], $3::bytea[], $4::bytea[])
+                                AS u(user_id, content_type, seen, completed)
+                            ON CONFLICT (user_id, content_type)
+                            DO UPDATE SET
+                                seen_bitmap = rb_or(
+                                    COALESCE(user_content_bitmaps.seen_bitmap, rb_build(ARRAY[]::integer[])),
+                                    EXCLUDED.seen_bitmap
+                                ),
+                                completed_bitmap = rb_or(
+                                    COALESCE(user_content_bitmaps.completed_bitmap, rb_build(ARRAY[]::integer[])),
+                                    EXCLUDED.completed_bitmap
+                                ),
+                                last_updated = NOW()
+                        """, user_ids, content_types, seen, completed)
+                except Exception:
+                    # Put the bits back so the next flush retries them
+                    for (_, state), seen_bytes, completed_bytes in zip(batch, seen, completed):
+                        state.pending_seen |= BitMap.deserialize(seen_bytes)
+                        state.pending_completed |= BitMap.deserialize(completed_bytes)
+                    raise
+
+                logger.debug(f"Flushed roaring bitmaps for {len(batch)} user/type pairs")
+
+            # Forget idle users once they're clean
+            cutoff = time.monotonic() - self.user_ttl
+            for key in [k for k, s in self._users.items() if s.last_used < cutoff and not s.dirty]:
+                del self._users[key]
+                self._user_locks.pop(key, None)
+
+    # ========== QUERIES ==========
+
+    async def get_unseen_content(
+        self,
+        conn,
+        content_type: str,
+        user_id: Optional[str],
+        category: Optional[str] = None,
+        count: int = 1,
+        exclude_completed_only: bool = False
+    ) -> List[Dict]:
+        """Get random content the user hasn't seen: universe andnot seen bitmap"""
+        if not user_id:
+            return await self._get_random_content(conn, content_type, category, count)
+
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            await self.refresh(conn)
+
+        state = await self._user(conn, user_id, content_type)
+        exclude = state.completed if exclude_completed_only else state.seen
+
+        results = []
+        taken = BitMap()
+        # A second pass covers rows that were deactivated since the last refresh
+        for _ in range(2):
+            universe = self._universe.get((content_type, category))
+            if not universe:
+                break
+            unseen = universe - exclude - taken
+            if not unseen:
+                break
+
+            wanted = count - len(results)
+            picks = [unseen[i] for i in random.sample(range(len(unseen)), min(wanted, len(unseen)))]
+            rows = await self._fetch_content(conn, [self._uuids[i] for i in picks])
+
+            for mapped_id in picks:
+                taken.add(mapped_id)
+                row = rows.get(self._uuids[mapped_id])
+                if row is None:
+                    self._discard_member(mapped_id)
+                    continue
+                results.append({
+                    "id": str(row["id"]),
+                    "type": row["type"],
+                    "data": row["data"],
+                    "metadata": row["metadata"],
+                    "created_at": row["created_at"].isoformat()
+                })
+
+            if len(results) >= count:
+                break
+
+        return results
+
+    async def _fetch_content(self, conn, ids: List[UUID]) -> Dict[UUID, Dict]:
+        if self.cache is not None:
+            return await self.cache.get_content(conn, ids)
+        rows = await conn.fetch("""
+            SELECT id, type, data, metadata, created_at
+            FROM content
+            WHERE id = ANY($1::uuid[])
+            AND is_active = true
+        """, ids)
+        return {row["id"]: row for row in rows}
+
+    async def get_user_stats(
+        self,
+        conn,
+        user_id: str,
+        content_type: str
+    ) -> Dict:
+        """Same shape as the SQL version, computed from the in-memory bitmaps"""
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            await self.refresh(conn)
+
+        state = await self._user(conn, user_id, content_type)
+        total_count = len(self._universe.get((content_type, None), ()))
+        seen_count = len(state.seen)
+        completed_count = len(state.completed)
+
+        stats = {
+            "seen_count": seen_count,
+            "completed_count": completed_count,
+            "total_count": total_count,
+            "completion_percentage": round(
+                (completed_count / total_count * 100) if total_count > 0 else 0,
+                2
+            )
+        }
+        if state.last_updated is not None:
+            stats["last_activity"] = state.last_updated.isoformat()
+        return stats
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "mapped_ids": len(self._ids),
+            "active_ids": len(self._members),
+            "users": len(self._users),
+            "dirty_users": sum(1 for s in self._users.values() if s.dirty)
+        }
+
+
+def create_roaring_dedup(cache=None) -> RoaringBitmapDeduplication:
+    """
+    In-memory engine when pyroaring is installed, otherwise the SQL one
+    ROARING_DEDUP_ENGINE=sql forces the SQL path
+    """
+    if os.getenv('ROARING_DEDUP_ENGINE', 'memory') == 'sql':
+        return RoaringBitmapDeduplication()
+    if BitMap is None:
+        logger.warning("pyroaring not installed, using SQL roaring bitmap deduplication")
+        return RoaringBitmapDeduplication()
+    return InMemoryRoaringDedup(cache=cache)
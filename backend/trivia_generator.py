@@ -9,7 +9,8 @@ import logging
 from datetime import datetime
 from uuid import uuid4
 from typing import Dict, Any, List
-import aiohttp
+from provider_client import close_clients, get_client
+from content_safety import safety_filter
 from database import db
 from dotenv import load_dotenv
 
@@ -108,33 +109,38 @@ class TriviaGenerator:
                     }]
                 }
                 
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        "https://api.anthropic.com/v1/messages",
-                        headers=headers,
-                        json=payload
-                    ) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            content = data['content'][0]['text']
+                async with get_client('anthropic').post(
+                    "https://api.anthropic.com/v1/messages",
+                    headers=headers,
+                    json=payload
+                ) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        content = data['content'][0]['text']
+                        
+                        # Parse JSON from response
+                        # Claude might wrap it in markdown, so extract JSON
+                        import re
+                        json_match = re.search(r'\{[\s\S]*\}', content)
+                        if json_match:
+                            trivia_data = json.loads(json_match.group())
                             
-                            # Parse JSON from response
-                            # Claude might wrap it in markdown, so extract JSON
-                            import re
-                            json_match = re.search(r'\{[\s\S]*\}', content)
-                            if json_match:
-                                trivia_data = json.loads(json_match.group())
-                                
-                                return {
-                                    "id": str(uuid4()),
-                                    "type": "trivia",
-                                    "data": trivia_data,
-                                    "metadata": {
-                                        "theme": theme,
-                                        "generated_at": datetime.utcnow().isoformat()
-                                    },
-                                    "tags": ["trivia", theme, "flashcard", trivia_data.get("difficulty", "medium")]
-                                }
+                            # Screen with the shared safety filter
+                            match = safety_filter.check_item(trivia_data)
+                            if match:
+                                logger.warning(f"Content filter rejected trivia: {match!r}")
+                                return self.get_fallback_trivia(theme, format)
+                            
+                            return {
+                                "id": str(uuid4()),
+                                "type": "trivia",
+                                "data": trivia_data,
+                                "metadata": {
+                                    "theme": theme,
+                                    "generated_at": datetime.utcnow().isoformat()
+                                },
+                                "tags": ["trivia", theme, "flashcard", trivia_data.get("difficulty", "medium")]
+                            }
         except Exception as e:
             logger.error(f"Failed to generate trivia: {e}")
         
@@ -299,6 +305,7 @@ async def main():
     try:
         await run_trivia_generator()
     finally:
+        await close_clients()
         await db.disconnect()
 
 if __name__ == "__main__":
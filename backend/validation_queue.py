@@ -0,0 +1,228 @@
+"""
+Validation job queue for JazzyPop
+Leases quiz sets to validation workers with FOR UPDATE SKIP LOCKED, so any
+number of workers on any number of hosts can pull from it without two of
+them validating the same set.
+
+A claim is a lease: the worker heartbeats to keep it, and a lease that
+expires (worker crashed or hung) makes the job claimable again. Each claim
+counts as an attempt; a job that fails or times out max_attempts times is
+parked as 'dead' and its content marked validation_status = 'error'.
+
+    pending --claim--> leased --complete--> done
+       ^                 |
+       +-----fail--------+--(attempts exhausted)--> dead
+"""
+
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+
+class ValidationQueue:
+    """Lease-based job queue over quiz sets awaiting validation"""
+
+    def __init__(self, lease_seconds: int = 600, max_attempts: int = 3, retry_delay: int = 60):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Failed jobs wait retry_delay * attempts seconds before the next try
+        self.retry_delay = retry_delay
+
+    async def initialize(self, conn):
+        """Create the jobs table; safe to run on every startup"""
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS validation_jobs (
+                content_id UUID PRIMARY KEY REFERENCES content(id) ON DELETE CASCADE,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                leased_by VARCHAR(100),
+                lease_expires_at TIMESTAMP WITH TIME ZONE,
+                last_error TEXT,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_validation_jobs_claimable
+            ON validation_jobs(available_at, created_at) WHERE status = 'pending';
+
+            CREATE INDEX IF NOT EXISTS idx_validation_jobs_leases
+            ON validation_jobs(lease_expires_at) WHERE status = 'leased';
+        """)
+
+    async def enqueue_pending(self, conn) -> int:
+        """
+        Add a job for every quiz set waiting for validation
+        A set put back to 'pending' after its job finished gets a fresh job
+        """
+        result = await conn.execute("""
+            INSERT INTO validation_jobs (content_id)
+            SELECT id FROM content
+            WHERE type = 'quiz_set' AND validation_status = 'pending'
+            ON CONFLICT (content_id) DO UPDATE
+            SET status = 'pending',
+                attempts = 0,
+                available_at = CURRENT_TIMESTAMP,
+                leased_by = NULL,
+                lease_expires_at = NULL,
+                last_error = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE validation_jobs.status = 'done'
+        """)
+        return int(result.split()[-1])
+
+    async def enqueue(self, conn, content_id: UUID):
+        """(Re)queue one set, e.g. for a manual re-validation"""
+        await conn.execute("""
+            INSERT INTO validation_jobs (content_id)
+            VALUES ($1)
+            ON CONFLICT (content_id) DO UPDATE
+            SET status = 'pending',
+                attempts = 0,
+                available_at = CURRENT_TIMESTAMP,
+                leased_by = NULL,
+                lease_expires_at = NULL,
+                last_error = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE validation_jobs.status <> 'leased'
+        """, content_id)
+
+    async def reap_expired(self, conn) -> int:
+        """Dead-letter expired leases that have used up their attempts"""
+        rows = await conn.fetch("""
+            UPDATE validation_jobs
+            SET status = 'dead',
+                leased_by = NULL,
+                lease_expires_at = NULL,
+                last_error = COALESCE(last_error, 'lease expired'),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE status = 'leased'
+            AND lease_expires_at < CURRENT_TIMESTAMP
+            AND attempts >= $1
+            RETURNING content_id, last_error
+        """, self.max_attempts)
+
+        for row in rows:
+            await self._mark_content_error(conn, row['content_id'], row['last_error'])
+        if rows:
+            logger.warning(f"Dead-lettered {len(rows)} validation jobs with expired leases")
+        return len(rows)
+
+    async def claim(self, conn, worker_id: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Lease up to `limit` jobs to this worker
+        Picks pending jobs that are due plus leases that have expired; rows
+        another worker is claiming right now are skipped, not waited on
+        """
+        rows = await conn.fetch("""
+            WITH claimable AS (
+                SELECT content_id
+                FROM validation_jobs
+                WHERE (status = 'pending' AND available_at <= CURRENT_TIMESTAMP)
+                OR (status = 'leased' AND lease_expires_at < CURRENT_TIMESTAMP AND attempts < $4)
+                ORDER BY created_at
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE validation_jobs j
+            SET status = 'leased',
+                leased_by = $1,
+                lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $3::int),
+                attempts = j.attempts + 1,
+                updated_at = CURRENT_TIMESTAMP
+            FROM claimable
+            WHERE j.content_id = claimable.content_id
+            RETURNING j.content_id, j.attempts
+        """, worker_id, limit, self.lease_seconds, self.max_attempts)
+
+        return [{'id': row['content_id'], 'attempts': row['attempts']} for row in rows]
+
+    async def heartbeat(self, conn, worker_id: str, content_ids: List[UUID]) -> int:
+        """Extend this worker's leases; returns how many it still holds"""
+        if not content_ids:
+            return 0
+        result = await conn.execute("""
+            UPDATE validation_jobs
+            SET lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $3::int),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE content_id = ANY($2::uuid[])
+            AND status = 'leased'
+            AND leased_by = $1
+        """, worker_id, content_ids, self.lease_seconds)
+        return int(result.split()[-1])
+
+    async def complete(self, conn, worker_id: str, content_id: UUID) -> bool:
+        """Finish a job; False if the lease was lost to another worker meanwhile"""
+        result = await conn.execute("""
+            UPDATE validation_jobs
+            SET status = 'done',
+                leased_by = NULL,
+                lease_expires_at = NULL,
+                last_error = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE content_id = $1 AND status = 'leased' AND leased_by = $2
+        """, content_id, worker_id)
+        return result.endswith(' 1')
+
+    async def fail(self, conn, worker_id: str, content_id: UUID, error: str) -> str:
+        """
+        Record a failed attempt: back to pending after a delay, or dead once
+        attempts are used up. Returns the job's new status
+        """
+        row = await conn.fetchrow("""
+            UPDATE validation_jobs
+            SET status = CASE WHEN attempts >= $3 THEN 'dead' ELSE 'pending' END,
+                available_at = CURRENT_TIMESTAMP + make_interval(secs => $4::int * attempts),
+                leased_by = NULL,
+                lease_expires_at = NULL,
+                last_error = $5,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE content_id = $1 AND status = 'leased' AND leased_by = $2
+            RETURNING status
+        """, content_id, worker_id, self.max_attempts, self.retry_delay, error)
+
+        if not row:
+            return 'lost'
+        if row['status'] == 'dead':
+            await self._mark_content_error(conn, content_id, error)
+        return row['status']
+
+    async def release(self, conn, worker_id: str, content_ids: List[UUID]):
+        """Hand unstarted jobs back on shutdown without using up an attempt"""
+        if not content_ids:
+            return
+        await conn.execute("""
+            UPDATE validation_jobs
+            SET status = 'pending',
+                attempts = GREATEST(attempts - 1, 0),
+                leased_by = NULL,
+                lease_expires_at = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE content_id = ANY($2::uuid[])
+            AND status = 'leased'
+            AND leased_by = $1
+        """, worker_id, content_ids)
+
+    async def stats(self, conn) -> Dict[str, int]:
+        rows = await conn.fetch("SELECT status, COUNT(*) AS count FROM validation_jobs GROUP BY status")
+        return {row['status']: row['count'] for row in rows}
+
+    async def _mark_content_error(self, conn, content_id: UUID, error_message: str):
+        """Same marker the worker has always left on sets it gave up on"""
+        await conn.execute("""
+            UPDATE content
+            SET validation_status = 'error',
+                metadata = jsonb_set(
+                    COALESCE(metadata, '{}'),
+                    '{validation_error}',
+                    $2
+                )
+            WHERE id = $1
+        """, content_id, json.dumps({
+            'error': error_message,
+            'timestamp': datetime.utcnow().isoformat()
+        }))
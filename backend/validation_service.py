@@ -4,12 +4,13 @@ Orchestrates the three-pass validation system for quiz content
 """
 
 import asyncio
+import hashlib
 import json
 import logging
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from uuid import UUID
-import aiohttp
+from provider_client import call_anthropic, get_client
 from database import db
 from validation_prompts import ValidationPrompts
 import os
@@ -29,9 +30,38 @@ class ValidationService:
         self.discord_webhook = os.getenv('DISCORD_WEBHOOK_URL')
         self.admin_alerts = []
         
+        # Questions are validated concurrently; the semaphore caps in-flight
+        # calls for this service and the shared limiter keeps every caller in
+        # the process inside the API limits
+        self.semaphore = asyncio.Semaphore(int(os.getenv('VALIDATION_CONCURRENCY', '6')))
+        # Hard cap on revise -> re-validate rounds per question
+        self.max_revisions = int(os.getenv('VALIDATION_MAX_REVISIONS', '2'))
+        self._initialized = False
+    
+    async def initialize(self):
+        """Create the per-pass checkpoint table; safe to run repeatedly"""
+        if self._initialized:
+            return
+        async with db.pool.acquire() as conn:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS validation_pass_results (
+                    content_id UUID NOT NULL,
+                    question_index INTEGER NOT NULL,
+                    revision INTEGER NOT NULL,
+                    pass_name VARCHAR(20) NOT NULL,
+                    question_hash VARCHAR(32) NOT NULL,
+                    result JSONB NOT NULL,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (content_id, question_index, revision, pass_name)
+                )
+            """)
+        self._initialized = True
+        
     async def validate_quiz_set(self, quiz_set_id: UUID) -> Dict[str, Any]:
         """
         Validate an entire quiz set (10 questions)
+        Questions run concurrently, so their passes interleave; passes saved
+        by an earlier, interrupted run are picked up instead of re-run
         Returns validation summary
         """
         logger.info(f"Starting validation for quiz set: {quiz_set_id}")
@@ -41,12 +71,22 @@ class ValidationService:
         if not quiz_set:
             return {"error": "Quiz set not found"}
         
-        # Validate each question in the set
-        validation_results = []
-        for idx, question in enumerate(quiz_set['data'].get('questions', [])):
-            logger.info(f"Validating question {idx + 1}/10")
-            result = await self.validate_single_quiz(question, quiz_set['data'].get('category', 'general'))
-            validation_results.append(result)
+        questions = quiz_set['data'].get('questions', [])
+        if not questions:
+            return {"error": "Quiz set has no questions"}
+        category = quiz_set['data'].get('category', 'general')
+        
+        await self.initialize()
+        checkpoint = await self._load_checkpoint(quiz_set_id, questions)
+        if checkpoint:
+            saved = sum(len(passes) for passes in checkpoint.values())
+            logger.info(f"Resuming {quiz_set_id} from {saved} saved passes")
+        
+        # Validate every question in the set at once
+        validation_results = await asyncio.gather(*(
+            self.validate_single_quiz(question, category, quiz_set_id, idx, checkpoint.get(idx))
+            for idx, question in enumerate(questions)
+        ))
         
         # Calculate overall set quality
         passed_count = sum(1 for r in validation_results if r['final_decision'] == 'approved')
@@ -73,6 +113,9 @@ class ValidationService:
             'validated_at': datetime.utcnow().isoformat()
         })
         
+        # The outcome is stored; the checkpoint is no longer needed
+        await self._clear_checkpoint(quiz_set_id)
+        
         return {
             'quiz_set_id': str(quiz_set_id),
             'decision': set_decision,
@@ -81,87 +124,104 @@ class ValidationService:
             'details': validation_results
         }
     
-    async def validate_single_quiz(self, quiz_data: Dict[str, Any], category: str) -> Dict[str, Any]:
+    async def validate_single_quiz(self, quiz_data: Dict[str, Any], category: str,
+                                   quiz_set_id: Optional[UUID] = None, question_index: Optional[int] = None,
+                                   checkpoint: Optional[Dict[tuple, Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
         Run triple validation on a single quiz question
+        needs_revision triggers at most max_revisions revise/re-validate rounds.
+        With a quiz_set_id each completed pass is saved, and passes found in
+        `checkpoint` ({(revision, pass_name): result}) are reused
         """
+        checkpoint = checkpoint or {}
+        question_hash = self._question_hash(quiz_data)
+        current = quiz_data
+        revision = 0
         validation_results = {}
         
+        async def run_pass(name: str, prompt: str, temperature: float):
+            saved = checkpoint.get((revision, name))
+            if saved is not None:
+                return saved, False
+            result = await self._run_validation_pass(prompt, temperature)
+            if quiz_set_id is not None and 'error' not in result:
+                await self._save_pass(quiz_set_id, question_index, revision, name, question_hash, result)
+            return result, True
+        
         try:
-            # Pass 1: Feedback Generation & Initial Assessment
-            logger.info("Running Pass 1: Feedback Generation")
-            pass_1_results = await self._run_validation_pass(
-                ValidationPrompts.get_pass_1_prompt(quiz_data, category),
-                temperature=0.7
-            )
-            validation_results['pass_1'] = pass_1_results
-            
-            # Check if Pass 1 found critical issues
-            if pass_1_results.get('quality_check', {}).get('needs_revision', False):
-                logger.warning("Pass 1 identified issues requiring revision")
-            
-            # Pass 2: Fact Checking & Verification
-            logger.info("Running Pass 2: Fact Checking")
-            pass_2_results = await self._run_validation_pass(
-                ValidationPrompts.get_pass_2_prompt(quiz_data, pass_1_results),
-                temperature=0.3  # Lower temperature for fact checking
-            )
-            validation_results['pass_2'] = pass_2_results
-            
-            # Pass 3: Final Quality Control
-            logger.info("Running Pass 3: Quality Control")
-            pass_3_results = await self._run_validation_pass(
-                ValidationPrompts.get_pass_3_prompt(quiz_data, pass_1_results, pass_2_results),
-                temperature=0.5
-            )
-            validation_results['pass_3'] = pass_3_results
-            
-            # Compile final results
-            final_decision = pass_3_results.get('final_decision', 'needs_revision')
-            quality_score = pass_3_results.get('quality_score', {}).get('percentage', 0)
-            
-            # Handle admin alerts
-            if pass_3_results.get('admin_alert', {}).get('needed', False):
-                await self._send_admin_alert(
-                    pass_3_results['admin_alert']['severity'],
-                    pass_3_results['admin_alert']['message']
+            while True:
+                validation_results = {}
+                
+                # Pass 1: Feedback Generation & Initial Assessment
+                logger.debug(f"Question {question_index} r{revision}: Pass 1 (feedback)")
+                pass_1_results, _ = await run_pass(
+                    'pass_1', ValidationPrompts.get_pass_1_prompt(current, category), 0.7
                 )
-            
-            # If revision needed, attempt to revise
-            if final_decision == 'needs_revision':
-                logger.info("Attempting automatic revision")
-                revised_quiz = await self._revise_quiz(quiz_data, validation_results)
-                if revised_quiz:
-                    # Re-validate the revised version (recursive, but with depth limit)
-                    return await self.validate_single_quiz(revised_quiz, category)
-            
-            return {
-                'quiz_data': quiz_data,
-                'final_decision': final_decision,
-                'quality_score': quality_score,
-                'feedback_captions': pass_1_results.get('feedback_captions', {}),
-                'difficulty': pass_3_results.get('final_metadata', {}).get('difficulty', 3),
-                'tags': pass_3_results.get('final_metadata', {}).get('tags', []),
-                'validation_passes': validation_results
-            }
+                validation_results['pass_1'] = pass_1_results
+                
+                # Check if Pass 1 found critical issues
+                if pass_1_results.get('quality_check', {}).get('needs_revision', False):
+                    logger.warning("Pass 1 identified issues requiring revision")
+                
+                # Pass 2: Fact Checking & Verification (lower temperature)
+                logger.debug(f"Question {question_index} r{revision}: Pass 2 (fact check)")
+                pass_2_results, _ = await run_pass(
+                    'pass_2', ValidationPrompts.get_pass_2_prompt(current, pass_1_results), 0.3
+                )
+                validation_results['pass_2'] = pass_2_results
+                
+                # Pass 3: Final Quality Control
+                logger.debug(f"Question {question_index} r{revision}: Pass 3 (quality control)")
+                pass_3_results, fresh = await run_pass(
+                    'pass_3', ValidationPrompts.get_pass_3_prompt(current, pass_1_results, pass_2_results), 0.5
+                )
+                validation_results['pass_3'] = pass_3_results
+                
+                # Compile final results
+                final_decision = pass_3_results.get('final_decision', 'needs_revision')
+                quality_score = pass_3_results.get('quality_score', {}).get('percentage', 0)
+                
+                # Handle admin alerts (a resumed pass already sent its alert)
+                if fresh and pass_3_results.get('admin_alert', {}).get('needed', False):
+                    await self._send_admin_alert(
+                        pass_3_results['admin_alert']['severity'],
+                        pass_3_results['admin_alert']['message']
+                    )
+                
+                # If revision needed, revise and re-validate - up to the cap
+                if final_decision == 'needs_revision' and revision < self.max_revisions:
+                    logger.info(f"Attempting automatic revision {revision + 1}/{self.max_revisions}")
+                    revised, _ = await run_pass(
+                        'revision', ValidationPrompts.get_revision_prompt(current, validation_results), 0.8
+                    )
+                    if 'error' not in revised:
+                        current = revised
+                        revision += 1
+                        continue
+                
+                return {
+                    'quiz_data': current,
+                    'final_decision': final_decision,
+                    'quality_score': quality_score,
+                    'feedback_captions': pass_1_results.get('feedback_captions', {}),
+                    'difficulty': pass_3_results.get('final_metadata', {}).get('difficulty', 3),
+                    'tags': pass_3_results.get('final_metadata', {}).get('tags', []),
+                    'revisions': revision,
+                    'validation_passes': validation_results
+                }
             
         except Exception as e:
             logger.error(f"Validation error: {e}")
             return {
-                'quiz_data': quiz_data,
+                'quiz_data': current,
                 'final_decision': 'error',
                 'error': str(e),
+                'revisions': revision,
                 'validation_passes': validation_results
             }
     
     async def _run_validation_pass(self, prompt: str, temperature: float = 0.7) -> Dict[str, Any]:
         """Execute a single validation pass with the AI"""
-        headers = {
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
-        
         payload = {
             "model": "claude-3-haiku-20240307",
             "max_tokens": 1000,
@@ -173,52 +233,70 @@ class ValidationService:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        content = result['content'][0]['text']
-                        
-                        # Clean the response - AI might add extra text
-                        content = content.strip()
-                        
-                        # Find JSON in the response (between first { and last })
-                        json_start = content.find('{')
-                        json_end = content.rfind('}') + 1
-                        
-                        if json_start >= 0 and json_end > json_start:
-                            json_content = content[json_start:json_end]
-                            try:
-                                return json.loads(json_content)
-                            except json.JSONDecodeError as e:
-                                logger.error(f"JSON decode error: {e}")
-                                logger.error(f"Attempted to parse: {json_content[:200]}...")
-                                return {"error": "Invalid JSON response from AI"}
-                        else:
-                            logger.error("No JSON found in AI response")
-                            return {"error": "No JSON found in AI response"}
-                    else:
-                        logger.error(f"API error: {response.status}")
-                        return {"error": f"API returned status {response.status}"}
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {e}")
-            return {"error": "Invalid JSON response from AI"}
+            result = await call_anthropic(payload, self.api_key, self.semaphore, url=self.api_url)
+            if not result:
+                return {"error": "API call failed"}
+            content = result['content'][0]['text']
+            
+            # Clean the response - AI might add extra text
+            content = content.strip()
+            
+            # Find JSON in the response (between first { and last })
+            json_start = content.find('{')
+            json_end = content.rfind('}') + 1
+            
+            if json_start >= 0 and json_end > json_start:
+                json_content = content[json_start:json_end]
+                try:
+                    return json.loads(json_content)
+                except json.JSONDecodeError as e:
+                    logger.error(f"JSON decode error: {e}")
+                    logger.error(f"Attempted to parse: {json_content[:200]}...")
+                    return {"error": "Invalid JSON response from AI"}
+            else:
+                logger.error("No JSON found in AI response")
+                return {"error": "No JSON found in AI response"}
         except Exception as e:
             logger.error(f"Validation pass error: {e}")
             return {"error": str(e)}
     
-    async def _revise_quiz(self, quiz_data: Dict[str, Any], validation_results: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Attempt to revise a quiz that failed validation"""
-        prompt = ValidationPrompts.get_revision_prompt(quiz_data, validation_results)
-        
-        try:
-            revised = await self._run_validation_pass(prompt, temperature=0.8)
-            if 'error' not in revised:
-                return revised
-        except Exception as e:
-            logger.error(f"Revision failed: {e}")
+    def _question_hash(self, quiz_data: Dict[str, Any]) -> str:
+        """Fingerprint of the original question, so edited questions don't resume stale passes"""
+        return hashlib.md5(json.dumps(quiz_data, sort_keys=True).encode()).hexdigest()
+    
+    async def _load_checkpoint(self, quiz_set_id: UUID, questions: List[Dict[str, Any]]) -> Dict[int, Dict[tuple, Dict[str, Any]]]:
+        """Saved passes per question index, keyed by (revision, pass_name)"""
+        hashes = [self._question_hash(q) for q in questions]
+        async with db.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT question_index, revision, pass_name, question_hash, result
+                FROM validation_pass_results
+                WHERE content_id = $1
+            """, quiz_set_id)
         
-        return None
+        checkpoint: Dict[int, Dict[tuple, Dict[str, Any]]] = {}
+        for row in rows:
+            idx = row['question_index']
+            if idx < len(hashes) and row['question_hash'] == hashes[idx]:
+                checkpoint.setdefault(idx, {})[(row['revision'], row['pass_name'])] = row['result']
+        return checkpoint
+    
+    async def _save_pass(self, quiz_set_id: UUID, question_index: int, revision: int,
+                         pass_name: str, question_hash: str, result: Dict[str, Any]):
+        async with db.pool.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO validation_pass_results
+                    (content_id, question_index, revision, pass_name, question_hash, result)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                ON CONFLICT (content_id, question_index, revision, pass_name)
+                DO UPDATE SET question_hash = EXCLUDED.question_hash,
+                              result = EXCLUDED.result,
+                              created_at = CURRENT_TIMESTAMP
+            """, quiz_set_id, question_index, revision, pass_name, question_hash, json.dumps(result))
+    
+    async def _clear_checkpoint(self, quiz_set_id: UUID):
+        async with db.pool.acquire() as conn:
+            await conn.execute("DELETE FROM validation_pass_results WHERE content_id = $1", quiz_set_id)
     
     async def _fetch_quiz_set(self, quiz_set_id: UUID) -> Optional[Dict[str, Any]]:
         """Fetch a quiz set from the database"""
@@ -279,8 +357,9 @@ class ValidationService:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                await session.post(self.discord_webhook, json=embed)
+            async with get_client('discord').post(self.discord_webhook, json=embed) as response:
+                if response.status >= 400:
+                    logger.error(f"Discord webhook returned {response.status}")
         except Exception as e:
             logger.error(f"Failed to send Discord alert: {e}")
     
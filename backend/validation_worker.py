@@ -2,18 +2,20 @@
 """
 Validation Worker - Background process for validating quiz content
 Processes pending quiz sets through the triple validation system
+Sets are leased from validation_queue, so any number of workers can run side by side
 """
 
 import asyncio
 import logging
 import signal
+import socket
 import sys
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 from database import db
 from validation_service import validation_service
-import json
+from validation_queue import ValidationQueue
 
 load_dotenv()
 
@@ -30,11 +32,19 @@ class ValidationWorker:
         self.running = True
         self.batch_size = int(os.getenv('VALIDATION_BATCH_SIZE', '5'))
         self.sleep_interval = int(os.getenv('VALIDATION_INTERVAL', '60'))  # seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.queue = ValidationQueue(
+            lease_seconds=int(os.getenv('VALIDATION_LEASE_SECONDS', '600')),
+            max_attempts=int(os.getenv('VALIDATION_MAX_ATTEMPTS', '3'))
+        )
+        # Jobs this worker currently holds a lease on
+        self.leased = set()
         self.stats = {
             'processed': 0,
             'approved': 0,
             'rejected': 0,
             'errors': 0,
+            'dead': 0,
             'started_at': datetime.utcnow()
         }
         
@@ -43,6 +53,7 @@ class ValidationWorker:
         logger.info("🚀 Starting JazzyPop Validation Worker")
         logger.info(f"Batch size: {self.batch_size} sets")
         logger.info(f"Check interval: {self.sleep_interval} seconds")
+        logger.info(f"Worker id: {self.worker_id}")
         
         # Set up graceful shutdown
         signal.signal(signal.SIGINT, self._handle_shutdown)
@@ -51,74 +62,90 @@ class ValidationWorker:
         await db.connect()
         logger.info("✅ Connected to database")
         
+        async with db.pool.acquire() as conn:
+            await self.queue.initialize(conn)
+        heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        
         try:
             while self.running:
-                await self._process_batch()
+                claimed = await self._process_batch()
                 
-                if self.running:
+                # A full batch means there is likely more work waiting
+                if self.running and claimed < self.batch_size:
                     logger.info(f"💤 Sleeping for {self.sleep_interval} seconds...")
                     await asyncio.sleep(self.sleep_interval)
                     
         except Exception as e:
             logger.error(f"❌ Worker error: {e}")
         finally:
+            heartbeat_task.cancel()
             await self._cleanup()
     
-    async def _process_batch(self):
-        """Process a batch of pending validations"""
+    async def _process_batch(self) -> int:
+        """Lease a batch of pending validations and process it; returns how many were claimed"""
         try:
-            # Fetch pending quiz sets
-            pending_sets = await self._fetch_pending_sets()
+            async with db.pool.acquire() as conn:
+                await self.queue.enqueue_pending(conn)
+                self.stats['dead'] += await self.queue.reap_expired(conn)
+                jobs = await self.queue.claim(conn, self.worker_id, self.batch_size)
             
-            if not pending_sets:
+            if not jobs:
                 logger.debug("No pending quiz sets to validate")
-                return
+                return 0
             
-            logger.info(f"📋 Processing {len(pending_sets)} quiz sets")
+            self.leased.update(job['id'] for job in jobs)
+            logger.info(f"📋 Processing {len(jobs)} quiz sets")
             
-            for quiz_set in pending_sets:
+            for job in jobs:
                 if not self.running:
                     break
                     
-                await self._process_single_set(quiz_set)
+                await self._process_single_set(job)
+            
+            # Anything left over (shutdown mid-batch) goes back to the queue
+            if self.leased:
+                async with db.pool.acquire() as conn:
+                    await self.queue.release(conn, self.worker_id, list(self.leased))
+                self.leased.clear()
                 
             # Log statistics
             self._log_stats()
+            return len(jobs)
             
         except Exception as e:
             logger.error(f"Error processing batch: {e}")
             self.stats['errors'] += 1
+            return 0
     
-    async def _fetch_pending_sets(self):
-        """Fetch quiz sets pending validation"""
-        async with db.pool.acquire() as conn:
-            rows = await conn.fetch("""
-                SELECT id, type, data, metadata
-                FROM content
-                WHERE type = 'quiz_set'
-                AND validation_status = 'pending'
-                ORDER BY created_at ASC
-                LIMIT $1
-            """, self.batch_size)
-            
-            return [{
-                'id': row['id'],
-                'type': row['type'],
-                'data': json.loads(row['data']) if isinstance(row['data'], str) else row['data'],
-                'metadata': json.loads(row['metadata']) if isinstance(row['metadata'], str) else row['metadata']
-            } for row in rows]
+    async def _heartbeat_loop(self):
+        """Keep our leases alive while long validations run"""
+        interval = max(self.queue.lease_seconds // 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            if not self.leased:
+                continue
+            try:
+                async with db.pool.acquire() as conn:
+                    held = await self.queue.heartbeat(conn, self.worker_id, list(self.leased))
+                if held < len(self.leased):
+                    logger.warning(f"Lost {len(self.leased) - held} leases")
+            except Exception as e:
+                logger.error(f"Heartbeat failed: {e}")
     
-    async def _process_single_set(self, quiz_set):
+    async def _process_single_set(self, job):
         """Process a single quiz set through validation"""
-        quiz_set_id = quiz_set['id']
-        logger.info(f"🔍 Validating quiz set: {quiz_set_id}")
+        quiz_set_id = job['id']
+        logger.info(f"🔍 Validating quiz set: {quiz_set_id} (attempt {job['attempts']})")
         
         try:
-            # Mark as processing to prevent duplicate work
-            await self._mark_processing(quiz_set_id)
-            
-            # Run validation
+            # Run validation (resumes from saved passes on a retry)
             result = await validation_service.validate_quiz_set(quiz_set_id)
+            if 'error' in result:
+                raise RuntimeError(result['error'])
+            
+            async with db.pool.acquire() as conn:
+                if not await self.queue.complete(conn, self.worker_id, quiz_set_id):
+                    logger.warning(f"Lease on {quiz_set_id} expired before completion")
             
             # Update statistics
             self.stats['processed'] += 1
@@ -135,38 +162,14 @@ class ValidationWorker:
             logger.error(f"Error validating {quiz_set_id}: {e}")
             self.stats['errors'] += 1
             
-            # Mark as error
-            await self._mark_error(quiz_set_id, str(e))
-    
-    async def _mark_processing(self, quiz_set_id):
-        """Mark a quiz set as being processed"""
-        async with db.pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE content
-                SET metadata = jsonb_set(
-                    COALESCE(metadata, '{}'),
-                    '{validation_started_at}',
-                    to_jsonb(CURRENT_TIMESTAMP)
-                )
-                WHERE id = $1
-            """, quiz_set_id)
-    
-    async def _mark_error(self, quiz_set_id, error_message):
-        """Mark a quiz set as having an error"""
-        async with db.pool.acquire() as conn:
-            await conn.execute("""
-                UPDATE content
-                SET validation_status = 'error',
-                    metadata = jsonb_set(
-                        COALESCE(metadata, '{}'),
-                        '{validation_error}',
-                        $2
-                    )
-                WHERE id = $1
-            """, quiz_set_id, json.dumps({
-                'error': error_message,
-                'timestamp': datetime.utcnow().isoformat()
-            }))
+            # Retry later, or dead-letter once attempts are used up
+            async with db.pool.acquire() as conn:
+                status = await self.queue.fail(conn, self.worker_id, quiz_set_id, str(e))
+            if status == 'dead':
+                self.stats['dead'] += 1
+                logger.error(f"☠️  Giving up on {quiz_set_id} after {job['attempts']} attempts")
+        finally:
+            self.leased.discard(quiz_set_id)
     
     def _log_stats(self):
         """Log current statistics"""
@@ -180,6 +183,7 @@ class ValidationWorker:
   Approved: {self.stats['approved']} ({self._percent(self.stats['approved'], self.stats['processed'])}%)
   Rejected: {self.stats['rejected']} ({self._percent(self.stats['rejected'], self.stats['processed'])}%)
   Errors: {self.stats['errors']}
+  Dead-lettered: {self.stats['dead']}
   Rate: {self.stats['processed'] / hours:.1f} sets/hour
         """)
     